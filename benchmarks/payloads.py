@@ -0,0 +1,75 @@
+"""Realistic payloads, shaped like the ones of the GitHub API, to use in benchmarks."""
+
+import json
+
+
+def make_user(index):
+    return {
+        'login': 'user%s' % index,
+        'id': 1000 + index,
+        'node_id': 'MDQ6VXNlcjE%s=' % index,
+        'avatar_url': 'https://avatars.githubusercontent.com/u/%s?v=4' % index,
+        'gravatar_id': '',
+        'url': 'https://api.github.com/users/user%s' % index,
+        'html_url': 'https://github.com/user%s' % index,
+        'followers_url': 'https://api.github.com/users/user%s/followers' % index,
+        'repos_url': 'https://api.github.com/users/user%s/repos' % index,
+        'type': 'User',
+        'site_admin': False,
+    }
+
+
+def make_issue(number):
+    return {
+        'url': 'https://api.github.com/repos/foo/bar/issues/%s' % number,
+        'repository_url': 'https://api.github.com/repos/foo/bar',
+        'labels_url': 'https://api.github.com/repos/foo/bar/issues/%s/labels{/name}' % number,
+        'comments_url': 'https://api.github.com/repos/foo/bar/issues/%s/comments' % number,
+        'html_url': 'https://github.com/foo/bar/issues/%s' % number,
+        'id': 100000 + number,
+        'node_id': 'MDU6SXNzdWUx%s' % number,
+        'number': number,
+        'title': 'Issue number %s with a not so short title' % number,
+        'user': make_user(number % 50),
+        'labels': [
+            {
+                'id': 200 + label,
+                'node_id': 'MDU6TGFiZWwy%s' % label,
+                'url': 'https://api.github.com/repos/foo/bar/labels/label%s' % label,
+                'name': 'label%s' % label,
+                'color': 'f29513',
+                'default': label == 0,
+            }
+            for label in range(number % 4)
+        ],
+        'state': 'open' if number % 3 else 'closed',
+        'locked': False,
+        'assignee': make_user(number % 7) if number % 2 else None,
+        'assignees': [make_user(number % 7)] if number % 2 else [],
+        'milestone': None,
+        'comments': number % 12,
+        'created_at': '2017-10-%02dT12:00:00Z' % (number % 28 + 1),
+        'updated_at': '2017-11-%02dT12:00:00Z' % (number % 28 + 1),
+        'closed_at': None,
+        'author_association': 'CONTRIBUTOR',
+        'body': 'Some description of the issue.\n' * (number % 20 + 1),
+    }
+
+
+def make_issues(size):
+    """Return a list of issues whose json representation is about `size` bytes."""
+
+    issues = []
+    total = 0
+    while total < size:
+        issue = make_issue(len(issues) + 1)
+        total += len(json.dumps(issue))
+        issues.append(issue)
+    return issues
+
+
+SMALL_ISSUE = make_issue(1)
+ISSUES_1MB = make_issues(1024 * 1024)
+ISSUES_1MB_JSON = json.dumps({'total_count': len(ISSUES_1MB), 'items': ISSUES_1MB})
+ISSUES_1MB_BY_NUMBER = {str(issue['number']): issue for issue in ISSUES_1MB}
+SMALL_ISSUE_JSON = json.dumps(SMALL_ISSUE)
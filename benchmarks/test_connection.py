@@ -0,0 +1,52 @@
+import pytest
+
+from isshub_sync.connection.connection import Callable, Connection, PathTemplate
+
+
+ROOT = 'https://api.github.com'
+CONNECTION = Connection(ROOT)
+ISSUE_TEMPLATE = PathTemplate(
+    Callable(CONNECTION, 'repos', '{owner}', '{name}', 'issues', '{number}')
+)
+
+
+def test_callable_short_chain(benchmark):
+    value = benchmark(lambda: CONNECTION.repos('foo', 'bar'))
+    assert value.path == '/repos/foo/bar'
+
+
+def test_callable_long_chain(benchmark):
+    value = benchmark(
+        lambda: CONNECTION.repos('foo', 'bar').issues(1).comments(2).reactions.get
+    )
+    assert value.path == '/repos/foo/bar/issues/1/comments/2/reactions'
+
+
+def test_callable_path(benchmark):
+    value = CONNECTION.repos('foo', 'bar').issues(1).comments
+    assert benchmark(lambda: value.path) == '/repos/foo/bar/issues/1/comments'
+
+
+def test_callable_path_template(benchmark):
+    value = CONNECTION.repos('foo', 'bar').issues(1).comments
+    assert benchmark(lambda: value.path_template) == '/repos/{}/{}/issues/{}/comments'
+
+
+def test_path_template_format(benchmark):
+    value = benchmark(ISSUE_TEMPLATE.format, owner='foo', name='bar', number=1)
+    assert value.path == '/repos/foo/bar/issues/1'
+
+
+@pytest.mark.parametrize('path', ['repos/foo/bar/issues', '/repos/foo/bar/issues/'])
+def test_finalize_path(benchmark, path):
+    assert benchmark(CONNECTION._finalize_path, path) == '/repos/foo/bar/issues/'
+
+
+def test_finalize_url(benchmark):
+    url = benchmark(CONNECTION._finalize_url, '/repos/foo/bar/issues')
+    assert url == ROOT + '/repos/foo/bar/issues/'
+
+
+@pytest.mark.parametrize('root', ['https://api.github.com', 'https://foo.com:8080/api/v3/'])
+def test_validate_root(benchmark, root):
+    assert benchmark(Connection._validate_root, root) == root.rstrip('/')
@@ -0,0 +1,55 @@
+import json
+
+from isshub_sync.utils import DictObject
+
+from .payloads import ISSUES_1MB_BY_NUMBER, ISSUES_1MB_JSON, SMALL_ISSUE, SMALL_ISSUE_JSON
+
+
+EXPECTED = (1, 'user1', 'Issue number 1 with a not so short title')
+
+
+def read_some_fields(issues):
+    return [(issue.number, issue.user.login, issue.title) for issue in issues]
+
+
+def test_eager_from_dict_1mb(benchmark):
+    fields = benchmark(
+        lambda: read_some_fields(DictObject.from_dict(ISSUES_1MB_BY_NUMBER).values())
+    )
+    assert fields[0] == EXPECTED
+
+
+def test_lazy_from_dict_1mb(benchmark):
+    fields = benchmark(
+        lambda: read_some_fields(DictObject.lazy(ISSUES_1MB_BY_NUMBER).values())
+    )
+    assert fields[0] == EXPECTED
+
+
+def test_eager_from_json_1mb(benchmark):
+    fields = benchmark(
+        lambda: read_some_fields(DictObject.from_json(ISSUES_1MB_JSON)['items'])
+    )
+    assert fields[0] == EXPECTED
+
+
+def test_lazy_from_json_1mb(benchmark):
+    fields = benchmark(
+        lambda: read_some_fields(DictObject.lazy(json.loads(ISSUES_1MB_JSON))['items'])
+    )
+    assert fields[0] == EXPECTED
+
+
+def test_eager_from_dict_small(benchmark):
+    issue = benchmark(DictObject.from_dict, SMALL_ISSUE)
+    assert issue.user.login == 'user1'
+
+
+def test_lazy_from_dict_small(benchmark):
+    issue = benchmark(DictObject.lazy, SMALL_ISSUE)
+    assert issue.user.login == 'user1'
+
+
+def test_eager_from_json_small(benchmark):
+    issue = benchmark(DictObject.from_json, SMALL_ISSUE_JSON)
+    assert issue.user.login == 'user1'
@@ -0,0 +1,107 @@
+"""Throughput and number of sockets, HTTP/1.1 with aiohttp versus HTTP/2 with httpx.
+
+The server is a local hypercorn server, speaking both protocols. The number of sockets
+opened by the client is counted by the server, and saved in the ``extra_info`` of each
+benchmark.
+
+"""
+
+import asyncio
+import socket
+
+import pytest
+
+from isshub_sync.connection.connection import Connection
+from isshub_sync.connection.http2 import HttpxClient
+from isshub_sync.connection.pool import ClientPool
+from isshub_sync.json_codec import get_codec
+
+from .payloads import SMALL_ISSUE
+
+pytest.importorskip('httpx')
+pytest.importorskip('h2')
+hypercorn_asyncio = pytest.importorskip('hypercorn.asyncio')
+hypercorn_config = pytest.importorskip('hypercorn.config')
+
+
+SMALL_ISSUE_JSON = get_codec().dumps(SMALL_ISSUE)
+
+
+@pytest.fixture
+def server(loop):
+    """Start a hypercorn server, and return its url and the set of client addresses."""
+
+    clients = set()
+
+    async def app(scope, receive, send):
+        if scope['type'] != 'http':
+            return
+        clients.add(tuple(scope['client']))
+        await send({'type': 'http.response.start', 'status': 200, 'headers': [
+            (b'content-type', b'application/json'),
+        ]})
+        await send({'type': 'http.response.body', 'body': SMALL_ISSUE_JSON})
+
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+
+    config = hypercorn_config.Config()
+    config.bind = ['127.0.0.1:%d' % port]
+    config.accesslog = config.errorlog = None
+    config.backlog = 2048
+    config.keep_alive_max_requests = 10 ** 6  # else the connection is closed every 1000 requests
+    shutdown = asyncio.Event()
+    task = loop.create_task(hypercorn_asyncio.serve(app, config, shutdown_trigger=shutdown.wait))
+    loop.run_until_complete(asyncio.sleep(0.2))
+
+    yield 'http://127.0.0.1:%d' % port, clients
+
+    shutdown.set()
+    loop.run_until_complete(task)
+
+
+CLIENTS = {
+    # the default pool: at most 10 sockets to the same host
+    'aiohttp-pool': lambda: ClientPool().client,
+    # a socket for each request in flight
+    'aiohttp-unlimited': lambda: ClientPool(limit=0, limit_per_host=0).client,
+    # all requests multiplexed over one socket
+    'httpx-http2': lambda: HttpxClient(http1=False, max_connections=1),
+}
+
+
+async def fetch_all(connection, concurrency):
+    async def fetch(number):
+        response = await connection.repos('foo', 'bar').issues(number).get()
+        try:
+            return (await response.json())['number']
+        finally:
+            response.release()
+
+    return await asyncio.gather(*(fetch(number) for number in range(concurrency)))
+
+
+@pytest.mark.parametrize('concurrency', [100, 1000])
+@pytest.mark.parametrize('client_name', sorted(CLIENTS))
+def test_concurrent_requests(benchmark, loop, server, client_name, concurrency):
+    root, clients = server
+
+    async def make_client():  # an aiohttp session must be created in a running loop
+        return CLIENTS[client_name]()
+
+    client = loop.run_until_complete(make_client())
+    connection = Connection(root, client=client)
+
+    try:
+        numbers = benchmark.pedantic(
+            lambda: loop.run_until_complete(fetch_all(connection, concurrency)),
+            rounds=5,
+            warmup_rounds=1,
+        )
+    finally:
+        loop.run_until_complete(client.close())
+
+    assert numbers == [1] * concurrency
+    benchmark.extra_info['sockets'] = len(clients)
+    print('\n%s, %d concurrent requests: %d sockets' % (client_name, concurrency, len(clients)))
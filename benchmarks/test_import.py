@@ -0,0 +1,31 @@
+"""Import time benchmarks, each one in a new python process."""
+
+import subprocess
+import sys
+from pathlib import PurePath
+
+import pytest
+
+
+ROOT = str(PurePath(__file__).parent.parent)
+
+
+def run_python(code):
+    subprocess.check_call([sys.executable, '-c', code], cwd=ROOT)
+
+
+def test_python_startup(benchmark):
+    """The reference: the time to start python without importing anything."""
+
+    benchmark(run_python, 'pass')
+
+
+@pytest.mark.parametrize('code', [
+    'import isshub_sync',
+    'import isshub_sync; isshub_sync.__version__',
+    'import isshub_sync.utils',
+    'import isshub_sync.records',
+    'import isshub_sync.connection.connection',
+])
+def test_import(benchmark, code):
+    benchmark(run_python, code)
@@ -0,0 +1,35 @@
+import pytest
+
+from isshub_sync.json_codec import CODEC_CLASSES
+from isshub_sync.utils import DictObject
+
+from .payloads import ISSUES_1MB, ISSUES_1MB_JSON, SMALL_ISSUE
+
+
+ISSUES_1MB_JSON_BYTES = ISSUES_1MB_JSON.encode()
+
+
+@pytest.fixture(params=CODEC_CLASSES, ids=lambda codec_class: codec_class.NAME)
+def codec(request):
+    if not request.param.is_available():
+        pytest.skip('%s is not installed' % request.param.MODULE)
+    return request.param()
+
+
+def test_dumps_small(benchmark, codec):
+    assert benchmark(codec.dumps, SMALL_ISSUE).startswith(b'{')
+
+
+def test_dumps_1mb(benchmark, codec):
+    assert benchmark(codec.dumps, ISSUES_1MB).startswith(b'[')
+
+
+def test_loads_objects_small(benchmark, codec):
+    small_issue_json = codec.dumps(SMALL_ISSUE)
+    issue = benchmark(codec.loads_objects, small_issue_json, DictObject)
+    assert issue.user.login == 'user1'
+
+
+def test_loads_objects_1mb(benchmark, codec):
+    issues = benchmark(codec.loads_objects, ISSUES_1MB_JSON_BYTES, DictObject)
+    assert issues['items'][0].user.login == 'user1'
@@ -0,0 +1,31 @@
+from pickle import HIGHEST_PROTOCOL, dumps, loads
+
+import pytest
+
+from isshub_sync.records import infer_record_type
+from isshub_sync.utils import DictObject
+
+from .payloads import ISSUES_1MB, SMALL_ISSUE
+
+
+Issue = infer_record_type('Issue', ISSUES_1MB)
+# inferred nested types must be found in their module to be pickled
+globals().update((record.__name__, record) for record in Issue.NESTED.values())
+
+OBJECTS = {
+    'dict_object_small': DictObject.from_dict(SMALL_ISSUE),
+    'dict_object_1mb': DictObject.from_dict({'items': ISSUES_1MB}),
+    'lazy_dict_object_1mb': DictObject.lazy({'items': ISSUES_1MB}),
+    'record_small': Issue.from_dict(SMALL_ISSUE),
+    'records_1mb': Issue.convert(ISSUES_1MB),
+}
+
+
+def round_trip(obj):
+    return loads(dumps(obj, HIGHEST_PROTOCOL))
+
+
+@pytest.mark.parametrize('name', sorted(OBJECTS))
+def test_pickle_round_trip(benchmark, name):
+    obj = OBJECTS[name]
+    assert benchmark(round_trip, obj) == obj
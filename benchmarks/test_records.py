@@ -0,0 +1,47 @@
+import json
+import tracemalloc
+
+from isshub_sync.records import infer_record_type
+from isshub_sync.utils import DictObject
+
+from .payloads import ISSUES_1MB
+
+
+Issue = infer_record_type('Issue', ISSUES_1MB)
+ISSUES_JSON = json.dumps(ISSUES_1MB)
+
+
+def measure_memory(build):
+    """Return the result of `build` and the number of bytes allocated to keep it."""
+
+    tracemalloc.start()
+    try:
+        result = build()
+        size = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    return result, size
+
+
+def test_memory_dict_object_vs_record():
+    dict_objects, dict_objects_size = measure_memory(lambda: DictObject.from_json(ISSUES_JSON))
+    records, records_size = measure_memory(lambda: Issue.from_json(ISSUES_JSON))
+
+    print('\n%s issues: DictObject %d bytes/issue, Record %d bytes/issue (%.0f%%)' % (
+        len(records),
+        dict_objects_size / len(records),
+        records_size / len(records),
+        100 * records_size / dict_objects_size,
+    ))
+    assert records == dict_objects
+    assert records_size < dict_objects_size
+
+
+def test_from_json_dict_object_1mb(benchmark):
+    issues = benchmark(DictObject.from_json, ISSUES_JSON)
+    assert issues[0].user.login == 'user1'
+
+
+def test_from_json_record_1mb(benchmark):
+    issues = benchmark(Issue.from_json, ISSUES_JSON)
+    assert issues[0].user.login == 'user1'
@@ -0,0 +1,77 @@
+"""End-to-end benchmarks: ``Executable`` calls against a local aiohttp server."""
+
+import asyncio
+from functools import partial
+
+from aiohttp import web
+
+import pytest
+
+from isshub_sync.connection.connection import Connection
+from isshub_sync.connection.pool import ClientPool
+from isshub_sync.json_codec import get_codec
+
+from .payloads import SMALL_ISSUE
+
+
+# many requests per round, to measure the overhead per request and not the event loop
+REQUESTS_PER_ROUND = 100
+SMALL_ISSUE_JSON = get_codec().dumps(SMALL_ISSUE)
+
+
+@pytest.fixture
+def server(loop, test_server):
+
+    async def issue(request):
+        return web.Response(body=SMALL_ISSUE_JSON, content_type='application/json')
+
+    app = web.Application()
+    app.router.add_get('/repos/{owner}/{name}/issues/{number}/', issue)
+
+    return loop.run_until_complete(test_server(app))
+
+
+@pytest.fixture
+def connection(loop, server):
+    pool = ClientPool(limit=100)
+    connection = Connection(str(server.make_url('/')), pool=pool)
+    yield connection
+    loop.run_until_complete(pool.close())
+
+
+async def fetch_issue(connection, number):
+    response = await connection.repos('foo', 'bar').issues(number).get()
+    try:
+        return (await response.json())['number']
+    finally:
+        response.release()
+
+
+async def fetch_issues(connection, concurrency):
+    """Fetch ``REQUESTS_PER_ROUND`` issues, with at most `concurrency` requests at once."""
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fetch(number):
+        async with semaphore:
+            return await fetch_issue(connection, number)
+
+    return await asyncio.gather(*(fetch(number) for number in range(REQUESTS_PER_ROUND)))
+
+
+@pytest.mark.parametrize('concurrency', [1, 10, 50])
+def test_executable_calls(benchmark, loop, connection, concurrency):
+    numbers = benchmark(lambda: loop.run_until_complete(fetch_issues(connection, concurrency)))
+    assert numbers == [1] * REQUESTS_PER_ROUND
+
+
+@pytest.mark.parametrize('concurrency', [1, 50])
+def test_executable_calls_with_gather(benchmark, loop, connection, concurrency):
+
+    def run():
+        return loop.run_until_complete(connection.gather(
+            [partial(fetch_issue, connection, number) for number in range(REQUESTS_PER_ROUND)],
+            concurrency=concurrency,
+        ))
+
+    assert benchmark(run) == [1] * REQUESTS_PER_ROUND
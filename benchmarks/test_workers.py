@@ -0,0 +1,56 @@
+"""Scaling of ``WorkerPool`` with the number of processes, on CPU bound jobs.
+
+Each job fetches a 1MB list of issues from a local aiohttp server and decodes it into
+``DictObject`` instances, so the time is spent in decoding, not in waiting for the network.
+With one process the jobs are limited by a single core, more processes should divide the
+time of a round up to the number of cores.
+
+"""
+
+from aiohttp import web
+
+import pytest
+
+from isshub_sync.connection.decoding import read_json
+from isshub_sync.connection.workers import WorkerPool
+
+from .payloads import ISSUES_1MB, ISSUES_1MB_JSON
+
+
+JOBS_PER_ROUND = 16
+
+
+@pytest.fixture
+def server(loop, test_server):
+
+    async def search(request):
+        return web.Response(body=ISSUES_1MB_JSON.encode(), content_type='application/json')
+
+    app = web.Application()
+    app.router.add_get('/search/issues/', search)
+
+    return loop.run_until_complete(test_server(app))
+
+
+async def count_issues(connection):
+    """Decode all the issues, but only send back their number to the main process."""
+
+    response = await connection.search.issues.get()
+    try:
+        return len((await read_json(response))['items'])
+    finally:
+        response.release()
+
+
+@pytest.mark.parametrize('processes', [1, 2, 4])
+def test_worker_pool_scaling(benchmark, loop, server, processes):
+    with WorkerPool(str(server.make_url('/')), processes=processes, chunk_size=1) as workers:
+        # start all the workers before measuring
+        loop.run_until_complete(workers.gather([count_issues] * processes))
+
+        counts = benchmark.pedantic(
+            lambda: loop.run_until_complete(workers.gather([count_issues] * JOBS_PER_ROUND)),
+            rounds=3,
+        )
+
+    assert counts == [len(ISSUES_1MB)] * JOBS_PER_ROUND
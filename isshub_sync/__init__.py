@@ -1,8 +1,43 @@
-"""Library to sync data between repository hosts and Isshub."""
+"""Library to sync data between repository hosts and Isshub.
 
-from pathlib import PurePath
-from pkg_resources import get_distribution, DistributionNotFound
-from setuptools.config import read_configuration
+Importing the package is cheap: ``__version__`` is only computed on first access, and no
+submodule, nor ``typing``, is imported until needed (``aiohttp`` is only imported with
+``isshub_sync.connection`` modules).
+
+"""
+
+import sys
+from types import ModuleType
+
+
+def _metadata_version(name: str) -> str:
+    """Return the version of an installed distribution, from its metadata.
+
+    Parameters
+    ----------
+    name : str
+        The name of the distribution
+
+    Returns
+    -------
+    str
+        The version of the distribution
+
+    Raises
+    ------
+    ImportError
+        If the distribution is not installed (``PackageNotFoundError`` is a subclass of
+        ``ImportError``), or if ``importlib_metadata`` is not installed for python < 3.8
+
+    """
+
+    # pylint: disable=import-outside-toplevel
+    if sys.version_info >= (3, 8):
+        from importlib.metadata import version
+    else:  # pragma: no cover
+        from importlib_metadata import version
+
+    return version(name)
 
 
 def _extract_version() -> str:
@@ -11,15 +46,56 @@ def _extract_version() -> str:
     Returns
     -------
     str
-        The version as defined in setup.cfg
+        The version of the installed package, or, if not installed, as defined in setup.cfg
 
     """
 
     try:
-        return get_distribution('isshub_sync').version
-    except DistributionNotFound:
-        conf = read_configuration(PurePath(__file__).parent.parent / 'setup.cfg')
-        return conf['metadata']['version']
+        return _metadata_version('isshub_sync')
+    except ImportError:
+        # pylint: disable=import-outside-toplevel
+        from configparser import ConfigParser
+        from pathlib import PurePath
+
+        config = ConfigParser(interpolation=None)
+        config.read(str(PurePath(__file__).parent.parent / 'setup.cfg'), encoding='utf-8')
+        return config['metadata']['version']
+
+
+def __getattr__(name: str) -> str:
+    """Compute ``__version__`` on first access, and save it in the module.
+
+    Parameters
+    ----------
+    name : str
+        The name of the attribute not found in the module
+
+    Returns
+    -------
+    str
+        The version, for ``__version__``
+
+    Raises
+    ------
+    AttributeError
+        For any other name
+
+    """
+
+    if name == '__version__':
+        version = globals()['__version__'] = _extract_version()
+        return version
+    raise AttributeError('module %r has no attribute %r' % (__name__, name))
+
+
+if sys.version_info < (3, 7):  # pragma: no cover  # module ``__getattr__`` (PEP 562)
+
+    class _LazyModule(ModuleType):  # pylint: disable=too-few-public-methods
+        """Module class calling the module ``__getattr__`` for missing attributes."""
+
+        def __getattr__(self, name: str) -> str:
+            """Call the module ``__getattr__``."""
 
+            return __getattr__(name)
 
-__version__ = _extract_version()
+    sys.modules[__name__].__class__ = _LazyModule
@@ -0,0 +1,213 @@
+"""Concurrent execution of many requests with bounded parallelism.
+
+A "job" is any callable without arguments returning an awaitable: an ``Executable``
+(``connection.repos('foo', 'bar').get``), a ``functools.partial`` of an ``Executable``
+to pass some arguments (``partial(executable, headers={...})``), or any coroutine function.
+
+"""
+
+import asyncio
+from collections import defaultdict
+from typing import (  # noqa: F401
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Hashable,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
+
+
+# pylint: disable=invalid-name
+Job = Callable[[], Awaitable[Any]]
+JobHostGetter = Callable[[Job], Optional[Hashable]]
+# pylint: enable=invalid-name
+
+
+class Batch:
+    """Run many jobs concurrently, with a global and per-host limit of running jobs.
+
+    If a job raises an exception, all the other ones, running or not yet started, are
+    cancelled and the exception is raised, unless `return_exceptions` is set.
+
+    Parameters
+    ----------
+    jobs: Iterable[Job]
+        The jobs to run. Each one is a callable without argument returning an awaitable.
+    concurrency: int
+        The maximum number of jobs running at the same time.
+    per_host_concurrency: int, optional
+        The maximum number of jobs running at the same time for the same host. Only used for
+        jobs for which `get_host` returns a host.
+    return_exceptions: bool
+        If ``True``, exceptions raised by jobs are returned as results instead of
+        cancelling the other jobs.
+    get_host: JobHostGetter, optional
+        A function returning the host of a job, or ``None`` if not known.
+
+    Attributes
+    ----------
+    All parameters given to the constuctor are saved as attributes on the instance.
+
+    Examples
+    --------
+    >>> from functools import partial
+    >>> async def double(value):
+    ...     await asyncio.sleep(0.01 * (5 - value))
+    ...     return value * 2
+    >>> jobs = [partial(double, value) for value in range(5)]
+    >>> loop = asyncio.new_event_loop()
+    >>> asyncio.set_event_loop(loop)
+    >>> loop.run_until_complete(Batch(jobs, concurrency=2).gather())
+    [0, 2, 4, 6, 8]
+    >>> loop.close()
+
+    """
+
+    __slots__ = (
+        'concurrency',
+        'get_host',
+        'jobs',
+        'per_host_concurrency',
+        'return_exceptions',
+    )
+
+    def __init__(  # pylint: disable=too-many-arguments
+            self,
+            jobs: Iterable[Job],
+            concurrency: int = 10,
+            per_host_concurrency: Optional[int] = None,
+            return_exceptions: bool = False,
+            get_host: Optional[JobHostGetter] = None) -> None:
+        """Save the jobs and the limits."""
+
+        assert concurrency > 0
+        assert per_host_concurrency is None or per_host_concurrency > 0
+
+        self.jobs: List[Job] = list(jobs)
+        self.concurrency: int = concurrency
+        self.per_host_concurrency: Optional[int] = per_host_concurrency
+        self.return_exceptions: bool = return_exceptions
+        self.get_host: Optional[JobHostGetter] = get_host
+
+    def _start(self) -> List[asyncio.Future]:
+        """Start a task for each job, each one waiting for its slots before running.
+
+        Returns
+        -------
+        List[asyncio.Future]
+            The tasks, in the same order as the jobs
+
+        """
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        per_host_concurrency = self.per_host_concurrency or 0  # host slots only used if set
+        host_semaphores: Dict[Hashable, asyncio.Semaphore] = defaultdict(
+            lambda: asyncio.Semaphore(per_host_concurrency)
+        )
+
+        async def run(job: Job) -> Any:
+            """Run the job when a global slot, and a host slot if needed, are available.
+
+            Parameters
+            ----------
+            job : Job
+                The job to run
+
+            Returns
+            -------
+            Any
+                The result of the job
+
+            """
+
+            host: Optional[Hashable] = None
+            if per_host_concurrency and self.get_host is not None:
+                host = self.get_host(job)
+
+            # take the host slot first, to not hold a global slot while waiting for it
+            if host is not None:
+                async with host_semaphores[host]:
+                    async with semaphore:
+                        return await job()
+
+            async with semaphore:
+                return await job()
+
+        return [asyncio.ensure_future(run(job)) for job in self.jobs]
+
+    async def as_completed(self, ordered: bool = False) -> AsyncIterator[Tuple[int, Any]]:
+        """[ASYNC] Run the jobs and yield their results as soon as they are available.
+
+        When the iteration stops before the end, call ``aclose`` on the iterator to cancel
+        the jobs still running.
+
+        Parameters
+        ----------
+        ordered : bool
+            If ``True``, results are yielded in the order of the jobs, each one as soon as it
+            and all the previous ones are done. Else they are yielded as they complete.
+
+        Yields
+        ------
+        Tuple[int, Any]
+            The index of the job in ``jobs``, and its result (or exception if
+            ``return_exceptions`` is set)
+
+        """
+
+        tasks = self._start()
+        indexes: Dict[asyncio.Future, int] = {task: index for index, task in enumerate(tasks)}
+        pending: Set[asyncio.Future] = set(tasks)
+        ready: Dict[int, Any] = {}
+        next_index = 0
+
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+
+                for task in sorted(done, key=indexes.__getitem__):
+                    # a job cancelled by itself fails like any other one (``exception`` would
+                    # raise the ``CancelledError``, as if the iteration itself was cancelled)
+                    exception = (
+                        asyncio.CancelledError() if task.cancelled() else task.exception()
+                    )
+                    if exception is not None and not self.return_exceptions:
+                        raise exception
+                    ready[indexes[task]] = task.result() if exception is None else exception
+
+                if ordered:
+                    while next_index in ready:
+                        yield next_index, ready.pop(next_index)
+                        next_index += 1
+                else:
+                    for index in sorted(ready):
+                        yield index, ready.pop(index)
+
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.wait(pending)
+
+    async def gather(self) -> List[Any]:
+        """[ASYNC] Run the jobs and return all their results, in the order of the jobs.
+
+        Returns
+        -------
+        List[Any]
+            The result of each job (or exception if ``return_exceptions`` is set)
+
+        """
+
+        results: List[Any] = [None] * len(self.jobs)
+
+        async for index, result in self.as_completed():
+            results[index] = result
+
+        return results
@@ -0,0 +1,741 @@
+"""Cache of responses, revalidated with conditional requests.
+
+When a cached response exists for a request, the request is sent with the "If-None-Match"
+and/or "If-Modified-Since" headers. If the server answers "304 Not Modified" (which is not
+counted in the rate limit by GitHub), the cached body is replayed transparently via a
+``CachedResponse``.
+
+Two backends are available: ``MemoryCache``, and ``SqliteCache`` that survives restarts.
+
+"""
+
+import asyncio
+import hashlib
+import json
+import sqlite3
+import time
+from abc import ABCMeta, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, List, Optional, Set, Tuple, Union
+from urllib.parse import urlencode
+
+from aiohttp import ClientResponse, hdrs
+from multidict import CIMultiDict, CIMultiDictProxy
+
+from .python_types import Url
+from .responses import BufferedResponse
+
+
+class CacheEntry:  # pylint: disable=too-few-public-methods
+    """A response saved in a cache.
+
+    Parameters
+    ----------
+    status: int
+        The HTTP status of the response
+    headers: List[Tuple[str, str]]
+        The headers of the response
+    body: bytes
+        The body of the response
+
+    Attributes
+    ----------
+    All parameters given to the constuctor are saved as attributes on the instance.
+    etag: str, optional
+        The "ETag" header of the response, if any
+    last_modified: str, optional
+        The "Last-Modified" header of the response, if any
+
+    Examples
+    --------
+    >>> entry = CacheEntry(200, [('ETag', '"abc"')], b'{}')
+    >>> entry.validators
+    {'If-None-Match': '"abc"'}
+    >>> entry.size
+    2
+
+    """
+
+    __slots__ = (
+        'body',
+        'headers',
+        'status',
+    )
+
+    def __init__(self, status: int, headers: List[Tuple[str, str]], body: bytes) -> None:
+        """Save the parts of the response."""
+
+        self.status: int = status
+        self.headers: List[Tuple[str, str]] = headers
+        self.body: bytes = body
+
+    def _get_header(self, name: str) -> Optional[str]:
+        """Return the value of the header `name`, case insensitive.
+
+        Parameters
+        ----------
+        name : str
+            The name of the wanted header
+
+        Returns
+        -------
+        str, optional
+            The value of the header, or ``None`` if not present
+
+        """
+
+        name = name.lower()
+        for key, value in self.headers:
+            if key.lower() == name:
+                return value
+        return None
+
+    @property
+    def etag(self) -> Optional[str]:
+        """Return the "ETag" header of the response, if any.
+
+        Returns
+        -------
+        str, optional
+            The value of the header
+
+        """
+
+        return self._get_header(hdrs.ETAG)
+
+    @property
+    def last_modified(self) -> Optional[str]:
+        """Return the "Last-Modified" header of the response, if any.
+
+        Returns
+        -------
+        str, optional
+            The value of the header
+
+        """
+
+        return self._get_header(hdrs.LAST_MODIFIED)
+
+    @property
+    def validators(self) -> dict:
+        """Return the headers to send to make a conditional request.
+
+        Returns
+        -------
+        dict
+            The "If-None-Match" and/or "If-Modified-Since" headers
+
+        """
+
+        headers: dict = {}
+        if self.etag is not None:
+            headers[hdrs.IF_NONE_MATCH] = self.etag
+        if self.last_modified is not None:
+            headers[hdrs.IF_MODIFIED_SINCE] = self.last_modified
+        return headers
+
+    @property
+    def size(self) -> int:
+        """Return the size of the body.
+
+        Returns
+        -------
+        int
+            The number of bytes of the body
+
+        """
+
+        return len(self.body)
+
+
+class CachedResponse(BufferedResponse):
+    """A response replayed from the cache, after a "304 Not Modified" answer.
+
+    It has the same interface as ``ClientResponse`` for the common use. All attributes
+    not defined here are taken from the real "304" response.
+
+    Parameters
+    ----------
+    response: ClientResponse
+        The "304 Not Modified" response
+    entry: CacheEntry
+        The cached response to replay
+
+    Attributes
+    ----------
+    from_cache: bool = True
+        Tells that the response comes from the cache
+    response: ClientResponse
+        The "304 Not Modified" response
+    entry: CacheEntry
+        The cached response to replay
+    body: bytes
+        The body of the cached response
+    status: int
+        The status of the cached response
+    headers: CIMultiDictProxy
+        The headers of the cached response, updated with the ones of the "304" response
+        (that include, for example, up to date rate-limit headers)
+
+    """
+
+    __slots__ = (
+        'entry',
+        'headers',
+        'status',
+    )
+
+    from_cache: bool = True
+
+    def __init__(self, response: ClientResponse, entry: CacheEntry) -> None:
+        """Save the response and the cache entry, and merge the headers."""
+
+        super().__init__(response, entry.body)
+        self.entry: CacheEntry = entry
+        self.status: int = entry.status
+
+        headers = CIMultiDict(entry.headers)
+        headers.update(response.headers)
+        self.headers: CIMultiDictProxy = CIMultiDictProxy(headers)
+
+    def raise_for_status(self) -> None:
+        """Do nothing, as a cached response is always a successful one."""
+
+
+class ResponseCache(metaclass=ABCMeta):
+    """Base class for caches of responses.
+
+    Subclasses must implement ``get``, ``set`` and ``delete``.
+
+    Parameters
+    ----------
+    max_entries: int, optional
+        The maximum number of entries to keep. The least recently used ones are evicted first.
+    max_size: int, optional
+        The maximum total size of the bodies to keep, in bytes. The least recently used ones
+        are evicted first.
+    max_entry_size: int, optional
+        Responses with a bigger body are not cached.
+
+    Attributes
+    ----------
+    METHODS: Set[str] = {'get'}
+        The (lowercase) HTTP methods for which responses are cached
+    VARY_HEADERS: Tuple[str] = ('Accept', 'Authorization')
+        The request headers that are part of the cache key, so different users, or asked
+        formats, have different entries
+    All parameters given to the constuctor are saved as attributes on the instance.
+
+    """
+
+    __slots__ = (
+        'max_entries',
+        'max_entry_size',
+        'max_size',
+    )
+
+    METHODS: Set[str] = {'get'}
+    VARY_HEADERS: Tuple[str, ...] = (hdrs.ACCEPT, hdrs.AUTHORIZATION)
+
+    def __init__(
+            self,
+            max_entries: Optional[int] = 10000,
+            max_size: Optional[int] = 100 * 1024 * 1024,
+            max_entry_size: Optional[int] = 5 * 1024 * 1024) -> None:
+        """Save the limits."""
+
+        self.max_entries: Optional[int] = max_entries
+        self.max_size: Optional[int] = max_size
+        self.max_entry_size: Optional[int] = max_entry_size
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[CacheEntry]:
+        """Return the entry for the given key, if any, and mark it as recently used.
+
+        Parameters
+        ----------
+        key : str
+            The key of the entry, computed by ``make_key``
+
+        Returns
+        -------
+        CacheEntry, optional
+            The entry, or ``None`` if not in the cache
+
+        """
+
+    @abstractmethod
+    def set(self, key: str, entry: CacheEntry) -> None:
+        """Save the given entry and evict old ones if needed.
+
+        Parameters
+        ----------
+        key : str
+            The key of the entry, computed by ``make_key``
+        entry : CacheEntry
+            The entry to save
+
+        """
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """Remove the entry for the given key, if any.
+
+        Parameters
+        ----------
+        key : str
+            The key of the entry, computed by ``make_key``
+
+        """
+
+    async def _run(self, method: Callable, *args: Any) -> Any:
+        """[ASYNC] Call a method accessing the storage (``get``, ``set`` or ``delete``).
+
+        Subclasses whose storage must not be accessed from the event loop can override it to
+        run the method elsewhere.
+
+        Parameters
+        ----------
+        method : Callable
+            The method to call
+        args : Any
+            The arguments to pass to the method
+
+        Returns
+        -------
+        Any
+            The result of the method
+
+        """
+
+        return method(*args)
+
+    def make_key(self, method: str, url: Url, request_kwargs: dict) -> str:
+        """Compute the cache key of a request.
+
+        The key is hashed to not keep tokens from the "Authorization" header in clear.
+
+        Parameters
+        ----------
+        method : str
+            The HTTP method of the request
+        url : Url
+            The finalized url of the request
+        request_kwargs : dict
+            The arguments of the request, with ``params`` and ``headers`` used in the key
+
+        Returns
+        -------
+        str
+            The key of the request
+
+        Examples
+        --------
+        >>> cache = MemoryCache()
+        >>> key = cache.make_key('get', 'https://foo.com/bar/', {'params': {'page': 2}})
+        >>> key == cache.make_key('GET', 'https://foo.com/bar/', {'params': {'page': 2}})
+        True
+        >>> key == cache.make_key('get', 'https://foo.com/bar/', {'params': {'page': 3}})
+        False
+        >>> key == cache.make_key(
+        ...     'get', 'https://foo.com/bar/', {'params': {'page': 2}, 'headers': {'accept': 'a'}}
+        ... )
+        False
+
+        """
+
+        parts: List[str] = [method.upper(), url]
+
+        params = request_kwargs.get('params')
+        if params:
+            parts.append(urlencode(sorted(params.items())))
+
+        headers = CIMultiDict(request_kwargs.get('headers') or {})
+        for name in self.VARY_HEADERS:
+            parts.append('%s:%s' % (name, headers.get(name, '')))
+
+        return hashlib.sha256('\n'.join(parts).encode()).hexdigest()
+
+    async def prepare(self, method: str, url: Url, request_kwargs: dict) -> Tuple[
+            Optional[str], Optional[CacheEntry]]:
+        """[ASYNC] Find the cached entry for a request, and add validators to its headers if found.
+
+        Parameters
+        ----------
+        method : str
+            The lowercase HTTP method of the request
+        url : Url
+            The finalized url of the request
+        request_kwargs : dict
+            The arguments of the request. Its headers will be updated if an entry is found
+
+        Returns
+        -------
+        Tuple[Optional[str], Optional[CacheEntry]]
+            The key of the request (``None`` if the method is not cached) and the entry found
+            in the cache, if any
+
+        """
+
+        if method not in self.METHODS:
+            return None, None
+
+        key = self.make_key(method, url, request_kwargs)
+        entry = await self._run(self.get, key)
+
+        if entry is not None:
+            headers = dict(request_kwargs.get('headers') or {})
+            headers.update(entry.validators)
+            request_kwargs['headers'] = headers
+
+        return key, entry
+
+    async def process_response(
+            self,
+            key: str,
+            entry: Optional[CacheEntry],
+            response: ClientResponse) -> Union[ClientResponse, CachedResponse]:
+        """[ASYNC] Return the response to use, and update the cache with it if possible.
+
+        Parameters
+        ----------
+        key : str
+            The key of the request, as returned by ``prepare``
+        entry : CacheEntry, optional
+            The entry found in the cache by ``prepare``, if any
+        response : ClientResponse
+            The response of the server
+
+        Returns
+        -------
+        Union[ClientResponse, CachedResponse]
+            A ``CachedResponse`` on a "304 Not Modified" response if we have a cached entry,
+            else the response of the server, with its body read if it was cached
+
+        """
+
+        if response.status == 304 and entry is not None:
+            return CachedResponse(response, entry)
+
+        if response.status != 200:
+            return response
+
+        if hdrs.ETAG not in response.headers and hdrs.LAST_MODIFIED not in response.headers:
+            if entry is not None:
+                await self._run(self.delete, key)
+            return response
+
+        if self.max_entry_size is not None \
+                and (response.content_length or 0) > self.max_entry_size:
+            return response
+
+        body = await response.read()  # kept by the response, so still readable by the caller
+        if self.max_entry_size is None or len(body) <= self.max_entry_size:
+            await self._run(
+                self.set, key, CacheEntry(response.status, list(response.headers.items()), body)
+            )
+
+        return response
+
+
+class MemoryCache(ResponseCache):
+    """A ``ResponseCache`` keeping the entries in memory.
+
+    Examples
+    --------
+    >>> cache = MemoryCache(max_entries=2)
+    >>> for key in 'abc':
+    ...     cache.set(key, CacheEntry(200, [], key.encode()))
+    >>> cache.get('a') is None
+    True
+    >>> cache.get('b').body
+    b'b'
+    >>> cache.set('d', CacheEntry(200, [], b'd'))  # "c" is now the least recently used
+    >>> sorted(cache.entries)
+    ['b', 'd']
+    >>> cache.size
+    2
+
+    """
+
+    __slots__ = (
+        'entries',
+        'size',
+    )
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        """Create the storage of the entries."""
+
+        super().__init__(*args, **kwargs)
+        self.entries: OrderedDict = OrderedDict()
+        self.size: int = 0
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        """Return the entry for the given key, if any, and mark it as recently used.
+
+        Parameters
+        ----------
+        key : str
+            The key of the entry, computed by ``make_key``
+
+        Returns
+        -------
+        CacheEntry, optional
+            The entry, or ``None`` if not in the cache
+
+        """
+
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+        return entry
+
+    def set(self, key: str, entry: CacheEntry) -> None:
+        """Save the given entry and evict the least recently used ones if needed.
+
+        Parameters
+        ----------
+        key : str
+            The key of the entry, computed by ``make_key``
+        entry : CacheEntry
+            The entry to save
+
+        """
+
+        self.delete(key)
+        self.entries[key] = entry
+        self.size += entry.size
+
+        while self.entries and (
+                (self.max_entries is not None and len(self.entries) > self.max_entries)
+                or (self.max_size is not None and self.size > self.max_size)
+        ):
+            __, evicted = self.entries.popitem(last=False)
+            self.size -= evicted.size
+
+    def delete(self, key: str) -> None:
+        """Remove the entry for the given key, if any.
+
+        Parameters
+        ----------
+        key : str
+            The key of the entry, computed by ``make_key``
+
+        """
+
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry.size
+
+
+class SqliteCache(ResponseCache):
+    """A ``ResponseCache`` keeping the entries in a sqlite database, to survive restarts.
+
+    Parameters
+    ----------
+    path: str
+        The path of the sqlite database file. ``:memory:`` can be used for tests.
+    args, kwargs: Any
+        The limits, passed to ``ResponseCache``
+
+    Attributes
+    ----------
+    db: sqlite3.Connection
+        The connection to the database
+
+    Examples
+    --------
+    >>> cache = SqliteCache(':memory:', max_entries=2)
+    >>> for key in 'abc':
+    ...     cache.set(key, CacheEntry(200, [('ETag', key)], key.encode()))
+    >>> cache.get('a') is None
+    True
+    >>> cache.get('b').etag
+    'b'
+    >>> cache.size
+    2
+    >>> cache.close()
+
+    Notes
+    -----
+    When used by a ``Connection``, the database is accessed in a dedicated thread, to not
+    block the event loop while writing bodies and committing.
+
+    """
+
+    __slots__ = (
+        '_count',
+        '_executor',
+        '_size',
+        'db',
+    )
+
+    def __init__(self, path: str, *args: Any, **kwargs: Any) -> None:
+        """Open the database and create the table if needed."""
+
+        super().__init__(*args, **kwargs)
+        # a single thread, as a sqlite connection must not be used by two at the same time
+        self._executor: ThreadPoolExecutor = ThreadPoolExecutor(max_workers=1)
+        self.db: sqlite3.Connection = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute(
+            'CREATE TABLE IF NOT EXISTS responses ('
+            ' key TEXT PRIMARY KEY,'
+            ' status INTEGER NOT NULL,'
+            ' headers TEXT NOT NULL,'
+            ' body BLOB NOT NULL,'
+            ' size INTEGER NOT NULL,'
+            ' accessed REAL NOT NULL'
+            ')'
+        )
+        self.db.execute('CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)')
+        self.db.commit()
+
+        # running totals, to not scan the table at each write to enforce the limits
+        self._count: int
+        self._size: int
+        self._count, self._size = self.db.execute(
+            'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses'
+        ).fetchone()
+
+    @property
+    def size(self) -> int:
+        """Return the total size of the bodies in the cache.
+
+        Returns
+        -------
+        int
+            The number of bytes
+
+        """
+
+        return self._size
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        """Read the entry for the given key from the database, and update its access time.
+
+        Parameters
+        ----------
+        key : str
+            The key of the entry, computed by ``make_key``
+
+        Returns
+        -------
+        CacheEntry, optional
+            The entry, or ``None`` if not in the cache
+
+        """
+
+        row = self.db.execute(
+            'SELECT status, headers, body FROM responses WHERE key = ?', (key, )
+        ).fetchone()
+        if row is None:
+            return None
+
+        with self.db:
+            self.db.execute('UPDATE responses SET accessed = ? WHERE key = ?', (time.time(), key))
+
+        status, headers, body = row
+        return CacheEntry(status, [tuple(header) for header in json.loads(headers)], body)
+
+    def set(self, key: str, entry: CacheEntry) -> None:
+        """Write the given entry in the database and evict old ones if needed.
+
+        Parameters
+        ----------
+        key : str
+            The key of the entry, computed by ``make_key``
+        entry : CacheEntry
+            The entry to save
+
+        """
+
+        with self.db:
+            self._forget(key)
+            self.db.execute(
+                'INSERT INTO responses (key, status, headers, body, size, accessed)'
+                ' VALUES (?, ?, ?, ?, ?, ?)',
+                (key, entry.status, json.dumps(entry.headers), entry.body, entry.size, time.time())
+            )
+            self._count += 1
+            self._size += entry.size
+
+            # only the evicted rows are read, from the least recently used one
+            evicted: List[str] = []
+            rows = self.db.execute('SELECT key, size FROM responses ORDER BY accessed')
+            while (
+                    (self.max_entries is not None and self._count > self.max_entries)
+                    or (self.max_size is not None and self._size > self.max_size)
+            ):
+                row = rows.fetchone()
+                if row is None:  # the database was changed by someone else
+                    break
+                row_key, size = row
+                evicted.append(row_key)
+                self._count -= 1
+                self._size -= size
+            rows.close()
+
+            if evicted:
+                self.db.executemany(
+                    'DELETE FROM responses WHERE key = ?', [(row_key, ) for row_key in evicted]
+                )
+
+    def _forget(self, key: str) -> None:
+        """Remove the entry for the given key, if any, updating the totals.
+
+        It must be called in a transaction.
+
+        Parameters
+        ----------
+        key : str
+            The key of the entry, computed by ``make_key``
+
+        """
+
+        row = self.db.execute('SELECT size FROM responses WHERE key = ?', (key, )).fetchone()
+        if row is not None:
+            self.db.execute('DELETE FROM responses WHERE key = ?', (key, ))
+            self._count -= 1
+            self._size -= row[0]
+
+    def delete(self, key: str) -> None:
+        """Remove the entry for the given key from the database, if any.
+
+        Parameters
+        ----------
+        key : str
+            The key of the entry, computed by ``make_key``
+
+        """
+
+        with self.db:
+            self._forget(key)
+
+    async def _run(self, method: Callable, *args: Any) -> Any:
+        """[ASYNC] Call a method accessing the database in the thread of the cache.
+
+        Parameters
+        ----------
+        method : Callable
+            The method to call
+        args : Any
+            The arguments to pass to the method
+
+        Returns
+        -------
+        Any
+            The result of the method
+
+        """
+
+        return await asyncio.get_event_loop().run_in_executor(
+            self._executor, partial(method, *args)
+        )
+
+    def close(self) -> None:
+        """Wait for the pending operations, then close the connection to the database."""
+
+        self._executor.shutdown()
+        self.db.close()
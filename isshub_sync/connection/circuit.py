@@ -0,0 +1,450 @@
+"""Circuit breaker, to fail fast on requests to a host that is down.
+
+When a host stops answering, each request would wait for a full connection or read timeout,
+holding its worker for minutes. A ``CircuitBreaker`` counts the failures of the requests to
+each host. When there are too many (consecutive ones, or a ratio of the last requests), the
+circuit of the host is "open": requests fail at once with ``CircuitOpen``. After a recovery
+timeout, it's "half-open": a few probe requests are let through, closing the circuit if they
+succeed, opening it again if they fail.
+
+Each change of state is a ``CircuitEvent``, passed to the ``on_state_change`` hook and saved
+in the ``events`` of the breaker.
+
+"""
+
+import asyncio
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Iterable, Optional  # noqa: F401
+
+from aiohttp import ClientConnectionError
+
+
+CLOSED: str = 'closed'
+OPEN: str = 'open'
+HALF_OPEN: str = 'half-open'
+
+
+class CircuitOpen(Exception):
+    """Raised when a request is not sent because the circuit of its host is open.
+
+    Parameters
+    ----------
+    host: str
+        The host whose circuit is open
+    retry_in: float
+        The number of seconds before probe requests are allowed again. 0 if the circuit is
+        half-open but all its probes are in flight
+
+    """
+
+    def __init__(self, host: str, retry_in: float) -> None:
+        """Save the host and the time before the next probe."""
+
+        super().__init__('Circuit open for %s, next probe in %.1fs' % (host, retry_in))
+        self.host: str = host
+        self.retry_in: float = retry_in
+
+
+class CircuitEvent:  # pylint: disable=too-few-public-methods
+    """A change of state of the circuit of a host, given to ``on_state_change``.
+
+    Parameters
+    ----------
+    host: str
+        The host, with the port if any
+    previous: str
+        The state before the change: ``CLOSED``, ``OPEN`` or ``HALF_OPEN``
+    state: str
+        The new state
+    reason: str
+        Why the state changed
+    changed_at: float
+        When the state changed, as given by the clock of the breaker
+
+    Attributes
+    ----------
+    All parameters given to the constuctor are saved as attributes on the instance.
+
+    """
+
+    __slots__ = (
+        'changed_at',
+        'host',
+        'previous',
+        'reason',
+        'state',
+    )
+
+    def __init__(  # pylint: disable=too-many-arguments
+            self,
+            host: str,
+            previous: str,
+            state: str,
+            reason: str,
+            changed_at: float) -> None:
+        """Save all arguments."""
+
+        self.host: str = host
+        self.previous: str = previous
+        self.state: str = state
+        self.reason: str = reason
+        self.changed_at: float = changed_at
+
+    def __str__(self) -> str:
+        """Return the class name, the host and the change.
+
+        Returns
+        -------
+        str
+            The stringified version of the object
+
+        """
+
+        return '%s (%s: %s -> %s, %s)' % (
+            self.__class__.__name__,
+            self.host,
+            self.previous,
+            self.state,
+            self.reason,
+        )
+
+    __repr__ = __str__
+
+
+class HostCircuit:  # pylint: disable=too-few-public-methods
+    """The state of the circuit of a host.
+
+    Parameters
+    ----------
+    window: int
+        The number of results of requests kept to compute the error rate
+
+    Attributes
+    ----------
+    state: str
+        ``CLOSED``, ``OPEN`` or ``HALF_OPEN``
+    failures: int
+        The number of consecutive failures
+    results: Deque[bool]
+        The results (``True`` for a success) of the last requests while closed
+    opened_at: float
+        When the circuit was last opened
+    probes: int
+        The number of probe requests in flight while half-open
+    probe_successes: int
+        The number of successful probe requests since the circuit is half-open
+
+    """
+
+    __slots__ = (
+        'failures',
+        'opened_at',
+        'probe_successes',
+        'probes',
+        'results',
+        'state',
+    )
+
+    def __init__(self, window: int) -> None:
+        """Create a closed circuit."""
+
+        self.state: str = CLOSED
+        self.failures: int = 0
+        self.results: Deque[bool] = deque(maxlen=window)
+        self.opened_at: float = float('-inf')
+        self.probes: int = 0
+        self.probe_successes: int = 0
+
+
+class CircuitBreaker:  # pylint: disable=too-many-instance-attributes
+    """Fail fast on the requests to hosts that are failing, and detect their recovery.
+
+    Parameters
+    ----------
+    failure_threshold: int, optional
+        The circuit is opened after this number of consecutive failures. ``None`` to only use
+        `error_rate`
+    error_rate: float, optional
+        If set, the circuit is also opened when the ratio of failures of the last `window`
+        requests reaches this value, for example 0.5 for half of them
+    window: int
+        The number of requests used to compute the error rate
+    min_requests: int
+        The number of requests needed before the error rate is used
+    recovery_timeout: float
+        The number of seconds a circuit stays open before probe requests are allowed
+    half_open_probes: int
+        The maximum number of probe requests in flight while the circuit is half-open. Other
+        requests fail at once
+    success_threshold: int
+        The number of successful probe requests needed to close the circuit
+    error_statuses: Iterable[int]
+        The statuses counted as failures. Connection errors and timeouts are failures too.
+        Other statuses are successes: the host answered. Other exceptions are ignored
+    on_state_change: Callable[[CircuitEvent], Any], optional
+        A function called on each change of state of a circuit
+    history_size: int
+        The number of events to keep in ``events``
+    clock: Callable[[], float]
+        The function returning the current time, in seconds. Default to ``time.monotonic``
+
+    Attributes
+    ----------
+    All parameters given to the constuctor are saved as attributes on the instance.
+    hosts: Dict[str, HostCircuit]
+        The circuit of each host
+    events: Deque[CircuitEvent]
+        The last changes of state, of all hosts
+
+    Examples
+    --------
+    >>> breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=10, clock=lambda: 0.0)
+    >>> for __ in range(2):
+    ...     breaker.release('foo.com', breaker.acquire('foo.com'), status=503)
+    >>> breaker.states
+    {'foo.com': 'open'}
+    >>> breaker.acquire('foo.com')
+    Traceback (most recent call last):
+    ...
+    isshub_sync.connection.circuit.CircuitOpen: Circuit open for foo.com, next probe in 10.0s
+    >>> list(breaker.events)
+    [CircuitEvent (foo.com: closed -> open, 2 consecutive failures)]
+
+    """
+
+    __slots__ = (
+        'clock',
+        'error_rate',
+        'error_statuses',
+        'events',
+        'failure_threshold',
+        'half_open_probes',
+        'history_size',
+        'hosts',
+        'min_requests',
+        'on_state_change',
+        'recovery_timeout',
+        'success_threshold',
+        'window',
+    )
+
+    def __init__(  # pylint: disable=too-many-arguments
+            self,
+            failure_threshold: Optional[int] = 5,
+            error_rate: Optional[float] = None,
+            window: int = 20,
+            min_requests: int = 10,
+            recovery_timeout: float = 30.0,
+            half_open_probes: int = 1,
+            success_threshold: int = 1,
+            error_statuses: Iterable[int] = (500, 502, 503, 504),
+            on_state_change: Optional[Callable[[CircuitEvent], Any]] = None,
+            history_size: int = 1000,
+            clock: Callable[[], float] = time.monotonic) -> None:
+        """Save the settings and create the storage of the hosts."""
+
+        assert failure_threshold is not None or error_rate is not None
+        assert half_open_probes >= 1 and success_threshold >= 1
+
+        self.failure_threshold: Optional[int] = failure_threshold
+        self.error_rate: Optional[float] = error_rate
+        self.window: int = window
+        self.min_requests: int = min_requests
+        self.recovery_timeout: float = recovery_timeout
+        self.half_open_probes: int = half_open_probes
+        self.success_threshold: int = success_threshold
+        self.error_statuses: frozenset = frozenset(error_statuses)
+        self.on_state_change: Optional[Callable[[CircuitEvent], Any]] = on_state_change
+        self.history_size: int = history_size
+        self.clock: Callable[[], float] = clock
+        self.hosts: Dict[str, HostCircuit] = {}
+        self.events: Deque[CircuitEvent] = deque(maxlen=history_size)
+
+    def get_host(self, host: str) -> HostCircuit:
+        """Return the circuit of the given host, creating it if needed.
+
+        Parameters
+        ----------
+        host : str
+            The host, with the port if any
+
+        Returns
+        -------
+        HostCircuit
+            The circuit of the host
+
+        """
+
+        circuit = self.hosts.get(host)
+        if circuit is None:
+            circuit = self.hosts[host] = HostCircuit(self.window)
+        return circuit
+
+    def _set_state(self, host: str, circuit: HostCircuit, state: str, reason: str) -> None:
+        """Change the state of a circuit, reset its counters, and send the event.
+
+        Parameters
+        ----------
+        host : str
+            The host, with the port if any
+        circuit : HostCircuit
+            The circuit of the host
+        state : str
+            The new state
+        reason : str
+            Why the state changed
+
+        """
+
+        event = CircuitEvent(host, circuit.state, state, reason, self.clock())
+        circuit.state = state
+        circuit.failures = 0
+        circuit.results.clear()
+        circuit.probes = circuit.probe_successes = 0
+        if state == OPEN:
+            circuit.opened_at = event.changed_at
+
+        self.events.append(event)
+        if self.on_state_change is not None:
+            self.on_state_change(event)
+
+    def acquire(self, host: str) -> bool:
+        """Tell if a request can be sent to the given host, or raise if its circuit is open.
+
+        Parameters
+        ----------
+        host : str
+            The host, with the port if any
+
+        Returns
+        -------
+        bool
+            ``True`` if the request is a probe of a half-open circuit. To pass to ``release``
+
+        Raises
+        ------
+        CircuitOpen
+            If the circuit is open, or half-open with all its probes in flight
+
+        """
+
+        circuit = self.get_host(host)
+        if circuit.state == CLOSED:
+            return False
+
+        if circuit.state == OPEN:
+            retry_in = circuit.opened_at + self.recovery_timeout - self.clock()
+            if retry_in > 0:
+                raise CircuitOpen(host, retry_in)
+            self._set_state(host, circuit, HALF_OPEN, 'recovery timeout')
+
+        if circuit.probes >= self.half_open_probes:
+            raise CircuitOpen(host, 0)
+        circuit.probes += 1
+        return True
+
+    def is_failure(
+            self,
+            status: Optional[int] = None,
+            exception: Optional[BaseException] = None) -> Optional[bool]:
+        """Tell if the result of a request is a failure of the host.
+
+        Parameters
+        ----------
+        status : int, optional
+            The status of the response, if any
+        exception : BaseException, optional
+            The exception raised by the request, if any
+
+        Returns
+        -------
+        bool, optional
+            ``None`` if the request was stopped before being answered (cancelled, rate limit
+            exceeded...), so it tells nothing about the host
+
+        Examples
+        --------
+        >>> breaker = CircuitBreaker()
+        >>> breaker.is_failure(503), breaker.is_failure(404)
+        (True, False)
+        >>> breaker.is_failure(exception=asyncio.TimeoutError())
+        True
+        >>> breaker.is_failure(exception=ValueError()) is None
+        True
+
+        """
+
+        if exception is not None:
+            if isinstance(exception, (ClientConnectionError, asyncio.TimeoutError)):
+                return True
+            return None
+        return status in self.error_statuses
+
+    def release(
+            self,
+            host: str,
+            probe: bool,
+            status: Optional[int] = None,
+            exception: Optional[BaseException] = None) -> None:
+        """Save the result of a request, and open or close the circuit of the host if needed.
+
+        Parameters
+        ----------
+        host : str
+            The host, with the port if any
+        probe : bool
+            The value returned by ``acquire``
+        status : int, optional
+            The status of the response, if any
+        exception : BaseException, optional
+            The exception raised by the request, if any
+
+        """
+
+        circuit = self.get_host(host)
+        failure = self.is_failure(status, exception)
+
+        if probe:
+            if circuit.state != HALF_OPEN:  # the circuit changed since, by another probe
+                return
+            circuit.probes -= 1
+            if failure:
+                self._set_state(host, circuit, OPEN, 'probe failed')
+            elif failure is not None:
+                circuit.probe_successes += 1
+                if circuit.probe_successes >= self.success_threshold:
+                    self._set_state(host, circuit, CLOSED, 'probe succeeded')
+            return
+
+        # requests started before the circuit was opened tell nothing new
+        if circuit.state != CLOSED or failure is None:
+            return
+
+        circuit.results.append(not failure)
+        if not failure:
+            circuit.failures = 0
+            return
+
+        circuit.failures += 1
+        if self.failure_threshold is not None and circuit.failures >= self.failure_threshold:
+            self._set_state(host, circuit, OPEN, '%s consecutive failures' % circuit.failures)
+            return
+
+        if self.error_rate is not None and len(circuit.results) >= self.min_requests:
+            rate = circuit.results.count(False) / len(circuit.results)
+            if rate >= self.error_rate:
+                self._set_state(host, circuit, OPEN, 'error rate %.0f%%' % (rate * 100))
+
+    @property
+    def states(self) -> Dict[str, str]:
+        """Return the state of the circuit of each host.
+
+        Returns
+        -------
+        Dict[str, str]
+            The state by host
+
+        """
+
+        return {host: circuit.state for host, circuit in self.hosts.items()}
@@ -0,0 +1,299 @@
+"""Coalescing of identical requests made at the same time ("single-flight").
+
+While a GET request is in flight, identical requests (same method, url, query parameters and
+headers) don't create new HTTP calls: they wait for the result of the first one. The body is
+read once, and each caller gets its own ``SharedResponse`` on it.
+
+"""
+
+import asyncio
+from typing import (  # noqa: F401
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    FrozenSet,
+    Iterable,
+    Optional,
+    Set,
+    Tuple,
+)
+
+from aiohttp import ClientResponse
+from multidict import CIMultiDict
+
+from .python_types import Url
+from .responses import BufferedResponse
+
+
+# pylint: disable=invalid-name
+FlightKey = Tuple[str, Url, Tuple[Tuple[str, str], ...], Tuple[Tuple[str, str], ...]]
+# pylint: enable=invalid-name
+
+
+class SharedResponse(BufferedResponse):
+    """A response shared between identical requests made at the same time.
+
+    The body is already read, and can be read by each caller. All attributes not defined
+    here are taken from the real response.
+
+    Parameters
+    ----------
+    response: ClientResponse
+        The real response, already read and released
+    body: bytes
+        The body of the response
+    shared: bool
+        ``True`` if the request was coalesced with another one already in flight, ``False``
+        for the caller that made the real request
+
+    Attributes
+    ----------
+    All parameters given to the constuctor are saved as attributes on the instance.
+
+    """
+
+    __slots__ = (
+        'shared',
+    )
+
+    def __init__(self, response: ClientResponse, body: bytes, shared: bool) -> None:
+        """Save the response, the body and if it was shared."""
+
+        super().__init__(response, body)
+        self.shared: bool = shared
+
+    @property
+    def from_cache(self) -> bool:
+        """Tell if the real response was replayed from the cache.
+
+        Returns
+        -------
+        bool
+            The ``from_cache`` attribute of the real response, if any, else ``False``
+
+        """
+
+        return getattr(self.response, 'from_cache', False)
+
+
+class _Flight:  # pylint: disable=too-few-public-methods
+    """A request in flight, and the number of callers waiting for it."""
+
+    __slots__ = (
+        'task',
+        'waiters',
+    )
+
+    def __init__(self, task: asyncio.Future) -> None:
+        """Save the task making the request."""
+
+        self.task: asyncio.Future = task
+        self.waiters: int = 0
+
+
+class RequestCoalescer:
+    """Make only one HTTP call for identical requests made at the same time.
+
+    Parameters
+    ----------
+    methods: Iterable[str]
+        The HTTP methods of the requests that can be coalesced. Only safe methods should
+        be used
+
+    Attributes
+    ----------
+    DEFAULT_METHODS: FrozenSet[str] = frozenset({'get'})
+        The methods of the requests coalesced by default
+    methods: Set[str]
+        The lowercase methods of the requests that can be coalesced
+    flights: Dict[FlightKey, _Flight]
+        The requests in flight, by key
+    requests: int
+        The number of requests that could be coalesced
+    collapsed: int
+        The number of requests that waited for an identical one instead of making a new call
+
+    Notes
+    -----
+    Requests with data are never coalesced.
+
+    If all the callers waiting for a request are cancelled, the request is cancelled too.
+
+    """
+
+    __slots__ = (
+        'collapsed',
+        'flights',
+        'methods',
+        'requests',
+    )
+
+    DEFAULT_METHODS: FrozenSet[str] = frozenset({'get'})
+
+    def __init__(self, methods: Iterable[str] = DEFAULT_METHODS) -> None:
+        """Save the methods and create the storage of the requests in flight."""
+
+        self.methods: Set[str] = {method.lower() for method in methods}
+        self.flights: Dict[FlightKey, _Flight] = {}
+        self.requests: int = 0
+        self.collapsed: int = 0
+
+    def make_key(self, method: str, url: Url, request_kwargs: dict) -> Optional[FlightKey]:
+        """Compute the key identifying identical requests.
+
+        Parameters
+        ----------
+        method : str
+            The lowercase HTTP method of the request
+        url : Url
+            The finalized url of the request
+        request_kwargs : dict
+            The arguments of the request, with ``params`` and ``headers`` used in the key
+
+        Returns
+        -------
+        FlightKey, optional
+            The key, or ``None`` if the request cannot be coalesced
+
+        Examples
+        --------
+        >>> coalescer = RequestCoalescer()
+        >>> key = coalescer.make_key('get', 'https://foo.com/bar/', {'headers': {'A': '1'}})
+        >>> key == coalescer.make_key('get', 'https://foo.com/bar/', {'headers': {'a': '1'}})
+        True
+        >>> key == coalescer.make_key('get', 'https://foo.com/bar/', {'headers': {'a': '2'}})
+        False
+        >>> coalescer.make_key('post', 'https://foo.com/bar/', {}) is None
+        True
+
+        """
+
+        if method not in self.methods or request_kwargs.get('data') is not None:
+            return None
+
+        params = request_kwargs.get('params') or {}
+        headers = CIMultiDict(request_kwargs.get('headers') or {})
+
+        return (
+            method,
+            url,
+            tuple(sorted((str(name), str(value)) for name, value in params.items())),
+            tuple(sorted((name.lower(), value) for name, value in headers.items())),
+        )
+
+    @staticmethod
+    async def _fetch(send: Callable[[], Awaitable[ClientResponse]]) -> Tuple[
+            ClientResponse, bytes]:
+        """[ASYNC] Make the request, read its body and release it.
+
+        Parameters
+        ----------
+        send : Callable[[], Awaitable[ClientResponse]]
+            The function making the request
+
+        Returns
+        -------
+        Tuple[ClientResponse, bytes]
+            The response and its body
+
+        """
+
+        response = await send()
+        try:
+            body = await response.read()
+        finally:
+            response.release()
+        return response, body
+
+    def _forget(self, key: FlightKey, flight: _Flight) -> None:
+        """Remove the given request from the requests in flight.
+
+        Parameters
+        ----------
+        key : FlightKey
+            The key of the request
+        flight : _Flight
+            The request in flight. Not removed if another one is now saved for this key
+
+        """
+
+        if self.flights.get(key) is flight:
+            del self.flights[key]
+
+    async def run(
+            self,
+            method: str,
+            url: Url,
+            request_kwargs: dict,
+            send: Callable[[], Awaitable[ClientResponse]]) -> Any:
+        """[ASYNC] Make the request with `send`, or wait for an identical one in flight.
+
+        Parameters
+        ----------
+        method : str
+            The lowercase HTTP method of the request
+        url : Url
+            The finalized url of the request
+        request_kwargs : dict
+            The arguments of the request
+        send : Callable[[], Awaitable[ClientResponse]]
+            The function making the request
+
+        Returns
+        -------
+        Any
+            A ``SharedResponse`` if the request can be coalesced, else the result of `send`
+
+        Raises
+        ------
+        Exception
+            The exception raised by the request, for all the callers waiting for it
+        asyncio.CancelledError
+            If the caller is cancelled. The request is cancelled too if nobody else waits for it
+
+        """
+
+        key = self.make_key(method, url, request_kwargs)
+        if key is None:
+            return await send()
+
+        self.requests += 1
+        flight = self.flights.get(key)
+        shared = flight is not None
+
+        if flight is None:
+            flight = self.flights[key] = _Flight(asyncio.ensure_future(self._fetch(send)))
+            flight.task.add_done_callback(lambda task: self._forget(key, flight))  # type: ignore
+        else:
+            self.collapsed += 1
+
+        flight.waiters += 1
+        try:
+            response, body = await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if not flight.task.done() and flight.waiters == 1:
+                flight.task.cancel()
+            raise
+        finally:
+            flight.waiters -= 1
+
+        return SharedResponse(response, body, shared)
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """Return statistics about the coalesced requests.
+
+        Returns
+        -------
+        Dict[str, int]
+            The number of ``requests`` that could be coalesced, the number of ``collapsed``
+            ones, that didn't make their own call, and the number of requests ``in_flight``
+
+        """
+
+        return {
+            'requests': self.requests,
+            'collapsed': self.collapsed,
+            'in_flight': len(self.flights),
+        }
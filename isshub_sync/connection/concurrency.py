@@ -0,0 +1,463 @@
+"""Adaptive limit of the requests in flight to each host (AIMD).
+
+A fixed concurrency is either too low, wasting throughput, or too high, triggering secondary
+rate limits and "502 Bad Gateway" answers. An ``AdaptiveLimiter`` finds the right value for
+each host, as TCP does for its congestion window: the limit is raised by a small step after
+each round of healthy responses (additive increase), and cut by a factor on a "429", a
+"5xx", a connection error, or a rising 90th percentile of latency (multiplicative decrease).
+
+"""
+
+import asyncio
+import math
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Iterable, List, Mapping, Optional, Tuple
+
+from aiohttp import ClientConnectionError, hdrs
+
+
+def percentile(values: Iterable[float], fraction: float) -> Optional[float]:
+    """Return a percentile of some values, using the nearest-rank method.
+
+    Parameters
+    ----------
+    values : Iterable[float]
+        The values
+    fraction : float
+        The wanted percentile, between 0 and 1: 0.9 for the 90th percentile
+
+    Returns
+    -------
+    float, optional
+        The value below which `fraction` of the values are, ``None`` if there are no values
+
+    Examples
+    --------
+    >>> percentile(range(1, 101), 0.9)
+    90
+    >>> percentile([3, 1, 2], 0.5)
+    2
+    >>> percentile([], 0.9) is None
+    True
+
+    """
+
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+class HostLimit:  # pylint: disable=too-few-public-methods,too-many-instance-attributes
+    """The adaptive limit of the requests in flight to a host, and what drives it.
+
+    Parameters
+    ----------
+    limit: int
+        The initial limit
+    window: int
+        The number of latencies kept to compute the 90th percentile
+    history_size: int
+        The number of changes of the limit to keep
+
+    Attributes
+    ----------
+    limit: int
+        The current maximum number of requests in flight
+    in_flight: int
+        The number of requests currently in flight
+    waiters: Deque[asyncio.Future]
+        The requests waiting for a slot
+    latencies: Deque[float]
+        The latencies of the last successful requests
+    measured: int
+        The number of latencies added since the 90th percentile was last checked
+    baseline: float, optional
+        The 90th percentile of latency considered healthy
+    successes: int
+        The number of successful requests since the last change of the limit
+    changed_at: float
+        When the limit was last decreased. Failures of requests started before are ignored,
+        as they were sent with the old limit
+    history: Deque[Tuple[float, int, str]]
+        The last changes of the limit: their time, the new limit and the reason
+
+    """
+
+    __slots__ = (
+        'baseline',
+        'changed_at',
+        'history',
+        'in_flight',
+        'latencies',
+        'limit',
+        'measured',
+        'successes',
+        'waiters',
+    )
+
+    def __init__(self, limit: int, window: int, history_size: int) -> None:
+        """Create the state with the initial limit."""
+
+        self.limit: int = limit
+        self.in_flight: int = 0
+        self.waiters: Deque[asyncio.Future] = deque()
+        self.latencies: Deque[float] = deque(maxlen=window)
+        self.measured: int = 0
+        self.baseline: Optional[float] = None
+        self.successes: int = 0
+        self.changed_at: float = float('-inf')
+        self.history: Deque[Tuple[float, int, str]] = deque(maxlen=history_size)
+
+    @property
+    def p90(self) -> Optional[float]:
+        """Return the 90th percentile of the last latencies.
+
+        Returns
+        -------
+        float, optional
+            The latency in seconds, ``None`` if no request succeeded yet
+
+        """
+
+        return percentile(self.latencies, 0.9)
+
+
+class AdaptiveLimiter:  # pylint: disable=too-many-instance-attributes
+    """Limit the requests in flight to each host, adapting the limit to how the host behaves.
+
+    Parameters
+    ----------
+    initial_limit: int
+        The limit of a host when its first request is made
+    min_limit: int
+        The limit is never decreased below this value
+    max_limit: int
+        The limit is never increased above this value
+    increase: int
+        The step by which the limit is increased after ``limit`` successful requests
+    decrease_factor: float
+        The factor by which the limit is multiplied on errors or rising latency
+    latency_tolerance: float
+        The limit is decreased when the 90th percentile of latency goes over the baseline
+        multiplied by this value
+    window: int
+        The number of latencies used to compute the 90th percentile. It is checked against
+        the baseline each time `window` new requests succeeded
+    error_statuses: Iterable[int]
+        The statuses telling that the host is overloaded. A "403" with a "Retry-After" header
+        (secondary rate limit of GitHub) is also one
+    history_size: int
+        The number of changes of the limit to keep for each host
+    clock: Callable[[], float]
+        The function returning the current time, in seconds. Default to ``time.monotonic``
+
+    Attributes
+    ----------
+    All parameters given to the constuctor are saved as attributes on the instance.
+    hosts: Dict[str, HostLimit]
+        The state of each host
+
+    Examples
+    --------
+    >>> limiter = AdaptiveLimiter(initial_limit=2, clock=lambda: 0.0)
+    >>> for __ in range(2):
+    ...     limiter.release('foo.com', limiter.clock(), 200)
+    >>> limiter.limits
+    {'foo.com': 3}
+    >>> limiter.release('foo.com', 1.0, 503)
+    >>> limiter.limits
+    {'foo.com': 1}
+    >>> limiter.history('foo.com')
+    [(0.0, 3, 'healthy'), (0.0, 1, 'status 503')]
+
+    """
+
+    __slots__ = (
+        'clock',
+        'decrease_factor',
+        'error_statuses',
+        'history_size',
+        'hosts',
+        'increase',
+        'initial_limit',
+        'latency_tolerance',
+        'max_limit',
+        'min_limit',
+        'window',
+    )
+
+    def __init__(  # pylint: disable=too-many-arguments
+            self,
+            initial_limit: int = 10,
+            min_limit: int = 1,
+            max_limit: int = 100,
+            increase: int = 1,
+            decrease_factor: float = 0.5,
+            latency_tolerance: float = 2.0,
+            window: int = 50,
+            error_statuses: Iterable[int] = (429, 500, 502, 503, 504),
+            history_size: int = 1000,
+            clock: Callable[[], float] = time.monotonic) -> None:
+        """Save the settings and create the storage of the hosts."""
+
+        assert 1 <= min_limit <= initial_limit <= max_limit
+        assert 0 < decrease_factor < 1
+
+        self.initial_limit: int = initial_limit
+        self.min_limit: int = min_limit
+        self.max_limit: int = max_limit
+        self.increase: int = increase
+        self.decrease_factor: float = decrease_factor
+        self.latency_tolerance: float = latency_tolerance
+        self.window: int = window
+        self.error_statuses: frozenset = frozenset(error_statuses)
+        self.history_size: int = history_size
+        self.clock: Callable[[], float] = clock
+        self.hosts: Dict[str, HostLimit] = {}
+
+    def get_host(self, host: str) -> HostLimit:
+        """Return the state of the given host, creating it if needed.
+
+        Parameters
+        ----------
+        host : str
+            The host, with the port if any
+
+        Returns
+        -------
+        HostLimit
+            The state of the host
+
+        """
+
+        state = self.hosts.get(host)
+        if state is None:
+            state = self.hosts[host] = HostLimit(
+                self.initial_limit, self.window, self.history_size
+            )
+        return state
+
+    async def acquire(self, host: str) -> float:
+        """[ASYNC] Wait until a request can be sent to the given host.
+
+        Parameters
+        ----------
+        host : str
+            The host, with the port if any
+
+        Returns
+        -------
+        float
+            The time the request is started, to pass to ``release``
+
+        Raises
+        ------
+        asyncio.CancelledError
+            If the caller is cancelled while waiting. The slot is then given to another request
+
+        """
+
+        state = self.get_host(host)
+        if state.in_flight >= state.limit or state.waiters:
+            waiter = asyncio.get_event_loop().create_future()
+            state.waiters.append(waiter)
+            try:
+                await waiter  # the slot is reserved by ``_wake_up``
+            except asyncio.CancelledError:
+                if waiter in state.waiters:
+                    state.waiters.remove(waiter)
+                elif not waiter.cancelled():
+                    self._release_slot(state)  # the slot was given, but is not used
+                raise
+        else:
+            state.in_flight += 1
+
+        return self.clock()
+
+    def _wake_up(self, state: HostLimit) -> None:
+        """Give the free slots of a host to the waiting requests.
+
+        Parameters
+        ----------
+        state : HostLimit
+            The state of the host
+
+        """
+
+        while state.waiters and state.in_flight < state.limit:
+            waiter = state.waiters.popleft()
+            if not waiter.done():
+                state.in_flight += 1
+                waiter.set_result(None)
+
+    def _release_slot(self, state: HostLimit) -> None:
+        """Free the slot of a request and give it to a waiting one.
+
+        Parameters
+        ----------
+        state : HostLimit
+            The state of the host
+
+        """
+
+        state.in_flight -= 1
+        self._wake_up(state)
+
+    def _set_limit(self, state: HostLimit, limit: int, reason: str) -> None:
+        """Change the limit of a host and save the change in its history.
+
+        Parameters
+        ----------
+        state : HostLimit
+            The state of the host
+        limit : int
+            The new limit, bounded by ``min_limit`` and ``max_limit``
+        reason : str
+            Why the limit changed
+
+        """
+
+        limit = max(self.min_limit, min(self.max_limit, limit))
+        state.successes = 0
+        if limit == state.limit:
+            return
+        state.limit = limit
+        state.history.append((self.clock(), limit, reason))
+        self._wake_up(state)
+
+    def _decrease(self, state: HostLimit, started: float, reason: str) -> None:
+        """Cut the limit of a host, unless the request was sent before the last decrease.
+
+        Parameters
+        ----------
+        state : HostLimit
+            The state of the host
+        started : float
+            When the failing request was started
+        reason : str
+            Why the limit is decreased
+
+        """
+
+        if started < state.changed_at:
+            return
+        state.changed_at = self.clock()
+        self._set_limit(state, int(state.limit * self.decrease_factor), reason)
+
+    def release(  # pylint: disable=too-many-arguments
+            self,
+            host: str,
+            started: float,
+            status: Optional[int] = None,
+            headers: Optional[Mapping] = None,
+            exception: Optional[BaseException] = None) -> None:
+        """Free the slot of a finished request, and adapt the limit of the host.
+
+        Parameters
+        ----------
+        host : str
+            The host, with the port if any
+        started : float
+            The time returned by ``acquire``
+        status : int, optional
+            The status of the response, if any
+        headers : Mapping, optional
+            The headers of the response, if any
+        exception : BaseException, optional
+            The exception raised by the request, if any. Only connection errors and timeouts
+            decrease the limit
+
+        """
+
+        state = self.get_host(host)
+        if state.in_flight > 0:
+            state.in_flight -= 1
+
+        if exception is not None:
+            if isinstance(exception, (ClientConnectionError, asyncio.TimeoutError)):
+                self._decrease(state, started, exception.__class__.__name__)
+            self._wake_up(state)
+            return
+
+        if status in self.error_statuses or (
+                status == 403 and headers is not None and hdrs.RETRY_AFTER in headers):
+            self._decrease(state, started, 'status %s' % status)
+            self._wake_up(state)
+            return
+
+        state.latencies.append(self.clock() - started)
+        state.measured += 1
+        state.successes += 1
+
+        if state.measured >= self.window:
+            state.measured = 0
+            p90 = state.p90
+            assert p90 is not None  # a latency was just added
+            if state.baseline is not None and p90 > state.baseline * self.latency_tolerance:
+                self._decrease(state, started, 'latency')
+                state.latencies.clear()  # the next window is measured with the new limit
+                self._wake_up(state)
+                return
+            if state.baseline is None or p90 < state.baseline:
+                state.baseline = p90
+            else:  # follow slow changes of the host
+                state.baseline = state.baseline * 0.9 + p90 * 0.1
+
+        if state.successes >= state.limit:
+            self._set_limit(state, state.limit + self.increase, 'healthy')
+
+        self._wake_up(state)
+
+    @property
+    def limits(self) -> Dict[str, int]:
+        """Return the current limit of each host.
+
+        Returns
+        -------
+        Dict[str, int]
+            The limit by host
+
+        """
+
+        return {host: state.limit for host, state in self.hosts.items()}
+
+    def history(self, host: str) -> List[Tuple[float, int, str]]:
+        """Return the last changes of the limit of a host.
+
+        Parameters
+        ----------
+        host : str
+            The host, with the port if any
+
+        Returns
+        -------
+        List[Tuple[float, int, str]]
+            For each change, its time, the new limit and the reason
+
+        """
+
+        return list(self.get_host(host).history)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Return the state of each host, for tuning.
+
+        Returns
+        -------
+        Dict[str, Dict[str, Any]]
+            For each host: its ``limit``, the requests ``in_flight`` and ``waiting``, the
+            current ``p90`` of latency and its ``baseline``
+
+        """
+
+        return {
+            host: {
+                'limit': state.limit,
+                'in_flight': state.in_flight,
+                'waiting': len(state.waiters),
+                'p90': state.p90,
+                'baseline': state.baseline,
+            }
+            for host, state in self.hosts.items()
+        }
@@ -8,18 +8,42 @@ calls), then an HTTP method.
 
 """
 
-import json
-from typing import Awaitable, Optional, Type, Union
+# pylint: disable=too-many-lines
+
+import asyncio
+from functools import partial
+from typing import Any, AsyncIterator, Iterable, List, Optional, Tuple, Type, Union, cast
 from urllib.parse import urlparse, urlunparse, ParseResult  # noqa: F401
 
-from aiohttp import ClientResponse, ClientSession
+from aiohttp import ClientResponse, ClientSession, hdrs
+from multidict import CIMultiDict
 
+from ..json_codec import get_codec
 from ..utils import NotProvided
-from .constants import DataModes, HTTP_METHODS
+from .batch import Batch, Job
+from .cache import ResponseCache
+from .circuit import CircuitBreaker
+from .coalescing import RequestCoalescer
+from .concurrency import AdaptiveLimiter
+from .constants import DataModes, HTTP_METHODS, JSON_CONTENT_TYPE
+from .credentials import CredentialPool
+from .cursors import CursorStore, iter_changes
+from .download import Destination, Download, download
+from .hedging import HedgingPolicy
+from .instrumentation import Instrumentation, RequestEvent, default_path_template
+from .pagination import Paginator
+from .pool import ClientPool
 from .python_types import CallableArg, ConnectionClient, OptionalDict, OptionalStr, Url
+from .ratelimit import RateLimiter
+from .retry import RetryPolicy
+from .timeouts import Deadline, DeadlineExceeded, TimeoutPolicy, Timeouts, current_deadline
+
+# pylint: disable=invalid-name
+OptionalRetryPolicy = Optional[Union[Type[NotProvided], RetryPolicy]]
+# pylint: enable=invalid-name
 
 
-class Connection:  # pylint: disable=too-few-public-methods
+class Connection:  # pylint: disable=too-few-public-methods,too-many-instance-attributes
     """A object capable of calling a HTTP endpoint.
 
     If an attribute is accessed or a call is made, a ``Callable`` object
@@ -33,8 +57,40 @@ class Connection:  # pylint: disable=too-few-public-methods
         The base url for all calls in this connection. A string with scheme, domain name
         and optional port
     client: type(ConnectionClient), optional
-        The client to use to make the connection. Will default to an instance of
-        ``cls.DEFAULT_CLIENT_CLASS``
+        The client to use to make the connection. Will default to the client of `pool`
+        if set, else to an instance of ``cls.DEFAULT_CLIENT_CLASS``
+    pool: ClientPool, optional
+        A pool, that may be shared with other connections, from which to get the client
+        if `client` is not given.
+    cache: ResponseCache, optional
+        A cache in which to save responses having an "ETag" or "Last-Modified" header, to
+        make conditional requests and replay them on "304 Not Modified" answers.
+    rate_limiter: RateLimiter, optional
+        A rate limiter, that may be shared with other connections to the same host, to delay
+        requests according to the rate-limit headers of the responses.
+    retry: RetryPolicy, optional
+        The policy used to retry failed requests. Can be overridden for each request.
+    coalescer: RequestCoalescer, optional
+        If set, identical GET requests made at the same time share the same HTTP call, and
+        their responses are ``SharedResponse`` objects, with the body already read.
+    instrumentation: Instrumentation, optional
+        If set, metrics are collected about each attempt of each request, and its hooks are
+        called. Its ``trace_config`` is used by the client created by the connection.
+    cursors: CursorStore, optional
+        The store used by ``Executable.changes`` to only fetch the items changed since the
+        last sync of an endpoint, if no other store is given.
+    credentials: CredentialPool, optional
+        If set, each request without an "Authorization" header is sent with the token of the
+        pool having the most remaining budget.
+    concurrency_limiter: AdaptiveLimiter, optional
+        If set, the number of requests in flight to the host is limited, the limit adapting
+        to the latency and errors of the responses.
+    circuit_breaker: CircuitBreaker, optional
+        If set, requests to the host fail at once with ``CircuitOpen`` after too many
+        failures, until probe requests succeed.
+    timeouts: TimeoutPolicy, optional
+        The timeouts of the requests, for all of them and by path prefix. Each request can
+        override them.
 
     Attributes
     ----------
@@ -51,8 +107,35 @@ class Connection:  # pylint: disable=too-few-public-methods
         but validated, and maybe changed, by the ``_validate_root`` method
     client: ConnectionClient
         The client used to make the requests. If not set in the constructor, it will be initialized
-        on the first request using ``DEFAULT_CLIENT_CLASS``
-
+        on the first request using ``pool``, or ``DEFAULT_CLIENT_CLASS``
+    pool: ClientPool
+        The pool given to the constructor, if any
+    cache: ResponseCache
+        The cache given to the constructor, if any
+    rate_limiter: RateLimiter
+        The rate limiter given to the constructor, if any. Its ``budget`` method gives the
+        current state of each token
+    retry: RetryPolicy
+        The retry policy given to the constructor, if any
+    coalescer: RequestCoalescer
+        The coalescer given to the constructor, if any. Its ``stats`` property tells how
+        many requests were collapsed
+    instrumentation: Instrumentation
+        The instrumentation given to the constructor, if any. Its ``snapshot`` and
+        ``to_prometheus`` methods export the collected metrics
+    cursors: CursorStore
+        The cursor store given to the constructor, if any
+    credentials: CredentialPool
+        The credential pool given to the constructor, if any. Its ``stats`` property gives
+        the usage and budget of each token
+    concurrency_limiter: AdaptiveLimiter
+        The adaptive limiter given to the constructor, if any. Its ``limits`` property and
+        its ``history`` method tell how the limit of each host evolved
+    circuit_breaker: CircuitBreaker
+        The circuit breaker given to the constructor, if any. Its ``states`` property and its
+        ``events`` tell the state of the circuit of each host
+    timeouts: TimeoutPolicy
+        The timeout policy given to the constructor, if any
 
 
     Examples
@@ -67,12 +150,34 @@ class Connection:  # pylint: disable=too-few-public-methods
     >>> connection.bar('baz', 1).get
     Executable (GET /bar/baz/1/)
 
+    A connection can be used as an async context manager, to release its client when done.
+    A client created by the connection itself is closed, a client given to the constructor
+    or taken from a pool is left open::
+
+        async with ClientPool(limit_per_host=20) as pool:
+            async with Connection('https://api.github.com', pool=pool) as github:
+                response = await github.repos('foo', 'bar').get()
+
     Notes
     -----
     Some keywords cannot be used as attributes of a ``Connection`` to create a path:
+    - as_completed
+    - cache
+    - circuit_breaker
     - client
+    - coalescer
+    - close
+    - concurrency_limiter
+    - credentials
+    - cursors
+    - gather
+    - instrumentation
+    - pool
+    - rate_limiter
+    - retry
     - root
     - request
+    - timeouts
     - all HTTP methods (in their lower form)
 
     If the first part of the path needs to be one of these, you can use them in a callable way:
@@ -86,18 +191,56 @@ class Connection:  # pylint: disable=too-few-public-methods
     """
 
     __slots__ = (
+        '_client_given',
+        'cache',
+        'circuit_breaker',
         'client',
-        'root'
+        'coalescer',
+        'concurrency_limiter',
+        'credentials',
+        'cursors',
+        'instrumentation',
+        'pool',
+        'rate_limiter',
+        'retry',
+        'root',
+        'timeouts',
     )
 
     PATH_SUFFIX: str = '/'
     DEFAULT_CLIENT_CLASS: Type[ConnectionClient] = ClientSession
 
-    def __init__(self, root: Url, client: Optional[ConnectionClient] = None) -> None:
-        """Save given client and root."""
+    def __init__(  # pylint: disable=too-many-arguments
+            self,
+            root: Url,
+            client: Optional[ConnectionClient] = None,
+            pool: Optional[ClientPool] = None,
+            cache: Optional[ResponseCache] = None,
+            rate_limiter: Optional[RateLimiter] = None,
+            retry: Optional[RetryPolicy] = None,
+            coalescer: Optional[RequestCoalescer] = None,
+            instrumentation: Optional[Instrumentation] = None,
+            cursors: Optional[CursorStore] = None,
+            credentials: Optional[CredentialPool] = None,
+            concurrency_limiter: Optional[AdaptiveLimiter] = None,
+            circuit_breaker: Optional[CircuitBreaker] = None,
+            timeouts: Optional[TimeoutPolicy] = None) -> None:
+        """Save given client, pool, cache, rate limiter, retry policy, coalescer... and root."""
 
         self.client: Optional[ConnectionClient] = client
+        self.pool: Optional[ClientPool] = pool
+        self.cache: Optional[ResponseCache] = cache
+        self.rate_limiter: Optional[RateLimiter] = rate_limiter
+        self.retry: Optional[RetryPolicy] = retry
+        self.coalescer: Optional[RequestCoalescer] = coalescer
+        self.instrumentation: Optional[Instrumentation] = instrumentation
+        self.cursors: Optional[CursorStore] = cursors
+        self.credentials: Optional[CredentialPool] = credentials
+        self.concurrency_limiter: Optional[AdaptiveLimiter] = concurrency_limiter
+        self.circuit_breaker: Optional[CircuitBreaker] = circuit_breaker
+        self.timeouts: Optional[TimeoutPolicy] = timeouts
         self.root: Url = self._validate_root(root)
+        self._client_given: bool = client is not None
 
     @staticmethod
     def _validate_root(root: Url) -> Url:
@@ -198,14 +341,256 @@ class Connection:  # pylint: disable=too-few-public-methods
 
         return path
 
-    async def request(  # pylint: disable=too-many-arguments
+    def _finalize_url(self, path: str, path_suffix: OptionalStr = NotProvided) -> Url:
+        """Return the full url to request for the given path.
+
+        Parameters
+        ----------
+        path : str
+            The path in the request, that will be finalized by ``_finalize_path``. Or a full url,
+            for example given by a "Link" header, that will be used as is.
+        path_suffix : str, optional
+            A string to be added at the end of the path if not already present.
+            Will default to ``self.PATH_SUFFIX`` if not provided. Not used for a full url.
+
+        Returns
+        -------
+        Url
+            The url ready to be requested
+
+        Raises
+        ------
+        ValueError
+            If `path` is a full url not starting with ``self.root``
+
+        Examples
+        --------
+        >>> connection = Connection('https://httpbin.org/')
+        >>> connection._finalize_url('foo')
+        'https://httpbin.org/foo/'
+        >>> connection._finalize_url('https://httpbin.org/foo?page=2')
+        'https://httpbin.org/foo?page=2'
+
+        """
+
+        if path.startswith(('http://', 'https://')):
+            if not path.startswith(self.root):
+                raise ValueError('%s is not an url of %s' % (path, self.root))
+            return path
+
+        return self.root + self._finalize_path(path, path_suffix)
+
+    def _get_client(self) -> ConnectionClient:
+        """Return the client to use, creating it if needed.
+
+        Returns
+        -------
+        ConnectionClient
+            The client given to the constructor, or the one of the pool, or a new instance
+            of ``DEFAULT_CLIENT_CLASS``, using the ``trace_config`` of ``instrumentation`` if
+            it's a ``ClientSession``
+
+        """
+
+        if self.pool is not None and not self._client_given:
+            # read at each call: the pool creates a new client if it was closed then used again
+            # (a ``ClientSession`` is a ``ConnectionClient``, see its ``__subclasshook__``)
+            self.client = cast(ConnectionClient, self.pool.client)
+        elif self.client is None:
+            if self.instrumentation is not None and issubclass(
+                    self.DEFAULT_CLIENT_CLASS, ClientSession):
+                self.client = self.DEFAULT_CLIENT_CLASS(  # type: ignore
+                    trace_configs=[self.instrumentation.trace_config]
+                )
+            else:
+                self.client = self.DEFAULT_CLIENT_CLASS()
+
+        return self.client
+
+    async def close(self) -> None:
+        """[ASYNC] Release the client.
+
+        The client is only closed if it was created by the connection itself. A client taken
+        from the pool, or given to the constructor, is left open.
+
+        """
+
+        if self.client is None or self._client_given:
+            return
+
+        close = getattr(self.client, 'close', None)  # not required by ``ConnectionClient``
+        if self.pool is None and callable(close):
+            await close()  # pylint: disable=not-callable
+
+        # will be created again, or taken again from the pool, if needed
+        self.client = None
+
+    async def __aenter__(self) -> 'Connection':
+        """[ASYNC] Enter the context manager.
+
+        Returns
+        -------
+        Connection
+            The connection itself
+
+        """
+
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        """[ASYNC] Exit the context manager by releasing the client.
+
+        Parameters
+        ----------
+        exc_info : Any
+            The exception information, if any. Not used.
+
+        """
+
+        await self.close()
+
+    @staticmethod
+    def _get_job_host(job: Job) -> Optional[str]:
+        """Return the host that will be requested by the given job, if it can be known.
+
+        Parameters
+        ----------
+        job : Job
+            A job of a batch. The host can only be known for an ``Executable``, or a
+            ``functools.partial`` of an ``Executable``
+
+        Returns
+        -------
+        str, optional
+            The host (with the port if any) of the root of the job connection
+
+        """
+
+        while isinstance(job, partial):
+            job = job.func
+
+        if isinstance(job, Executable):
+            return urlparse(job.connection.root).netloc
+
+        return None
+
+    def _make_batch(
+            self,
+            jobs: Iterable[Job],
+            concurrency: int,
+            per_host_concurrency: Optional[int],
+            return_exceptions: bool) -> Batch:
+        """Create a ``Batch`` that knows how to get the host of ``Executable`` jobs.
+
+        Parameters
+        ----------
+        jobs : Iterable[Job]
+            The jobs to run
+        concurrency : int
+            The maximum number of jobs running at the same time
+        per_host_concurrency : int, optional
+            The maximum number of jobs running at the same time for the same host
+        return_exceptions : bool
+            If ``True``, exceptions are returned as results instead of being raised
+
+        Returns
+        -------
+        Batch
+            The batch ready to be run
+
+        """
+
+        return Batch(
+            jobs,
+            concurrency=concurrency,
+            per_host_concurrency=per_host_concurrency,
+            return_exceptions=return_exceptions,
+            get_host=self._get_job_host,
+        )
+
+    async def gather(
+            self,
+            jobs: Iterable[Job],
+            concurrency: int = 10,
+            per_host_concurrency: Optional[int] = None,
+            return_exceptions: bool = False) -> List[Any]:
+        """[ASYNC] Run many jobs concurrently and return their results in the same order.
+
+        On the first exception raised by a job, the other ones are cancelled and the exception
+        is raised, unless `return_exceptions` is set.
+
+        Parameters
+        ----------
+        jobs : Iterable[Job]
+            The jobs to run. ``Executable`` objects, or ``functools.partial`` of them to pass
+            arguments, or any callable without arguments returning an awaitable.
+        concurrency : int
+            The maximum number of jobs running at the same time
+        per_host_concurrency : int, optional
+            The maximum number of jobs running at the same time for the same host
+        return_exceptions : bool
+            If ``True``, exceptions are returned as results instead of being raised
+
+        Returns
+        -------
+        List[Any]
+            The result of each job
+
+        """
+
+        return await self._make_batch(
+            jobs, concurrency, per_host_concurrency, return_exceptions
+        ).gather()
+
+    def as_completed(  # pylint: disable=too-many-arguments
+            self,
+            jobs: Iterable[Job],
+            concurrency: int = 10,
+            per_host_concurrency: Optional[int] = None,
+            ordered: bool = False,
+            return_exceptions: bool = False) -> AsyncIterator[Tuple[int, Any]]:
+        """Run many jobs concurrently and iterate on their results as soon as available.
+
+        See ``gather`` for the common parameters.
+
+        Parameters
+        ----------
+        jobs : Iterable[Job]
+            The jobs to run
+        concurrency : int
+            The maximum number of jobs running at the same time
+        per_host_concurrency : int, optional
+            The maximum number of jobs running at the same time for the same host
+        ordered : bool
+            If ``True``, results are yielded in the order of the jobs
+        return_exceptions : bool
+            If ``True``, exceptions are returned as results instead of being raised
+
+        Returns
+        -------
+        AsyncIterator[Tuple[int, Any]]
+            An async iterator yielding the index of each job and its result
+
+        """
+
+        return self._make_batch(
+            jobs, concurrency, per_host_concurrency, return_exceptions
+        ).as_completed(ordered=ordered)
+
+    async def request(  # pylint: disable=too-many-arguments,too-many-locals
             self,
             method: str,
             path: str,
             data: OptionalDict = NotProvided,
             data_mode: Optional[DataModes] = DataModes.FORM,
             headers: OptionalDict = NotProvided,
-            path_suffix: OptionalStr = NotProvided) -> Awaitable[ClientResponse]:
+            path_suffix: OptionalStr = NotProvided,
+            params: OptionalDict = NotProvided,
+            retry: OptionalRetryPolicy = NotProvided,
+            path_template: OptionalStr = NotProvided,
+            stream: bool = False,
+            hedging: Optional[HedgingPolicy] = None,
+            timeouts: Optional[Timeouts] = None) -> ClientResponse:
         """[ASYNC] Generate a request.
 
         Parameters
@@ -214,45 +599,334 @@ class Connection:  # pylint: disable=too-few-public-methods
             The method to use. Will be lowercased
         path : str
             The path in the request. Must not contain the host. If will be prefixed with "/"
-            if not already done.
+            if not already done. May also be a full url starting with ``self.root``, like the
+            ones found in "Link" headers.
         data : dict, optional
             Data to pass as the body of the request, if set.
         data_mode: DataModes
-            One key of the ``DataMode`` enum, for example ``DataMode.FORM`` or ``DataMode.JSON``
+            One key of the ``DataMode`` enum, for example ``DataMode.FORM`` or ``DataMode.JSON``.
+            For ``DataMode.JSON``, the data is encoded by the codec returned by
+            ``isshub_sync.json_codec.get_codec``, and the "Content-Type" header is set to
+            "application/json" if not given in `headers`.
         headers : dict, optional
             HTTP headers for the request.
         path_suffix : str, optional
             A string to be added at the end of the path if not already present.
             Will default to ``self.PATH_SUFFIX`` if not provided
+        params : dict, optional
+            Parameters to pass in the query string of the request.
+        retry : RetryPolicy, optional
+            The retry policy to use for this request. Will default to ``self.retry`` if not
+            provided. ``None`` to disable retries.
+        path_template : str, optional
+            The template of the path, like "/repos/{}/{}/issues", used to group requests in
+            the metrics of ``self.instrumentation``. Given by ``Callable.path_template``.
+            If not provided, it's the path with its numeric parts replaced by "{}".
+        stream : bool
+            If ``True``, the body of the response is left unread, for the caller to read it
+            by chunks: ``cache`` and ``coalescer``, that read whole bodies, are not used.
+        hedging : HedgingPolicy, optional
+            If set, and the method is one of ``hedging.methods``, a second identical request
+            is sent if the first one is too slow, and the first response wins
+        timeouts : Timeouts, optional
+            The timeouts of this request, overriding the ones of ``self.timeouts``. The total
+            timeout of each attempt is never longer than what is left before the deadline of
+            the current ``Deadline`` block, if any
 
         Returns
         -------
-        Awaitable[ClientResponse]
-            The async response of the request
+        ClientResponse
+            The async response of the request. A ``CachedResponse`` if it was replayed from
+            the cache, a ``SharedResponse`` if it was coalesced by ``coalescer``
 
         """
 
         method = method.lower()
 
-        if self.client is None:
-            self.client = self.DEFAULT_CLIENT_CLASS()
-
-        url = self.root + self._finalize_path(path, path_suffix)
+        url = self._finalize_url(path, path_suffix)
 
         kwargs: dict = {}
 
+        if headers is not NotProvided:
+            kwargs['headers'] = headers
+
         if data is not NotProvided:
             if data_mode is DataModes.JSON:
-                kwargs['data'] = json.dumps(data)
+                kwargs['data'] = get_codec().dumps(data)
+                request_headers = CIMultiDict(kwargs.get('headers') or {})
+                request_headers.setdefault(hdrs.CONTENT_TYPE, JSON_CONTENT_TYPE)
+                kwargs['headers'] = request_headers
             else:
                 kwargs['data'] = data
 
-        if headers is not NotProvided:
-            kwargs['headers'] = headers
+        if params is not NotProvided:
+            kwargs['params'] = params
+
+        retry_policy = self.retry
+        if retry is not NotProvided:
+            retry_policy = cast(Optional[RetryPolicy], retry)
+
+        template: Optional[str] = None
+        if self.instrumentation is not None or hedging is not None:
+            if path_template is NotProvided or path_template is None:
+                template = default_path_template(url[len(self.root):])
+            else:
+                template = str(path_template)
+
+        if self.timeouts is not None:
+            timeouts = self.timeouts.get(url[len(self.root):]).merge(timeouts)
+
+        send = partial(
+            self._send, method, url, kwargs, retry_policy, template, not stream, timeouts
+        )
+        if hedging is not None:
+            assert template is not None  # computed above when hedging
+            send = partial(hedging.run, send, method, template)
+        if self.coalescer is not None and not stream:
+            return await self.coalescer.run(method, url, kwargs, send)
+        return await send()
+
+    async def _send(  # pylint: disable=too-many-arguments
+            self,
+            method: str,
+            url: Url,
+            kwargs: dict,
+            retry: Optional[RetryPolicy] = None,
+            path_template: Optional[str] = None,
+            use_cache: bool = True,
+            timeouts: Optional[Timeouts] = None) -> ClientResponse:
+        """[ASYNC] Send the request using the client, the cache and the retry policy if any.
+
+        Parameters
+        ----------
+        method : str
+            The lowercase HTTP method
+        url : Url
+            The full url to request
+        kwargs : dict
+            The arguments to pass to the method of the client
+        retry : RetryPolicy, optional
+            The retry policy to use, if any
+        path_template : str, optional
+            The template of the path, for the instrumentation
+        use_cache : bool
+            If ``False``, the cache is not used
+        timeouts : Timeouts, optional
+            The timeouts of each attempt
+
+        Returns
+        -------
+        ClientResponse
+            The response of the request
 
-        response = await getattr(self.client, method)(url, **kwargs)
+        """
+
+        cache = self.cache if use_cache else None
+        cache_key = cache_entry = credential_key = None
+        if cache is not None:
+            # the token is chosen first, for all the attempts, as the "Authorization" header
+            # is part of the cache key: entries, and their ETags, are per token, as on the server
+            credential_key, kwargs = await self._choose_credential(kwargs, current_deadline())
+            cache_key, cache_entry = await cache.prepare(method, url, kwargs)
+
+        send_once = partial(
+            self._send_once, method, url, kwargs, path_template, timeouts, credential_key
+        )
+        if self.circuit_breaker is not None:
+            send_once = partial(self._send_through_circuit, self.circuit_breaker, send_once, url)
+        if retry is not None and retry.can_retry(method):
+            response = await retry.run(send_once, method, url)
+        else:
+            response = await send_once()
+
+        if cache is None or cache_key is None:
+            return response
+
+        # a ``CachedResponse`` has the same interface as a ``ClientResponse``
+        return cast(ClientResponse, await cache.process_response(
+            cache_key, cache_entry, response
+        ))
+
+    async def _choose_credential(
+            self,
+            kwargs: dict,
+            deadline: Optional[Deadline]) -> Tuple[Optional[str], dict]:
+        """[ASYNC] Choose a token of the credential pool, if any, for a request.
+
+        Parameters
+        ----------
+        kwargs : dict
+            The arguments to pass to the method of the client
+        deadline : Deadline, optional
+            The deadline of the current job, if any. The wait for a token must end before it
+
+        Returns
+        -------
+        Tuple[Optional[str], dict]
+            The key of the chosen token, and `kwargs` with its "Authorization" header. ``None``
+            and `kwargs` as is if there is no pool, or if the request has its own header
+
+        """
+
+        if self.credentials is None:
+            return None, kwargs
+        headers = CIMultiDict(kwargs.get('headers') or {})
+        if hdrs.AUTHORIZATION in headers:
+            return None, kwargs
+        key, headers[hdrs.AUTHORIZATION] = await self.credentials.acquire(deadline)
+        return key, dict(kwargs, headers=headers)
+
+    @staticmethod
+    async def _send_through_circuit(
+            circuit_breaker: CircuitBreaker,
+            send: Job,
+            url: Url) -> ClientResponse:
+        """[ASYNC] Make one attempt of a request if the circuit of its host is not open.
+
+        Parameters
+        ----------
+        circuit_breaker : CircuitBreaker
+            The circuit breaker of the connection
+        send : Job
+            The function making the attempt
+        url : Url
+            The full url to request
+
+        Returns
+        -------
+        ClientResponse
+            The response of the request
+
+        Raises
+        ------
+        CircuitOpen
+            If the circuit of the host is open: the request is not sent
+
+        """
+
+        host = urlparse(url).netloc
+        probe = circuit_breaker.acquire(host)
+        try:
+            response = await send()
+        except BaseException as exc:
+            circuit_breaker.release(host, probe, exception=exc)
+            raise
+        circuit_breaker.release(host, probe, response.status)
+        return response
+
+    # pylint: disable=too-many-branches,too-many-statements
+    async def _send_once(  # pylint: disable=too-many-arguments,too-many-locals
+            self,
+            method: str,
+            url: Url,
+            kwargs: dict,
+            path_template: Optional[str] = None,
+            timeouts: Optional[Timeouts] = None,
+            credential_key: Optional[str] = None) -> ClientResponse:
+        """[ASYNC] Make one attempt of a request, using the credentials and the limiters.
+
+        Parameters
+        ----------
+        method : str
+            The lowercase HTTP method
+        url : Url
+            The full url to request
+        kwargs : dict
+            The arguments to pass to the method of the client
+        path_template : str, optional
+            The template of the path, for the instrumentation
+        timeouts : Timeouts, optional
+            The timeouts of the attempt
+        credential_key : str, optional
+            The key of the token of the credential pool already in the "Authorization" header
+            of `kwargs`, if any
+
+        Returns
+        -------
+        ClientResponse
+            The response of the request
+
+        Raises
+        ------
+        DeadlineExceeded
+            If the deadline of the current ``Deadline`` block expired before or during the
+            attempt, or would expire while waiting for a token or a slot
+
+        """
+
+        deadline = current_deadline()
+        if deadline is not None:
+            deadline.check()
+
+        if credential_key is None:
+            # chosen for each attempt: a retry may use another token
+            credential_key, kwargs = await self._choose_credential(kwargs, deadline)
+
+        rate_limit_key = None
+        if self.rate_limiter is not None:
+            rate_limit_key = self.rate_limiter.get_key(kwargs.get('headers'))
+            await self.rate_limiter.acquire(rate_limit_key, deadline)
+
+        concurrency_limiter = self.concurrency_limiter
+        host, started = '', 0.0
+        if concurrency_limiter is not None:
+            # acquired after the rate limiter, to not hold a slot while waiting for it
+            host = urlparse(url).netloc
+            if deadline is None:
+                started = await concurrency_limiter.acquire(host)
+            else:
+                try:
+                    started = await asyncio.wait_for(
+                        concurrency_limiter.acquire(host), deadline.remaining
+                    )
+                except asyncio.TimeoutError:
+                    raise DeadlineExceeded(deadline.budget) from None
+
+        try:
+            if timeouts is not None or deadline is not None:
+                # computed last, to not count the time spent waiting for the limiters
+                remaining = None
+                if deadline is not None:
+                    deadline.check()
+                    remaining = deadline.remaining
+                kwargs = dict(kwargs, timeout=(timeouts or Timeouts()).to_client_timeout(
+                    getattr(self._get_client(), 'timeout', None), remaining
+                ))
+
+            if self.instrumentation is None:
+                response = await getattr(self._get_client(), method)(url, **kwargs)
+            else:
+                event = RequestEvent(method.upper(), url, path_template or '/', dict(kwargs))
+                self.instrumentation.start(event)
+                try:
+                    response = await getattr(self._get_client(), method)(
+                        url, **event.request_kwargs
+                    )
+                except BaseException as exc:
+                    self.instrumentation.finish(event, exception=exc)
+                    raise
+                self.instrumentation.finish(event, response)
+        except BaseException as exc:
+            error = exc
+            if deadline is not None and deadline.expired and isinstance(
+                    exc, asyncio.TimeoutError):
+                # the host is not slow: the job has no time left
+                error = DeadlineExceeded(deadline.budget)
+            if concurrency_limiter is not None:
+                concurrency_limiter.release(host, started, exception=error)
+            if error is not exc:
+                raise error from exc
+            raise
+
+        if concurrency_limiter is not None:
+            concurrency_limiter.release(host, started, response.status, response.headers)
+        if credential_key is not None and self.credentials is not None:
+            self.credentials.update(credential_key, response.status, response.headers)
+        if rate_limit_key is not None and self.rate_limiter is not None:
+            self.rate_limiter.update(rate_limit_key, response.status, response.headers)
 
         return response
+    # pylint: enable=too-many-branches,too-many-statements
 
 
 class Executable:  # pylint: disable=too-few-public-methods
@@ -266,6 +940,8 @@ class Executable:  # pylint: disable=too-few-public-methods
         The HTTP method used. One of ``isshub_sync.connection.constants.HTTP_METHODS``
     path: str, optional
         The path of the request. If not set, the request will be made to ``connection.root``.
+    path_template: str, optional
+        The template of `path`, passed to ``Connection.request`` for the metrics
 
     Attributes
     ----------
@@ -276,6 +952,8 @@ class Executable:  # pylint: disable=too-few-public-methods
     >>> connection = Connection('https://httpbin.org/')
     >>> Executable(connection, 'GET', '/foo/bar')
     Executable (GET /foo/bar/)
+    >>> connection.foo(1).get.path_template
+    '/foo/{}'
 
     """
 
@@ -283,14 +961,21 @@ class Executable:  # pylint: disable=too-few-public-methods
         'connection',
         'method',
         'path',
+        'path_template',
     )
 
-    def __init__(self, connection: Connection, method: str, path: Optional[str] = None) -> None:
+    def __init__(
+            self,
+            connection: Connection,
+            method: str,
+            path: Optional[str] = None,
+            path_template: Optional[str] = None) -> None:
         """Save all arguments to be ready to be called."""
 
         self.connection: Connection = connection
         self.method: str = method
         self.path: Optional[str] = path
+        self.path_template: Optional[str] = path_template
 
     def __str__(self) -> str:
         """Return the class name and the actual method and path.
@@ -336,11 +1021,128 @@ class Executable:  # pylint: disable=too-few-public-methods
             elif args:
                 path, *args = args
 
+        elif self.path_template is not None:
+            kwargs.setdefault('path_template', self.path_template)
+
         if not path:
             path = '/'
 
         return await self.connection.request(self.method, path, *args, **kwargs)
 
+    def paginate(self, per_page: Optional[int] = None, **kwargs: Any) -> Paginator:
+        """Return an async iterator on all the items of all the pages of this request.
+
+        Parameters
+        ----------
+        per_page : int, optional
+            The number of items to ask per page
+        kwargs : Any
+            Other arguments for the ``Paginator`` (``prefetch``, ``items_key``, ``get_next``),
+            and for ``self.connection.request``
+
+        Returns
+        -------
+        Paginator
+            The async iterator, fetching the pages lazily
+
+        Examples
+        --------
+        >>> connection = Connection('https://httpbin.org/')
+        >>> connection.foo.get.paginate(per_page=100).per_page
+        100
+
+        """
+
+        return Paginator(self, per_page, **kwargs)
+
+    async def download(
+            self,
+            destination: Destination,
+            chunk_size: int = 64 * 1024,
+            hash_name: Optional[str] = None,
+            resume: bool = False,
+            **kwargs: Any) -> Download:
+        """[ASYNC] Launch the request and write the body to a file as it is received.
+
+        The memory used doesn't depend on the size of the body.
+
+        Parameters
+        ----------
+        destination : Destination
+            The path of the file to write to, or a file object opened in binary mode
+        chunk_size : int
+            The maximum size of the chunks read from the response and written to the file
+        hash_name : str, optional
+            The name of a ``hashlib`` algorithm, like "sha256", to hash the body on the fly
+        resume : bool
+            If ``True`` and `destination` is the path of an existing file, only the missing
+            part is asked, with a "Range" header
+        kwargs : Any
+            Other arguments for ``self.connection.request``
+
+        Returns
+        -------
+        Download
+            The status, the size and the hash of the body
+
+        Examples
+        --------
+        ::
+
+            result = await github.repos('foo', 'bar').tarball('master').get.download(
+                '/tmp/bar.tar.gz', hash_name='sha256', resume=True,
+            )
+
+        """
+
+        return await download(self, destination, chunk_size, hash_name, resume, **kwargs)
+
+    def changes(
+            self,
+            store: Optional[CursorStore] = None,
+            since_param: Optional[str] = 'since',
+            **kwargs: Any) -> AsyncIterator[Any]:
+        """Return an async iterator on the items changed since the last call for this endpoint.
+
+        Parameters
+        ----------
+        store : CursorStore, optional
+            The store of the cursors. Default to ``self.connection.cursors``
+        since_param : str, optional
+            The name of the query parameter taking the date of the last sync. If ``None``,
+            only the "ETag" of the last answer is used
+        kwargs : Any
+            Other arguments for ``iter_changes`` (``per_page``, ``items_key``, ``get_next``,
+            ``key``), and for ``self.connection.request``
+
+        Returns
+        -------
+        AsyncIterator[Any]
+            The async iterator, fetching the pages lazily and saving the cursor
+
+        Raises
+        ------
+        ValueError
+            If no store is given and the connection has none
+
+        Examples
+        --------
+        ::
+
+            github = Connection('https://api.github.com', cursors=SqliteCursorStore('sync.db'))
+            async for issue in github.repos('foo', 'bar').issues.get.changes(
+                    params={'state': 'all'}, per_page=100):
+                save(issue)
+
+        """
+
+        if store is None:
+            store = self.connection.cursors
+            if store is None:
+                raise ValueError('A cursor store is needed, on the call or on the connection')
+
+        return iter_changes(store, self, since_param, **kwargs)
+
 
 class Callable:  # pylint: disable=too-few-public-methods
     """Object that will create a new one when calling or accessing attribute.
@@ -348,12 +1150,33 @@ class Callable:  # pylint: disable=too-few-public-methods
     The only exception is when accessing attributes that are http methods. In this case,
     a new ``Executable`` object will be created.
 
-    The actual path of a ``Callable`` can be accessed via the ``_path`` property (prefixed with
-    "_" to be able to use "path" as a part of a real path)
+    The path is joined once, when the ``Callable`` is created, by adding the new parts to the
+    already joined path of the parent ``Callable``. So building a chain of ``n`` parts costs
+    ``O(n)``, and reading ``path`` costs nothing.
+
+    Parameters
+    ----------
+    connection: Connection
+        The connection that will eventually be passed to the ``Executable``
+    parts: CallableArg
+        A iterable of int or strings, to add to the path of `parent`
+    parent: Callable, optional
+        The ``Callable`` whose path is extended with `parts`
+    variable: bool
+        If ``True``, `parts` are values (like ids) and are replaced by "{}" in
+        ``path_template``
 
     Attributes
     ----------
-    All parameters given to the constuctor are saved as attributes on the instance.
+    connection: Connection
+        The connection given to the constructor
+    path: str
+        The joined path, prefixed by "/"
+    parts: list
+        The path split on "/"
+    path_template: str
+        The path, with the parts given by calling a ``Callable`` replaced by "{}". Used to
+        group requests in metrics (see ``Instrumentation``)
 
     Examples
     --------
@@ -368,6 +1191,8 @@ class Callable:  # pylint: disable=too-few-public-methods
     Executable (GET /foo/bar/1/)
     >>> Callable(connection)('foo', 'bar', 2)
     Callable (/foo/bar/2/)
+    >>> connection.repos('foo', 'bar').issues(1).path_template
+    '/repos/{}/{}/issues/{}'
 
     Notes
     -----
@@ -375,6 +1200,7 @@ class Callable:  # pylint: disable=too-few-public-methods
     - connection
     - parts
     - path
+    - path_template
     - all HTTP methods (in their lower form)
 
     If the first part of the path needs to be one of these, you can use them in a callable way:
@@ -387,25 +1213,53 @@ class Callable:  # pylint: disable=too-few-public-methods
     """
 
     __slots__ = (
+        '_path',
+        '_template',
         'connection',
-        'parts',
     )
 
-    def __init__(self, connection: Connection, *parts: CallableArg) -> None:
-        """Convert the parts and save them, along the connection.
+    def __init__(
+            self,
+            connection: Connection,
+            *parts: CallableArg,
+            parent: Optional['Callable'] = None,
+            variable: bool = False,
+            template: Optional[str] = None) -> None:
+        """Join the parts to the path of the parent, and save it along the connection.
 
         Parameters
         ----------
         connection : Connection
             The connection that will eventually be passed to the ``Executable``
         parts : CallableArg
-            A iterable of int or strings. Ints will be converted to strings, and strings
-            will be split on "/"
+            A iterable of int or strings. Ints will be converted to strings.
+        parent : Callable, optional
+            The ``Callable`` whose path is extended with `parts`
+        variable : bool
+            If ``True``, `parts` are replaced by "{}" in the path template
+        template : str, optional
+            The path template to use instead of the one built from `parent` and `parts`
 
         """
 
         self.connection: Connection = connection
-        self.parts: list = sum([str(part).split('/') for part in parts], [])
+
+        # the template is only stored when it differs from the path
+        # pylint: disable=protected-access
+        path: str = '' if parent is None else parent._path
+        parent_template: Optional[str] = None if parent is None else parent._template
+        # pylint: enable=protected-access
+        if parts:
+            if variable:
+                parent_template = (
+                    path if parent_template is None else parent_template
+                ) + '/{}' * len(parts)
+            joined = '/' + '/'.join(map(str, parts))
+            if parent_template is not None and not variable:
+                parent_template += joined
+            path += joined
+        self._path: str = path
+        self._template: Optional[str] = parent_template if template is None else template
 
     def __call__(self, *args: CallableArg) -> 'Callable':
         """Return a new ``Callable`` with the given args added to the current ones.
@@ -422,7 +1276,7 @@ class Callable:  # pylint: disable=too-few-public-methods
 
         """
 
-        return Callable(self.connection, *self.parts, *args) if args else self
+        return Callable(self.connection, *args, parent=self, variable=True) if args else self
 
     def __getattr__(self, attr: str) -> Union['Callable', Executable]:
         """Return a new ``Callable``, or an ``Executable`` if `attr` is a method.
@@ -441,22 +1295,48 @@ class Callable:  # pylint: disable=too-few-public-methods
         """
 
         if attr.upper() in HTTP_METHODS:
-            return Executable(self.connection, attr.upper(), self.path)
+            return Executable(self.connection, attr.upper(), self.path, self.path_template)
 
-        return Callable(self.connection, *self.parts, attr)
+        return Callable(self.connection, attr, parent=self)
 
     @property
     def path(self) -> str:
-        """Convert the parts into a path, the whole being prefixed by "/".
+        """Return the joined path, the whole being prefixed by "/".
+
+        Returns
+        -------
+        str
+            The parts joined by "/"
+
+        """
+
+        return self._path or '/'
+
+    @property
+    def path_template(self) -> str:
+        """Return the path with the parts given by calls replaced by "{}".
 
         Returns
         -------
         str
-            The ``parts`` attribute converted into a string, joined by "/"
+            The path template, prefixed by "/"
+
+        """
+
+        return (self._path if self._template is None else self._template) or '/'
+
+    @property
+    def parts(self) -> list:
+        """Return the parts of the path.
+
+        Returns
+        -------
+        list
+            The path split on "/"
 
         """
 
-        return '/' + '/'.join(self.parts)
+        return self._path.split('/')[1:]
 
     def __str__(self) -> str:
         """Return the class name and the actual path.
@@ -471,3 +1351,82 @@ class Callable:  # pylint: disable=too-few-public-methods
         return '%s (%s%s)' % (self.__class__.__name__, self.path, self.connection.PATH_SUFFIX)
 
     __repr__ = __str__
+
+
+class PathTemplate:  # pylint: disable=too-few-public-methods
+    """A path with placeholders, joined once then formatted for each use.
+
+    Formatting a template is a single ``str.format`` call on the already joined path, so it
+    is the fastest way to create many ``Callable`` objects for the same endpoint.
+
+    Parameters
+    ----------
+    base: Callable
+        A ``Callable`` with placeholders, in the ``str.format`` syntax, in its path
+
+    Attributes
+    ----------
+    connection: Connection
+        The connection of `base`
+    template: str
+        The path of `base`, without its leading "/"
+
+    Examples
+    --------
+    >>> connection = Connection('https://httpbin.org/')
+    >>> issues = PathTemplate(connection.repos('{owner}', '{name}').issues)
+    >>> issues
+    PathTemplate (/repos/{owner}/{name}/issues/)
+    >>> issues.format(owner='foo', name='bar')
+    Callable (/repos/foo/bar/issues/)
+    >>> issues.format(owner='foo', name='bar')(1).comments.get
+    Executable (GET /repos/foo/bar/issues/1/comments/)
+
+    """
+
+    __slots__ = (
+        'connection',
+        'template',
+    )
+
+    def __init__(self, base: Callable) -> None:
+        """Save the path of `base` as template, along its connection."""
+
+        self.connection: Connection = base.connection
+        self.template: str = base.path[1:]
+
+    def format(self, **values: CallableArg) -> Callable:
+        """Return a ``Callable`` whose path is the template formatted with `values`.
+
+        Parameters
+        ----------
+        values : CallableArg
+            The values of the placeholders of the template
+
+        Returns
+        -------
+        Callable
+            A new ``Callable`` with the formatted path, and the template, with its named
+            placeholders, as ``path_template``
+
+        """
+
+        return Callable(
+            self.connection, self.template.format(**values), template='/' + self.template
+        )
+
+    def __str__(self) -> str:
+        """Return the class name and the template.
+
+        Returns
+        -------
+        str
+            The stringified version of the object
+
+        """
+
+        return '%s (/%s%s)' % (
+            self.__class__.__name__, self.template, self.connection.PATH_SUFFIX
+        )
+
+    __repr__ = __str__
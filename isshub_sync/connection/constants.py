@@ -4,6 +4,8 @@ Attributes
 ----------
 HTTP_METHODS: set
     List of all available HTTP methods, uppercase
+JSON_CONTENT_TYPE: str
+    The "Content-Type" header of requests with json data
 
 """
 
@@ -13,6 +15,7 @@ from aiohttp import hdrs
 
 
 HTTP_METHODS: set = hdrs.METH_ALL - {hdrs.METH_CONNECT, hdrs.METH_TRACE}
+JSON_CONTENT_TYPE: str = 'application/json'
 
 
 class DataModes(IntEnum):
@@ -0,0 +1,243 @@
+"""Rotation of requests over many tokens, to add up their rate limits.
+
+A ``CredentialPool`` holds N tokens and knows the remaining budget of each one from the
+rate-limit headers of the responses. Each request of a ``Connection`` using the pool is sent
+with the token having the most remaining budget, an exhausted token being skipped until its
+reset time. With N tokens, a full sync can go N times faster before hitting the limits.
+
+"""
+
+import asyncio
+import time
+from typing import Callable, Dict, Iterable, Mapping, Optional, Tuple
+
+from .ratelimit import RateLimiter, RateLimitExceeded, RateLimitState, token_key
+from .timeouts import Deadline
+
+
+class CredentialPool:
+    """A set of tokens, each request using the one with the most remaining budget.
+
+    Parameters
+    ----------
+    tokens: Iterable[str]
+        The tokens to use
+    scheme: str, optional
+        The scheme to put before each token in the "Authorization" header. ``None`` if the
+        tokens are already full header values, like "Bearer xxx"
+    max_wait: float, optional
+        If all tokens are exhausted and the next reset is farther than this number of
+        seconds, a ``RateLimitExceeded`` exception is raised instead of waiting. ``None`` to
+        always wait.
+    clock: Callable[[], float]
+        The function returning the current timestamp. Default to ``time.time``, as reset
+        times given by the servers are timestamps.
+
+    Attributes
+    ----------
+    All parameters given to the constuctor, except `tokens` and `scheme`, are saved as
+    attributes on the instance.
+    authorizations: Dict[str, str]
+        The value of the "Authorization" header of each token, by key (see ``token_key``)
+    rate_limiter: RateLimiter
+        Holds the state of each token, updated from the headers of the responses
+
+    Examples
+    --------
+    >>> pool = CredentialPool(['foo', 'bar'], clock=lambda: 1000.0)
+    >>> foo, bar = pool.authorizations
+    >>> pool.update(foo, 200, {'X-RateLimit-Limit': '5000', 'X-RateLimit-Remaining': '10',
+    ...                        'X-RateLimit-Reset': '2000'})
+    >>> pool.update(bar, 200, {'X-RateLimit-Limit': '5000', 'X-RateLimit-Remaining': '12',
+    ...                        'X-RateLimit-Reset': '2000'})
+    >>> [pool.authorizations[pool.choose()[0]] for __ in range(4)]
+    ['token bar', 'token bar', 'token foo', 'token bar']
+    >>> pool.stats[foo]['remaining'], pool.stats[bar]['remaining']
+    (9, 9)
+
+    Notes
+    -----
+    A request given its own "Authorization" header is sent with it, not with a token of the
+    pool.
+
+    With a cache, the token is chosen once for all the attempts of a request, before
+    computing its cache key: cached responses are per token, like their ETags on the server.
+
+    """
+
+    __slots__ = (
+        'authorizations',
+        'clock',
+        'max_wait',
+        'rate_limiter',
+    )
+
+    def __init__(
+            self,
+            tokens: Iterable[str],
+            scheme: Optional[str] = 'token',
+            max_wait: Optional[float] = None,
+            clock: Callable[[], float] = time.time) -> None:
+        """Compute the "Authorization" header of each token and create their states."""
+
+        self.max_wait: Optional[float] = max_wait
+        self.clock: Callable[[], float] = clock
+        self.rate_limiter: RateLimiter = RateLimiter(clock=clock)
+
+        self.authorizations: Dict[str, str] = {}
+        for token in tokens:
+            authorization = token if scheme is None else '%s %s' % (scheme, token)
+            key = token_key(authorization)
+            self.authorizations[key] = authorization
+            self.rate_limiter.get_state(key)
+
+        if not self.authorizations:
+            raise ValueError('A credential pool needs at least one token')
+
+    def _get_wait(self, state: RateLimitState, now: float) -> float:
+        """Return the time to wait before a token can be used.
+
+        Parameters
+        ----------
+        state : RateLimitState
+            The state of the token. Its budget is forgotten if its reset time is passed
+        now : float
+            The current timestamp
+
+        Returns
+        -------
+        float
+            The number of seconds before the token can be used, 0 if it can be used now
+
+        """
+
+        if state.reset is not None and state.reset <= now:
+            # the period is over, we don't know the new budget yet
+            state.remaining = None
+
+        until = state.blocked_until
+        if state.remaining is not None and state.remaining <= 0 and state.reset is not None:
+            until = max(until, state.reset)
+
+        return max(0.0, until - now)
+
+    def choose(self) -> Tuple[str, float]:
+        """Reserve a request on the token with the most remaining budget.
+
+        Exhausted tokens are skipped until their reset. A token whose budget is not known
+        yet is preferred, to learn it. If all tokens are exhausted, the one available first
+        is chosen.
+
+        Returns
+        -------
+        Tuple[str, float]
+            The key of the token, and the number of seconds to wait before using it
+
+        Raises
+        ------
+        RateLimitExceeded
+            If all tokens are exhausted for longer than ``max_wait``
+
+        """
+
+        now = self.clock()
+        best: Optional[Tuple[float, float, int]] = None
+        best_key: str = ''
+
+        for key in self.authorizations:
+            state = self.rate_limiter.get_state(key)
+            wait = self._get_wait(state, now)
+            remaining = float('inf') if state.remaining is None else state.remaining
+            # the shortest wait, then the biggest budget, then the least used
+            score = (wait, -remaining, state.requests)
+            if best is None or score < best:
+                best, best_key = score, key
+
+        wait = best[0]  # type: ignore
+        if self.max_wait is not None and wait > self.max_wait:
+            raise RateLimitExceeded(best_key, wait)
+
+        state = self.rate_limiter.get_state(best_key)
+        if state.remaining is not None:
+            state.remaining -= 1
+        state.requests += 1
+
+        return best_key, wait
+
+    async def acquire(self, deadline: Optional[Deadline] = None) -> Tuple[str, str]:
+        """[ASYNC] Choose a token for a request, waiting if they are all exhausted.
+
+        Parameters
+        ----------
+        deadline : Deadline, optional
+            The deadline of the current job, if any. The wait must end before it
+
+        Returns
+        -------
+        Tuple[str, str]
+            The key of the token, and the value of the "Authorization" header to use
+
+        Raises
+        ------
+        RateLimitExceeded
+            If all tokens are exhausted for longer than ``max_wait``
+        DeadlineExceeded
+            If the deadline would expire during the wait, which is then not done
+
+        """
+
+        key, wait = self.choose()
+        if deadline is not None:
+            deadline.check(wait)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return key, self.authorizations[key]
+
+    def update(self, key: str, status: int, headers: Mapping) -> None:
+        """Update the state of a token from the headers of a response.
+
+        Parameters
+        ----------
+        key : str
+            The key of the token
+        status : int
+            The HTTP status of the response
+        headers : Mapping
+            The headers of the response
+
+        """
+
+        self.rate_limiter.update(key, status, headers)
+
+    @property
+    def stats(self) -> Dict[str, dict]:
+        """Return the usage and the budget of each token.
+
+        Returns
+        -------
+        Dict[str, dict]
+            For each token key, a dict with its state (see ``RateLimitState``), and
+            ``available``, telling if it can be used now
+
+        """
+
+        now = self.clock()
+        stats = {}
+        for key in self.authorizations:
+            state = self.rate_limiter.get_state(key)
+            stats[key] = dict(state.as_dict(), available=self._get_wait(state, now) == 0)
+        return stats
+
+    def __str__(self) -> str:
+        """Return the class name and the number of tokens.
+
+        Returns
+        -------
+        str
+            The stringified version of the object
+
+        """
+
+        return '%s (%d tokens)' % (self.__class__.__name__, len(self.authorizations))
+
+    __repr__ = __str__
@@ -0,0 +1,603 @@
+"""Persistent state of incremental syncs, to only fetch what changed since the last one.
+
+For each endpoint, a ``SyncCursor`` records the value to pass in the ``since`` query parameter,
+the "ETag" of the last answer, and the url of the page being fetched if a sync was
+interrupted. ``iter_changes`` uses and updates it, so each sync of a list endpoint only asks
+for the items updated since the previous one, answered by a free "304 Not Modified" when
+nothing changed, and resumes where it stopped after an interruption.
+
+Two backends are available: ``MemoryCursorStore``, and ``SqliteCursorStore`` that survives
+restarts.
+
+"""
+
+import asyncio
+import json
+import sqlite3
+import time
+import weakref
+from abc import ABCMeta, abstractmethod
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, AsyncIterator, Dict, Optional, TYPE_CHECKING  # noqa: F401
+from urllib.parse import urlencode
+
+from aiohttp import hdrs
+
+from .decoding import read_checked_json
+from .pagination import NextGetter, Paginator, get_next_link
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .connection import Executable  # noqa: F401  # pylint: disable=cyclic-import
+
+
+SINCE_FORMAT: str = '%Y-%m-%dT%H:%M:%SZ'
+
+
+def format_since(date_header: Optional[str] = None) -> str:
+    """Return the ISO 8601 UTC date to use as ``since``, from a "Date" header if possible.
+
+    Using the date of the server avoids missing updates because of the clock of the client.
+
+    Parameters
+    ----------
+    date_header : str, optional
+        The value of the "Date" header of a response. If not set or invalid, the current
+        time of the client is used
+
+    Returns
+    -------
+    str
+        The date, formatted with ``SINCE_FORMAT``
+
+    Examples
+    --------
+    >>> format_since('Sun, 06 Nov 1994 08:49:37 GMT')
+    '1994-11-06T08:49:37Z'
+    >>> len(format_since('foo'))
+    20
+
+    """
+
+    date: Optional[datetime] = None
+    if date_header:
+        try:
+            date = parsedate_to_datetime(date_header)
+        except (TypeError, ValueError):
+            pass
+
+    if date is None:
+        date = datetime.now(timezone.utc)
+    elif date.tzinfo is not None:
+        date = date.astimezone(timezone.utc)
+
+    return date.strftime(SINCE_FORMAT)
+
+
+class SyncCursor:  # pylint: disable=too-few-public-methods
+    """How far the last sync of an endpoint went.
+
+    Parameters
+    ----------
+    since: str, optional
+        The value to pass in the ``since`` query parameter on the next sync
+    etag: str, optional
+        The "ETag" of the first page of the last sync, valid for the next one as long as
+        `since` doesn't change
+    next_url: str, optional
+        The url of the page being fetched when a sync was interrupted, to resume from it
+    next_since: str, optional
+        The `since` to save when the interrupted sync completes
+
+    Attributes
+    ----------
+    All parameters given to the constuctor are saved as attributes on the instance.
+
+    Examples
+    --------
+    >>> cursor = SyncCursor(since='2018-01-01T00:00:00Z', etag='"abc"')
+    >>> SyncCursor.from_dict(cursor.to_dict()).etag
+    '"abc"'
+    >>> cursor
+    SyncCursor (since 2018-01-01T00:00:00Z)
+
+    """
+
+    __slots__ = (
+        'etag',
+        'next_since',
+        'next_url',
+        'since',
+    )
+
+    def __init__(
+            self,
+            since: Optional[str] = None,
+            etag: Optional[str] = None,
+            next_url: Optional[str] = None,
+            next_since: Optional[str] = None) -> None:
+        """Save the state of the sync."""
+
+        self.since: Optional[str] = since
+        self.etag: Optional[str] = etag
+        self.next_url: Optional[str] = next_url
+        self.next_since: Optional[str] = next_since
+
+    def to_dict(self) -> Dict[str, Optional[str]]:
+        """Return the state as a dict, to be saved by a store.
+
+        Returns
+        -------
+        Dict[str, Optional[str]]
+            The value of each attribute
+
+        """
+
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Optional[str]]) -> 'SyncCursor':
+        """Create a cursor from a dict returned by ``to_dict``.
+
+        Parameters
+        ----------
+        data : Dict[str, Optional[str]]
+            The value of each attribute
+
+        Returns
+        -------
+        SyncCursor
+            The new cursor
+
+        """
+
+        return cls(**{name: data.get(name) for name in cls.__slots__})
+
+    def __str__(self) -> str:
+        """Return the class name, the `since` date and if a sync is in progress.
+
+        Returns
+        -------
+        str
+            The stringified version of the object
+
+        """
+
+        return '%s (since %s%s)' % (
+            self.__class__.__name__, self.since, ', interrupted' if self.next_url else ''
+        )
+
+    __repr__ = __str__
+
+
+class CursorStore(metaclass=ABCMeta):
+    """Base class for stores of ``SyncCursor`` objects.
+
+    Subclasses must implement ``get``, ``set`` and ``delete``.
+
+    Attributes
+    ----------
+    locks: weakref.WeakValueDictionary
+        An ``asyncio.Lock`` by key, held during a sync so concurrent tasks syncing the same
+        endpoint run one after the other, the second one starting from the cursor saved by
+        the first one
+
+    """
+
+    __slots__ = (
+        'locks',
+    )
+
+    def __init__(self) -> None:
+        """Create the storage of the locks."""
+
+        self.locks: weakref.WeakValueDictionary = weakref.WeakValueDictionary()
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[SyncCursor]:
+        """Return the cursor for the given key, if any.
+
+        Parameters
+        ----------
+        key : str
+            The key of the cursor, computed by ``make_key``
+
+        Returns
+        -------
+        SyncCursor, optional
+            The cursor, or ``None`` if the endpoint was never synced
+
+        """
+
+    @abstractmethod
+    def set(self, key: str, cursor: SyncCursor) -> None:
+        """Save the given cursor.
+
+        Parameters
+        ----------
+        key : str
+            The key of the cursor, computed by ``make_key``
+        cursor : SyncCursor
+            The cursor to save
+
+        """
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """Remove the cursor for the given key, if any, so the next sync is a full one.
+
+        Parameters
+        ----------
+        key : str
+            The key of the cursor, computed by ``make_key``
+
+        """
+
+    @staticmethod
+    def make_key(executable: 'Executable', params: Optional[dict] = None) -> str:
+        """Compute the key of an endpoint.
+
+        Parameters
+        ----------
+        executable : Executable
+            The request of the endpoint
+        params : dict, optional
+            The query parameters of the request, except the ``since`` and ``per_page`` ones
+
+        Returns
+        -------
+        str
+            The key of the endpoint: the method, the url and the sorted parameters
+
+        Examples
+        --------
+        >>> from isshub_sync.connection.connection import Connection
+        >>> connection = Connection('https://api.github.com/')
+        >>> CursorStore.make_key(connection.repos('foo', 'bar').issues.get, {'state': 'all'})
+        'GET https://api.github.com/repos/foo/bar/issues/?state=all'
+
+        """
+
+        key = '%s %s' % (
+            executable.method.upper(),
+            executable.connection._finalize_url(  # pylint: disable=protected-access
+                executable.path or '/'
+            ),
+        )
+        if params:
+            key += '?' + urlencode(sorted(params.items()))
+        return key
+
+    def lock(self, key: str) -> asyncio.Lock:
+        """Return the lock to hold while syncing the endpoint of the given key.
+
+        Parameters
+        ----------
+        key : str
+            The key of the cursor, computed by ``make_key``
+
+        Returns
+        -------
+        asyncio.Lock
+            The lock, the same one for all the tasks using it at the same time
+
+        """
+
+        lock = self.locks.get(key)
+        if lock is None:
+            lock = self.locks[key] = asyncio.Lock()
+        return lock
+
+
+class MemoryCursorStore(CursorStore):
+    """A ``CursorStore`` keeping the cursors in memory.
+
+    Attributes
+    ----------
+    cursors: Dict[str, dict]
+        The state of the cursors by key, as returned by ``SyncCursor.to_dict``
+
+    Examples
+    --------
+    >>> store = MemoryCursorStore()
+    >>> store.set('foo', SyncCursor(since='2018-01-01T00:00:00Z'))
+    >>> store.get('foo')
+    SyncCursor (since 2018-01-01T00:00:00Z)
+    >>> store.delete('foo')
+    >>> store.get('foo') is None
+    True
+
+    """
+
+    __slots__ = (
+        'cursors',
+    )
+
+    def __init__(self) -> None:
+        """Create the storage of the cursors."""
+
+        super().__init__()
+        self.cursors: Dict[str, dict] = {}
+
+    def get(self, key: str) -> Optional[SyncCursor]:
+        """Return a new cursor from the state saved for the given key, if any.
+
+        Parameters
+        ----------
+        key : str
+            The key of the cursor, computed by ``make_key``
+
+        Returns
+        -------
+        SyncCursor, optional
+            The cursor, or ``None`` if the endpoint was never synced
+
+        """
+
+        data = self.cursors.get(key)
+        return None if data is None else SyncCursor.from_dict(data)
+
+    def set(self, key: str, cursor: SyncCursor) -> None:
+        """Save the state of the given cursor, as a dict.
+
+        Parameters
+        ----------
+        key : str
+            The key of the cursor, computed by ``make_key``
+        cursor : SyncCursor
+            The cursor to save
+
+        """
+
+        self.cursors[key] = cursor.to_dict()
+
+    def delete(self, key: str) -> None:
+        """Forget the state saved for the given key, if any.
+
+        Parameters
+        ----------
+        key : str
+            The key of the cursor, computed by ``make_key``
+
+        """
+
+        self.cursors.pop(key, None)
+
+
+class SqliteCursorStore(CursorStore):
+    """A ``CursorStore`` keeping the cursors in a sqlite database, to survive restarts.
+
+    Parameters
+    ----------
+    path: str
+        The path of the sqlite database file. ``:memory:`` can be used for tests.
+
+    Attributes
+    ----------
+    db: sqlite3.Connection
+        The connection to the database
+
+    Examples
+    --------
+    >>> store = SqliteCursorStore(':memory:')
+    >>> store.set('foo', SyncCursor(since='2018-01-01T00:00:00Z', etag='"abc"'))
+    >>> store.get('foo').etag
+    '"abc"'
+    >>> store.delete('foo')
+    >>> store.get('foo') is None
+    True
+    >>> store.close()
+
+    Notes
+    -----
+    Database operations are fast enough to be done synchronously, as there is one small row
+    by endpoint, accessed by primary key.
+
+    """
+
+    __slots__ = (
+        'db',
+    )
+
+    def __init__(self, path: str) -> None:
+        """Open the database and create the table if needed."""
+
+        super().__init__()
+        self.db: sqlite3.Connection = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute(
+            'CREATE TABLE IF NOT EXISTS cursors ('
+            ' key TEXT PRIMARY KEY,'
+            ' cursor TEXT NOT NULL,'
+            ' updated REAL NOT NULL'
+            ')'
+        )
+        self.db.commit()
+
+    def get(self, key: str) -> Optional[SyncCursor]:
+        """Read the cursor for the given key from the database, if any.
+
+        Parameters
+        ----------
+        key : str
+            The key of the cursor, computed by ``make_key``
+
+        Returns
+        -------
+        SyncCursor, optional
+            The cursor, or ``None`` if the endpoint was never synced
+
+        """
+
+        row = self.db.execute('SELECT cursor FROM cursors WHERE key = ?', (key, )).fetchone()
+        return None if row is None else SyncCursor.from_dict(json.loads(row[0]))
+
+    def set(self, key: str, cursor: SyncCursor) -> None:
+        """Write the given cursor in the database, as json.
+
+        Parameters
+        ----------
+        key : str
+            The key of the cursor, computed by ``make_key``
+        cursor : SyncCursor
+            The cursor to save
+
+        """
+
+        with self.db:
+            self.db.execute(
+                'INSERT OR REPLACE INTO cursors (key, cursor, updated) VALUES (?, ?, ?)',
+                (key, json.dumps(cursor.to_dict()), time.time())
+            )
+
+    def delete(self, key: str) -> None:
+        """Remove the cursor for the given key from the database, if any.
+
+        Parameters
+        ----------
+        key : str
+            The key of the cursor, computed by ``make_key``
+
+        """
+
+        with self.db:
+            self.db.execute('DELETE FROM cursors WHERE key = ?', (key, ))
+
+    def close(self) -> None:
+        """Close the connection to the database."""
+
+        self.db.close()
+
+
+# pylint: disable=too-many-statements
+async def iter_changes(  # pylint: disable=too-many-arguments,too-many-locals,too-many-branches
+        store: CursorStore,
+        executable: 'Executable',
+        since_param: Optional[str] = 'since',
+        per_page: Optional[int] = None,
+        items_key: Optional[str] = None,
+        get_next: NextGetter = get_next_link,
+        key: Optional[str] = None,
+        **kwargs: Any) -> AsyncIterator[Any]:
+    """[ASYNC] Iterate on the items changed since the last sync of an endpoint.
+
+    The cursor of the endpoint is read from `store`, applied to the first request, and saved
+    after each page:
+
+    - the ``since`` query parameter is set to the date of the start of the last complete
+      sync, so only the items updated since are listed
+    - if the last sync found nothing, the same request is sent with the "If-None-Match"
+      header, and a "304 Not Modified" answer (free for the GitHub rate limit) ends the sync
+    - if the last sync was interrupted, it's resumed from the page it stopped at
+
+    Parameters
+    ----------
+    store : CursorStore
+        The store of the cursors
+    executable : Executable
+        The request of the list endpoint
+    since_param : str, optional
+        The name of the query parameter taking the date. If ``None``, only the "ETag" is
+        used, for endpoints without such a parameter
+    per_page : int, optional
+        The number of items to ask per page
+    items_key : str, optional
+        If the body is an object, the key where to find the list of items
+    get_next : NextGetter
+        A function returning the url of the next page. Default to ``get_next_link``
+    key : str, optional
+        The key of the cursor. Default to the one computed by ``store.make_key``. Should be
+        set if different tokens, seeing different items, sync the same endpoint
+    kwargs : Any
+        Other arguments for ``Connection.request``
+
+    Yields
+    ------
+    Any
+        Each changed item, as a ``DictObject`` if it is an object
+
+    Raises
+    ------
+    ClientResponseError
+        If the status of a response is 400 or more. The cursor points to the failing page,
+        so the next sync resumes from it
+
+    Notes
+    -----
+    With `since_param` set to ``None``, a "304 Not Modified" answer on the first page ends the
+    sync, so it should only be used for single page endpoints, or lists sorted by update
+    date.
+
+    """
+
+    request_kwargs = dict(kwargs)
+    headers = dict(request_kwargs.pop('headers', None) or {})
+    params = dict(request_kwargs.pop('params', None) or {})
+    if since_param is not None:
+        params.pop(since_param, None)
+    if executable.path and executable.path_template is not None:
+        request_kwargs.setdefault('path_template', executable.path_template)
+
+    if key is None:
+        key = store.make_key(executable, params)
+    if per_page is not None:
+        params[Paginator.PER_PAGE_PARAM] = per_page
+
+    connection = executable.connection
+
+    async with store.lock(key):
+        cursor = store.get(key) or SyncCursor()
+        first = cursor.next_url is None
+        changed = not first  # an interrupted sync got changes
+        next_since = cursor.next_since
+        etag: Optional[str] = None
+
+        if first:
+            url: Optional[str] = executable.path or '/'
+            if since_param is not None and cursor.since is not None:
+                params[since_param] = cursor.since
+            first_kwargs = dict(request_kwargs, params=params)
+            if cursor.etag is not None:
+                first_kwargs['headers'] = {**headers, hdrs.IF_NONE_MATCH: cursor.etag}
+            elif headers:
+                first_kwargs['headers'] = headers
+        else:
+            url = cursor.next_url
+        if headers:
+            request_kwargs['headers'] = headers
+
+        while url is not None:
+            response = await connection.request(
+                executable.method, url, **(first_kwargs if first else request_kwargs)
+            )
+            if first and (response.status == 304 or getattr(response, 'from_cache', False)):
+                response.release()
+                return  # nothing changed: the cursor is still valid
+            body = await read_checked_json(response)
+
+            if first:
+                next_since = format_since(response.headers.get(hdrs.DATE))
+                etag = response.headers.get(hdrs.ETAG)
+
+            items = body[items_key] if items_key is not None else body
+            if not isinstance(items, list):
+                items = [items]
+            changed = changed or bool(items)
+
+            # saved before yielding, so an interrupted sync restarts from this page
+            store.set(key, SyncCursor(
+                cursor.since, cursor.etag, str(response.url), next_since
+            ))
+            for item in items:
+                yield item
+
+            url = get_next(response, body)
+            first = False
+            if url is not None:
+                store.set(key, SyncCursor(cursor.since, cursor.etag, url, next_since))
+
+        if since_param is None or not changed:
+            # same request next time, that will be answered by a "304" if nothing changes
+            store.set(key, SyncCursor(cursor.since, etag))
+        else:
+            store.set(key, SyncCursor(next_since))
+# pylint: enable=too-many-statements
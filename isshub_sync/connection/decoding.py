@@ -0,0 +1,276 @@
+"""Decoding of json responses into ``DictObject``, without intermediate copies.
+
+Objects are created as ``DictObject`` directly by the json decoder when possible, instead
+of decoding into plain dicts then converting them. Whole bodies are decoded by the codec
+returned by ``isshub_sync.json_codec.get_codec``.
+
+For big responses whose body is an array, ``iter_json_array`` reads the body by chunks and
+yields each element as soon as it is complete, so the whole body, and all the decoded
+elements, are never in memory at the same time.
+
+"""
+
+import codecs
+import json
+from typing import Any, AsyncIterator, Iterator, Optional, Tuple
+
+from aiohttp import ClientResponse
+
+from ..json_codec import JsonData, get_codec
+from ..utils import DictObject
+
+
+DECODER = json.JSONDecoder(object_pairs_hook=DictObject)
+WHITESPACES = ' \t\n\r'
+VALUE_STARTS = '{["-0123456789tfn'
+# longest end of a valid json text that the decoder can report as invalid, like "fals"
+# or "\\u12": a decoding error before it is not due to a missing part
+MAX_INCOMPLETE_TOKEN = 6
+
+
+async def read_json(response: ClientResponse, encoding: str = 'utf-8') -> Any:
+    """[ASYNC] Read the body of a response and decode it from json.
+
+    Parameters
+    ----------
+    response : ClientResponse
+        The response to read
+    encoding : str
+        The encoding of the body
+
+    Returns
+    -------
+    Any
+        The decoded body, with objects as ``DictObject``
+
+    """
+
+    body = await response.read()
+    data: JsonData = body
+    if encoding.lower().replace('_', '-') not in ('utf-8', 'utf8'):
+        data = body.decode(encoding)
+    return get_codec().loads_objects(data, DictObject)
+
+
+async def read_checked_json(response: ClientResponse, encoding: str = 'utf-8') -> Any:
+    """[ASYNC] Check the status of a response, then read and release its json body.
+
+    Parameters
+    ----------
+    response : ClientResponse
+        The response to read. It is released, even if its status is an error
+    encoding : str
+        The encoding of the body
+
+    Returns
+    -------
+    Any
+        The decoded body, as returned by ``read_json``
+
+    Raises
+    ------
+    ClientResponseError
+        If the status of the response is 400 or more
+
+    """
+
+    try:
+        response.raise_for_status()
+        return await read_json(response, encoding)
+    finally:
+        response.release()
+
+
+def _skip(buffer: str, position: int, chars: str) -> int:
+    """Return the position of the first char of `buffer` not in `chars` from `position`.
+
+    Parameters
+    ----------
+    buffer : str
+        The string to read
+    position : int
+        The position from which to start
+    chars : str
+        The chars to skip
+
+    Returns
+    -------
+    int
+        The position of the first char not in `chars`, or the length of `buffer`
+
+    """
+
+    length = len(buffer)
+    while position < length and buffer[position] in chars:
+        position += 1
+    return position
+
+
+def _decode_element(buffer: str, position: int) -> Optional[Tuple[Any, int]]:
+    """Decode the element of a json array starting at `position` in `buffer`.
+
+    Parameters
+    ----------
+    buffer : str
+        The string to read
+    position : int
+        The position of the first char of the element
+
+    Returns
+    -------
+    Tuple[Any, int], optional
+        The element and the position in `buffer` after it, or ``None`` if the element may
+        be incomplete
+
+    Raises
+    ------
+    ValueError
+        If the element is invalid, whatever the rest of the body
+
+    """
+
+    length = len(buffer)
+    if buffer[position] not in VALUE_STARTS:
+        raise ValueError('Expecting a json value at position %d' % position)
+
+    try:
+        element, end = DECODER.raw_decode(buffer, position)
+    except json.JSONDecodeError as exc:
+        if exc.msg.startswith('Unterminated string') or exc.pos >= length - MAX_INCOMPLETE_TOKEN:
+            return None
+        raise ValueError(str(exc)) from exc
+
+    if end >= length:
+        return None  # may be incomplete, like a number
+    if buffer[end] not in WHITESPACES + ',]' and end >= length - 2:
+        return None  # a number that may continue, like "1." or "1e+"
+    return element, end
+
+
+def iter_json_decode(buffer: str, first: bool = True) -> Iterator[Tuple[Any, int]]:
+    """Decode elements of a json array from `buffer`, as much as possible.
+
+    It's a generator that is meant to be used by ``iter_json_array``, and that can also be
+    used to test the parsing.
+
+    Parameters
+    ----------
+    buffer : str
+        The beginning of a json array, without the opening "[", or the rest of the array
+        after an element
+    first : bool
+        ``True`` if `buffer` starts right after the opening "[", ``False`` if it starts after
+        an element, and so with a comma or the closing "]"
+
+    Yields
+    ------
+    Tuple[Any, int]
+        Each complete element of the array, and the position in `buffer` after it
+
+    Raises
+    ------
+    ValueError
+        If a comma is missing or extra, or if an element is invalid
+
+    Examples
+    --------
+    >>> list(iter_json_decode(' {"a": 1}, 2, [3]'))
+    [({'a': 1}, 9), (2, 12)]
+    >>> list(iter_json_decode(', 4, 5', first=False))
+    [(4, 3)]
+    >>> list(iter_json_decode('1 2]'))
+    Traceback (most recent call last):
+    ...
+    ValueError: Expecting "," or "]" at position 2
+
+    """
+
+    position = _skip(buffer, 0, WHITESPACES)
+    length = len(buffer)
+
+    while position < length and buffer[position] != ']':
+        if not first:
+            if buffer[position] != ',':
+                raise ValueError('Expecting "," or "]" at position %d' % position)
+            position = _skip(buffer, position + 1, WHITESPACES)
+            if position >= length:
+                return  # the next element is not received yet
+
+        decoded = _decode_element(buffer, position)
+        if decoded is None:
+            return
+
+        yield decoded
+        first = False
+        position = _skip(buffer, decoded[1], WHITESPACES)
+
+
+async def iter_json_array(
+        response: ClientResponse,
+        chunk_size: int = 64 * 1024,
+        encoding: str = 'utf-8') -> AsyncIterator[Any]:
+    """[ASYNC] Iterate on the elements of a json array in the body, reading it by chunks.
+
+    Parameters
+    ----------
+    response : ClientResponse
+        The response to read. Its body must be a json array
+    chunk_size : int
+        The number of bytes to read at once
+    encoding : str
+        The encoding of the body
+
+    Yields
+    ------
+    Any
+        Each element of the array, objects being ``DictObject``
+
+    Raises
+    ------
+    ValueError
+        If the body is not a valid json array
+
+    """
+
+    if getattr(response, 'buffered', False):
+        # the body is already in memory (cached or shared response)
+        for element in await read_json(response, encoding):
+            yield element
+        return
+
+    decoder = codecs.getincrementaldecoder(encoding)()
+    buffer = ''
+    started = finished = False
+    first = True  # no element decoded yet
+    # size of the buffer under which it's useless to try to decode again
+    min_size = 0
+
+    while not finished:
+        chunk = await response.content.read(chunk_size)
+        finished = not chunk
+        buffer += decoder.decode(chunk, final=finished)
+
+        if not started:
+            position = _skip(buffer, 0, WHITESPACES)
+            if position == len(buffer):
+                if finished:
+                    raise ValueError('Empty body')
+                continue
+            if buffer[position] != '[':
+                raise ValueError('The body is not a json array')
+            buffer = buffer[position + 1:]
+            started = True
+
+        if len(buffer) < min_size and not finished:
+            continue
+
+        end = 0
+        for element, end in iter_json_decode(buffer, first):
+            first = False
+            yield element
+        buffer = buffer[end:]
+        # an incomplete element: wait to have twice more data before trying again
+        min_size = len(buffer) * 2
+
+    if buffer.strip(WHITESPACES) != ']':
+        raise ValueError('Invalid or incomplete json array')
@@ -0,0 +1,331 @@
+"""Streaming of response bodies to files, with hashing and resuming.
+
+Big bodies (archives, diffs, logs...) are written chunk by chunk as they are received, so
+the memory used doesn't depend on their size. The body can be hashed on the fly, and an
+interrupted download can be resumed with a "Range" request.
+
+"""
+
+import asyncio
+import hashlib
+import os
+import re
+from typing import Any, BinaryIO, IO, Optional, Tuple, Union, TYPE_CHECKING  # noqa: F401
+
+from aiohttp import ClientResponse, hdrs
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .connection import Executable  # noqa: F401  # pylint: disable=cyclic-import
+
+
+# pylint: disable=invalid-name
+Destination = Union[str, 'os.PathLike', BinaryIO]
+# pylint: enable=invalid-name
+
+CONTENT_RANGE_RE = re.compile(r'bytes\s+(?:(\d+)-\d+|\*)/(\d+|\*)')
+
+
+def parse_content_range(value: Optional[str]) -> Tuple[Optional[int], Optional[int]]:
+    """Parse a "Content-Range" header.
+
+    Parameters
+    ----------
+    value : str, optional
+        The value of the header
+
+    Returns
+    -------
+    Tuple[Optional[int], Optional[int]]
+        The position of the first byte of the range, and the total size, if known
+
+    Examples
+    --------
+    >>> parse_content_range('bytes 100-199/1000')
+    (100, 1000)
+    >>> parse_content_range('bytes */1000')
+    (None, 1000)
+    >>> parse_content_range('bytes 100-199/*')
+    (100, None)
+    >>> parse_content_range(None)
+    (None, None)
+
+    """
+
+    match = CONTENT_RANGE_RE.match(value or '')
+    if match is None:
+        return None, None
+    start, total = match.groups()
+    return (
+        None if start is None else int(start),
+        None if total == '*' else int(total),
+    )
+
+
+class Download:  # pylint: disable=too-few-public-methods
+    """The result of a download.
+
+    Parameters
+    ----------
+    status: int
+        The status of the response
+    size: int
+        The size of the whole body, including the part already downloaded if resumed
+    received: int
+        The number of bytes received by this download
+    resumed: bool
+        ``True`` if the download continued a previous one, with a "Range" request
+    hash: hashlib object, optional
+        The hash of the whole body, if a hash algorithm was asked
+
+    Attributes
+    ----------
+    All parameters given to the constuctor are saved as attributes on the instance.
+
+    """
+
+    __slots__ = (
+        'hash',
+        'received',
+        'resumed',
+        'size',
+        'status',
+    )
+
+    def __init__(  # pylint: disable=too-many-arguments
+            self,
+            status: int,
+            size: int,
+            received: int,
+            resumed: bool,
+            hash: Any = None) -> None:  # pylint: disable=redefined-builtin
+        """Save the information about the download."""
+
+        self.status: int = status
+        self.size: int = size
+        self.received: int = received
+        self.resumed: bool = resumed
+        self.hash: Any = hash
+
+    @property
+    def hexdigest(self) -> Optional[str]:
+        """Return the hash of the body as an hexadecimal string.
+
+        Returns
+        -------
+        str, optional
+            The hexadecimal digest, if a hash algorithm was asked
+
+        """
+
+        return None if self.hash is None else self.hash.hexdigest()
+
+    def __str__(self) -> str:
+        """Return the class name, the size and if resumed.
+
+        Returns
+        -------
+        str
+            The stringified version of the object
+
+        """
+
+        return '%s (%s bytes%s)' % (
+            self.__class__.__name__, self.size, ', resumed' if self.resumed else ''
+        )
+
+    __repr__ = __str__
+
+
+async def write_body(
+        response: ClientResponse,
+        fileobj: IO[bytes],
+        chunk_size: int,
+        hasher: Any = None) -> int:
+    """[ASYNC] Write the body of a response to a file, chunk by chunk.
+
+    Parameters
+    ----------
+    response : ClientResponse
+        The response whose body is not read yet
+    fileobj : IO[bytes]
+        The file to write to
+    chunk_size : int
+        The size of the chunks to read
+    hasher : hashlib object, optional
+        If set, it's updated with each chunk
+
+    Returns
+    -------
+    int
+        The number of bytes written
+
+    """
+
+    if getattr(response, 'buffered', False):  # the body is already in memory
+        chunk = await response.read()
+        fileobj.write(chunk)
+        if hasher is not None:
+            hasher.update(chunk)
+        return len(chunk)
+
+    written = 0
+    while True:
+        chunk = await response.content.read(chunk_size)
+        if not chunk:
+            return written
+        fileobj.write(chunk)
+        if hasher is not None:
+            hasher.update(chunk)
+        written += len(chunk)
+
+
+def _hash_file(
+        path: Union[str, 'os.PathLike'],
+        hasher: Any,
+        size: int,
+        chunk_size: int) -> None:
+    """Update `hasher` with the first `size` bytes of a file.
+
+    Parameters
+    ----------
+    path : Union[str, os.PathLike]
+        The path of the file
+    hasher : hashlib object
+        The hash to update
+    size : int
+        The number of bytes to read
+    chunk_size : int
+        The size of the chunks to read
+
+    """
+
+    with open(path, 'rb') as fileobj:
+        while size > 0:
+            chunk = fileobj.read(min(chunk_size, size))
+            if not chunk:
+                break
+            hasher.update(chunk)
+            size -= len(chunk)
+
+
+async def _hash_file_in_executor(
+        path: Union[str, 'os.PathLike'],
+        hasher: Any,
+        size: int,
+        chunk_size: int) -> None:
+    """[ASYNC] Run ``_hash_file`` in the default executor, to not block the event loop.
+
+    Parameters
+    ----------
+    path : Union[str, os.PathLike]
+        The path of the file
+    hasher : hashlib object
+        The hash to update
+    size : int
+        The number of bytes to read
+    chunk_size : int
+        The size of the chunks to read
+
+    """
+
+    await asyncio.get_event_loop().run_in_executor(
+        None, _hash_file, path, hasher, size, chunk_size
+    )
+
+
+async def download(  # pylint: disable=too-many-arguments,too-many-locals,too-many-branches
+        executable: 'Executable',
+        destination: Destination,
+        chunk_size: int = 64 * 1024,
+        hash_name: Optional[str] = None,
+        resume: bool = False,
+        **kwargs: Any) -> Download:
+    """[ASYNC] Make the request of an ``Executable``, and write its body to a file.
+
+    Parameters
+    ----------
+    executable : Executable
+        The request to make
+    destination : Destination
+        The path of the file to write to, or a file object opened in binary mode
+    chunk_size : int
+        The maximum size of the chunks read from the response and written to the file
+    hash_name : str, optional
+        The name of a ``hashlib`` algorithm, like "sha256", to hash the body on the fly
+    resume : bool
+        If ``True`` and `destination` is the path of an existing file, only the missing part
+        is asked, with a "Range" header. If the server doesn't support ranges, the whole
+        file is downloaded again
+    kwargs : Any
+        Other arguments for ``Connection.request``
+
+    Returns
+    -------
+    Download
+        The status, the size and the hash of the body
+
+    Raises
+    ------
+    ValueError
+        If `resume` is set for a file object
+    ClientResponseError
+        If the status of the response is 400 or more
+
+    """
+
+    path: Optional[Union[str, 'os.PathLike']] = None
+    if isinstance(destination, (str, os.PathLike)):
+        path = destination
+    elif resume:
+        raise ValueError('A download can only be resumed to a path, not a file object')
+
+    offset = 0
+    if resume and path is not None and os.path.exists(path):
+        offset = os.path.getsize(path)
+
+    request_kwargs = dict(kwargs, stream=True)
+    if offset:
+        headers = dict(kwargs.get('headers') or {})
+        headers[hdrs.RANGE] = 'bytes=%d-' % offset
+        request_kwargs['headers'] = headers
+
+    response = await executable(**request_kwargs)
+
+    try:
+        if offset and response.status == 416:
+            __, total = parse_content_range(response.headers.get(hdrs.CONTENT_RANGE))
+            if total == offset:  # already complete
+                hasher = None
+                if hash_name is not None and path is not None:
+                    hasher = hashlib.new(hash_name)
+                    await _hash_file_in_executor(path, hasher, offset, chunk_size)
+                return Download(response.status, offset, 0, True, hasher)
+
+        response.raise_for_status()
+
+        resumed = False
+        if offset and response.status == 206:
+            start, __ = parse_content_range(response.headers.get(hdrs.CONTENT_RANGE))
+            resumed = start == offset
+            if not resumed:  # not the asked range: start again from the beginning
+                response.release()
+                return await download(
+                    executable, destination, chunk_size, hash_name, False, **kwargs
+                )
+
+        hasher = None if hash_name is None else hashlib.new(hash_name)
+        if resumed and hasher is not None and path is not None:
+            await _hash_file_in_executor(path, hasher, offset, chunk_size)
+
+        if isinstance(destination, (str, os.PathLike)):
+            with open(destination, 'ab' if resumed else 'wb') as fileobj:
+                received = await write_body(response, fileobj, chunk_size, hasher)
+        else:
+            received = await write_body(response, destination, chunk_size, hasher)
+
+        return Download(
+            response.status, received + (offset if resumed else 0), received, resumed, hasher
+        )
+
+    finally:
+        response.release()
@@ -0,0 +1,436 @@
+"""Batching of many GraphQL lookups into one request, using aliases.
+
+Instead of one REST request per object (``connection.repos(owner, name).get()`` for
+hundreds of repositories), lookups are queued in a ``GraphQLBatcher``. They are sent
+together, each one with its own alias, in a single query, after a short window or when a
+size or cost limit is reached. The response is then split back to each caller.
+
+"""
+
+import asyncio
+import json
+from typing import Any, Dict, List, Optional, Set, TYPE_CHECKING  # noqa: F401
+
+from .constants import DataModes
+from .decoding import read_checked_json
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .connection import Connection  # noqa: F401  # pylint: disable=cyclic-import
+
+
+class GraphQLError(Exception):
+    """Raised for a lookup for which the GraphQL server returned an error.
+
+    Parameters
+    ----------
+    errors: List[dict]
+        The errors returned by the server for the lookup
+
+    """
+
+    def __init__(self, errors: List[dict]) -> None:
+        """Save the errors."""
+
+        super().__init__('; '.join(str(error.get('message', error)) for error in errors))
+        self.errors: List[dict] = errors
+
+
+class GraphQLEnum(str):
+    """A string to be used as an enum value in a GraphQL query, so without quotes.
+
+    Examples
+    --------
+    >>> format_value({'field': GraphQLEnum('CREATED_AT'), 'direction': GraphQLEnum('DESC')})
+    '{field: CREATED_AT, direction: DESC}'
+
+    """
+
+    __slots__ = ()
+
+
+def format_value(value: Any) -> str:  # pylint: disable=too-many-return-statements
+    r"""Format a python value as a GraphQL literal.
+
+    Parameters
+    ----------
+    value : Any
+        The value to format. Strings, numbers, booleans, ``None``, ``GraphQLEnum``, and lists
+        and dicts of them are accepted
+
+    Returns
+    -------
+    str
+        The GraphQL literal
+
+    Raises
+    ------
+    TypeError
+        If the value cannot be formatted
+
+    Examples
+    --------
+    >>> format_value(['foo "bar"', 1, 2.5, True, None])
+    '["foo \\"bar\\"", 1, 2.5, true, null]'
+
+    """
+
+    if isinstance(value, GraphQLEnum):
+        return str(value)
+    if isinstance(value, str):
+        return json.dumps(value)  # GraphQL strings are escaped like json strings
+    if value is None:
+        return 'null'
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, (int, float)):
+        return repr(value)
+    if isinstance(value, (list, tuple)):
+        return '[%s]' % ', '.join(format_value(item) for item in value)
+    if isinstance(value, dict):
+        return '{%s}' % ', '.join(
+            '%s: %s' % (key, format_value(item)) for key, item in value.items()
+        )
+    raise TypeError('Cannot format %s as a GraphQL value' % value.__class__.__name__)
+
+
+class GraphQLLookup:  # pylint: disable=too-few-public-methods
+    """A lookup queued in a ``GraphQLBatcher``.
+
+    Parameters
+    ----------
+    field: str
+        The root field to query, like ``repository``
+    arguments: dict, optional
+        The arguments of the field, formatted with ``format_value``
+    selection: str
+        The fields to select in the result, like ``id name``. Empty for a scalar field
+    cost: int
+        The cost of the lookup, counted against the ``max_cost`` of the batcher
+    loop: asyncio.AbstractEventLoop, optional
+        The loop of the future. Default to the current one
+
+    Attributes
+    ----------
+    All parameters given to the constuctor are saved as attributes on the instance.
+    future: asyncio.Future
+        The future that will get the result of the lookup
+
+    Examples
+    --------
+    >>> loop = asyncio.new_event_loop()
+    >>> lookup = GraphQLLookup('repository', {'owner': 'foo', 'name': 'bar'}, 'id', loop=loop)
+    >>> lookup.to_query('q0')
+    'q0: repository(owner: "foo", name: "bar") { id }'
+    >>> loop.close()
+
+    """
+
+    __slots__ = (
+        'arguments',
+        'cost',
+        'field',
+        'future',
+        'selection',
+    )
+
+    def __init__(  # pylint: disable=too-many-arguments
+            self,
+            field: str,
+            arguments: Optional[dict] = None,
+            selection: str = '',
+            cost: int = 1,
+            loop: Optional[asyncio.AbstractEventLoop] = None) -> None:
+        """Save the lookup and create its future."""
+
+        self.field: str = field
+        self.arguments: dict = arguments or {}
+        self.selection: str = selection
+        self.cost: int = cost
+        self.future: asyncio.Future = (loop or asyncio.get_event_loop()).create_future()
+
+    def to_query(self, alias: str) -> str:
+        """Return the part of the GraphQL query for this lookup.
+
+        Parameters
+        ----------
+        alias : str
+            The alias to use, to find the result of the lookup in the response
+
+        Returns
+        -------
+        str
+            The aliased field, with its arguments and selection
+
+        """
+
+        query = '%s: %s' % (alias, self.field)
+        if self.arguments:
+            query += '(%s)' % ', '.join(
+                '%s: %s' % (name, format_value(value)) for name, value in self.arguments.items()
+            )
+        if self.selection:
+            query += ' { %s }' % self.selection
+        return query
+
+
+class GraphQLBatcher:  # pylint: disable=too-many-instance-attributes
+    """Queue GraphQL lookups and send them in batches, as one aliased query.
+
+    Parameters
+    ----------
+    connection: Connection
+        The connection used to send the queries. Its cache, rate limiter, retry policy...
+        are used
+    path: str
+        The path of the GraphQL endpoint on the connection
+    window: float
+        The number of seconds to wait for more lookups after the first one of a batch
+    max_size: int
+        The maximum number of lookups in a batch. A batch is sent as soon as it is full
+    max_cost: int, optional
+        The maximum sum of the costs of the lookups of a batch. A batch is sent as soon
+        as this cost is reached
+    request_kwargs: Any
+        Other arguments to pass to ``Connection.request``, like ``headers``
+
+    Attributes
+    ----------
+    All parameters given to the constuctor are saved as attributes on the instance.
+    pending: List[GraphQLLookup]
+        The lookups waiting to be sent
+    batches: int
+        The number of batches sent
+    lookups: int
+        The number of lookups sent
+
+    Examples
+    --------
+    ::
+
+        async with GraphQLBatcher(github) as batcher:
+            repositories = await asyncio.gather(*(
+                batcher.lookup('repository', {'owner': owner, 'name': name}, 'id stargazerCount')
+                for owner, name in repositories_names
+            ))
+
+    """
+
+    __slots__ = (
+        '_sending',
+        '_timer',
+        'batches',
+        'connection',
+        'lookups',
+        'max_cost',
+        'max_size',
+        'path',
+        'pending',
+        'request_kwargs',
+        'window',
+    )
+
+    def __init__(  # pylint: disable=too-many-arguments
+            self,
+            connection: 'Connection',
+            path: str = '/graphql',
+            window: float = 0.01,
+            max_size: int = 50,
+            max_cost: Optional[int] = None,
+            **request_kwargs: Any) -> None:
+        """Save the settings and create the queue of lookups."""
+
+        self.connection: 'Connection' = connection
+        self.path: str = path
+        self.window: float = window
+        self.max_size: int = max_size
+        self.max_cost: Optional[int] = max_cost
+        self.request_kwargs: dict = request_kwargs
+        self.pending: List[GraphQLLookup] = []
+        self.batches: int = 0
+        self.lookups: int = 0
+        self._timer: Optional[asyncio.Handle] = None
+        self._sending: Set[asyncio.Future] = set()
+
+    async def lookup(
+            self,
+            field: str,
+            arguments: Optional[dict] = None,
+            selection: str = '',
+            cost: int = 1) -> Any:
+        """[ASYNC] Queue a lookup and return its result when its batch is done.
+
+        Parameters
+        ----------
+        field : str
+            The root field to query, like ``repository``
+        arguments : dict, optional
+            The arguments of the field, formatted with ``format_value``
+        selection : str
+            The fields to select in the result, like ``id name``
+        cost : int
+            The cost of the lookup, counted against ``max_cost``
+
+        Returns
+        -------
+        Any
+            The result of the lookup, with objects as ``DictObject``
+
+        Raises
+        ------
+        GraphQLError
+            If the server returned an error for this lookup, or for the whole query
+        Exception
+            The exception raised by the request, if any, like a ``ClientResponseError``
+
+        """
+
+        lookup = GraphQLLookup(field, arguments, selection, cost)
+        self.pending.append(lookup)
+
+        if len(self.pending) >= self.max_size or (
+                self.max_cost is not None
+                and sum(pending.cost for pending in self.pending) >= self.max_cost):
+            self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_event_loop().call_later(self.window, self.flush)
+
+        return await lookup.future
+
+    def flush(self) -> None:
+        """Send the pending lookups now, in the background."""
+
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        if not self.pending:
+            return
+
+        lookups, self.pending = self.pending, []
+        task = asyncio.ensure_future(self._send(lookups))
+        self._sending.add(task)
+        task.add_done_callback(self._sending.discard)
+
+    async def wait(self) -> None:
+        """[ASYNC] Send the pending lookups and wait for all the batches to be done."""
+
+        self.flush()
+        if self._sending:
+            await asyncio.wait(self._sending)
+
+    async def _send(self, lookups: List[GraphQLLookup]) -> None:
+        """[ASYNC] Send a batch of lookups and set their results.
+
+        Parameters
+        ----------
+        lookups : List[GraphQLLookup]
+            The lookups to send
+
+        """
+
+        aliases = {'q%d' % index: lookup for index, lookup in enumerate(lookups)}
+        query = 'query {\n%s\n}' % '\n'.join(
+            lookup.to_query(alias) for alias, lookup in aliases.items()
+        )
+
+        self.batches += 1
+        self.lookups += len(lookups)
+
+        try:
+            response = await self.connection.request(
+                'post',
+                self.path,
+                data={'query': query},
+                data_mode=DataModes.JSON,
+                path_suffix='',
+                **self.request_kwargs
+            )
+            body = await read_checked_json(response)
+        except BaseException as exc:  # pylint: disable=broad-except
+            # resolve every lookup, even if the batch is cancelled, so no caller waits forever
+            if isinstance(exc, Exception) and not isinstance(exc, asyncio.CancelledError):
+                self._fail(lookups, exc)
+                return
+            self._fail(lookups, None)
+            raise
+
+        data = body.get('data') or {}
+        errors_by_alias: Dict[str, List[dict]] = {}
+        global_errors: List[dict] = []
+        for error in body.get('errors') or []:
+            path = error.get('path') or []
+            if path and path[0] in aliases:
+                errors_by_alias.setdefault(path[0], []).append(error)
+            else:
+                global_errors.append(error)
+
+        for alias, lookup in aliases.items():
+            if lookup.future.done():  # cancelled by the caller
+                continue
+            errors = errors_by_alias.get(alias) or (global_errors if alias not in data else [])
+            if errors:
+                lookup.future.set_exception(GraphQLError(errors))
+            else:
+                lookup.future.set_result(data.get(alias))
+
+    @staticmethod
+    def _fail(lookups: List[GraphQLLookup], exception: Optional[BaseException]) -> None:
+        """Set an exception on the lookups not done yet, or cancel them.
+
+        Parameters
+        ----------
+        lookups : List[GraphQLLookup]
+            The lookups of the failed batch
+        exception : Optional[BaseException]
+            The exception to set on the lookups. If ``None``, the lookups are cancelled
+
+        """
+
+        for lookup in lookups:
+            if lookup.future.done():  # cancelled by the caller
+                continue
+            if exception is None:
+                lookup.future.cancel()
+            else:
+                lookup.future.set_exception(exception)
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """Return statistics about the batches.
+
+        Returns
+        -------
+        Dict[str, int]
+            The number of ``batches`` and ``lookups`` sent, and of ``pending`` lookups
+
+        """
+
+        return {
+            'batches': self.batches,
+            'lookups': self.lookups,
+            'pending': len(self.pending),
+        }
+
+    async def __aenter__(self) -> 'GraphQLBatcher':
+        """[ASYNC] Enter the context manager.
+
+        Returns
+        -------
+        GraphQLBatcher
+            The batcher itself
+
+        """
+
+        return self
+
+    async def __aexit__(self, exc_type: Any, exc_value: Any, traceback: Any) -> None:
+        """[ASYNC] Send the pending lookups and wait for them when exiting the context manager.
+
+        Parameters
+        ----------
+        exc_type, exc_value, traceback : Any
+            The exception raised in the context, if any
+
+        """
+
+        await self.wait()
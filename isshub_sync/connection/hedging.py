@@ -0,0 +1,287 @@
+"""Hedged requests, to cut the tail latency of slow idempotent requests.
+
+When a GET request has not answered after a delay, a second identical request is sent, and
+the first response wins: the other request is cancelled, closing its connection. The delay
+is fixed, or the 95th percentile of the recent latencies of the same path template, so only
+the slowest requests are hedged. The extra load is capped to a ratio of the requests.
+
+"""
+
+import asyncio
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterable, Optional
+
+from aiohttp import ClientResponse
+
+from .concurrency import percentile
+
+
+class HedgingPolicy:  # pylint: disable=too-many-instance-attributes
+    """When to send a second request for a slow one, and how many can be sent.
+
+    Parameters
+    ----------
+    delay: float, optional
+        The number of seconds after which a second request is sent. If not set, it's the
+        `quantile` of the recent latencies of the path template of the request
+    quantile: float
+        The percentile of the latencies used as delay if `delay` is not set: 0.95 for the
+        95th percentile
+    min_delay: float
+        The minimum delay, when computed from the latencies, to not hedge fast requests
+        because of the noise
+    window: int
+        The number of latencies kept by path template
+    min_samples: int
+        The number of latencies needed for a path template before its requests are hedged,
+        if `delay` is not set
+    max_extra: float
+        The maximum ratio of hedged requests over all requests: 0.1 for at most 10% more
+        requests. A request that should be hedged over this budget is not
+    methods: Iterable[str]
+        The (lowercase) HTTP methods of the requests that can be hedged, that must be
+        idempotent
+    clock: Callable[[], float]
+        The function returning the current time, in seconds. Default to ``time.monotonic``
+
+    Attributes
+    ----------
+    All parameters given to the constuctor are saved as attributes on the instance.
+    latencies: Dict[str, Deque[float]]
+        The recent latencies of each path template
+    requests: int
+        The number of requests run through the policy
+    hedged: int
+        The number of requests for which a second request was sent
+    wins: int
+        The number of hedged requests for which the second request answered first
+    skipped: int
+        The number of requests that were not hedged because of `max_extra`
+
+    Examples
+    --------
+    ::
+
+        hedging = HedgingPolicy(max_extra=0.05)
+        response = await github.repos('foo', 'bar').issues(1).get(hedging=hedging)
+        print(hedging.stats)
+
+    """
+
+    __slots__ = (
+        'clock',
+        'delay',
+        'hedged',
+        'latencies',
+        'max_extra',
+        'methods',
+        'min_delay',
+        'min_samples',
+        'quantile',
+        'requests',
+        'skipped',
+        'window',
+        'wins',
+    )
+
+    def __init__(  # pylint: disable=too-many-arguments
+            self,
+            delay: Optional[float] = None,
+            quantile: float = 0.95,
+            min_delay: float = 0.05,
+            window: int = 100,
+            min_samples: int = 20,
+            max_extra: float = 0.1,
+            methods: Iterable[str] = ('get', 'head'),
+            clock: Callable[[], float] = time.monotonic) -> None:
+        """Save the settings and create the storage of latencies and counters."""
+
+        self.delay: Optional[float] = delay
+        self.quantile: float = quantile
+        self.min_delay: float = min_delay
+        self.window: int = window
+        self.min_samples: int = min_samples
+        self.max_extra: float = max_extra
+        self.methods: frozenset = frozenset(method.lower() for method in methods)
+        self.clock: Callable[[], float] = clock
+        self.latencies: Dict[str, Deque[float]] = {}
+        self.requests: int = 0
+        self.hedged: int = 0
+        self.wins: int = 0
+        self.skipped: int = 0
+
+    def get_delay(self, path_template: str) -> Optional[float]:
+        """Return the delay after which a request to the given path template is hedged.
+
+        Parameters
+        ----------
+        path_template : str
+            The template of the path of the request
+
+        Returns
+        -------
+        float, optional
+            The delay in seconds, ``None`` if not enough latencies are known yet
+
+        Examples
+        --------
+        >>> policy = HedgingPolicy(min_samples=3)
+        >>> policy.observe('/foo', 0.2)
+        >>> policy.get_delay('/foo') is None
+        True
+        >>> for latency in (0.1, 0.5):
+        ...     policy.observe('/foo', latency)
+        >>> policy.get_delay('/foo')
+        0.5
+        >>> HedgingPolicy(delay=1).get_delay('/foo')
+        1
+
+        """
+
+        if self.delay is not None:
+            return self.delay
+
+        latencies = self.latencies.get(path_template)
+        if latencies is None or len(latencies) < self.min_samples:
+            return None
+        return max(self.min_delay, percentile(latencies, self.quantile))  # type: ignore
+
+    def observe(self, path_template: str, latency: float) -> None:
+        """Save the latency of a request.
+
+        Parameters
+        ----------
+        path_template : str
+            The template of the path of the request
+        latency : float
+            The number of seconds the request took
+
+        """
+
+        latencies = self.latencies.get(path_template)
+        if latencies is None:
+            latencies = self.latencies[path_template] = deque(maxlen=self.window)
+        latencies.append(latency)
+
+    def can_hedge(self) -> bool:
+        """Tell if a request can be hedged without going over ``max_extra``.
+
+        Returns
+        -------
+        bool
+            ``True`` if one more hedged request stays in the budget
+
+        """
+
+        return self.hedged + 1 <= self.max_extra * self.requests
+
+    @staticmethod
+    def _release(task: asyncio.Future) -> None:
+        """Cancel a losing request, or release its response if it has one.
+
+        Parameters
+        ----------
+        task : asyncio.Future
+            The task of the request
+
+        """
+
+        if not task.done():
+            task.cancel()
+        elif not task.cancelled() and task.exception() is None:
+            task.result().release()
+
+    async def run(
+            self,
+            send: Callable[[], Awaitable[ClientResponse]],
+            method: str,
+            path_template: str) -> Any:
+        """[ASYNC] Send a request, and a second one if it is too slow, returning the first answer.
+
+        Parameters
+        ----------
+        send : Callable[[], Awaitable[ClientResponse]]
+            The function sending the request
+        method : str
+            The lowercase HTTP method of the request. Requests whose method is not in
+            ``methods`` are sent once
+        path_template : str
+            The template of the path of the request, to get and save its latency
+
+        Returns
+        -------
+        Any
+            The first response
+
+        Raises
+        ------
+        Exception
+            The exception raised by the last request to fail, if both failed
+
+        """
+
+        if method not in self.methods:
+            return await send()
+
+        self.requests += 1
+        started = self.clock()
+        delay = self.get_delay(path_template)
+
+        first = asyncio.ensure_future(send())
+        tasks = [first]
+        winner: Optional[asyncio.Future] = None
+        try:
+            if delay is not None:
+                done, __ = await asyncio.wait(tasks, timeout=delay)
+                if not done:
+                    if self.can_hedge():
+                        self.hedged += 1
+                        tasks.append(asyncio.ensure_future(send()))
+                    else:
+                        self.skipped += 1
+
+            pending = set(tasks)
+            while True:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                # a failed, or cancelled, request loses, unless the other one also failed
+                winners = [
+                    task for task in tasks
+                    if task in done and not task.cancelled() and task.exception() is None
+                ]
+                if winners or not pending:
+                    winner = winners[0] if winners else done.pop()
+                    break
+
+            if winner is not first and winners:
+                self.wins += 1
+            self.observe(path_template, self.clock() - started)
+            return winner.result()
+
+        finally:
+            for task in tasks:
+                if task is not winner:
+                    self._release(task)
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        """Return how often hedging fired and won.
+
+        Returns
+        -------
+        Dict[str, Any]
+            The number of ``requests``, ``hedged`` ones, ``wins`` of the second request,
+            requests ``skipped`` because of ``max_extra``, and the ``extra_ratio`` of
+            requests added by hedging
+
+        """
+
+        return {
+            'requests': self.requests,
+            'hedged': self.hedged,
+            'wins': self.wins,
+            'skipped': self.skipped,
+            'extra_ratio': self.hedged / self.requests if self.requests else 0.0,
+        }
@@ -0,0 +1,624 @@
+"""A ``ConnectionClient`` multiplexing requests over HTTP/2 connections, using ``httpx``.
+
+With the ``aiohttp.ClientSession``, in HTTP/1.1, each request in flight needs its own
+socket: 500 concurrent requests to the same host need 500 connections, or wait for a free
+one in the pool. In HTTP/2, many requests are multiplexed, as streams, over the same
+connection.
+
+``HttpxClient`` has the same interface as ``ClientSession`` for what ``Connection`` uses
+(one coroutine per lowercase HTTP method), and returns ``HttpxResponse`` objects, that
+behave like ``aiohttp.ClientResponse``: ``status``, ``headers``, ``read``, ``json``,
+``content.read``, ``release``, ``raise_for_status`` raising ``ClientResponseError``... And
+transport errors are raised as ``ClientConnectionError`` or ``asyncio.TimeoutError``, so
+the retry policies work the same way.
+
+It needs the optional ``httpx`` and ``h2`` packages (``pip install isshub_sync[http2]``).
+
+HTTP/2 is not faster by itself: the framing of ``h2`` is done in pure python, so, against a
+local server, ``aiohttp`` in HTTP/1.1 handles about 4 times more requests per second (see
+``benchmarks/test_http2.py``). It's useful when sockets are the limit: connections limited
+by the server or by the file descriptors, or a TLS handshake for each new connection to a
+distant host.
+
+To use it for a connection::
+
+    async with HttpxClient() as client:
+        github = Connection('https://api.github.com', client=client)
+
+Or to have the connection create, and close, its own::
+
+    class GithubConnection(Connection):
+        DEFAULT_CLIENT_CLASS = HttpxClient
+
+"""
+
+import asyncio
+import importlib
+import json
+from typing import Any, Awaitable, Callable, Optional  # noqa: F401
+
+from aiohttp import ClientConnectionError, ClientResponseError, ClientTimeout, RequestInfo, hdrs
+from multidict import CIMultiDict, CIMultiDictProxy
+from yarl import URL
+
+from .python_types import Url
+from .responses import CHARSET_RE
+
+
+class HttpxStreamReader:  # pylint: disable=too-few-public-methods
+    """A reader of the body of a ``HttpxResponse``, like ``aiohttp.StreamReader``.
+
+    Parameters
+    ----------
+    response: httpx.Response
+        The streamed response whose body is read
+
+    """
+
+    __slots__ = (
+        '_buffer',
+        '_chunks',
+    )
+
+    def __init__(self, response: Any) -> None:
+        """Prepare the iteration on the chunks of the body."""
+
+        self._chunks = response.aiter_bytes()
+        self._buffer: bytes = b''
+
+    async def read(self, size: int = -1) -> bytes:
+        """[ASYNC] Read up to `size` bytes of the body.
+
+        Parameters
+        ----------
+        size : int
+            The maximum number of bytes to read. ``-1`` to read until the end
+
+        Returns
+        -------
+        bytes
+            The bytes read. Empty at the end of the body
+
+        """
+
+        while size < 0 or len(self._buffer) < size:
+            try:
+                self._buffer += await self._chunks.__anext__()
+            except StopAsyncIteration:
+                break
+
+        if size < 0:
+            data, self._buffer = self._buffer, b''
+        else:
+            data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+
+class HttpxResponse:  # pylint: disable=too-many-instance-attributes
+    """A ``httpx`` response, with the interface of ``aiohttp.ClientResponse``.
+
+    Parameters
+    ----------
+    response: httpx.Response
+        The streamed ``httpx`` response
+
+    Attributes
+    ----------
+    response: httpx.Response
+        The ``httpx`` response
+    status: int
+        The status code
+    reason: str
+        The reason phrase of the status
+    headers: CIMultiDictProxy
+        The headers of the response
+    url: URL
+        The url of the response, after redirects
+    method: str
+        The uppercase HTTP method of the request
+    version: str
+        The HTTP version used, like "HTTP/2"
+    content: HttpxStreamReader
+        The reader of the body, to read it by chunks
+
+    """
+
+    __slots__ = (
+        '_content',
+        'headers',
+        'method',
+        'reason',
+        'response',
+        'status',
+        'url',
+        'version',
+    )
+
+    def __init__(self, response: Any) -> None:
+        """Save the response and convert its metadata to the ``aiohttp`` types."""
+
+        self.response: Any = response
+        self.status: int = response.status_code
+        self.reason: str = response.reason_phrase
+        self.headers: CIMultiDictProxy = CIMultiDictProxy(
+            CIMultiDict(response.headers.multi_items())
+        )
+        self.url: URL = URL(str(response.url))
+        self.method: str = response.request.method
+        self.version: str = response.http_version
+        self._content: Optional[HttpxStreamReader] = None
+
+    @property
+    def content(self) -> HttpxStreamReader:
+        """Return the reader of the body.
+
+        Returns
+        -------
+        HttpxStreamReader
+            The reader, to read the body by chunks
+
+        """
+
+        if self._content is None:
+            self._content = HttpxStreamReader(self.response)
+        return self._content
+
+    @property
+    def content_length(self) -> Optional[int]:
+        """Return the length of the body given in the "Content-Length" header.
+
+        Returns
+        -------
+        int, optional
+            The length, if known
+
+        """
+
+        try:
+            return int(self.headers[hdrs.CONTENT_LENGTH])
+        except (KeyError, ValueError):
+            return None
+
+    @property
+    def ok(self) -> bool:  # pylint: disable=invalid-name
+        """Tell if the status is lower than 400.
+
+        Returns
+        -------
+        bool
+            ``True`` if the request was successful
+
+        """
+
+        return self.status < 400
+
+    @property
+    def request_info(self) -> RequestInfo:
+        """Return the information about the request, as for an ``aiohttp`` response.
+
+        Returns
+        -------
+        RequestInfo
+            The url, method and headers of the request
+
+        """
+
+        request = self.response.request
+        url = URL(str(request.url))
+        return RequestInfo(
+            url,
+            request.method,
+            CIMultiDictProxy(CIMultiDict(request.headers.multi_items())),
+            url,
+        )
+
+    async def read(self) -> bytes:
+        """[ASYNC] Read the whole body, that can then be read again.
+
+        Returns
+        -------
+        bytes
+            The body of the response
+
+        """
+
+        return await self.response.aread()
+
+    async def text(self, encoding: Optional[str] = None) -> str:
+        """[ASYNC] Read the whole body, decoded.
+
+        Parameters
+        ----------
+        encoding : str, optional
+            The encoding to use. Default to the charset of the "Content-Type" header, or utf-8
+
+        Returns
+        -------
+        str
+            The decoded body of the response
+
+        """
+
+        if encoding is None:
+            match = CHARSET_RE.search(self.headers.get(hdrs.CONTENT_TYPE, ''))
+            encoding = match.group(1) if match else 'utf-8'
+
+        return (await self.read()).decode(encoding)
+
+    async def json(  # pylint: disable=unused-argument
+            self,
+            *,
+            loads: Any = json.loads,
+            **kwargs: Any) -> Any:
+        """[ASYNC] Read the whole body, decoded as json.
+
+        Parameters
+        ----------
+        loads : Any
+            The function used to decode the json
+        kwargs : Any
+            Accepted for compatibility with ``ClientResponse.json``. Not used.
+
+        Returns
+        -------
+        Any
+            The decoded json
+
+        """
+
+        return loads(await self.text())
+
+    def raise_for_status(self) -> None:
+        """Raise an exception if the status is 400 or more.
+
+        Raises
+        ------
+        ClientResponseError
+            If the status is 400 or more, as for an ``aiohttp`` response
+
+        """
+
+        if self.status >= 400:
+            self.release()
+            raise ClientResponseError(
+                self.request_info,
+                (),
+                status=self.status,
+                message=self.reason,
+                headers=self.headers,
+            )
+
+    def release(self) -> None:
+        """Close the response, in the background, if its body was not entirely read."""
+
+        if not self.response.is_closed:
+            asyncio.ensure_future(self.response.aclose())
+
+    async def __aenter__(self) -> 'HttpxResponse':
+        """[ASYNC] Enter the context manager.
+
+        Returns
+        -------
+        HttpxResponse
+            The response itself
+
+        """
+
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        """[ASYNC] Close the response when exiting the context manager.
+
+        Parameters
+        ----------
+        exc_info : Any
+            The exception information, if any. Not used.
+
+        """
+
+        await self.response.aclose()
+
+    def __str__(self) -> str:
+        """Return the class name, the status and the url.
+
+        Returns
+        -------
+        str
+            The stringified version of the object
+
+        """
+
+        return '%s (%s %s)' % (self.__class__.__name__, self.status, self.url)
+
+    __repr__ = __str__
+
+
+def _method(method: str) -> Callable[..., Awaitable[HttpxResponse]]:
+    """Return a coroutine function making a request with the given HTTP method.
+
+    Parameters
+    ----------
+    method : str
+        The uppercase HTTP method
+
+    Returns
+    -------
+    Callable[..., Awaitable[HttpxResponse]]
+        The coroutine function, to use as a method of ``HttpxClient``
+
+    """
+
+    async def request(self: 'HttpxClient', url: Url, **kwargs: Any) -> HttpxResponse:
+        """[ASYNC] Make a request with the HTTP method given to ``_method``.
+
+        Parameters
+        ----------
+        url : Url
+            The url to request
+        kwargs : Any
+            The other arguments for ``HttpxClient.request``
+
+        Returns
+        -------
+        HttpxResponse
+            The response, whose body is not read yet
+
+        """
+
+        return await self.request(method, url, **kwargs)
+
+    request.__name__ = method.lower()
+    request.__doc__ = '[ASYNC] Make a %s request. See ``HttpxClient.request``.' % method
+    return request
+
+
+class HttpxClient:
+    """A ``ConnectionClient`` using ``httpx``, with HTTP/2 to multiplex the requests.
+
+    Parameters
+    ----------
+    http2: bool
+        If ``True``, use HTTP/2 when the server supports it. It's negotiated with TLS, so
+        for "https" urls
+    http1: bool
+        If ``False``, with `http2`, HTTP/2 is used even for "http" urls, without negotiation
+        ("prior knowledge")
+    max_connections: int, optional
+        The maximum number of connections. With HTTP/2, one connection to a host is enough
+        for many concurrent requests
+    client_kwargs: Any
+        Other arguments to pass to ``httpx.AsyncClient``, like ``timeout``
+
+    Attributes
+    ----------
+    MODULE: str = 'httpx'
+        The module to import to create the client
+    DEFAULT_TIMEOUT: float = 300.0
+        The timeout, in seconds, used if not given in `client_kwargs`. The same as the total
+        timeout of ``aiohttp``, instead of the 5 seconds of ``httpx``
+    client_kwargs: dict
+        The arguments, computed from the constructor ones, that will be passed to
+        ``httpx.AsyncClient``
+
+    Raises
+    ------
+    ImportError
+        When creating the client, if ``httpx`` (or ``h2``, with `http2`) is not installed
+
+    Examples
+    --------
+    >>> from .python_types import ConnectionClient
+    >>> issubclass(HttpxClient, ConnectionClient)
+    True
+    >>> HttpxClient(max_connections=1)
+    HttpxClient (http2, max_connections=1, not started)
+
+    Notes
+    -----
+    Arguments given to the methods are the ones of ``aiohttp``: ``params``, ``headers``,
+    ``data`` (a dict for a form, else bytes or str for the raw body) and
+    ``allow_redirects``. ``trace_request_ctx``, for the ``aiohttp`` tracing, is ignored.
+
+    """
+
+    __slots__ = (
+        '_client',
+        'client_kwargs',
+    )
+
+    MODULE: str = 'httpx'
+    DEFAULT_TIMEOUT: float = 300.0
+
+    def __init__(
+            self,
+            http2: bool = True,
+            http1: bool = True,
+            max_connections: Optional[int] = 10,
+            **client_kwargs: Any) -> None:
+        """Save the settings that will be used to create the client."""
+
+        client_kwargs.setdefault('timeout', self.DEFAULT_TIMEOUT)
+        self.client_kwargs: dict = dict(
+            client_kwargs, http1=http1, http2=http2, max_connections=max_connections
+        )
+        self._client: Any = None
+
+    @property
+    def client(self) -> Any:
+        """Return the ``httpx.AsyncClient``, creating it if needed.
+
+        Returns
+        -------
+        httpx.AsyncClient
+            The client used to make the requests
+
+        """
+
+        if self._client is None:
+            httpx = importlib.import_module(self.MODULE)
+            client_kwargs = dict(self.client_kwargs)
+            client_kwargs['limits'] = httpx.Limits(
+                max_connections=client_kwargs.pop('max_connections')
+            )
+            self._client = httpx.AsyncClient(**client_kwargs)
+        return self._client
+
+    async def request(  # pylint: disable=too-many-arguments,too-many-locals
+            self,
+            method: str,
+            url: Url,
+            params: Optional[dict] = None,
+            data: Any = None,
+            headers: Optional[dict] = None,
+            allow_redirects: bool = True,
+            trace_request_ctx: Any = None,  # pylint: disable=unused-argument
+            **kwargs: Any) -> HttpxResponse:
+        """[ASYNC] Send a request and return its response when the headers are received.
+
+        Parameters
+        ----------
+        method : str
+            The HTTP method
+        url : Url
+            The url to request
+        params : dict, optional
+            Parameters to pass in the query string
+        data : Any
+            A dict to send as a form, or bytes or str to send as is
+        headers : dict, optional
+            HTTP headers for the request
+        allow_redirects : bool
+            If ``True``, redirects are followed
+        trace_request_ctx : Any
+            Accepted for compatibility with ``aiohttp``. Not used
+        kwargs : Any
+            Other arguments for ``httpx.AsyncClient.build_request``. A ``timeout`` given as an
+            ``aiohttp.ClientTimeout``, as done by ``Connection``, is converted
+
+        Returns
+        -------
+        HttpxResponse
+            The response, whose body is not read yet
+
+        Raises
+        ------
+        asyncio.TimeoutError
+            If a timeout of ``httpx``, or the total timeout, expired
+        ClientConnectionError
+            For any other transport error
+
+        """
+
+        if isinstance(data, dict):
+            kwargs['data'] = data
+        elif data is not None:
+            kwargs['content'] = data
+        if headers is not None:
+            kwargs['headers'] = list(headers.items())
+
+        client = self.client
+        httpx = importlib.import_module(self.MODULE)
+
+        total = None
+        timeout = kwargs.get('timeout')
+        if isinstance(timeout, ClientTimeout):
+            # ``httpx`` has no total timeout: it's applied until the headers are received
+            total = timeout.total
+            kwargs['timeout'] = httpx.Timeout(
+                connect=client.timeout.connect if timeout.sock_connect is None
+                else timeout.sock_connect,
+                read=client.timeout.read if timeout.sock_read is None else timeout.sock_read,
+                write=client.timeout.write,
+                pool=client.timeout.pool,
+            )
+
+        request = client.build_request(method.upper(), url, params=params, **kwargs)
+
+        try:
+            send = client.send(request, stream=True, follow_redirects=allow_redirects)
+            if total is not None:
+                send = asyncio.wait_for(send, total)
+            response = await send
+        except httpx.TimeoutException as exc:
+            raise asyncio.TimeoutError(str(exc)) from exc
+        except httpx.TransportError as exc:
+            raise ClientConnectionError(str(exc) or exc.__class__.__name__) from exc
+
+        return HttpxResponse(response)
+
+    get = _method(hdrs.METH_GET)
+    head = _method(hdrs.METH_HEAD)
+    post = _method(hdrs.METH_POST)
+    put = _method(hdrs.METH_PUT)
+    patch = _method(hdrs.METH_PATCH)
+    delete = _method(hdrs.METH_DELETE)
+    options = _method(hdrs.METH_OPTIONS)
+
+    @property
+    def started(self) -> bool:
+        """Tell if the ``httpx`` client was created and not yet closed.
+
+        Returns
+        -------
+        bool
+            ``True`` if the client is currently available
+
+        """
+
+        return self._client is not None
+
+    async def close(self) -> None:
+        """[ASYNC] Close the ``httpx`` client, if any, and all its connections.
+
+        A new client will be created if this one is used again.
+
+        """
+
+        if self._client is None:
+            return
+
+        client, self._client = self._client, None
+        await client.aclose()
+
+    async def __aenter__(self) -> 'HttpxClient':
+        """[ASYNC] Enter the context manager.
+
+        Returns
+        -------
+        HttpxClient
+            The client itself
+
+        """
+
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        """[ASYNC] Exit the context manager by closing the ``httpx`` client.
+
+        Parameters
+        ----------
+        exc_info : Any
+            The exception information, if any. Not used.
+
+        """
+
+        await self.close()
+
+    def __str__(self) -> str:
+        """Return the class name, the protocol and the limit of connections.
+
+        Returns
+        -------
+        str
+            The stringified version of the object
+
+        """
+
+        return '%s (%s, max_connections=%s, %s)' % (
+            self.__class__.__name__,
+            'http2' if self.client_kwargs['http2'] else 'http1',
+            self.client_kwargs['max_connections'],
+            'started' if self.started else 'not started',
+        )
+
+    __repr__ = __str__
@@ -0,0 +1,736 @@
+"""Instrumentation of the requests: hooks, latency histograms, counters.
+
+An ``Instrumentation`` given to a ``Connection`` records, for each HTTP method and path
+template (like ``/repos/{}/{}/issues/``, see ``Callable.path_template``), a histogram of
+the durations of the requests, the number of requests by status, the bytes sent and
+received, and the time spent waiting for a connection of the pool versus on the wire.
+
+The time spent waiting for the pool, and the exact bytes, are only known if the
+``trace_config`` of the instrumentation is used by the ``aiohttp.ClientSession``. It's done
+automatically for the client created by a ``Connection``. For a ``ClientPool``, it must be
+passed to its constructor::
+
+    instrumentation = Instrumentation()
+    pool = ClientPool(trace_configs=[instrumentation.trace_config])
+    connection = Connection('https://api.github.com', pool=pool, instrumentation=instrumentation)
+
+Data can be exported as a dict with ``snapshot``, or in the Prometheus text format with
+``to_prometheus``.
+
+"""
+
+import re
+from bisect import bisect_left
+from time import monotonic
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple  # noqa: F401
+
+from aiohttp import ClientResponse, TraceConfig, hdrs
+
+from .python_types import Url
+
+
+# pylint: disable=invalid-name
+MetricKey = Tuple[str, str]  # method, path template
+Hook = Callable[['RequestEvent'], Any]
+# pylint: enable=invalid-name
+
+DIGITS_PART_RE = re.compile(r'(?<=/)\d+(?=/|$)')
+
+
+def default_path_template(path: str) -> str:
+    """Return a path template for a path not built with a ``Callable``.
+
+    Parts made only of digits are replaced by "{}", and the query string is removed.
+
+    Parameters
+    ----------
+    path : str
+        The path, starting with "/"
+
+    Returns
+    -------
+    str
+        The path template
+
+    Examples
+    --------
+    >>> default_path_template('/repos/foo/bar/issues/123/?page=2')
+    '/repos/foo/bar/issues/{}/'
+
+    """
+
+    return DIGITS_PART_RE.sub('{}', path.split('?', 1)[0])
+
+
+class RequestEvent:  # pylint: disable=too-few-public-methods,too-many-instance-attributes
+    """Information about one attempt of a request, given to the hooks of an ``Instrumentation``.
+
+    Parameters
+    ----------
+    method: str
+        The uppercase HTTP method of the request
+    url: Url
+        The url of the request
+    path_template: str
+        The path template of the request, used as label in the metrics
+    request_kwargs: dict
+        The arguments passed to the client
+
+    Attributes
+    ----------
+    All parameters given to the constuctor are saved as attributes on the instance.
+    start: float
+        The time (``time.monotonic``) when the request started
+    duration: float, optional
+        The number of seconds until the response headers were received
+    pool_wait: float
+        The number of seconds spent waiting for a free connection in the pool
+    connect: float
+        The number of seconds spent creating a new connection, if needed
+    status: int, optional
+        The status of the response, if any
+    exception: BaseException, optional
+        The exception raised by the client, if any, including ``asyncio.CancelledError`` for
+        a cancelled request
+    bytes_sent: int
+        The number of bytes of the body of the request
+    bytes_received: int
+        The number of bytes of the body of the response, as received so far (the body may
+        be read later), or as given by the "Content-Length" header if not traced
+    traced: bool
+        ``True`` if the ``trace_config`` of the instrumentation is used by the client
+    instrumentation: Instrumentation, optional
+        The instrumentation that started the request, set by ``Instrumentation.start``
+
+    """
+
+    __slots__ = (
+        'bytes_received',
+        'bytes_sent',
+        'connect',
+        'duration',
+        'exception',
+        'instrumentation',
+        'method',
+        'path_template',
+        'pool_wait',
+        'request_kwargs',
+        'start',
+        'status',
+        'traced',
+        'url',
+    )
+
+    def __init__(
+            self,
+            method: str,
+            url: Url,
+            path_template: str,
+            request_kwargs: dict) -> None:
+        """Save the request and initialize the measures."""
+
+        self.method: str = method
+        self.url: Url = url
+        self.path_template: str = path_template
+        self.request_kwargs: dict = request_kwargs
+        self.start: float = monotonic()
+        self.duration: Optional[float] = None
+        self.pool_wait: float = 0.0
+        self.connect: float = 0.0
+        self.status: Optional[int] = None
+        self.exception: Optional[BaseException] = None
+        self.bytes_sent: int = 0
+        self.bytes_received: int = 0
+        self.traced: bool = False
+        self.instrumentation: Optional['Instrumentation'] = None
+
+    @property
+    def key(self) -> MetricKey:
+        """Return the key of the metrics of this request.
+
+        Returns
+        -------
+        MetricKey
+            The method and the path template
+
+        """
+
+        return self.method, self.path_template
+
+    @property
+    def wire(self) -> float:
+        """Return the time spent on the wire, without waiting for the pool or connecting.
+
+        Returns
+        -------
+        float
+            The number of seconds
+
+        """
+
+        return max(0.0, (self.duration or 0.0) - self.pool_wait - self.connect)
+
+    def __str__(self) -> str:
+        """Return the class name, the request and its result.
+
+        Returns
+        -------
+        str
+            The stringified version of the object
+
+        """
+
+        return '%s (%s %s, %s)' % (
+            self.__class__.__name__,
+            self.method,
+            self.path_template,
+            self.status if self.exception is None else self.exception.__class__.__name__,
+        )
+
+    __repr__ = __str__
+
+
+class Histogram:  # pylint: disable=too-few-public-methods
+    """A histogram of values, with fixed buckets.
+
+    Parameters
+    ----------
+    buckets: Tuple[float, ...]
+        The upper bounds of the buckets, sorted. A last bucket, for bigger values, is added
+
+    Attributes
+    ----------
+    buckets: Tuple[float, ...]
+        The upper bounds of the buckets
+    counts: List[int]
+        The number of values in each bucket, the last one being for values bigger than the
+        last bound
+    count: int
+        The number of values
+    sum: float
+        The sum of the values
+
+    Examples
+    --------
+    >>> histogram = Histogram((0.1, 1))
+    >>> for value in (0.05, 0.1, 0.5, 2):
+    ...     histogram.observe(value)
+    >>> histogram.counts, histogram.count, histogram.sum
+    ([2, 1, 1], 4, 2.65)
+    >>> histogram.cumulative()
+    [(0.1, 2), (1, 3), (inf, 4)]
+
+    """
+
+    __slots__ = (
+        'buckets',
+        'count',
+        'counts',
+        'sum',
+    )
+
+    def __init__(self, buckets: Tuple[float, ...]) -> None:
+        """Create the empty buckets."""
+
+        self.buckets: Tuple[float, ...] = buckets
+        self.counts: List[int] = [0] * (len(buckets) + 1)
+        self.count: int = 0
+        self.sum: float = 0.0
+
+    def observe(self, value: float) -> None:
+        """Add a value to the histogram.
+
+        Parameters
+        ----------
+        value : float
+            The value to add
+
+        """
+
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self) -> List[Tuple[float, int]]:
+        """Return the cumulative counts, as in Prometheus histograms.
+
+        Returns
+        -------
+        List[Tuple[float, int]]
+            For each bucket, including the ``inf`` one, its upper bound and the number of
+            values lower or equal to it
+
+        """
+
+        result = []
+        total = 0
+        for bound, count in zip(self.buckets + (float('inf'), ), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+
+class EndpointMetrics:  # pylint: disable=too-few-public-methods
+    """The metrics of the requests of one method and path template.
+
+    Parameters
+    ----------
+    buckets: Tuple[float, ...]
+        The buckets of the histogram of durations
+
+    Attributes
+    ----------
+    durations: Histogram
+        The durations of the requests, until the response headers are received
+    statuses: Dict[str, int]
+        The number of requests by status. Requests that failed without a response are
+        counted with the name of the exception
+    bytes_sent: int
+        The bytes of the bodies of the requests
+    bytes_received: int
+        The bytes of the bodies of the responses
+    pool_wait: float
+        The number of seconds spent waiting for a free connection in the pool
+    connect: float
+        The number of seconds spent creating new connections
+    wire: float
+        The number of seconds spent on the wire
+
+    """
+
+    __slots__ = (
+        'bytes_received',
+        'bytes_sent',
+        'connect',
+        'durations',
+        'pool_wait',
+        'statuses',
+        'wire',
+    )
+
+    def __init__(self, buckets: Tuple[float, ...]) -> None:
+        """Create the empty metrics."""
+
+        self.durations: Histogram = Histogram(buckets)
+        self.statuses: Dict[str, int] = {}
+        self.bytes_sent: int = 0
+        self.bytes_received: int = 0
+        self.pool_wait: float = 0.0
+        self.connect: float = 0.0
+        self.wire: float = 0.0
+
+    def as_dict(self) -> dict:
+        """Return the metrics as a dict.
+
+        Returns
+        -------
+        dict
+            A dict with all the metrics, the histogram having its ``buckets`` (cumulative),
+            ``count`` and ``sum``
+
+        """
+
+        return {
+            'durations': {
+                'buckets': self.durations.cumulative(),
+                'count': self.durations.count,
+                'sum': self.durations.sum,
+            },
+            'statuses': dict(self.statuses),
+            'bytes_sent': self.bytes_sent,
+            'bytes_received': self.bytes_received,
+            'pool_wait': self.pool_wait,
+            'connect': self.connect,
+            'wire': self.wire,
+        }
+
+
+def _escape_label(value: str) -> str:
+    r"""Escape a label value for the Prometheus text format.
+
+    Parameters
+    ----------
+    value : str
+        The value to escape
+
+    Returns
+    -------
+    str
+        The escaped value
+
+    Examples
+    --------
+    >>> print(_escape_label('a"b\\c'))
+    a\"b\\c
+
+    """
+
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Instrumentation:
+    """Collect metrics about the requests of one or many connections, and call hooks.
+
+    Parameters
+    ----------
+    buckets: Iterable[float]
+        The upper bounds of the buckets of the histograms of durations, in seconds
+    before_request: Iterable[Hook]
+        Functions called with a ``RequestEvent`` before each attempt of a request
+    after_request: Iterable[Hook]
+        Functions called with a ``RequestEvent`` after each attempt of a request, when the
+        response headers are received or the request failed
+    prefix: str
+        The prefix of the names of the metrics in the Prometheus format
+
+    Attributes
+    ----------
+    DEFAULT_BUCKETS: Tuple[float, ...]
+        The default buckets, from 10ms to 30s
+    buckets: Tuple[float, ...]
+        The upper bounds of the buckets
+    before_request: List[Hook]
+        The hooks called before each request. Can be updated
+    after_request: List[Hook]
+        The hooks called after each request. Can be updated
+    prefix: str
+        The prefix of the names of the metrics in the Prometheus format
+    metrics: Dict[MetricKey, EndpointMetrics]
+        The metrics by method and path template
+
+    Examples
+    --------
+    >>> instrumentation = Instrumentation(buckets=(0.1, 1))
+    >>> event = RequestEvent('GET', 'https://foo.com/bar/1/', '/bar/{}/', {})
+    >>> instrumentation.start(event)
+    >>> event.status, event.start = 200, event.start - 0.5
+    >>> instrumentation.finish(event)
+    >>> instrumentation.snapshot()[('GET', '/bar/{}/')]['statuses']
+    {'200': 1}
+
+    Notes
+    -----
+    Recording a request costs a few dict lookups and additions, and is done synchronously.
+
+    """
+
+    __slots__ = (
+        '_trace_config',
+        'after_request',
+        'before_request',
+        'buckets',
+        'metrics',
+        'prefix',
+    )
+
+    DEFAULT_BUCKETS: Tuple[float, ...] = (
+        0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0
+    )
+
+    def __init__(
+            self,
+            buckets: Iterable[float] = DEFAULT_BUCKETS,
+            before_request: Iterable[Hook] = (),
+            after_request: Iterable[Hook] = (),
+            prefix: str = 'isshub_sync_http') -> None:
+        """Save the settings and create the storage of the metrics."""
+
+        self.buckets: Tuple[float, ...] = tuple(sorted(buckets))
+        self.before_request: List[Hook] = list(before_request)
+        self.after_request: List[Hook] = list(after_request)
+        self.prefix: str = prefix
+        self.metrics: Dict[MetricKey, EndpointMetrics] = {}
+        self._trace_config: Optional[TraceConfig] = None
+
+    def get_metrics(self, key: MetricKey) -> EndpointMetrics:
+        """Return the metrics for the given method and path template, creating them if needed.
+
+        Parameters
+        ----------
+        key : MetricKey
+            The method and the path template
+
+        Returns
+        -------
+        EndpointMetrics
+            The metrics
+
+        """
+
+        metrics = self.metrics.get(key)
+        if metrics is None:
+            metrics = self.metrics[key] = EndpointMetrics(self.buckets)
+        return metrics
+
+    def start(self, event: RequestEvent) -> None:
+        """Register the start of a request and call the ``before_request`` hooks.
+
+        Parameters
+        ----------
+        event : RequestEvent
+            The request that will be sent. It is passed to the client, so the
+            ``trace_config`` can update it
+
+        """
+
+        event.instrumentation = self
+        event.request_kwargs['trace_request_ctx'] = event
+        for hook in self.before_request:
+            hook(event)
+
+    def finish(
+            self,
+            event: RequestEvent,
+            response: Optional[ClientResponse] = None,
+            exception: Optional[BaseException] = None) -> None:
+        """Register the end of a request and call the ``after_request`` hooks.
+
+        Parameters
+        ----------
+        event : RequestEvent
+            The request that was sent
+        response : ClientResponse, optional
+            The response, if any
+        exception : BaseException, optional
+            The exception raised by the client, if any
+
+        """
+
+        event.duration = monotonic() - event.start
+        if response is not None:
+            event.status = response.status
+        if exception is not None:
+            event.exception = exception
+
+        if not event.traced:
+            data = event.request_kwargs.get('data')
+            if isinstance(data, (bytes, str)):
+                event.bytes_sent = len(data)
+            if response is not None:
+                try:
+                    event.bytes_received = int(response.headers.get(hdrs.CONTENT_LENGTH, 0))
+                except ValueError:
+                    pass
+
+        metrics = self.get_metrics(event.key)
+        metrics.durations.observe(event.duration)
+        status = str(event.status) if event.exception is None else \
+            event.exception.__class__.__name__
+        metrics.statuses[status] = metrics.statuses.get(status, 0) + 1
+        metrics.pool_wait += event.pool_wait
+        metrics.connect += event.connect
+        metrics.wire += event.wire
+        if not event.traced:  # else counted as the chunks are sent and received
+            metrics.bytes_sent += event.bytes_sent
+            metrics.bytes_received += event.bytes_received
+
+        for hook in self.after_request:
+            hook(event)
+
+    @property
+    def trace_config(self) -> TraceConfig:
+        """Return the ``aiohttp.TraceConfig`` to measure the pool wait and the exact bytes.
+
+        It must be passed to the ``trace_configs`` argument of the ``ClientSession``.
+
+        Returns
+        -------
+        TraceConfig
+            The trace config, always the same for this instrumentation
+
+        """
+
+        if self._trace_config is None:
+            self._trace_config = self._make_trace_config()
+        return self._trace_config
+
+    @staticmethod
+    def _make_trace_config() -> TraceConfig:
+        """Create the ``aiohttp.TraceConfig`` updating the ``RequestEvent`` of each request.
+
+        Returns
+        -------
+        TraceConfig
+            The new trace config
+
+        """
+
+        # pylint: disable=unused-argument
+
+        def get_event(context: Any) -> Optional[RequestEvent]:
+            """Return the event of a traced request, if started by an instrumentation.
+
+            Parameters
+            ----------
+            context : SimpleNamespace
+                The context of the traced request
+
+            Returns
+            -------
+            RequestEvent, optional
+                The event passed as ``trace_request_ctx``, if any
+
+            """
+
+            event = context.trace_request_ctx
+            return event if isinstance(event, RequestEvent) else None
+
+        async def on_request_start(session: Any, context: Any, params: Any) -> None:
+            event = get_event(context)
+            if event is not None:
+                event.traced = True
+
+        async def on_connection_queued_start(session: Any, context: Any, params: Any) -> None:
+            context.queued_start = monotonic()
+
+        async def on_connection_queued_end(session: Any, context: Any, params: Any) -> None:
+            event = get_event(context)
+            if event is not None:
+                event.pool_wait += monotonic() - context.queued_start
+
+        async def on_connection_create_start(session: Any, context: Any, params: Any) -> None:
+            context.create_start = monotonic()
+
+        async def on_connection_create_end(session: Any, context: Any, params: Any) -> None:
+            event = get_event(context)
+            if event is not None:
+                event.connect += monotonic() - context.create_start
+
+        async def on_request_chunk_sent(session: Any, context: Any, params: Any) -> None:
+            event = get_event(context)
+            if event is not None and event.instrumentation is not None:
+                event.bytes_sent += len(params.chunk)
+                event.instrumentation.get_metrics(event.key).bytes_sent += len(params.chunk)
+
+        async def on_response_chunk_received(session: Any, context: Any, params: Any) -> None:
+            event = get_event(context)
+            if event is not None and event.instrumentation is not None:
+                event.bytes_received += len(params.chunk)
+                event.instrumentation.get_metrics(event.key).bytes_received += len(
+                    params.chunk
+                )
+
+        # pylint: enable=unused-argument
+
+        trace_config = TraceConfig()
+        trace_config.on_request_start.append(on_request_start)
+        trace_config.on_connection_queued_start.append(on_connection_queued_start)
+        trace_config.on_connection_queued_end.append(on_connection_queued_end)
+        trace_config.on_connection_create_start.append(on_connection_create_start)
+        trace_config.on_connection_create_end.append(on_connection_create_end)
+        trace_config.on_request_chunk_sent.append(on_request_chunk_sent)
+        trace_config.on_response_chunk_received.append(on_response_chunk_received)
+        return trace_config
+
+    def snapshot(self) -> Dict[MetricKey, dict]:
+        """Return all the metrics.
+
+        Returns
+        -------
+        Dict[MetricKey, dict]
+            For each method and path template, the metrics as a dict (see
+            ``EndpointMetrics.as_dict``)
+
+        """
+
+        return {key: metrics.as_dict() for key, metrics in self.metrics.items()}
+
+    def reset(self) -> None:
+        """Remove all the metrics."""
+
+        self.metrics = {}
+
+    def to_prometheus(self) -> str:
+        """Return all the metrics in the Prometheus text format.
+
+        Returns
+        -------
+        str
+            The metrics, ready to be exposed to Prometheus
+
+        """
+
+        prefix = self.prefix
+        lines: List[str] = []
+
+        def add_metric(name: str, kind: str, help_text: str) -> str:
+            """Add the "HELP" and "TYPE" lines of a metric.
+
+            Parameters
+            ----------
+            name : str
+                The name of the metric, without the prefix
+            kind : str
+                The type of the metric: "counter", "histogram"...
+            help_text : str
+                The description of the metric
+
+            Returns
+            -------
+            str
+                The full name of the metric, with the prefix
+
+            """
+
+            full_name = '%s_%s' % (prefix, name)
+            lines.append('# HELP %s %s' % (full_name, help_text))
+            lines.append('# TYPE %s %s' % (full_name, kind))
+            return full_name
+
+        def labels(key: MetricKey, **extra: str) -> str:
+            """Format the labels of a metric: the method, the path and the `extra` ones.
+
+            Parameters
+            ----------
+            key : MetricKey
+                The method and the path template
+            extra : str
+                Other labels, like "le" for the buckets of a histogram
+
+            Returns
+            -------
+            str
+                The labels, to put between braces
+
+            """
+
+            values = [('method', key[0]), ('path', key[1])] + sorted(extra.items())
+            return ','.join('%s="%s"' % (name, _escape_label(value)) for name, value in values)
+
+        items = sorted(self.metrics.items())
+
+        name = add_metric(
+            'request_duration_seconds', 'histogram',
+            'Duration of the requests, until the response headers are received.'
+        )
+        for key, metrics in items:
+            for bound, count in metrics.durations.cumulative():
+                lines.append('%s_bucket{%s} %d' % (
+                    name, labels(key, le='+Inf' if bound == float('inf') else repr(bound)), count
+                ))
+            lines.append('%s_sum{%s} %r' % (name, labels(key), metrics.durations.sum))
+            lines.append('%s_count{%s} %d' % (name, labels(key), metrics.durations.count))
+
+        name = add_metric('requests_total', 'counter', 'Number of requests, by status.')
+        for key, metrics in items:
+            for status, count in sorted(metrics.statuses.items()):
+                lines.append('%s{%s} %d' % (name, labels(key, status=status), count))
+
+        for attr, help_text in (
+                ('bytes_sent', 'Bytes of the bodies of the requests.'),
+                ('bytes_received', 'Bytes of the bodies of the responses.'),
+        ):
+            name = add_metric('%s_total' % attr, 'counter', help_text)
+            for key, metrics in items:
+                lines.append('%s{%s} %d' % (name, labels(key), getattr(metrics, attr)))
+
+        for attr, help_text in (
+                ('pool_wait', 'Time spent waiting for a free connection in the pool.'),
+                ('connect', 'Time spent creating new connections.'),
+                ('wire', 'Time spent on the wire, until the response headers are received.'),
+        ):
+            name = add_metric('%s_seconds_total' % attr, 'counter', help_text)
+            for key, metrics in items:
+                lines.append('%s{%s} %r' % (name, labels(key), getattr(metrics, attr)))
+
+        return '\n'.join(lines) + '\n'
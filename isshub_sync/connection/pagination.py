@@ -0,0 +1,256 @@
+"""Lazy iteration on all the items of a paginated list endpoint.
+
+Pages are followed using the ``rel="next"`` url of the "Link" header, as done by GitHub,
+GitLab and others. Another way to find the next page (a cursor in the body for example)
+can be used by passing a custom ``get_next`` function.
+
+"""
+
+import asyncio
+import re
+from typing import (  # noqa: F401
+    Any,
+    AsyncGenerator,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+    TYPE_CHECKING,
+    Union,
+)
+from urllib.parse import urljoin
+
+from aiohttp import ClientResponse
+
+from ..utils import NotProvided
+from .decoding import read_checked_json
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .connection import Executable  # noqa: F401  # pylint: disable=cyclic-import
+
+
+# pylint: disable=invalid-name
+NextGetter = Callable[[ClientResponse, Any], Optional[str]]
+# pylint: enable=invalid-name
+
+LINK_RE = re.compile(r'<([^>]*)>([^<]*)')
+LINK_REL_RE = re.compile(r'rel\s*=\s*"?([^";,]+)"?')
+
+
+def parse_link_header(value: str) -> Dict[str, str]:
+    """Parse the value of a "Link" header to return the urls by relation type.
+
+    Parameters
+    ----------
+    value : str
+        The value of the "Link" header
+
+    Returns
+    -------
+    Dict[str, str]
+        A dict with the relation types ("next", "last"...) as keys, and urls as values
+
+    Examples
+    --------
+    >>> links = parse_link_header(
+    ...     '<https://foo.com/bar?page=2>; rel="next", <https://foo.com/bar?page=5>; rel="last"'
+    ... )
+    >>> links == {'next': 'https://foo.com/bar?page=2', 'last': 'https://foo.com/bar?page=5'}
+    True
+    >>> parse_link_header('')
+    {}
+
+    """
+
+    links: Dict[str, str] = {}
+
+    for url, link_params in LINK_RE.findall(value or ''):
+        match = LINK_REL_RE.search(link_params)
+        if match:
+            for rel in match.group(1).split():
+                links.setdefault(rel, url)
+
+    return links
+
+
+def get_next_link(
+        response: ClientResponse,
+        body: Any) -> Optional[str]:  # pylint: disable=unused-argument
+    """Return the url of the next page, from the "Link" header of the response.
+
+    Parameters
+    ----------
+    response : ClientResponse
+        The response of the current page
+    body : Any
+        The decoded body of the current page. Not used.
+
+    Returns
+    -------
+    str, optional
+        The absolute url of the next page, or ``None`` if it is the last page
+
+    """
+
+    next_url = parse_link_header(response.headers.get('Link', '')).get('next')
+    if next_url is None:
+        return None
+    return urljoin(str(response.url), next_url)
+
+
+class Paginator:
+    """Async iterator on all the items of a paginated endpoint, fetching pages lazily.
+
+    Parameters
+    ----------
+    executable: Executable
+        The executable giving the first page
+    per_page: int, optional
+        The number of items to ask per page, passed in the ``PER_PAGE_PARAM`` query parameter
+    prefetch: bool
+        If ``True``, the next page is fetched while the items of the current one are consumed
+    items_key: str, optional
+        If the body is an object, the key where to find the list of items
+    get_next: NextGetter
+        A function taking the response and the decoded body, and returning the url of the
+        next page, or ``None`` if there is none. Default to ``get_next_link``
+    request_kwargs: Any
+        Other arguments to pass to ``Connection.request``
+
+    Attributes
+    ----------
+    PER_PAGE_PARAM: str = 'per_page'
+        The name of the query parameter used to pass `per_page`
+    All parameters given to the constuctor are saved as attributes on the instance.
+
+    Examples
+    --------
+    ::
+
+        async for issue in connection.repos('foo', 'bar').issues.get.paginate(per_page=100):
+            print(issue.title)
+
+    Notes
+    -----
+    When the iteration stops before the end, the prefetched page, if any, is cancelled.
+
+    """
+
+    __slots__ = (
+        'executable',
+        'get_next',
+        'items_key',
+        'per_page',
+        'prefetch',
+        'request_kwargs',
+    )
+
+    PER_PAGE_PARAM: str = 'per_page'
+
+    def __init__(  # pylint: disable=too-many-arguments
+            self,
+            executable: 'Executable',
+            per_page: Optional[int] = None,
+            prefetch: bool = True,
+            items_key: Optional[str] = None,
+            get_next: NextGetter = get_next_link,
+            **request_kwargs: Any) -> None:
+        """Save the executable and the pagination settings."""
+
+        self.executable: 'Executable' = executable
+        self.per_page: Optional[int] = per_page
+        self.prefetch: bool = prefetch
+        self.items_key: Optional[str] = items_key
+        self.get_next: NextGetter = get_next
+        self.request_kwargs: dict = request_kwargs
+
+    async def _fetch(self, path: str, request_kwargs: dict) -> Tuple[List[Any], Optional[str]]:
+        """[ASYNC] Fetch a page and return its items and the url of the next one.
+
+        Parameters
+        ----------
+        path : str
+            The path, or full url, of the page to fetch
+        request_kwargs : dict
+            The arguments to pass to ``Connection.request``
+
+        Returns
+        -------
+        Tuple[List[Any], Optional[str]]
+            The items of the page, and the url of the next one, if any
+
+        """
+
+        response = await self.executable.connection.request(
+            self.executable.method, path, **request_kwargs
+        )
+        body = await read_checked_json(response)
+
+        items = body[self.items_key] if self.items_key is not None else body
+        if not isinstance(items, list):
+            items = [items]
+
+        return items, self.get_next(response, body)
+
+    async def pages(self) -> AsyncGenerator[List[Any], None]:
+        """[ASYNC] Iterate on the pages, fetching them one after the other.
+
+        Yields
+        ------
+        List[Any]
+            The items of each page
+
+        """
+
+        request_kwargs = dict(self.request_kwargs)
+        path = self.executable.path or request_kwargs.pop('path', '/')
+        if self.executable.path and self.executable.path_template is not None:
+            # the same template for all the pages, even if their urls are different
+            request_kwargs.setdefault('path_template', self.executable.path_template)
+
+        params = request_kwargs.pop('params', NotProvided)
+        first_params: dict = {} if params in (NotProvided, None) else dict(params)
+        if self.per_page is not None:
+            first_params[self.PER_PAGE_PARAM] = self.per_page
+
+        # the following pages are full urls, including the query string
+        page: Optional[Union[Awaitable, asyncio.Future]] = asyncio.ensure_future(
+            self._fetch(path, dict(request_kwargs, params=first_params))
+        )
+
+        try:
+            while page is not None:
+                items, next_url = await page
+                page = None
+                if next_url is not None:
+                    page = self._fetch(next_url, request_kwargs)
+                    if self.prefetch:
+                        page = asyncio.ensure_future(page)
+                yield items
+
+        finally:
+            if isinstance(page, asyncio.Future):
+                page.cancel()
+            elif page is not None:
+                page.close()  # type: ignore  # a coroutine never awaited
+
+    async def __aiter__(self) -> AsyncIterator[Any]:
+        """[ASYNC] Iterate on all the items of all the pages.
+
+        Yields
+        ------
+        Any
+            Each item, as a ``DictObject`` if it is an object
+
+        """
+
+        pages = self.pages()
+        try:
+            async for items in pages:
+                for item in items:
+                    yield item
+        finally:
+            await pages.aclose()
@@ -0,0 +1,182 @@
+"""A pool of HTTP connections that can be shared by many ``Connection`` objects.
+
+Without a pool, each ``Connection`` creates its own ``ClientSession``, with its own
+``TCPConnector`` using the default limits. When many connections are used at the same
+time, they all fight for sockets, and DNS resolutions and keep-alive connections are not
+shared. A ``ClientPool`` owns one tuned ``ClientSession`` that is used by all the
+connections it is given to.
+
+"""
+
+from typing import Any, Optional, Type
+
+from aiohttp import ClientSession, TCPConnector
+
+
+class ClientPool:
+    """A lazily created ``ClientSession`` with a tuned connector, shared between connections.
+
+    Parameters
+    ----------
+    limit: int
+        Maximum number of simultaneous connections, for all hosts. ``0`` for no limit.
+    limit_per_host: int
+        Maximum number of simultaneous connections to the same host. ``0`` for no limit.
+    keepalive_timeout: float
+        Number of seconds an unused connection is kept alive to be reused.
+    ttl_dns_cache: int, optional
+        Number of seconds a DNS resolution is cached. ``None`` to cache forever.
+    use_dns_cache: bool
+        If ``False``, DNS resolutions will not be cached at all.
+    session_kwargs: Any
+        Other arguments to pass to ``CLIENT_CLASS`` when creating the client.
+
+    Attributes
+    ----------
+    CLIENT_CLASS: Type[ClientSession] = ClientSession
+        The class used to create the shared client. It must accept a ``connector`` argument.
+    CONNECTOR_CLASS: Type[TCPConnector] = TCPConnector
+        The class used to create the connector of the shared client.
+    connector_kwargs: dict
+        The arguments, computed from the constructor ones, that will be passed to
+        ``CONNECTOR_CLASS``.
+    session_kwargs: dict
+        The extra arguments that will be passed to ``CLIENT_CLASS``.
+
+    Examples
+    --------
+    >>> pool = ClientPool(limit=50, limit_per_host=10)
+    >>> pool
+    ClientPool (limit=50, limit_per_host=10, not started)
+    >>> pool.connector_kwargs['keepalive_timeout']
+    30.0
+
+    Notes
+    -----
+    The client is only created on the first access to ``client``, because an ``aiohttp``
+    session must be created inside a running event loop.
+
+    The pool can be used as an async context manager, to close the client when done::
+
+        async with ClientPool(limit_per_host=20) as pool:
+            github = Connection('https://api.github.com', pool=pool)
+            gitlab = Connection('https://gitlab.com/api/v4', pool=pool)
+            ...
+
+    """
+
+    __slots__ = (
+        '_client',
+        'connector_kwargs',
+        'session_kwargs',
+    )
+
+    CLIENT_CLASS: Type[ClientSession] = ClientSession
+    CONNECTOR_CLASS: Type[TCPConnector] = TCPConnector
+
+    def __init__(  # pylint: disable=too-many-arguments
+            self,
+            limit: int = 100,
+            limit_per_host: int = 10,
+            keepalive_timeout: float = 30.0,
+            ttl_dns_cache: Optional[int] = 300,
+            use_dns_cache: bool = True,
+            **session_kwargs: Any) -> None:
+        """Save the settings that will be used to create the client."""
+
+        self._client: Optional[ClientSession] = None
+        self.connector_kwargs: dict = {
+            'limit': limit,
+            'limit_per_host': limit_per_host,
+            'keepalive_timeout': keepalive_timeout,
+            'ttl_dns_cache': ttl_dns_cache,
+            'use_dns_cache': use_dns_cache,
+        }
+        self.session_kwargs: dict = session_kwargs
+
+    @property
+    def client(self) -> ClientSession:
+        """Return the shared client, creating it if needed.
+
+        Returns
+        -------
+        ClientSession
+            The client to use to make requests
+
+        """
+
+        if self._client is None:
+            self._client = self.CLIENT_CLASS(
+                connector=self.CONNECTOR_CLASS(**self.connector_kwargs),
+                **self.session_kwargs
+            )
+        return self._client
+
+    @property
+    def started(self) -> bool:
+        """Tell if the shared client was created and not yet closed.
+
+        Returns
+        -------
+        bool
+            ``True`` if the client is currently available
+
+        """
+
+        return self._client is not None
+
+    async def close(self) -> None:
+        """[ASYNC] Close the shared client, if any, and all its connections.
+
+        A new client will be created if the pool is used again.
+
+        """
+
+        if self._client is None:
+            return
+
+        client, self._client = self._client, None
+        await client.close()
+
+    async def __aenter__(self) -> 'ClientPool':
+        """[ASYNC] Enter the context manager.
+
+        Returns
+        -------
+        ClientPool
+            The pool itself
+
+        """
+
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        """[ASYNC] Exit the context manager by closing the shared client.
+
+        Parameters
+        ----------
+        exc_info : Any
+            The exception information, if any. Not used.
+
+        """
+
+        await self.close()
+
+    def __str__(self) -> str:
+        """Return the class name and the main limits.
+
+        Returns
+        -------
+        str
+            The stringified version of the object
+
+        """
+
+        return '%s (limit=%s, limit_per_host=%s, %s)' % (
+            self.__class__.__name__,
+            self.connector_kwargs['limit'],
+            self.connector_kwargs['limit_per_host'],
+            'started' if self.started else 'not started',
+        )
+
+    __repr__ = __str__
@@ -0,0 +1,381 @@
+"""Scheduling of requests according to the rate limits announced by the servers.
+
+The "X-RateLimit-Limit", "X-RateLimit-Remaining", "X-RateLimit-Reset" and "Retry-After"
+headers of each response are read to know the budget of each token (identified by the
+"Authorization" header of the request). When the budget runs low, requests are spaced out
+so that the remaining ones are spread until the reset time, instead of being all fired at
+once then failing until the reset.
+
+"""
+
+import asyncio
+import hashlib
+import time
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, Mapping, Optional
+
+from aiohttp import hdrs
+from multidict import CIMultiDict
+
+from .timeouts import Deadline
+
+
+ANONYMOUS: str = 'anonymous'
+
+
+def token_key(authorization: Optional[str]) -> str:
+    """Return a key identifying a token, without exposing it.
+
+    Parameters
+    ----------
+    authorization : str, optional
+        The value of the "Authorization" header
+
+    Returns
+    -------
+    str
+        A short hash of `authorization`, or ``ANONYMOUS`` if not set
+
+    Examples
+    --------
+    >>> token_key(None)
+    'anonymous'
+    >>> token_key('token foo') == token_key('token foo') != token_key('token bar')
+    True
+
+    """
+
+    if not authorization:
+        return ANONYMOUS
+    return hashlib.sha256(authorization.encode()).hexdigest()[:12]
+
+
+def parse_retry_after(value: Optional[str], now: float) -> Optional[float]:
+    """Parse a "Retry-After" header, that is a number of seconds or a date.
+
+    Parameters
+    ----------
+    value : str, optional
+        The value of the header
+    now : float
+        The current timestamp
+
+    Returns
+    -------
+    float, optional
+        The timestamp until which no request should be made, if the header is valid
+
+    Examples
+    --------
+    >>> parse_retry_after('30', 1000.0)
+    1030.0
+    >>> parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT', 0)
+    1445412480.0
+    >>> parse_retry_after('foo', 0) is None
+    True
+
+    """
+
+    if not value:
+        return None
+
+    try:
+        return now + float(value)
+    except ValueError:
+        pass
+
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a request would have to wait longer than allowed for the rate limit.
+
+    Parameters
+    ----------
+    key: str
+        The key of the token whose budget is exhausted
+    wait: float
+        The number of seconds the request would have to wait
+
+    """
+
+    def __init__(self, key: str, wait: float) -> None:
+        """Save the key and the waiting time."""
+
+        super().__init__('Rate limit exceeded for %s, %.1f seconds to wait' % (key, wait))
+        self.key: str = key
+        self.wait: float = wait
+
+
+class RateLimitState:  # pylint: disable=too-few-public-methods
+    """The known rate-limit budget of a token.
+
+    Attributes
+    ----------
+    limit: int, optional
+        The number of requests allowed per period, as given by the last response
+    remaining: int, optional
+        The number of requests still allowed, as given by the last response, minus the
+        requests sent since
+    reset: float, optional
+        The timestamp at which the budget will be reset
+    blocked_until: float
+        A timestamp before which no request must be made, because of a "Retry-After" header
+        or an exhausted budget
+    next_slot: float
+        The timestamp from which the next request can be made, when requests are spaced out
+    requests: int
+        The number of requests made with this token
+
+    """
+
+    __slots__ = (
+        'blocked_until',
+        'limit',
+        'next_slot',
+        'remaining',
+        'requests',
+        'reset',
+    )
+
+    def __init__(self) -> None:
+        """Create an empty state: nothing is known yet."""
+
+        self.limit: Optional[int] = None
+        self.remaining: Optional[int] = None
+        self.reset: Optional[float] = None
+        self.blocked_until: float = 0.0
+        self.next_slot: float = 0.0
+        self.requests: int = 0
+
+    def as_dict(self) -> dict:
+        """Return the state as a dict.
+
+        Returns
+        -------
+        dict
+            A dict with all the attributes of the state
+
+        """
+
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class RateLimiter:
+    """Delay requests to stay in the rate-limit budget of each token.
+
+    Parameters
+    ----------
+    smooth_below: float
+        When the ratio of remaining requests on the limit goes below this value, requests are
+        spaced out to spread the remaining ones until the reset time.
+    max_wait: float, optional
+        If a request would have to wait longer than this number of seconds, a
+        ``RateLimitExceeded`` exception is raised instead. ``None`` to always wait.
+    clock: Callable[[], float]
+        The function returning the current timestamp. Default to ``time.time``, as reset
+        times given by the servers are timestamps.
+
+    Attributes
+    ----------
+    All parameters given to the constuctor are saved as attributes on the instance.
+    states: Dict[str, RateLimitState]
+        The state of each token, by key (see ``token_key``)
+
+    Examples
+    --------
+    >>> limiter = RateLimiter(smooth_below=0.5, clock=lambda: 1000.0)
+    >>> key = limiter.get_key({'Authorization': 'token foo'})
+    >>> limiter.update(key, 200, {'X-RateLimit-Limit': '100', 'X-RateLimit-Remaining': '10',
+    ...                           'X-RateLimit-Reset': '1020'})
+    >>> limiter.get_delay(key)  # 10 requests to spread over 20 seconds
+    0.0
+    >>> limiter.get_delay(key)
+    2.0
+    >>> limiter.budget()[key]['remaining']
+    8
+
+    """
+
+    __slots__ = (
+        'clock',
+        'max_wait',
+        'smooth_below',
+        'states',
+    )
+
+    def __init__(
+            self,
+            smooth_below: float = 0.2,
+            max_wait: Optional[float] = None,
+            clock: Callable[[], float] = time.time) -> None:
+        """Save the settings and create the storage of states."""
+
+        self.smooth_below: float = smooth_below
+        self.max_wait: Optional[float] = max_wait
+        self.clock: Callable[[], float] = clock
+        self.states: Dict[str, RateLimitState] = {}
+
+    @staticmethod
+    def get_key(headers: Optional[Mapping]) -> str:
+        """Return the key of the token used by a request.
+
+        Parameters
+        ----------
+        headers : Mapping, optional
+            The headers of the request
+
+        Returns
+        -------
+        str
+            The key of the token, computed by ``token_key``
+
+        """
+
+        return token_key(CIMultiDict(headers or {}).get(hdrs.AUTHORIZATION))
+
+    def get_state(self, key: str) -> RateLimitState:
+        """Return the state of the given token, creating it if needed.
+
+        Parameters
+        ----------
+        key : str
+            The key of the token
+
+        Returns
+        -------
+        RateLimitState
+            The state of the token
+
+        """
+
+        state = self.states.get(key)
+        if state is None:
+            state = self.states[key] = RateLimitState()
+        return state
+
+    def get_delay(self, key: str) -> float:
+        """Reserve a slot for a request with the given token and return the time to wait.
+
+        Parameters
+        ----------
+        key : str
+            The key of the token
+
+        Returns
+        -------
+        float
+            The number of seconds to wait before sending the request
+
+        Raises
+        ------
+        RateLimitExceeded
+            If the delay is greater than ``max_wait``
+
+        """
+
+        state = self.get_state(key)
+        now = self.clock()
+        start = max(now, state.blocked_until)
+
+        if state.reset is not None and state.reset <= now:
+            # the period is over, we don't know the new budget yet
+            state.remaining = None
+
+        if state.remaining is not None and state.reset is not None and state.reset > start:
+            if state.remaining <= 0:
+                # budget exhausted: wait for the reset
+                start = state.reset
+            elif state.limit and state.remaining < state.limit * self.smooth_below:
+                # budget running low: spread the remaining requests until the reset
+                start = max(start, state.next_slot)
+                state.next_slot = start + (state.reset - start) / state.remaining
+
+        delay = start - now
+        if self.max_wait is not None and delay > self.max_wait:
+            raise RateLimitExceeded(key, delay)
+
+        if state.remaining is not None:
+            state.remaining -= 1
+        state.requests += 1
+
+        return delay
+
+    async def acquire(self, key: str, deadline: Optional[Deadline] = None) -> None:
+        """[ASYNC] Wait until a request can be made with the given token.
+
+        Parameters
+        ----------
+        key : str
+            The key of the token
+        deadline : Deadline, optional
+            The deadline of the current job, if any. The wait must end before it
+
+        Raises
+        ------
+        DeadlineExceeded
+            If the deadline would expire during the wait, which is then not done
+
+        """
+
+        delay = self.get_delay(key)
+        if deadline is not None:
+            deadline.check(delay)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def update(self, key: str, status: int, headers: Mapping) -> None:
+        """Update the state of a token from the headers of a response.
+
+        Parameters
+        ----------
+        key : str
+            The key of the token
+        status : int
+            The HTTP status of the response
+        headers : Mapping
+            The headers of the response
+
+        """
+
+        state = self.get_state(key)
+        headers = CIMultiDict(headers)
+        now = self.clock()
+
+        try:
+            state.limit = int(headers['X-RateLimit-Limit'])
+        except (KeyError, ValueError):
+            pass
+        try:
+            state.remaining = int(headers['X-RateLimit-Remaining'])
+        except (KeyError, ValueError):
+            pass
+        try:
+            state.reset = float(headers['X-RateLimit-Reset'])
+        except (KeyError, ValueError):
+            pass
+
+        retry_after = parse_retry_after(headers.get(hdrs.RETRY_AFTER), now)
+        if retry_after is not None and status in (403, 429, 503):
+            state.blocked_until = max(state.blocked_until, retry_after)
+        elif status in (403, 429) and state.remaining == 0 and state.reset is not None:
+            state.blocked_until = max(state.blocked_until, state.reset)
+
+        if state.reset is not None and state.reset <= now:
+            # the period is over, we don't know the new budget yet
+            state.remaining = None
+
+    def budget(self) -> Dict[str, dict]:
+        """Return the current state of all the tokens.
+
+        Returns
+        -------
+        Dict[str, dict]
+            For each token key, a dict with its state (see ``RateLimitState``)
+
+        """
+
+        return {key: state.as_dict() for key, state in self.states.items()}
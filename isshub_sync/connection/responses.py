@@ -0,0 +1,131 @@
+"""Responses whose body is already in memory, and can be read any number of times."""
+
+import json
+import re
+from typing import Any, Optional
+
+from aiohttp import ClientResponse, hdrs
+
+
+CHARSET_RE = re.compile(r'charset=["\']?([\w-]+)', re.IGNORECASE)
+
+
+class BufferedResponse:
+    """A response whose body is already read, with the same interface as ``ClientResponse``.
+
+    All attributes not defined here are taken from the real response.
+
+    Parameters
+    ----------
+    response: ClientResponse
+        The real response
+    body: bytes
+        The body to return
+
+    Attributes
+    ----------
+    buffered: bool = True
+        Tells that the body is in memory, so there is no need to read it by chunks
+    All parameters given to the constuctor are saved as attributes on the instance.
+
+    """
+
+    __slots__ = (
+        'body',
+        'response',
+    )
+
+    buffered: bool = True
+
+    def __init__(self, response: ClientResponse, body: bytes) -> None:
+        """Save the response and the body."""
+
+        self.response: ClientResponse = response
+        self.body: bytes = body
+
+    def __getattr__(self, attr: str) -> Any:
+        """Return the attribute `attr` of the real response.
+
+        Parameters
+        ----------
+        attr : str
+            The name of the wanted attribute
+
+        Returns
+        -------
+        Any
+            The value of the attribute on the real response
+
+        """
+
+        return getattr(self.response, attr)
+
+    async def read(self) -> bytes:
+        """[ASYNC] Return the body.
+
+        Returns
+        -------
+        bytes
+            The body of the response
+
+        """
+
+        return self.body
+
+    async def text(self, encoding: Optional[str] = None) -> str:
+        """[ASYNC] Return the body, decoded.
+
+        Parameters
+        ----------
+        encoding : str, optional
+            The encoding to use. Default to the charset of the "Content-Type" header, or utf-8
+
+        Returns
+        -------
+        str
+            The decoded body of the response
+
+        """
+
+        if encoding is None:
+            match = CHARSET_RE.search(self.headers.get(hdrs.CONTENT_TYPE, ''))
+            encoding = match.group(1) if match else 'utf-8'
+
+        return self.body.decode(encoding)
+
+    async def json(  # pylint: disable=unused-argument
+            self,
+            *,
+            loads: Any = json.loads,
+            **kwargs: Any) -> Any:
+        """[ASYNC] Return the body, decoded as json.
+
+        Parameters
+        ----------
+        loads : Any
+            The function used to decode the json
+        kwargs : Any
+            Accepted for compatibility with ``ClientResponse.json``. Not used.
+
+        Returns
+        -------
+        Any
+            The decoded json
+
+        """
+
+        return loads(await self.text())
+
+    def __str__(self) -> str:
+        """Return the class name, the url and the status.
+
+        Returns
+        -------
+        str
+            The stringified version of the object
+
+        """
+
+        return '%s (%s %s)' % (self.__class__.__name__, self.status, self.response.url)
+
+    __repr__ = __str__
@@ -0,0 +1,318 @@
+"""Retry of failed requests, with exponential backoff and jitter.
+
+By default only idempotent requests (GET, HEAD, OPTIONS, PUT, DELETE) are retried, on
+connection errors, timeouts, and some status codes (429, 502, 503, 504). POST and PATCH
+can be retried by passing them in ``methods``.
+
+"""
+
+import asyncio
+import random
+import time
+from typing import (  # noqa: F401
+    Any,
+    Awaitable,
+    Callable,
+    FrozenSet,
+    Iterable,
+    Optional,
+    Set,
+    Tuple,
+    Type,
+)
+
+from aiohttp import ClientConnectionError, ClientResponse, hdrs
+
+from .python_types import Url
+from .ratelimit import parse_retry_after
+from .timeouts import current_deadline
+
+
+class RetryEvent:  # pylint: disable=too-few-public-methods
+    """Information about a retry, given to the ``on_retry`` hook of a ``RetryPolicy``.
+
+    Parameters
+    ----------
+    method: str
+        The lowercase HTTP method of the request
+    url: Url
+        The url of the request
+    attempt: int
+        The number of the attempt that failed, starting at 1
+    delay: float
+        The number of seconds that will be waited before the next attempt
+    elapsed: float
+        The number of seconds since the start of the first attempt
+    status: int, optional
+        The status of the failed attempt, if a response was received
+    exception: Exception, optional
+        The exception raised by the failed attempt, if any
+
+    Attributes
+    ----------
+    All parameters given to the constuctor are saved as attributes on the instance.
+
+    """
+
+    __slots__ = (
+        'attempt',
+        'delay',
+        'elapsed',
+        'exception',
+        'method',
+        'status',
+        'url',
+    )
+
+    def __init__(  # pylint: disable=too-many-arguments
+            self,
+            method: str,
+            url: Url,
+            attempt: int,
+            delay: float,
+            elapsed: float,
+            status: Optional[int] = None,
+            exception: Optional[Exception] = None) -> None:
+        """Save all arguments."""
+
+        self.method: str = method
+        self.url: Url = url
+        self.attempt: int = attempt
+        self.delay: float = delay
+        self.elapsed: float = elapsed
+        self.status: Optional[int] = status
+        self.exception: Optional[Exception] = exception
+
+    def __str__(self) -> str:
+        """Return the class name and the main information.
+
+        Returns
+        -------
+        str
+            The stringified version of the object
+
+        """
+
+        return '%s (%s %s, attempt %s failed with %s, retry in %.2fs)' % (
+            self.__class__.__name__,
+            self.method.upper(),
+            self.url,
+            self.attempt,
+            self.status if self.exception is None else self.exception.__class__.__name__,
+            self.delay,
+        )
+
+    __repr__ = __str__
+
+
+class RetryPolicy:  # pylint: disable=too-many-instance-attributes
+    """Define how, and which, failed requests are retried.
+
+    Parameters
+    ----------
+    max_attempts: int
+        The maximum number of attempts, including the first one
+    backoff_factor: float
+        The base delay in seconds. Before the attempt ``n + 1``, the delay is randomly chosen
+        between 0 and ``backoff_factor * 2 ** (n - 1)`` (if `jitter` is set, else the maximum)
+    max_backoff: float
+        The maximum delay between two attempts. A longer "Retry-After" is only waited for
+        within a deadline, of the policy or of the current ``Deadline`` block: without one,
+        the response is returned instead of retrying
+    jitter: bool
+        If ``True``, the delay is randomly chosen between 0 and the computed backoff ("full
+        jitter"), to avoid many clients retrying all at the same time
+    statuses: Iterable[int]
+        The HTTP statuses for which to retry. A "Retry-After" header, if any, is respected
+    exceptions: Tuple[Type[Exception], ...]
+        The exceptions raised by the client for which to retry
+    methods: Iterable[str]
+        The HTTP methods that can be retried
+    deadline: float, optional
+        The maximum number of seconds for all the attempts. No retry is done if it would
+        start after this deadline, or after the one of the current ``Deadline`` block
+    on_retry: Callable[[RetryEvent], Any], optional
+        A function called before waiting for each retry
+
+    Attributes
+    ----------
+    DEFAULT_STATUSES: FrozenSet[int] = frozenset({429, 502, 503, 504})
+        The statuses for which to retry by default
+    DEFAULT_EXCEPTIONS: Tuple[Type[Exception], ...]
+        ``ClientConnectionError`` and ``asyncio.TimeoutError``, the exceptions for which
+        to retry by default
+    DEFAULT_METHODS: FrozenSet[str] = frozenset({'get', 'head', 'options', 'put', 'delete'})
+        The idempotent methods, retried by default
+    All parameters given to the constuctor are saved as attributes on the instance.
+
+    Examples
+    --------
+    >>> policy = RetryPolicy(backoff_factor=1, max_backoff=5, jitter=False)
+    >>> [policy.get_backoff(attempt) for attempt in range(1, 6)]
+    [1, 2, 4, 5, 5]
+    >>> policy.can_retry('get'), policy.can_retry('POST')
+    (True, False)
+    >>> RetryPolicy(methods=RetryPolicy.DEFAULT_METHODS | {'post'}).can_retry('post')
+    True
+
+    """
+
+    __slots__ = (
+        'backoff_factor',
+        'deadline',
+        'exceptions',
+        'jitter',
+        'max_attempts',
+        'max_backoff',
+        'methods',
+        'on_retry',
+        'statuses',
+    )
+
+    DEFAULT_STATUSES: FrozenSet[int] = frozenset({429, 502, 503, 504})
+    DEFAULT_EXCEPTIONS: Tuple[Type[Exception], ...] = (
+        ClientConnectionError,
+        asyncio.TimeoutError,
+    )
+    DEFAULT_METHODS: FrozenSet[str] = frozenset({'get', 'head', 'options', 'put', 'delete'})
+
+    def __init__(  # pylint: disable=too-many-arguments
+            self,
+            max_attempts: int = 3,
+            backoff_factor: float = 0.5,
+            max_backoff: float = 30.0,
+            jitter: bool = True,
+            statuses: Iterable[int] = DEFAULT_STATUSES,
+            exceptions: Tuple[Type[Exception], ...] = DEFAULT_EXCEPTIONS,
+            methods: Iterable[str] = DEFAULT_METHODS,
+            deadline: Optional[float] = None,
+            on_retry: Optional[Callable[[RetryEvent], Any]] = None) -> None:
+        """Save the settings."""
+
+        assert max_attempts >= 1
+
+        self.max_attempts: int = max_attempts
+        self.backoff_factor: float = backoff_factor
+        self.max_backoff: float = max_backoff
+        self.jitter: bool = jitter
+        self.statuses: Set[int] = set(statuses)
+        self.exceptions: Tuple[Type[Exception], ...] = tuple(exceptions)
+        self.methods: Set[str] = {method.lower() for method in methods}
+        self.deadline: Optional[float] = deadline
+        self.on_retry: Optional[Callable[[RetryEvent], Any]] = on_retry
+
+    def can_retry(self, method: str) -> bool:
+        """Tell if requests with the given method can be retried.
+
+        Parameters
+        ----------
+        method : str
+            The HTTP method
+
+        Returns
+        -------
+        bool
+            ``True`` if the method is in ``methods``
+
+        """
+
+        return method.lower() in self.methods
+
+    def get_backoff(self, attempt: int) -> float:
+        """Return the delay to wait after the given failed attempt.
+
+        Parameters
+        ----------
+        attempt : int
+            The number of the attempt that failed, starting at 1
+
+        Returns
+        -------
+        float
+            The number of seconds to wait
+
+        """
+
+        backoff = min(self.max_backoff, self.backoff_factor * 2 ** (attempt - 1))
+        if self.jitter:
+            return random.uniform(0, backoff)
+        return backoff
+
+    async def run(
+            self,
+            send: Callable[[], Awaitable[ClientResponse]],
+            method: str,
+            url: Url) -> ClientResponse:
+        """[ASYNC] Call `send` until it succeeds or the policy stops retrying.
+
+        Parameters
+        ----------
+        send : Callable[[], Awaitable[ClientResponse]]
+            The function making one attempt of the request
+        method : str
+            The lowercase HTTP method of the request
+        url : Url
+            The url of the request
+
+        Returns
+        -------
+        ClientResponse
+            The response of the last attempt
+
+        Raises
+        ------
+        Exception
+            The exception raised by the last attempt, if any
+
+        """
+
+        loop = asyncio.get_event_loop()
+        start = loop.time()
+        attempt = 0
+
+        while True:
+            attempt += 1
+            response: Optional[ClientResponse] = None
+            exception: Optional[Exception] = None
+
+            try:
+                response = await send()
+            except self.exceptions as exc:  # pylint: disable=catching-non-exception
+                exception = exc
+
+            if response is not None and response.status not in self.statuses:
+                return response
+            if attempt >= self.max_attempts:
+                break
+
+            job_deadline = current_deadline()
+            delay = self.get_backoff(attempt)
+            if response is not None:
+                now = time.time()
+                retry_at = parse_retry_after(response.headers.get(hdrs.RETRY_AFTER), now)
+                if retry_at is not None:
+                    delay = max(delay, retry_at - now)
+                    if delay > self.max_backoff and self.deadline is None and job_deadline is None:
+                        break  # nothing bounds the wait, like an hour for a rate limit reset
+
+            elapsed = loop.time() - start
+            if self.deadline is not None and elapsed + delay > self.deadline:
+                break
+            if job_deadline is not None and delay >= job_deadline.remaining:
+                break
+
+            if response is not None:
+                response.release()
+
+            if self.on_retry is not None:
+                self.on_retry(RetryEvent(
+                    method, url, attempt, delay, elapsed,
+                    status=None if response is None else response.status,
+                    exception=exception,
+                ))
+
+            await asyncio.sleep(delay)
+
+        if exception is not None:
+            raise exception
+        return response  # type: ignore
@@ -0,0 +1,508 @@
+"""Timeouts of the requests, and deadlines shared by all the requests of a job.
+
+Without timeouts, requests rely on the default of the client (5 minutes for ``aiohttp``). A
+``TimeoutPolicy`` given to a ``Connection`` sets the ``Timeouts`` of its requests, for all of
+them and for the paths starting with some prefixes, and each call can override them::
+
+    connection = Connection('https://api.github.com', timeouts=TimeoutPolicy(
+        Timeouts(total=30, connect=5),
+        prefixes={'/search': Timeouts(total=60)},
+    ))
+    response = await connection.repos('foo', 'bar').get(timeouts=Timeouts(read=10))
+
+A ``Deadline`` gives a time budget to a whole job: every request made in its block, with
+its retries and the pages of a pagination, only uses what is left, and fails with
+``DeadlineExceeded`` once it's spent::
+
+    with Deadline(120):
+        async for issue in connection.repos('foo', 'bar').issues.paginate():
+            ...
+
+The current deadline is stored in a context variable, so it's seen by the tasks created in
+the block, like the jobs of ``Connection.gather``. On Python 3.6, whose ``asyncio`` has no
+context variables, it's only seen by the task that entered the block.
+
+"""
+
+import asyncio
+import sys
+import time
+from typing import Any, Callable, List, Mapping, Optional, Tuple  # noqa: F401
+from weakref import WeakKeyDictionary
+
+from aiohttp import ClientTimeout
+
+
+class Timeouts:
+    """The timeouts of a request, in seconds.
+
+    Parameters
+    ----------
+    total: float, optional
+        The maximum duration of the whole request, including waiting for a connection of the
+        pool and reading the body
+    connect: float, optional
+        The maximum duration to establish a new connection
+    read: float, optional
+        The maximum duration between two reads of data from the server
+
+    A value not set is taken from a less specific level: the timeouts of the path prefix,
+    of the connection, and finally of the client.
+
+    Attributes
+    ----------
+    All parameters given to the constuctor are saved as attributes on the instance.
+
+    Examples
+    --------
+    >>> Timeouts(total=30, connect=5).merge(Timeouts(total=60, read=10))
+    Timeouts (total=60, connect=5, read=10)
+
+    """
+
+    __slots__ = (
+        'connect',
+        'read',
+        'total',
+    )
+
+    def __init__(
+            self,
+            total: Optional[float] = None,
+            connect: Optional[float] = None,
+            read: Optional[float] = None) -> None:
+        """Save the timeouts."""
+
+        self.total: Optional[float] = total
+        self.connect: Optional[float] = connect
+        self.read: Optional[float] = read
+
+    def merge(self, other: Optional['Timeouts']) -> 'Timeouts':
+        """Return new timeouts, using the values of `other` when set.
+
+        Parameters
+        ----------
+        other : Timeouts, optional
+            The more specific timeouts
+
+        Returns
+        -------
+        Timeouts
+            The merged timeouts
+
+        """
+
+        if other is None:
+            return self
+
+        return Timeouts(
+            total=self.total if other.total is None else other.total,
+            connect=self.connect if other.connect is None else other.connect,
+            read=self.read if other.read is None else other.read,
+        )
+
+    def to_client_timeout(
+            self,
+            base: Optional[ClientTimeout] = None,
+            remaining: Optional[float] = None) -> ClientTimeout:
+        """Return the ``aiohttp`` timeout for a request.
+
+        Parameters
+        ----------
+        base : ClientTimeout, optional
+            The timeout of the client, used for the values not set. Ignored if it's not a
+            ``ClientTimeout``
+        remaining : float, optional
+            The number of seconds left before the current deadline, if any. The total
+            timeout is never longer
+
+        Returns
+        -------
+        ClientTimeout
+            The timeout to pass to the client
+
+        Examples
+        --------
+        >>> timeout = Timeouts(total=30, read=10).to_client_timeout(remaining=12.5)
+        >>> timeout.total, timeout.sock_read, timeout.sock_connect
+        (12.5, 10, None)
+
+        """
+
+        if not isinstance(base, ClientTimeout):
+            base = ClientTimeout()
+
+        total = base.total if self.total is None else self.total
+        if remaining is not None:
+            total = remaining if total is None else min(total, remaining)
+
+        return ClientTimeout(
+            total=total,
+            connect=base.connect,
+            sock_read=base.sock_read if self.read is None else self.read,
+            sock_connect=base.sock_connect if self.connect is None else self.connect,
+        )
+
+    def __str__(self) -> str:
+        """Return the class name and the timeouts.
+
+        Returns
+        -------
+        str
+            The stringified version of the object
+
+        """
+
+        return '%s (total=%s, connect=%s, read=%s)' % (
+            self.__class__.__name__,
+            self.total,
+            self.connect,
+            self.read,
+        )
+
+    __repr__ = __str__
+
+
+class TimeoutPolicy:  # pylint: disable=too-few-public-methods
+    """The timeouts of the requests of a connection, that may depend on their path.
+
+    Parameters
+    ----------
+    default: Timeouts, optional
+        The timeouts of all requests
+    prefixes: Mapping[str, Timeouts], optional
+        The timeouts of the requests whose path starts with the given prefixes, like
+        "/search" or "/repos/foo/bar". When many prefixes match, the longest one wins for
+        the values it sets
+
+    Attributes
+    ----------
+    default: Timeouts
+        The timeouts of all requests
+    prefixes: List[Tuple[str, Timeouts]]
+        The prefixes, without a final "/", and their timeouts, from the shortest to the
+        longest prefix
+
+    Examples
+    --------
+    >>> policy = TimeoutPolicy(Timeouts(total=30), {
+    ...     '/repos/': Timeouts(read=5),
+    ...     '/repos/foo/bar': Timeouts(total=60),
+    ... })
+    >>> policy.get('/repos/foo/bar/issues/?page=2')
+    Timeouts (total=60, connect=None, read=5)
+    >>> policy.get('/repos/foo/barbaz/')
+    Timeouts (total=30, connect=None, read=5)
+
+    """
+
+    __slots__ = (
+        'default',
+        'prefixes',
+    )
+
+    def __init__(
+            self,
+            default: Optional[Timeouts] = None,
+            prefixes: Optional[Mapping[str, Timeouts]] = None) -> None:
+        """Save the timeouts, sorting the prefixes."""
+
+        self.default: Timeouts = default or Timeouts()
+        self.prefixes: List[Tuple[str, Timeouts]] = sorted(
+            (
+                ('/' + prefix.strip('/'), timeouts)
+                for prefix, timeouts in (prefixes or {}).items()
+            ),
+            key=lambda item: len(item[0])
+        )
+
+    def get(self, path: str) -> Timeouts:
+        """Return the timeouts of a request.
+
+        Parameters
+        ----------
+        path : str
+            The path of the request, without the root of the connection
+
+        Returns
+        -------
+        Timeouts
+            The default timeouts, merged with the ones of all matching prefixes
+
+        """
+
+        path = path.split('?', 1)[0].rstrip('/')
+        timeouts = self.default
+        for prefix, prefix_timeouts in self.prefixes:
+            if path == prefix or path.startswith(prefix + '/'):
+                timeouts = timeouts.merge(prefix_timeouts)
+        return timeouts
+
+
+class _TaskLocal:
+    """A minimal ``ContextVar``, whose value is local to the current task.
+
+    Used on Python 3.6, whose ``asyncio`` does not propagate context variables to tasks.
+
+    Attributes
+    ----------
+    values: WeakKeyDictionary
+        The value by task
+    value: Any
+        The value outside of any task
+
+    """
+
+    __slots__ = (
+        'value',
+        'values',
+    )
+
+    def __init__(self) -> None:
+        """Create the storage of the values."""
+
+        self.values: WeakKeyDictionary = WeakKeyDictionary()
+        self.value: Any = None
+
+    @staticmethod
+    def _get_task() -> Optional[asyncio.Task]:
+        """Return the current task, if any.
+
+        Returns
+        -------
+        asyncio.Task, optional
+            The task running the code, ``None`` if not run in a task
+
+        """
+
+        current_task = getattr(asyncio, 'current_task', None) or asyncio.Task.current_task
+        try:
+            return current_task()
+        except RuntimeError:  # no running event loop
+            return None
+
+    def get(self, default: Any = None) -> Any:
+        """Return the value for the current task.
+
+        Parameters
+        ----------
+        default : Any
+            Returned if no value is set
+
+        Returns
+        -------
+        Any
+            The value
+
+        """
+
+        task = self._get_task()
+        value = self.value if task is None else self.values.get(task)
+        return default if value is None else value
+
+    def set(self, value: Any) -> Any:
+        """Set the value for the current task.
+
+        Parameters
+        ----------
+        value : Any
+            The new value
+
+        Returns
+        -------
+        Any
+            The old value, to pass to ``reset``
+
+        """
+
+        old_value = self.get()
+        self.reset(value)
+        return old_value
+
+    def reset(self, token: Any) -> None:
+        """Restore a value returned by ``set``.
+
+        Parameters
+        ----------
+        token : Any
+            The value to restore
+
+        """
+
+        task = self._get_task()
+        if task is None:
+            self.value = token
+        elif token is None:
+            self.values.pop(task, None)
+        else:
+            self.values[task] = token
+
+
+if sys.version_info >= (3, 7):
+    from contextvars import ContextVar  # pylint: disable=wrong-import-order,wrong-import-position
+    _CURRENT_DEADLINE: Any = ContextVar('isshub_sync_deadline', default=None)
+else:
+    _CURRENT_DEADLINE = _TaskLocal()
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a request is made, or times out, after the deadline of its job.
+
+    Parameters
+    ----------
+    budget: float
+        The number of seconds given to the job
+
+    """
+
+    def __init__(self, budget: float) -> None:
+        """Save the budget."""
+
+        super().__init__('Deadline of %.1f seconds exceeded' % budget)
+        self.budget: float = budget
+
+
+class Deadline:
+    """A time budget for all the requests made in a ``with`` block.
+
+    Deadlines can be nested: a nested deadline never ends after the outer one.
+
+    Parameters
+    ----------
+    budget: float
+        The number of seconds given to the block, from when it's entered
+    clock: Callable[[], float]
+        The function returning the current time, in seconds. Default to ``time.monotonic``
+
+    Attributes
+    ----------
+    All parameters given to the constuctor are saved as attributes on the instance.
+    expires_at: float, optional
+        When the deadline expires, known when the block is entered
+
+    Examples
+    --------
+    >>> now = 100.0
+    >>> with Deadline(30, clock=lambda: now) as deadline:
+    ...     with Deadline(60, clock=lambda: now) as nested:
+    ...         now += 10
+    ...         nested.remaining, current_deadline() is nested
+    (20.0, True)
+    >>> current_deadline() is None
+    True
+
+    """
+
+    __slots__ = (
+        '_token',
+        'budget',
+        'clock',
+        'expires_at',
+    )
+
+    def __init__(self, budget: float, clock: Callable[[], float] = time.monotonic) -> None:
+        """Save the budget."""
+
+        self.budget: float = budget
+        self.clock: Callable[[], float] = clock
+        self.expires_at: Optional[float] = None
+        self._token: Any = None
+
+    @property
+    def remaining(self) -> float:
+        """Return the number of seconds left before the deadline.
+
+        Returns
+        -------
+        float
+            The seconds left, 0 if the deadline expired. The whole budget if the block was
+            not entered yet
+
+        """
+
+        if self.expires_at is None:
+            return self.budget
+        return max(0.0, self.expires_at - self.clock())
+
+    @property
+    def expired(self) -> bool:
+        """Tell if the deadline expired.
+
+        Returns
+        -------
+        bool
+            ``True`` if there is no time left
+
+        """
+
+        return self.remaining <= 0
+
+    def check(self, wait: float = 0.0) -> None:
+        """Ensure the deadline has not expired, and will not while waiting.
+
+        Parameters
+        ----------
+        wait : float
+            The number of seconds about to be spent waiting, before sending a request
+
+        Raises
+        ------
+        DeadlineExceeded
+            If there is no time left, or not more than `wait` seconds
+
+        Examples
+        --------
+        >>> with Deadline(30, clock=lambda: 100.0) as deadline:
+        ...     deadline.check(10)
+        ...     deadline.check(30)
+        Traceback (most recent call last):
+        ...
+        isshub_sync.connection.timeouts.DeadlineExceeded: Deadline of 30.0 seconds exceeded
+
+        """
+
+        if self.remaining <= wait:
+            raise DeadlineExceeded(self.budget)
+
+    def __enter__(self) -> 'Deadline':
+        """Start the deadline and make it the current one.
+
+        Returns
+        -------
+        Deadline
+            The deadline itself
+
+        """
+
+        self.expires_at = self.clock() + self.budget
+        outer = current_deadline()
+        if outer is not None and outer.expires_at is not None:
+            self.expires_at = min(self.expires_at, outer.expires_at)
+        self._token = _CURRENT_DEADLINE.set(self)
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        """Restore the previous deadline.
+
+        Parameters
+        ----------
+        exc_info : Any
+            The exception information, if any. Not used.
+
+        """
+
+        _CURRENT_DEADLINE.reset(self._token)
+        self._token = None
+
+
+def current_deadline() -> Optional[Deadline]:
+    """Return the deadline of the current block, if any.
+
+    Returns
+    -------
+    Deadline, optional
+        The deadline of the innermost ``with Deadline(...)`` block
+
+    """
+
+    return _CURRENT_DEADLINE.get()
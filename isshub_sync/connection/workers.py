@@ -0,0 +1,833 @@
+"""Run sync jobs in many processes, sharing one rate-limit budget and one cache.
+
+Decoding JSON and creating ``DictObject`` instances use the CPU: with a single event loop,
+one core is saturated long before the network is the bottleneck. A ``WorkerPool`` spreads
+the jobs across processes, each one with its own event loop and its own ``Connection``
+with a pooled client.
+
+The ``RateLimiter`` and the ``MemoryCache`` live in a coordinator process (a
+``multiprocessing`` manager). The workers use them through ``SharedRateLimiter`` and
+``SharedCache``, so all the requests, whatever the process sending them, are counted in the
+same budget, and a response cached by a worker can be revalidated by another one.
+
+"""
+
+import asyncio
+import multiprocessing
+from functools import partial
+from multiprocessing.managers import BaseManager
+from multiprocessing.util import Finalize
+from typing import (  # noqa: F401
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Set,
+    Type,
+)
+
+from .cache import CacheEntry, MemoryCache, ResponseCache
+from .connection import Connection, Executable
+from .decoding import read_checked_json
+from .pool import ClientPool
+from .python_types import Url
+from .ratelimit import RateLimiter
+from .timeouts import Deadline
+
+
+class JobFailed(Exception):
+    """Raised, or returned, for a job that raised an exception in a worker.
+
+    The original exception is not sent back, as it may not be picklable (``aiohttp``
+    exceptions hold the request, for example).
+
+    Parameters
+    ----------
+    error_class: str
+        The name of the class of the original exception
+    message: str
+        The message of the original exception
+
+    """
+
+    def __init__(self, error_class: str, message: str) -> None:
+        """Save the class name and the message of the original exception."""
+
+        super().__init__(error_class, message)
+        self.error_class: str = error_class
+        self.message: str = message
+
+    def __str__(self) -> str:
+        """Return the class name and the message of the original exception.
+
+        Returns
+        -------
+        str
+            The stringified version of the exception
+
+        """
+
+        return '%s: %s' % (self.error_class, self.message)
+
+
+class RequestJob:  # pylint: disable=too-few-public-methods
+    """A picklable request, to be sent by a worker, returning the decoded body.
+
+    Parameters
+    ----------
+    method: str
+        The HTTP method of the request
+    path: str
+        The path of the request, relative to the root of the connection of the worker
+    kwargs: Any
+        Other arguments for ``Connection.request``
+
+    Attributes
+    ----------
+    All parameters given to the constuctor are saved as attributes on the instance.
+
+    Examples
+    --------
+    >>> from isshub_sync.connection.connection import Connection
+    >>> connection = Connection('https://api.github.com/')
+    >>> RequestJob.from_executable(connection.repos('foo', 'bar').get)
+    RequestJob (GET /repos/foo/bar)
+
+    """
+
+    __slots__ = (
+        'kwargs',
+        'method',
+        'path',
+    )
+
+    def __init__(self, method: str, path: str, **kwargs: Any) -> None:
+        """Save the request to make."""
+
+        self.method: str = method
+        self.path: str = path
+        self.kwargs: dict = kwargs
+
+    @classmethod
+    def from_executable(cls, executable: Executable, **kwargs: Any) -> 'RequestJob':
+        """Create a job from an ``Executable``, that is not picklable.
+
+        Parameters
+        ----------
+        executable : Executable
+            The request to make
+        kwargs : Any
+            Other arguments for ``Connection.request``
+
+        Returns
+        -------
+        RequestJob
+            The picklable job
+
+        """
+
+        if executable.path and executable.path_template is not None:
+            kwargs.setdefault('path_template', executable.path_template)
+        return cls(executable.method, executable.path or '/', **kwargs)
+
+    async def __call__(self, connection: Connection) -> Any:
+        """[ASYNC] Make the request and return its decoded body.
+
+        Parameters
+        ----------
+        connection : Connection
+            The connection of the worker
+
+        Returns
+        -------
+        Any
+            The body, as returned by ``read_checked_json``
+
+        Raises
+        ------
+        ClientResponseError
+            If the status of the response is 400 or more
+
+        """
+
+        response = await connection.request(self.method, self.path, **self.kwargs)
+        return await read_checked_json(response)
+
+    def __str__(self) -> str:
+        """Return the class name, the method and the path.
+
+        Returns
+        -------
+        str
+            The stringified version of the object
+
+        """
+
+        return '%s (%s %s)' % (self.__class__.__name__, self.method.upper(), self.path)
+
+    __repr__ = __str__
+
+
+def make_job(job: Any) -> Callable:
+    """Return a job that can be sent to a worker.
+
+    Parameters
+    ----------
+    job : Any
+        An ``Executable``, a ``functools.partial`` of an ``Executable`` to pass arguments,
+        a ``RequestJob``, or a picklable coroutine function taking the connection of the
+        worker as argument (a function defined at the module level, or a ``partial`` of it)
+
+    Returns
+    -------
+    Callable
+        A picklable coroutine function taking the connection of the worker
+
+    """
+
+    if isinstance(job, Executable):
+        return RequestJob.from_executable(job)
+    if isinstance(job, partial) and isinstance(job.func, Executable) and not job.args:
+        return RequestJob.from_executable(job.func, **job.keywords)
+    return job
+
+
+class SharedRateLimiter(RateLimiter):
+    """A ``RateLimiter`` whose budget is held by the coordinator of a ``WorkerPool``.
+
+    Parameters
+    ----------
+    proxy: BaseProxy
+        The proxy to the ``RateLimiter`` of the coordinator process
+
+    Attributes
+    ----------
+    All parameters given to the constuctor are saved as attributes on the instance.
+
+    Notes
+    -----
+    Calls to the coordinator are blocking round trips, so the ones made for each request are
+    run in the default executor of the event loop, to not stall the other requests of the
+    worker. The headers of a response are sent without waiting for the coordinator, ``flush``
+    waiting for all of them to be received.
+
+    """
+
+    __slots__ = (
+        'pending',
+        'proxy',
+    )
+
+    def __init__(self, proxy: Any) -> None:
+        """Save the proxy to the shared rate limiter."""
+
+        super().__init__()
+        self.proxy: Any = proxy
+        self.pending: Set[asyncio.Future] = set()
+
+    def get_delay(self, key: str) -> float:
+        """Reserve a slot in the shared budget for a request with the given token.
+
+        Parameters
+        ----------
+        key : str
+            The key of the token
+
+        Returns
+        -------
+        float
+            The number of seconds to wait before sending the request
+
+        """
+
+        return self.proxy.get_delay(key)
+
+    async def acquire(self, key: str, deadline: Optional[Deadline] = None) -> None:
+        """[ASYNC] Wait until a request can be made with the given token.
+
+        Parameters
+        ----------
+        key : str
+            The key of the token
+        deadline : Deadline, optional
+            The deadline of the current job, if any. The wait must end before it
+
+        Raises
+        ------
+        DeadlineExceeded
+            If the deadline would expire during the wait, which is then not done
+
+        """
+
+        delay = await asyncio.get_event_loop().run_in_executor(None, self.get_delay, key)
+        if deadline is not None:
+            deadline.check(delay)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def update(self, key: str, status: int, headers: Mapping) -> None:
+        """Send the headers of a response to the shared rate limiter, without waiting.
+
+        Parameters
+        ----------
+        key : str
+            The key of the token
+        status : int
+            The HTTP status of the response
+        headers : Mapping
+            The headers of the response
+
+        """
+
+        future = asyncio.get_event_loop().run_in_executor(
+            None, self.proxy.update, key, status, list(headers.items())
+        )
+        self.pending.add(future)
+        future.add_done_callback(self.pending.discard)
+
+    async def flush(self) -> None:
+        """[ASYNC] Wait for the coordinator to receive all the headers sent by ``update``."""
+
+        if self.pending:
+            await asyncio.wait(self.pending)
+
+    def budget(self) -> Dict[str, dict]:
+        """Return the current state of all the tokens, from the coordinator.
+
+        Returns
+        -------
+        Dict[str, dict]
+            For each token key, a dict with its state (see ``RateLimitState``)
+
+        """
+
+        return self.proxy.budget()
+
+
+class SharedCache(ResponseCache):
+    """A ``ResponseCache`` whose entries are held by the coordinator of a ``WorkerPool``.
+
+    Parameters
+    ----------
+    proxy: BaseProxy
+        The proxy to the ``MemoryCache`` of the coordinator process
+    args, kwargs: Any
+        The limits, passed to ``ResponseCache``. ``max_entry_size`` avoids sending too big
+        bodies to the coordinator, the other ones are applied by the coordinator
+
+    Attributes
+    ----------
+    All parameters given to the constuctor are saved as attributes on the instance.
+
+    Notes
+    -----
+    Calls to the coordinator are blocking round trips, so when made for a request they are
+    run in the default executor of the event loop, to not stall the other requests of the
+    worker.
+
+    """
+
+    __slots__ = (
+        'proxy',
+    )
+
+    def __init__(self, proxy: Any, *args: Any, **kwargs: Any) -> None:
+        """Save the proxy to the shared cache."""
+
+        super().__init__(*args, **kwargs)
+        self.proxy: Any = proxy
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        """Return the entry for the given key from the coordinator, if any.
+
+        Parameters
+        ----------
+        key : str
+            The key of the entry, computed by ``make_key``
+
+        Returns
+        -------
+        CacheEntry, optional
+            The entry, or ``None`` if not in the cache
+
+        """
+
+        return self.proxy.get(key)
+
+    def set(self, key: str, entry: CacheEntry) -> None:
+        """Send the given entry to the coordinator.
+
+        Parameters
+        ----------
+        key : str
+            The key of the entry, computed by ``make_key``
+        entry : CacheEntry
+            The entry to save
+
+        """
+
+        self.proxy.set(key, entry)
+
+    def delete(self, key: str) -> None:
+        """Remove the entry for the given key from the coordinator, if any.
+
+        Parameters
+        ----------
+        key : str
+            The key of the entry, computed by ``make_key``
+
+        """
+
+        self.proxy.delete(key)
+
+    async def _run(self, method: Callable, *args: Any) -> Any:
+        """[ASYNC] Call a method accessing the coordinator in the default executor.
+
+        Parameters
+        ----------
+        method : Callable
+            The method to call
+        args : Any
+            The arguments to pass to the method
+
+        Returns
+        -------
+        Any
+            The result of the method
+
+        """
+
+        return await asyncio.get_event_loop().run_in_executor(None, partial(method, *args))
+
+
+class Coordinator(BaseManager):
+    """The process holding the rate limiter and the cache shared by the workers."""
+
+    def rate_limiter(self, **kwargs: Any) -> Any:
+        """Create a ``RateLimiter`` in the coordinator process.
+
+        Parameters
+        ----------
+        kwargs : Any
+            The arguments of the ``RateLimiter``
+
+        Returns
+        -------
+        BaseProxy
+            The proxy to the ``RateLimiter``
+
+        """
+
+        # registered dynamically, by ``Coordinator.register``
+        return getattr(self, 'RateLimiter')(**kwargs)
+
+    def memory_cache(self, **kwargs: Any) -> Any:
+        """Create a ``MemoryCache`` in the coordinator process.
+
+        Parameters
+        ----------
+        kwargs : Any
+            The arguments of the ``MemoryCache``
+
+        Returns
+        -------
+        BaseProxy
+            The proxy to the ``MemoryCache``
+
+        """
+
+        # registered dynamically, by ``Coordinator.register``
+        return getattr(self, 'MemoryCache')(**kwargs)
+
+
+Coordinator.register('RateLimiter', RateLimiter, exposed=('budget', 'get_delay', 'update'))
+Coordinator.register('MemoryCache', MemoryCache, exposed=('delete', 'get', 'set'))
+
+
+# The state of the current worker process, set by ``_init_worker``
+_WORKER: dict = {}
+
+
+def _init_worker(  # pylint: disable=too-many-arguments
+        root: Url,
+        connection_class: Type[Connection],
+        connection_kwargs: dict,
+        pool_kwargs: dict,
+        rate_limiter: Any,
+        cache: Any,
+        cache_kwargs: dict) -> None:
+    """Create the event loop and the connection of a worker process.
+
+    Parameters
+    ----------
+    root : Url
+        The root of the connection
+    connection_class : Type[Connection]
+        The class of the connection
+    connection_kwargs : dict
+        Other arguments for the connection
+    pool_kwargs : dict
+        The arguments of the ``ClientPool`` of the worker
+    rate_limiter : BaseProxy, optional
+        The proxy to the shared rate limiter, if any
+    cache : BaseProxy, optional
+        The proxy to the shared cache, if any
+    cache_kwargs : dict
+        The limits of the shared cache
+
+    """
+
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    pool = ClientPool(**pool_kwargs)
+
+    kwargs = dict(connection_kwargs, pool=pool)
+    if rate_limiter is not None:
+        kwargs['rate_limiter'] = SharedRateLimiter(rate_limiter)
+    if cache is not None:
+        kwargs['cache'] = SharedCache(cache, **cache_kwargs)
+
+    _WORKER.update(
+        loop=loop,
+        pool=pool,
+        rate_limiter=kwargs.get('rate_limiter'),
+        connection=connection_class(root, **kwargs),
+    )
+
+    # run when the worker exits after ``WorkerPool.close``
+    Finalize(None, _close_worker, exitpriority=10)
+
+
+def _close_worker() -> None:
+    """Close the client and the event loop of a worker process."""
+
+    loop = _WORKER.pop('loop', None)
+    if loop is None:
+        return
+    loop.run_until_complete(_WORKER.pop('pool').close())
+    loop.close()
+    _WORKER.clear()
+
+
+def _run_chunk(jobs: List[Callable], concurrency: int) -> List[Any]:
+    """Run jobs concurrently in a worker process.
+
+    Parameters
+    ----------
+    jobs : List[Callable]
+        The jobs to run, each one a coroutine function taking the connection
+    concurrency : int
+        The maximum number of jobs running at the same time
+
+    Returns
+    -------
+    List[Any]
+        The result of each job, or a ``JobFailed`` instance for the failing ones
+
+    """
+
+    connection = _WORKER['connection']
+    loop = _WORKER['loop']
+    results = loop.run_until_complete(connection.gather(
+        [partial(job, connection) for job in jobs],
+        concurrency=concurrency,
+        return_exceptions=True,
+    ))
+
+    if _WORKER['rate_limiter'] is not None:
+        # the budget is up to date when the results are returned
+        loop.run_until_complete(_WORKER['rate_limiter'].flush())
+
+    return [
+        JobFailed(result.__class__.__name__, str(result))
+        if isinstance(result, Exception) else result
+        for result in results
+    ]
+
+
+class WorkerPool:  # pylint: disable=too-many-instance-attributes
+    """Run jobs in many processes, each one with its own event loop and connection.
+
+    The jobs are sent to the workers by chunks, the jobs of a chunk being run concurrently
+    by the worker. All workers share the same rate-limit budget and cache, held by a
+    coordinator process.
+
+    Parameters
+    ----------
+    root: Url
+        The root of the connection of each worker
+    processes: int, optional
+        The number of worker processes. Default to the number of cores
+    chunk_size: int
+        The number of jobs sent at once to a worker
+    concurrency: int
+        The maximum number of jobs of a chunk running at the same time in a worker
+    rate_limit: bool
+        If ``True``, the requests of all the workers are limited by a shared ``RateLimiter``
+    rate_limiter_kwargs: dict, optional
+        The arguments of the shared ``RateLimiter``
+    cache: bool
+        If ``True``, the responses are cached in a shared ``MemoryCache``
+    cache_kwargs: dict, optional
+        The arguments of the shared ``MemoryCache``
+    pool_kwargs: dict, optional
+        The arguments of the ``ClientPool`` of each worker
+    connection_class: Type[Connection]
+        The class of the connection of each worker
+    context: str, optional
+        The ``multiprocessing`` start method ("fork", "spawn"...). Default to the one of the
+        platform
+    connection_kwargs: Any
+        Other picklable arguments for the connection of each worker
+
+    Attributes
+    ----------
+    All parameters given to the constuctor are saved as attributes on the instance.
+    coordinator: Coordinator
+        The manager process holding the shared rate limiter and cache
+    shared_rate_limiter: BaseProxy, optional
+        The proxy to the shared ``RateLimiter``, if any
+    shared_cache: BaseProxy, optional
+        The proxy to the shared ``MemoryCache``, if any
+    pool: multiprocessing.pool.Pool
+        The pool of worker processes
+
+    Examples
+    --------
+    ::
+
+        with WorkerPool('https://api.github.com', processes=4) as workers:
+            github = Connection('https://api.github.com')
+            jobs = [
+                partial(github.repos('foo', 'bar').issues(number).get, headers=headers)
+                for number in range(1, 1001)
+            ]
+            for issue in workers.map(jobs):
+                print(issue.title)
+
+    Notes
+    -----
+    Jobs are sent to other processes, so they must be picklable. ``Executable`` objects are
+    converted to ``RequestJob`` ones, their path being used with `root`, and return the
+    decoded body of the response. Other jobs must be coroutine functions, defined at the
+    module level, taking the connection of the worker as argument.
+
+    """
+
+    __slots__ = (
+        'cache',
+        'cache_kwargs',
+        'chunk_size',
+        'concurrency',
+        'connection_class',
+        'connection_kwargs',
+        'context',
+        'coordinator',
+        'pool',
+        'pool_kwargs',
+        'processes',
+        'rate_limit',
+        'rate_limiter_kwargs',
+        'root',
+        'shared_cache',
+        'shared_rate_limiter',
+    )
+
+    def __init__(  # pylint: disable=too-many-arguments
+            self,
+            root: Url,
+            processes: Optional[int] = None,
+            chunk_size: int = 20,
+            concurrency: int = 10,
+            rate_limit: bool = True,
+            rate_limiter_kwargs: Optional[dict] = None,
+            cache: bool = True,
+            cache_kwargs: Optional[dict] = None,
+            pool_kwargs: Optional[dict] = None,
+            connection_class: Type[Connection] = Connection,
+            context: Optional[str] = None,
+            **connection_kwargs: Any) -> None:
+        """Start the coordinator and the worker processes."""
+
+        self.root: Url = root
+        self.processes: int = processes or multiprocessing.cpu_count()
+        self.chunk_size: int = chunk_size
+        self.concurrency: int = concurrency
+        self.rate_limit: bool = rate_limit
+        self.rate_limiter_kwargs: dict = rate_limiter_kwargs or {}
+        self.cache: bool = cache
+        self.cache_kwargs: dict = cache_kwargs or {}
+        self.pool_kwargs: dict = pool_kwargs or {}
+        self.connection_class: Type[Connection] = connection_class
+        self.context: Optional[str] = context
+        self.connection_kwargs: dict = connection_kwargs
+
+        mp_context = multiprocessing.get_context(context)
+
+        self.coordinator: Coordinator = Coordinator(ctx=mp_context)
+        self.coordinator.start()  # pylint: disable=consider-using-with
+        self.shared_rate_limiter: Any = None
+        if rate_limit:
+            self.shared_rate_limiter = self.coordinator.rate_limiter(**self.rate_limiter_kwargs)
+        self.shared_cache: Any = None
+        worker_cache_kwargs: dict = {}
+        if cache:
+            self.shared_cache = self.coordinator.memory_cache(**self.cache_kwargs)
+            if 'max_entry_size' in self.cache_kwargs:
+                worker_cache_kwargs['max_entry_size'] = self.cache_kwargs['max_entry_size']
+
+        self.pool: Any = mp_context.Pool(  # pylint: disable=consider-using-with
+            self.processes,
+            initializer=_init_worker,
+            initargs=(
+                root, connection_class, connection_kwargs, self.pool_kwargs,
+                self.shared_rate_limiter, self.shared_cache, worker_cache_kwargs,
+            ),
+        )
+
+    def _chunks(self, jobs: Iterable[Any]) -> Iterator[List[Callable]]:
+        """Split the jobs in chunks of ``chunk_size`` picklable jobs.
+
+        Parameters
+        ----------
+        jobs : Iterable[Any]
+            The jobs to run
+
+        Yields
+        ------
+        List[Callable]
+            Each chunk
+
+        """
+
+        chunk: List[Callable] = []
+        for job in jobs:
+            chunk.append(make_job(job))
+            if len(chunk) == self.chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def map(self, jobs: Iterable[Any], return_exceptions: bool = False) -> Iterator[Any]:
+        """Run the jobs in the workers and iterate on their results, in the order of the jobs.
+
+        Parameters
+        ----------
+        jobs : Iterable[Any]
+            The jobs to run. See ``make_job``
+        return_exceptions : bool
+            If ``True``, a ``JobFailed`` instance is returned for each failing job, instead of
+            being raised
+
+        Yields
+        ------
+        Any
+            The result of each job
+
+        Raises
+        ------
+        JobFailed
+            For the first failing job, if `return_exceptions` is not set
+
+        """
+
+        for results in self.pool.imap(
+                partial(_run_chunk, concurrency=self.concurrency), self._chunks(jobs)):
+            for result in results:
+                if isinstance(result, JobFailed) and not return_exceptions:
+                    raise result
+                yield result
+
+    async def gather(self, jobs: Iterable[Any], return_exceptions: bool = False) -> List[Any]:
+        """[ASYNC] Run the jobs in the workers and return their results, without blocking.
+
+        The results are waited for in a thread, so the event loop of the caller is free.
+
+        Parameters
+        ----------
+        jobs : Iterable[Any]
+            The jobs to run. See ``make_job``
+        return_exceptions : bool
+            If ``True``, a ``JobFailed`` instance is returned for each failing job, instead of
+            being raised
+
+        Returns
+        -------
+        List[Any]
+            The result of each job
+
+        Raises
+        ------
+        JobFailed
+            For the first failing job, if `return_exceptions` is not set
+
+        """
+
+        jobs = list(jobs)  # built in the caller thread
+        return await asyncio.get_event_loop().run_in_executor(
+            None, lambda: list(self.map(jobs, return_exceptions))
+        )
+
+    def budget(self) -> Dict[str, dict]:
+        """Return the current state of all the tokens, as known by the coordinator.
+
+        Returns
+        -------
+        Dict[str, dict]
+            For each token key, a dict with its state (see ``RateLimitState``)
+
+        """
+
+        if self.shared_rate_limiter is None:
+            return {}
+        return self.shared_rate_limiter.budget()
+
+    def close(self) -> None:
+        """Wait for the workers to finish their jobs, then stop them and the coordinator."""
+
+        self.pool.close()
+        self.pool.join()
+        self.coordinator.shutdown()
+
+    def __enter__(self) -> 'WorkerPool':
+        """Enter the context manager.
+
+        Returns
+        -------
+        WorkerPool
+            The pool itself
+
+        """
+
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        """Exit the context manager by closing the pool.
+
+        Parameters
+        ----------
+        exc_info : Any
+            The exception information, if any. Not used.
+
+        """
+
+        self.close()
+
+    def __str__(self) -> str:
+        """Return the class name, the root and the number of processes.
+
+        Returns
+        -------
+        str
+            The stringified version of the object
+
+        """
+
+        return '%s (%s, %s processes)' % (self.__class__.__name__, self.root, self.processes)
+
+    __repr__ = __str__
@@ -0,0 +1,486 @@
+"""Encoding and decoding of json, using the fastest library available.
+
+``orjson``, ``rapidjson`` (``python-rapidjson``) and ``ujson`` (5 or later) are used, in
+this order of preference, if installed, else the ``json`` module of the standard library.
+``orjson`` can be installed with the ``fastjson`` extra: ``pip install isshub_sync[fastjson]``,
+and ``ujson`` with the ``ujson`` one.
+
+All codecs encode to ``bytes``, ready to be sent, and decode ``str`` or ``bytes``.
+
+"""
+
+import importlib
+import json
+from collections.abc import Mapping
+from typing import Any, Callable, Dict, Optional, Tuple, Type, Union  # noqa: F401
+
+
+JsonData = Union[str, bytes]  # pylint: disable=invalid-name
+
+
+def _default(obj: Any) -> Any:
+    """Return a serializable version of `obj`, for objects unknown to the json libraries.
+
+    Parameters
+    ----------
+    obj : Any
+        The object to serialize
+
+    Returns
+    -------
+    Any
+        A dict for a ``Mapping`` (like a ``Record``)
+
+    Raises
+    ------
+    TypeError
+        If `obj` cannot be serialized
+
+    """
+
+    if isinstance(obj, Mapping):
+        return dict(obj)
+    raise TypeError('Object of type %s is not JSON serializable' % obj.__class__.__name__)
+
+
+def convert_objects(value: Any, object_class: Callable[[dict], Any]) -> Any:
+    """Convert the dicts of a decoded json value into `object_class`, recursively.
+
+    Parameters
+    ----------
+    value : Any
+        The decoded json value
+    object_class : Callable[[dict], Any]
+        The class to use for the objects, created with a dict as argument. Its instances
+        must support item assignment
+
+    Returns
+    -------
+    Any
+        The converted value
+
+    Examples
+    --------
+    >>> from isshub_sync.utils import DictObject
+    >>> obj = convert_objects({'a': [{'b': 1}], 'c': {}}, DictObject)
+    >>> type(obj).__name__, type(obj.a[0]).__name__, type(obj.c).__name__
+    ('DictObject', 'DictObject', 'DictObject')
+
+    """
+
+    value_type = type(value)
+
+    if value_type is dict:
+        obj = object_class(value)
+        for key, sub_value in value.items():
+            sub_value_type = type(sub_value)
+            if sub_value_type is dict or sub_value_type is list:
+                obj[key] = convert_objects(sub_value, object_class)
+        return obj
+
+    if value_type is list:
+        return [
+            convert_objects(item, object_class) if type(item) in (dict, list) else item
+            for item in value
+        ]
+
+    return value
+
+
+class JsonCodec:
+    """Codec using the ``json`` module of the standard library, and base of the other ones.
+
+    Attributes
+    ----------
+    NAME: str = 'json'
+        The name of the codec
+    MODULE: str = 'json'
+        The name of the module to import
+    module: module
+        The imported module
+
+    Examples
+    --------
+    >>> codec = JsonCodec()
+    >>> codec.dumps({'a': [1, 2]})
+    b'{"a":[1,2]}'
+    >>> codec.loads(b'{"a": [1, 2]}')
+    {'a': [1, 2]}
+
+    """
+
+    __slots__ = (
+        'module',
+    )
+
+    NAME: str = 'json'
+    MODULE: str = 'json'
+
+    def __init__(self) -> None:
+        """Import the module of the codec.
+
+        Raises
+        ------
+        ImportError
+            If the module is not installed
+
+        """
+
+        self.module = importlib.import_module(self.MODULE)
+
+    @classmethod
+    def is_available(cls) -> bool:
+        """Tell if the module of the codec is installed.
+
+        Returns
+        -------
+        bool
+            ``True`` if the module can be imported
+
+        """
+
+        try:
+            importlib.import_module(cls.MODULE)
+        except ImportError:
+            return False
+        return True
+
+    def dumps(self, obj: Any) -> bytes:
+        """Encode `obj` in json.
+
+        Parameters
+        ----------
+        obj : Any
+            The object to encode
+
+        Returns
+        -------
+        bytes
+            The json, encoded in utf-8
+
+        """
+
+        return json.dumps(obj, separators=(',', ':'), default=_default).encode()
+
+    def loads(self, data: JsonData) -> Any:
+        """Decode json.
+
+        Parameters
+        ----------
+        data : Union[str, bytes]
+            The json to decode
+
+        Returns
+        -------
+        Any
+            The decoded value
+
+        """
+
+        return json.loads(data)
+
+    def loads_objects(self, data: JsonData, object_class: Callable[..., Any]) -> Any:
+        """Decode json, creating objects with `object_class`.
+
+        Parameters
+        ----------
+        data : Union[str, bytes]
+            The json to decode
+        object_class : Callable[..., Any]
+            The class to use for the objects, like ``DictObject``. It's called with an
+            iterable of pairs, or a dict, depending on the codec
+
+        Returns
+        -------
+        Any
+            The decoded value
+
+        """
+
+        return json.loads(data, object_pairs_hook=object_class)
+
+    def __str__(self) -> str:
+        """Return the class name and the name of the codec.
+
+        Returns
+        -------
+        str
+            The stringified version of the object
+
+        """
+
+        return '%s (%s)' % (self.__class__.__name__, self.NAME)
+
+    __repr__ = __str__
+
+
+class OrjsonCodec(JsonCodec):
+    """Codec using ``orjson``, the fastest one.
+
+    ``orjson`` has no hook for the objects, so they are converted after decoding, which
+    is still faster than the standard library with a hook.
+
+    """
+
+    __slots__ = ()
+
+    NAME: str = 'orjson'
+    MODULE: str = 'orjson'
+
+    def dumps(self, obj: Any) -> bytes:
+        """Encode `obj` in json with ``orjson``, that returns bytes.
+
+        Parameters
+        ----------
+        obj : Any
+            The object to encode
+
+        Returns
+        -------
+        bytes
+            The json, encoded in utf-8
+
+        """
+
+        return self.module.dumps(obj, default=_default)
+
+    def loads(self, data: JsonData) -> Any:
+        """Decode json with ``orjson``.
+
+        Parameters
+        ----------
+        data : Union[str, bytes]
+            The json to decode
+
+        Returns
+        -------
+        Any
+            The decoded value
+
+        """
+
+        return self.module.loads(data)
+
+    def loads_objects(
+            self,
+            data: JsonData,
+            object_class: Callable[..., Any]) -> Any:
+        """Decode json with ``orjson``, then convert the dicts with `object_class`.
+
+        Parameters
+        ----------
+        data : Union[str, bytes]
+            The json to decode
+        object_class : Callable[..., Any]
+            The class to use for the objects, like ``DictObject``
+
+        Returns
+        -------
+        Any
+            The decoded value
+
+        """
+
+        return convert_objects(self.module.loads(data), object_class)
+
+
+class RapidjsonCodec(JsonCodec):
+    """Codec using ``rapidjson``, from the ``python-rapidjson`` package."""
+
+    __slots__ = ()
+
+    NAME: str = 'rapidjson'
+    MODULE: str = 'rapidjson'
+
+    def dumps(self, obj: Any) -> bytes:
+        """Encode `obj` in json with ``rapidjson``.
+
+        Parameters
+        ----------
+        obj : Any
+            The object to encode
+
+        Returns
+        -------
+        bytes
+            The json, encoded in utf-8
+
+        """
+
+        return self.module.dumps(obj, default=_default).encode()
+
+    def loads(self, data: JsonData) -> Any:
+        """Decode json with ``rapidjson``.
+
+        Parameters
+        ----------
+        data : Union[str, bytes]
+            The json to decode
+
+        Returns
+        -------
+        Any
+            The decoded value
+
+        """
+
+        return self.module.loads(data)
+
+    def loads_objects(
+            self,
+            data: JsonData,
+            object_class: Callable[..., Any]) -> Any:
+        """Decode json with ``rapidjson``, passing `object_class` as object hook.
+
+        Parameters
+        ----------
+        data : Union[str, bytes]
+            The json to decode
+        object_class : Callable[..., Any]
+            The class to use for the objects, like ``DictObject``
+
+        Returns
+        -------
+        Any
+            The decoded value
+
+        """
+
+        return self.module.loads(data, object_hook=object_class)
+
+
+class UjsonCodec(JsonCodec):
+    """Codec using ``ujson``.
+
+    ``ujson`` has no hook for the objects, and converting them after decoding is slower
+    than using the standard library, so ``loads_objects`` is the one of ``JsonCodec``.
+
+    """
+
+    __slots__ = ()
+
+    NAME: str = 'ujson'
+    MODULE: str = 'ujson'
+
+    @classmethod
+    def is_available(cls) -> bool:
+        """Tell if ``ujson`` 5 or later is installed, older ones having no ``default``.
+
+        Returns
+        -------
+        bool
+            ``True`` if a recent enough version of ``ujson`` can be imported
+
+        """
+
+        if not super().is_available():
+            return False
+        version = importlib.import_module(cls.MODULE).__version__
+        return int(version.split('.')[0]) >= 5
+
+    def dumps(self, obj: Any) -> bytes:
+        """Encode `obj` in json with ``ujson``.
+
+        Parameters
+        ----------
+        obj : Any
+            The object to encode
+
+        Returns
+        -------
+        bytes
+            The json, encoded in utf-8
+
+        """
+
+        return self.module.dumps(obj, default=_default).encode()
+
+    def loads(self, data: JsonData) -> Any:
+        """Decode json with ``ujson``.
+
+        Parameters
+        ----------
+        data : Union[str, bytes]
+            The json to decode
+
+        Returns
+        -------
+        Any
+            The decoded value
+
+        """
+
+        return self.module.loads(data)
+
+
+CODEC_CLASSES: Tuple[Type[JsonCodec], ...] = (
+    OrjsonCodec,
+    RapidjsonCodec,
+    UjsonCodec,
+    JsonCodec,
+)
+
+_codec: Optional[JsonCodec] = None
+
+
+def get_codec() -> JsonCodec:
+    """Return the codec to use, the first available one of ``CODEC_CLASSES`` by default.
+
+    Returns
+    -------
+    JsonCodec
+        The codec
+
+    """
+
+    global _codec  # pylint: disable=global-statement,invalid-name
+    if _codec is None:
+        _codec = next(
+            codec_class() for codec_class in CODEC_CLASSES if codec_class.is_available()
+        )
+    return _codec
+
+
+def set_codec(codec: Optional[Union[str, JsonCodec]]) -> JsonCodec:
+    """Set the codec to use.
+
+    Parameters
+    ----------
+    codec : Union[str, JsonCodec], optional
+        A codec, or the ``NAME`` of one of ``CODEC_CLASSES``. ``None`` to use the default one
+
+    Returns
+    -------
+    JsonCodec
+        The codec now used
+
+    Raises
+    ------
+    ValueError
+        If the name is not the one of a known codec
+    ImportError
+        If the module of the codec is not installed
+
+    Examples
+    --------
+    >>> set_codec('json')
+    JsonCodec (json)
+    >>> get_codec()
+    JsonCodec (json)
+    >>> set_codec(None) is get_codec()
+    True
+
+    """
+
+    global _codec  # pylint: disable=global-statement,invalid-name
+
+    if isinstance(codec, str):
+        codec_classes: Dict[str, Type[JsonCodec]] = {
+            codec_class.NAME: codec_class for codec_class in CODEC_CLASSES
+        }
+        if codec not in codec_classes:
+            raise ValueError('Unknown json codec "%s"' % codec)
+        codec = codec_classes[codec]()
+
+    _codec = codec
+    return get_codec()
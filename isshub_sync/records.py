@@ -0,0 +1,594 @@
+"""Compact record types, with a fixed set of fields, for the objects kept in memory.
+
+A ``DictObject`` is a dict, so each instance carries its own hash table. During a full sync
+hundreds of thousands of issues, pull requests, comments... are kept in memory: declaring
+their fields once, in a ``Record`` subclass using ``__slots__``, takes a lot less memory per
+object, while keeping the same attribute access (``issue.title``).
+
+Record types can be declared as classes, created by ``record_type``, or inferred from
+sample payloads by ``infer_record_type``. Keys of a payload that are not fields of the
+record type are kept in a ``DictObject``, so nothing is lost.
+
+"""
+
+import keyword
+import sys
+from collections.abc import Mapping
+from typing import (  # noqa: F401
+    Any,
+    Dict,
+    FrozenSet,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Type,
+    Union,
+)
+
+from .json_codec import get_codec
+from .utils import DictObject
+
+
+_SCALARS = (str, int, float)  # values without anything to convert, checked first for speed
+_MISSING = object()
+
+
+def _get_slots(cls: type) -> Tuple[str, ...]:
+    """Return the names defined in the ``__slots__`` of `cls` itself, not of its parents.
+
+    Parameters
+    ----------
+    cls : type
+        The class for which we want the slots
+
+    Returns
+    -------
+    Tuple[str, ...]
+        The names of the slots
+
+    """
+
+    slots = cls.__dict__.get('__slots__', ())
+    return (slots, ) if isinstance(slots, str) else tuple(slots)
+
+
+def _to_dict_object(value: Any) -> Any:
+    """Convert mappings into ``DictObject``, recursively, including the ones in lists.
+
+    Parameters
+    ----------
+    value : Any
+        The value to convert
+
+    Returns
+    -------
+    Any
+        The converted value, or `value` itself if there is nothing to convert
+
+    """
+
+    if value is None or isinstance(value, _SCALARS):
+        return value
+    if isinstance(value, Mapping):
+        if isinstance(value, (DictObject, Record)):
+            return value
+        return DictObject((key, _to_dict_object(sub_value)) for key, sub_value in value.items())
+    if isinstance(value, list):
+        return [_to_dict_object(item) for item in value]
+    return value
+
+
+class Record(Mapping):
+    """Base class of the record types, objects with a fixed set of fields.
+
+    Fields are declared with ``__slots__`` in subclasses. Values can be get/set as
+    attributes or keys, like with ``DictObject``, and a record is a read-only ``Mapping``.
+    Keys that are not fields are saved in a ``DictObject``, in ``_extra``.
+
+    Parameters
+    ----------
+    args, kwargs : Any
+        The values of the record, as accepted by ``dict``. They are not converted, use
+        ``from_dict`` to convert nested mappings.
+
+    Attributes
+    ----------
+    FIELDS: Tuple[str, ...]
+        The names of all the fields, computed from the ``__slots__`` of the class and its
+        parents.
+    NESTED: Dict[str, Type[Record]]
+        For fields whose values are mappings (or lists of mappings), the record type to use
+        to convert them. Other mappings are converted into ``DictObject``.
+
+    Examples
+    --------
+    >>> class User(Record):
+    ...     __slots__ = ('login', )
+    >>> class Issue(Record):
+    ...     __slots__ = ('number', 'title', 'user')
+    ...     NESTED = {'user': User}
+    >>> issue = Issue.from_dict(
+    ...     {'number': 1, 'title': 'Foo', 'user': {'login': 'bar'}, 'state': 'open'}
+    ... )
+    >>> issue
+    Issue(number=1, title='Foo', user=User(login='bar'), state='open')
+    >>> issue.user.login, issue['title'], issue.state
+    ('bar', 'Foo', 'open')
+    >>> issue == {'number': 1, 'title': 'Foo', 'user': {'login': 'bar'}, 'state': 'open'}
+    True
+
+    """
+
+    __slots__ = (
+        '_extra',
+    )
+
+    FIELDS: Tuple[str, ...] = ()
+    NESTED: Dict[str, Type['Record']] = {}
+    _FIELDS_SET: FrozenSet[str] = frozenset()
+
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        """Compute the fields of the new record type, from its ``__slots__``.
+
+        Raises
+        ------
+        ValueError
+            If a field is named like an attribute of ``Record``, or starts with "_"
+
+        """
+
+        super().__init_subclass__(**kwargs)  # type: ignore
+
+        for name in _get_slots(cls):
+            if name.startswith('_') or hasattr(Record, name):
+                raise ValueError('"%s" cannot be used as a field name' % name)
+
+        fields: Dict[str, None] = {}
+        for base in reversed(cls.__mro__):
+            if issubclass(base, Record):
+                fields.update(dict.fromkeys(_get_slots(base)))
+        fields.pop('_extra')
+
+        cls.FIELDS = tuple(fields)
+        cls._FIELDS_SET = frozenset(cls.FIELDS)
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        """Set the given values."""
+
+        object.__setattr__(self, '_extra', None)
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    @classmethod
+    def from_dict(cls, pairs: Mapping) -> 'Record':
+        """Convert a dict (or any ``Mapping``) into a record, recursively.
+
+        Values of fields in ``NESTED`` are converted into their record type, and other
+        mappings, including the ones of keys that are not fields, into ``DictObject``.
+
+        Parameters
+        ----------
+        pairs : Mapping
+            The dict to convert
+
+        Returns
+        -------
+        Record
+            The new record created from the dict
+
+        """
+
+        obj = cls.__new__(cls)
+        fields = cls._FIELDS_SET
+        nested = cls.NESTED
+        setter = object.__setattr__
+        extra = None
+
+        for key, value in pairs.items():
+            if key in fields:
+                if value is not None and not isinstance(value, _SCALARS):
+                    record_class = nested.get(key)
+                    if record_class is not None:
+                        value = record_class.convert(value)
+                    else:
+                        value = _to_dict_object(value)
+                setter(obj, key, value)
+            else:
+                if extra is None:
+                    extra = DictObject()
+                extra[key] = _to_dict_object(value)
+
+        setter(obj, '_extra', extra)
+        return obj
+
+    @classmethod
+    def convert(cls, value: Any) -> Any:
+        """Convert a mapping, or all the mappings of a list, into records.
+
+        Parameters
+        ----------
+        value : Any
+            The value to convert
+
+        Returns
+        -------
+        Any
+            A record for a mapping, a list of records for a list of mappings, else `value`
+
+        Examples
+        --------
+        >>> class User(Record):
+        ...     __slots__ = ('login', )
+        >>> User.convert([{'login': 'foo'}, None])
+        [User(login='foo'), None]
+
+        """
+
+        if value is None or isinstance(value, _SCALARS):
+            return value
+        if isinstance(value, Mapping):
+            return value if isinstance(value, cls) else cls.from_dict(value)
+        if isinstance(value, list):
+            return [cls.convert(item) for item in value]
+        return value
+
+    @classmethod
+    def from_json(cls, json_string: Union[str, bytes]) -> Any:
+        """Convert a json object, or a json array of objects, into records.
+
+        Parameters
+        ----------
+        json_string : Union[str, bytes]
+            The json to convert
+
+        Returns
+        -------
+        Any
+            A record for an object, a list of records for an array of objects
+
+        """
+
+        return cls.convert(get_codec().loads(json_string))
+
+    def _get(self, key: str, default: Any = None) -> Any:
+        """Return the value of a field, or `default` if it is not set.
+
+        Parameters
+        ----------
+        key : str
+            The name of the field
+        default : Any
+            The value to return if the field is not set
+
+        Returns
+        -------
+        Any
+            The value of the field, or `default`
+
+        """
+
+        try:
+            return object.__getattribute__(self, key)
+        except AttributeError:
+            return default
+
+    def __getitem__(self, key: str) -> Any:
+        """Return the value for `key`, from the fields or the extra keys.
+
+        Parameters
+        ----------
+        key : str
+            The name of the wanted entry
+
+        Returns
+        -------
+        Any
+            The value for `key`
+
+        Raises
+        ------
+        KeyError
+            If there is no value for `key`
+
+        """
+
+        if key in self._FIELDS_SET:
+            value = self._get(key, _MISSING)
+            if value is not _MISSING:
+                return value
+        elif self._extra is not None and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        """Set the value for `key`, in the fields or the extra keys.
+
+        Parameters
+        ----------
+        key : str
+            The name of the entry to set
+        value : Any
+            The value to set
+
+        """
+
+        if key in self._FIELDS_SET:
+            object.__setattr__(self, key, value)
+        else:
+            if self._extra is None:
+                object.__setattr__(self, '_extra', DictObject())
+            self._extra[key] = value
+
+    def __getattr__(self, attr: str) -> Any:
+        """Return the value of `attr`, called when `attr` is not a field that is set.
+
+        Parameters
+        ----------
+        attr : str
+            The name of the wanted attribute
+
+        Returns
+        -------
+        Any
+            The value for `attr`
+
+        Raises
+        ------
+        KeyError
+            If there is no value for `attr`, as for ``DictObject``
+        AttributeError
+            If `attr` is a special name, like ``__foo__``
+
+        """
+
+        if attr.startswith('__'):
+            raise AttributeError(attr)
+        return self[attr]
+
+    def __setattr__(self, attr: str, value: Any) -> None:
+        """Set the value of `attr`, in the fields or the extra keys.
+
+        Parameters
+        ----------
+        attr : str
+            The name of the attribute to set
+        value : Any
+            The value to set
+
+        """
+
+        self[attr] = value
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterate on the names of the fields that are set, then of the extra keys.
+
+        Yields
+        ------
+        str
+            Each key
+
+        """
+
+        for name in self.FIELDS:
+            if self._get(name, _MISSING) is not _MISSING:
+                yield name
+        if self._extra is not None:
+            yield from self._extra
+
+    def __len__(self) -> int:
+        """Return the number of keys.
+
+        Returns
+        -------
+        int
+            The number of fields set plus the number of extra keys
+
+        """
+
+        return sum(1 for __ in self)
+
+    def __reduce__(self) -> tuple:
+        """Pickle the values of the fields that are set and the extra keys.
+
+        Returns
+        -------
+        tuple
+            The class, no arguments, and the values of the fields and ``_extra`` as state
+
+        """
+
+        state = {name: value for name, value in self.items() if name in self._FIELDS_SET}
+        state['_extra'] = self._extra
+        return self.__class__, (), state
+
+    def __setstate__(self, state: dict) -> None:
+        """Set the unpickled values.
+
+        Parameters
+        ----------
+        state : dict
+            The values of the fields, and the extra keys in ``_extra``
+
+        """
+
+        for name, value in state.items():
+            object.__setattr__(self, name, value)
+
+    def __str__(self) -> str:
+        """Return the class name and the values.
+
+        Returns
+        -------
+        str
+            The stringified version of the object
+
+        """
+
+        return '%s(%s)' % (
+            self.__class__.__name__,
+            ', '.join('%s=%r' % (key, value) for key, value in self.items()),
+        )
+
+    __repr__ = __str__
+
+
+def _is_valid_field(name: str) -> bool:
+    """Tell if `name` can be used as a field name of a record type.
+
+    Parameters
+    ----------
+    name : str
+        The name to check
+
+    Returns
+    -------
+    bool
+        ``True`` if `name` is an identifier not starting with "_", and not used by ``Record``
+
+    """
+
+    return (
+        isinstance(name, str)
+        and name.isidentifier()
+        and not keyword.iskeyword(name)
+        and not name.startswith('_')
+        and not hasattr(Record, name)
+    )
+
+
+def _caller_module(depth: int) -> str:
+    """Get the name of the module of a caller, for pickling, as done by ``collections.namedtuple``.
+
+    Parameters
+    ----------
+    depth : int
+        The number of frames to go up from the function calling ``_caller_module``: ``1`` for
+        its caller
+
+    Returns
+    -------
+    str
+        The name of the module, or ``'__main__'`` if it cannot be found
+
+    """
+
+    try:
+        frame = sys._getframe(depth + 1)  # pylint: disable=protected-access
+        return frame.f_globals.get('__name__', '__main__')
+    except (AttributeError, ValueError):  # pragma: no cover
+        return '__main__'
+
+
+def record_type(
+        name: str,
+        fields: Iterable[str],
+        nested: Optional[Dict[str, Type[Record]]] = None,
+        module: Optional[str] = None) -> Type[Record]:
+    """Create a record type with the given fields.
+
+    Parameters
+    ----------
+    name : str
+        The name of the class
+    fields : Iterable[str]
+        The names of the fields. Names that cannot be used (see ``Record``) are ignored: such
+        keys will be saved as extra keys.
+    nested : Dict[str, Type[Record]], optional
+        The record types to use for fields whose values are mappings (see ``Record.NESTED``)
+    module : str, optional
+        The module of the class, to be able to pickle its instances. Default to the module of
+        the caller. The class must be available with its name in this module to be pickled.
+
+    Returns
+    -------
+    Type[Record]
+        The new record type
+
+    Examples
+    --------
+    >>> User = record_type('User', ['id', 'login', 'class', '_links'])
+    >>> User.FIELDS
+    ('id', 'login')
+    >>> User.from_dict({'id': 1, 'login': 'foo', 'class': 'bar'})
+    User(id=1, login='foo', class='bar')
+
+    """
+
+    if module is None:
+        module = _caller_module(1)
+
+    fields = tuple(field for field in dict.fromkeys(fields) if _is_valid_field(field))
+    return type(name, (Record, ), {
+        '__slots__': fields,
+        '__module__': module,
+        'NESTED': dict(nested or {}),
+    })
+
+
+def infer_record_type(
+        name: str,
+        samples: Union[Mapping, Iterable[Mapping]],
+        module: Optional[str] = None) -> Type[Record]:
+    """Create a record type from one or many sample payloads.
+
+    The fields are all the keys found in the samples. For keys whose values are mappings
+    (or lists of mappings), nested record types are inferred too, named with the name of
+    the parent type and the key, in CamelCase.
+
+    Parameters
+    ----------
+    name : str
+        The name of the class
+    samples : Union[Mapping, Iterable[Mapping]]
+        A payload, or many payloads, of the objects the record type will be used for
+    module : str, optional
+        The module of the class (see ``record_type``). Default to the module of the caller.
+
+    Returns
+    -------
+    Type[Record]
+        The new record type
+
+    Examples
+    --------
+    >>> Issue = infer_record_type('Issue', [
+    ...     {'number': 1, 'user': {'login': 'foo'}, 'labels': [{'name': 'bug'}]},
+    ...     {'number': 2, 'user': {'login': 'bar', 'id': 2}, 'labels': [], 'body': 'baz'},
+    ... ])
+    >>> Issue.FIELDS
+    ('number', 'user', 'labels', 'body')
+    >>> Issue.NESTED['user'].__name__, Issue.NESTED['user'].FIELDS
+    ('IssueUser', ('login', 'id'))
+    >>> Issue.from_dict({'number': 3, 'labels': [{'name': 'bug'}]}).labels[0].name
+    'bug'
+
+    """
+
+    if module is None:
+        module = _caller_module(1)
+
+    if isinstance(samples, Mapping):
+        samples = [samples]
+
+    fields: Dict[str, List[Mapping]] = {}  # sub-samples by field, in order of appearance
+    for sample in samples:
+        for key, value in sample.items():
+            sub_samples = fields.setdefault(key, [])
+            if isinstance(value, Mapping):
+                sub_samples.append(value)
+            elif isinstance(value, list):
+                sub_samples.extend(item for item in value if isinstance(item, Mapping))
+
+    nested = {
+        key: infer_record_type(
+            name + ''.join(part.capitalize() for part in key.split('_')),
+            sub_samples,
+            module=module,
+        )
+        for key, sub_samples in fields.items()
+        if sub_samples and _is_valid_field(key)
+    }
+
+    return record_type(name, fields, nested=nested, module=module)
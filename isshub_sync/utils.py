@@ -1,7 +1,9 @@
 """Some utils for the isshub_sync library."""
 
-from typing import Any, Mapping
-import json
+from collections.abc import ItemsView, ValuesView
+from typing import Any, Mapping, Union
+
+from .json_codec import get_codec
 
 
 class NotProvided:  # pylint: disable=too-few-public-methods
@@ -125,12 +127,16 @@ class DictObject(dict):
         )
 
     @classmethod
-    def from_json(cls, json_string: str) -> 'DictObject':
+    def from_json(cls, json_string: Union[str, bytes]) -> 'DictObject':
         """Convert a whole json string into a ``DictObject``, recursively.
 
+        Objects are directly created as ``DictObject`` by the json decoder when possible.
+        Unlike ``from_dict``, objects in lists are converted too. The json is decoded by the
+        codec returned by ``isshub_sync.json_codec.get_codec``.
+
         Parameters
         ----------
-        json_string : str
+        json_string : Union[str, bytes]
             The json string to convert
 
         Returns
@@ -138,6 +144,232 @@ class DictObject(dict):
         DictObject
             The new object created from the json string
 
+        Examples
+        --------
+        >>> obj = DictObject.from_json('{"a": {"b": 1}, "c": [{"d": 2}]}')
+        >>> obj.a.b, obj.c[0].d
+        (1, 2)
+
+        """
+
+        return get_codec().loads_objects(json_string, cls)
+
+    @classmethod
+    def lazy(cls, pairs: Mapping) -> 'LazyDictObject':
+        """Wrap a dict (or any ``Mapping``) into a ``LazyDictObject``.
+
+        Unlike ``from_dict``, sub-mappings are only converted when accessed.
+
+        Parameters
+        ----------
+        pairs : Mapping
+            The dict to wrap
+
+        Returns
+        -------
+        LazyDictObject
+            The new object wrapping the dict
+
+        """
+
+        return LazyDictObject(pairs)
+
+
+def _make_lazy(value: Any) -> Any:
+    """Wrap `value` in a lazy object if it is a mapping or a list not already wrapped.
+
+    Parameters
+    ----------
+    value : Any
+        The value to wrap
+
+    Returns
+    -------
+    Any
+        A ``LazyDictObject`` for a mapping, a ``LazyList`` for a list, else `value` itself
+
+    """
+
+    if isinstance(value, Mapping):
+        return value if isinstance(value, DictObject) else LazyDictObject(value)
+    if isinstance(value, list) and not isinstance(value, LazyList):
+        return LazyList(value)
+    return value
+
+
+class LazyDictObject(DictObject):
+    """A ``DictObject`` converting its sub-mappings and lists only when they are accessed.
+
+    Only a shallow copy of the mapping is made. A sub-mapping (or list) is wrapped the first
+    time it is accessed, and the wrapper replaces it, so it is wrapped only once.
+
+    It's useful for big payloads of which only a few fields are read.
+
+    Examples
+    --------
+    >>> raw = {'a': {'b': {'c': 1}}, 'd': [{'e': 2}]}
+    >>> obj = DictObject.lazy(raw)
+    >>> type(dict.__getitem__(obj, 'a'))
+    <class 'dict'>
+    >>> obj.a.b.c
+    1
+    >>> type(dict.__getitem__(obj, 'a')).__name__
+    'LazyDictObject'
+    >>> obj.a is obj.a
+    True
+    >>> obj.d[0].e
+    2
+    >>> obj == raw
+    True
+
+    Notes
+    -----
+    Methods of ``dict`` that don't use ``__getitem__`` (``copy``, ``dict(obj)``...) return
+    the values not converted yet as they are.
+
+    """
+
+    def __getitem__(self, key: Any) -> Any:
+        """Return the entry `key`, wrapping it first if needed.
+
+        Parameters
+        ----------
+        key : Any
+            The key of the wanted entry
+
+        Returns
+        -------
+        Any
+            The entry, wrapped in a lazy object if it is a mapping or a list
+
+        Raises
+        ------
+        KeyError
+            If the key `key` does not exist
+
+        """
+
+        value = dict.__getitem__(self, key)
+        wrapped = _make_lazy(value)
+        if wrapped is not value:
+            dict.__setitem__(self, key, wrapped)
+        return wrapped
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        """Return the entry `key` if it exists, wrapping it first if needed, else `default`.
+
+        Parameters
+        ----------
+        key : Any
+            The key of the wanted entry
+        default : Any
+            The value to return if `key` does not exist
+
+        Returns
+        -------
+        Any
+            The entry, or `default`
+
+        """
+
+        return self[key] if key in self else default
+
+    def items(self) -> ItemsView:  # type: ignore  # a dict view would skip __getitem__
+        """Return a view on the entries, wrapped as they are read.
+
+        Returns
+        -------
+        ItemsView
+            The view on the (key, value) pairs
+
+        """
+
+        return ItemsView(self)
+
+    def values(self) -> ValuesView:  # type: ignore  # a dict view would skip __getitem__
+        """Return a view on the values, wrapped as they are read.
+
+        Returns
+        -------
+        ValuesView
+            The view on the values
+
+        """
+
+        return ValuesView(self)
+
+    def __reduce__(self) -> tuple:
+        """Pickle only the state, without wrapping the values not converted yet.
+
+        Returns
+        -------
+        tuple
+            The class, no arguments, and the state given by ``__getstate__``
+
+        """
+
+        return self.__class__, (), self.__getstate__()
+
+
+class LazyList(list):
+    """A list converting its mappings and lists only when they are accessed.
+
+    Examples
+    --------
+    >>> lst = LazyList([{'a': 1}, 2])
+    >>> lst[0].a
+    1
+    >>> [type(item).__name__ for item in lst]
+    ['LazyDictObject', 'int']
+
+    """
+
+    def __getitem__(self, index: Any) -> Any:
+        """Return the item at `index`, wrapping it first if needed.
+
+        Parameters
+        ----------
+        index : Any
+            The index of the wanted item, or a slice
+
+        Returns
+        -------
+        Any
+            The item, wrapped in a lazy object if it is a mapping or a list. A ``LazyList``
+            for a slice
+
+        """
+
+        if isinstance(index, slice):
+            return LazyList(list.__getitem__(self, index))
+
+        value = list.__getitem__(self, index)
+        wrapped = _make_lazy(value)
+        if wrapped is not value:
+            list.__setitem__(self, index, wrapped)
+        return wrapped
+
+    def __iter__(self) -> Any:
+        """Iterate on the items, wrapping them if needed.
+
+        Yields
+        ------
+        Any
+            Each item, wrapped in a lazy object if it is a mapping or a list
+
+        """
+
+        for index in range(len(self)):
+            yield self[index]
+
+    def __reduce__(self) -> tuple:
+        """Pickle the items without wrapping the ones not converted yet.
+
+        Returns
+        -------
+        tuple
+            The class and the raw items as argument
+
         """
 
-        return cls.from_dict(json.loads(json_string))
+        return self.__class__, (list.copy(self), )
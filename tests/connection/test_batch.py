@@ -0,0 +1,164 @@
+import asyncio
+from functools import partial
+
+from aiohttp import web
+
+import pytest
+
+from isshub_sync.connection.batch import Batch
+from isshub_sync.connection.connection import Connection
+
+
+DUMMY_ROOT: str = 'https://httpbin.org/'
+
+
+class Tracker:
+    """Count the number of jobs running at the same time."""
+
+    def __init__(self):
+        self.running = 0
+        self.max_running = 0
+
+    async def job(self, value, delay=0.01, fail=False):
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        try:
+            await asyncio.sleep(delay)
+            if fail:
+                raise ValueError(value)
+            return value
+        finally:
+            self.running -= 1
+
+
+async def test_batch_gather_keeps_order_and_limits_concurrency(loop):
+    tracker = Tracker()
+    jobs = [partial(tracker.job, value, delay=0.001 * (10 - value)) for value in range(10)]
+
+    results = await Batch(jobs, concurrency=3).gather()
+
+    assert results == list(range(10))
+    assert tracker.max_running == 3
+
+
+async def test_batch_limits_concurrency_per_host(loop):
+    trackers = {'a': Tracker(), 'b': Tracker()}
+    jobs = [(host, partial(trackers[host].job, value)) for value in range(6) for host in 'ab']
+    hosts = {job: host for host, job in jobs}
+
+    results = await Batch(
+        [job for __, job in jobs],
+        concurrency=10,
+        per_host_concurrency=2,
+        get_host=hosts.get,
+    ).gather()
+
+    assert results == [value for value in range(6) for __ in 'ab']
+    assert trackers['a'].max_running == 2
+    assert trackers['b'].max_running == 2
+
+
+async def test_batch_as_completed(loop):
+    tracker = Tracker()
+    jobs = [partial(tracker.job, value, delay=0.03 * (3 - value)) for value in range(3)]
+
+    results = [result async for result in Batch(jobs).as_completed()]
+    assert results == [(2, 2), (1, 1), (0, 0)]
+
+    results = [result async for result in Batch(jobs).as_completed(ordered=True)]
+    assert results == [(0, 0), (1, 1), (2, 2)]
+
+
+async def test_batch_cancels_other_jobs_on_error(loop):
+    tracker = Tracker()
+    jobs = [
+        partial(tracker.job, 0, delay=1),
+        partial(tracker.job, 1, fail=True),
+        partial(tracker.job, 2, delay=1),
+    ]
+
+    with pytest.raises(ValueError):
+        await Batch(jobs).gather()
+
+    assert tracker.running == 0
+
+
+async def test_batch_can_return_exceptions(loop):
+    tracker = Tracker()
+    jobs = [partial(tracker.job, value, fail=value == 1) for value in range(3)]
+
+    results = await Batch(jobs, return_exceptions=True).gather()
+
+    assert results[0] == 0
+    assert isinstance(results[1], ValueError)
+    assert results[2] == 2
+
+
+async def test_batch_returns_cancelled_jobs_as_exceptions(loop):
+    tracker = Tracker()
+
+    async def cancelled():
+        raise asyncio.CancelledError()
+
+    jobs = [partial(tracker.job, 0), cancelled, partial(tracker.job, 2)]
+
+    results = await Batch(jobs, return_exceptions=True).gather()
+
+    assert results[0] == 0
+    assert isinstance(results[1], asyncio.CancelledError)
+    assert results[2] == 2
+
+    with pytest.raises(asyncio.CancelledError):
+        await Batch(jobs).gather()
+    assert tracker.running == 0
+
+
+def test_connection_gets_host_of_executables():
+    connection = Connection('https://foo.com:8080/bar')
+
+    assert Connection._get_job_host(connection.foo.get) == 'foo.com:8080'
+    assert Connection._get_job_host(partial(connection.foo.get, headers={})) == 'foo.com:8080'
+    assert Connection._get_job_host(lambda: None) is None
+
+
+@pytest.fixture
+def client(loop, test_client):
+
+    async def dummy_get(request):
+        return web.Response(text='dummy %s' % request.match_info['value'])
+
+    app = web.Application()
+    app.router.add_get('/dummy_get/{value}/', dummy_get)
+
+    return loop.run_until_complete(test_client(app))
+
+
+async def test_connection_gather_executables(client):
+    connection = Connection(DUMMY_ROOT, client=client)
+    connection.root = ''  # test client refuses absolute urls
+
+    responses = await connection.gather(
+        [connection.dummy_get(value).get for value in range(5)],
+        concurrency=2,
+        per_host_concurrency=1,
+    )
+
+    assert [await response.text() for response in responses] == [
+        'dummy %s' % value for value in range(5)
+    ]
+
+
+async def test_connection_as_completed_executables(client):
+    connection = Connection(DUMMY_ROOT, client=client)
+    connection.root = ''  # test client refuses absolute urls
+
+    results = {}
+    async for index, response in connection.as_completed(
+            [
+                partial(connection.dummy_get(value).get, headers={'X-Foo': 'Bar'})
+                for value in range(5)
+            ]
+    ):
+        results[index] = await response.text()
+
+    assert results == {value: 'dummy %s' % value for value in range(5)}
@@ -0,0 +1,190 @@
+import threading
+
+from aiohttp import web
+
+import pytest
+
+from isshub_sync.connection.cache import CachedResponse, CacheEntry, MemoryCache, SqliteCache
+from isshub_sync.connection.connection import Connection
+from isshub_sync.connection.credentials import CredentialPool
+
+
+@pytest.fixture
+def calls():
+    return []
+
+
+@pytest.fixture
+def authorizations():
+    return []
+
+
+@pytest.fixture
+def server(loop, test_server, calls, authorizations):
+
+    async def with_etag(request):
+        calls.append(('etag', request.headers.get('If-None-Match')))
+        authorizations.append(request.headers.get('Authorization'))
+        if request.headers.get('If-None-Match') == '"v1"':
+            return web.Response(
+                status=304, headers={'ETag': '"v1"', 'X-RateLimit-Remaining': '42'}
+            )
+        return web.json_response({'foo': 'bar'}, headers={'ETag': '"v1"'})
+
+    async def with_last_modified(request):
+        last_modified = 'Wed, 21 Oct 2015 07:28:00 GMT'
+        calls.append(('last_modified', request.headers.get('If-Modified-Since')))
+        if request.headers.get('If-Modified-Since') == last_modified:
+            return web.Response(status=304)
+        return web.Response(text='modified', headers={'Last-Modified': last_modified})
+
+    async def without_validator(request):
+        calls.append(('without_validator', request.headers.get('If-None-Match')))
+        return web.Response(text='no validator')
+
+    app = web.Application()
+    app.router.add_get('/etag/', with_etag)
+    app.router.add_post('/etag/', with_etag)
+    app.router.add_get('/last_modified/', with_last_modified)
+    app.router.add_get('/without_validator/', without_validator)
+
+    return loop.run_until_complete(test_server(app))
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def cache(request, tmpdir):
+    if request.param == 'memory':
+        return MemoryCache()
+    return SqliteCache(str(tmpdir.join('cache.sqlite')))
+
+
+async def test_cache_replays_body_on_not_modified(server, calls, cache):
+    async with Connection(str(server.make_url('/')), cache=cache) as connection:
+        response = await connection.etag.get()
+        assert response.status == 200
+        assert await response.json() == {'foo': 'bar'}
+
+        response = await connection.etag.get()
+        assert isinstance(response, CachedResponse)
+        assert response.from_cache
+        assert response.status == 200
+        assert await response.json() == {'foo': 'bar'}
+        assert await response.text() == '{"foo": "bar"}'
+        assert response.headers['X-RateLimit-Remaining'] == '42'
+        assert response.headers['Content-Type'] == 'application/json; charset=utf-8'
+
+    assert calls == [('etag', None), ('etag', '"v1"')]
+
+
+async def test_cache_uses_last_modified(server, calls, cache):
+    async with Connection(str(server.make_url('/')), cache=cache) as connection:
+        assert await (await connection.last_modified.get()).text() == 'modified'
+        assert await (await connection.last_modified.get()).text() == 'modified'
+
+    assert calls == [
+        ('last_modified', None),
+        ('last_modified', 'Wed, 21 Oct 2015 07:28:00 GMT'),
+    ]
+
+
+async def test_cache_ignores_responses_without_validator(server, calls, cache):
+    async with Connection(str(server.make_url('/')), cache=cache) as connection:
+        await connection.without_validator.get()
+        response = await connection.without_validator.get()
+        assert not isinstance(response, CachedResponse)
+
+    assert calls == [('without_validator', None), ('without_validator', None)]
+
+
+async def test_cache_ignores_non_get_requests(server, calls, cache):
+    async with Connection(str(server.make_url('/')), cache=cache) as connection:
+        await connection.etag.post()
+        await connection.etag.post()
+
+    assert calls == [('etag', None), ('etag', None)]
+
+
+async def test_cache_key_depends_on_authorization(server, calls, cache):
+    async with Connection(str(server.make_url('/')), cache=cache) as connection:
+        await connection.etag.get(headers={'Authorization': 'token foo'})
+        await connection.etag.get(headers={'Authorization': 'token bar'})
+        await connection.etag.get(headers={'Authorization': 'token foo'})
+
+    assert calls == [('etag', None), ('etag', None), ('etag', '"v1"')]
+
+
+async def test_cache_key_depends_on_pool_token(server, calls, authorizations, cache):
+    credentials = CredentialPool(['foo', 'bar'])
+    async with Connection(
+            str(server.make_url('/')), cache=cache, credentials=credentials) as connection:
+        for __ in range(4):
+            await connection.etag.get()
+
+    # the tokens are used in turn, each one revalidating its own entry
+    assert authorizations == ['token foo', 'token bar', 'token foo', 'token bar']
+    assert calls == [('etag', None), ('etag', None), ('etag', '"v1"'), ('etag', '"v1"')]
+
+
+async def test_sqlite_cache_survives_restart(server, calls, tmpdir):
+    path = str(tmpdir.join('cache.sqlite'))
+
+    async with Connection(str(server.make_url('/')), cache=SqliteCache(path)) as connection:
+        await connection.etag.get()
+
+    async with Connection(str(server.make_url('/')), cache=SqliteCache(path)) as connection:
+        response = await connection.etag.get()
+        assert await response.json() == {'foo': 'bar'}
+
+    assert calls == [('etag', None), ('etag', '"v1"')]
+
+
+@pytest.mark.parametrize('cache_class', [MemoryCache, SqliteCache])
+def test_cache_evicts_by_size(cache_class, tmpdir):
+    if cache_class is SqliteCache:
+        cache = SqliteCache(str(tmpdir.join('cache.sqlite')), max_size=10)
+    else:
+        cache = MemoryCache(max_size=10)
+
+    cache.set('a', CacheEntry(200, [], b'1234'))
+    cache.set('b', CacheEntry(200, [], b'1234'))
+    cache.get('a')  # "b" is now the least recently used
+    cache.set('c', CacheEntry(200, [], b'1234'))
+
+    assert cache.get('b') is None
+    assert cache.get('a').body == b'1234'
+    assert cache.get('c').body == b'1234'
+    assert cache.size == 8
+
+
+def test_sqlite_cache_keeps_its_totals(tmpdir):
+    path = str(tmpdir.join('cache.sqlite'))
+    cache = SqliteCache(path, max_entries=3, max_size=10)
+    cache.set('a', CacheEntry(200, [], b'123'))
+    cache.set('b', CacheEntry(200, [], b'123'))
+    cache.set('a', CacheEntry(200, [], b'12'))  # replaced, and now the most recent
+    assert cache.size == 5
+    cache.delete('b')
+    cache.delete('b')
+    assert cache.size == 2
+    cache.close()
+
+    # read back from the database
+    cache = SqliteCache(path, max_entries=3, max_size=10)
+    assert cache.size == 2
+    for key in 'bcd':
+        cache.set(key, CacheEntry(200, [], b'1234'))
+    # "a" and "b" are evicted for the size, then "d" fits
+    assert [key for key in 'abcd' if cache.get(key) is not None] == ['c', 'd']
+    assert cache.size == 8
+    cache.close()
+
+
+async def test_sqlite_cache_uses_its_own_thread(tmpdir):
+    cache = SqliteCache(str(tmpdir.join('cache.sqlite')))
+    thread = await cache._run(threading.get_ident)
+    assert thread != threading.get_ident()
+    assert await cache._run(threading.get_ident) == thread
+
+    await cache._run(cache.set, 'a', CacheEntry(200, [], b'1234'))
+    assert (await cache._run(cache.get, 'a')).body == b'1234'
+    cache.close()
@@ -0,0 +1,166 @@
+import asyncio
+
+from aiohttp import ClientConnectionError, web
+
+import pytest
+
+from isshub_sync.connection.circuit import CircuitBreaker, CircuitOpen, CLOSED, HALF_OPEN, OPEN
+from isshub_sync.connection.connection import Connection
+from isshub_sync.connection.retry import RetryPolicy
+
+from .utils import Clock
+
+
+def test_breaker_opens_on_consecutive_failures():
+    clock = Clock()
+    events = []
+    breaker = CircuitBreaker(
+        failure_threshold=3, recovery_timeout=10, clock=clock, on_state_change=events.append
+    )
+
+    def request(**result):
+        breaker.release('foo', breaker.acquire('foo'), **result)
+
+    # failures must be consecutive
+    for result in [{'status': 502}, {'exception': ClientConnectionError()}, {'status': 404}]:
+        request(**result)
+    # neither a failure or a success
+    request(exception=ValueError())
+    request(exception=asyncio.TimeoutError())
+    assert breaker.states == {'foo': CLOSED}
+    request(status=503)
+    request(status=500)
+    assert breaker.states == {'foo': OPEN}
+
+    # requests fail at once until the recovery timeout
+    clock.now += 4
+    with pytest.raises(CircuitOpen) as raised:
+        breaker.acquire('foo')
+    assert (raised.value.host, raised.value.retry_in) == ('foo', 6)
+    # other hosts are not impacted
+    assert breaker.acquire('bar') is False
+
+    # a request started before the circuit was opened is ignored
+    breaker.release('foo', False, status=200)
+    assert breaker.states['foo'] == OPEN
+
+    assert [(event.host, event.previous, event.state, event.reason) for event in events] == [
+        ('foo', CLOSED, OPEN, '3 consecutive failures'),
+    ]
+    assert events[0].changed_at == 1000
+
+
+def test_breaker_opens_on_error_rate():
+    breaker = CircuitBreaker(failure_threshold=None, error_rate=0.5, window=10, min_requests=6)
+
+    def request(status):
+        breaker.release('foo', breaker.acquire('foo'), status=status)
+
+    for status in [500, 500, 500, 200, 200]:
+        request(status)
+    assert breaker.states['foo'] == CLOSED  # not enough requests
+    for status in [200, 200]:
+        request(status)
+    assert breaker.states['foo'] == CLOSED  # 3 failures of the last 7
+    request(500)
+    assert breaker.states['foo'] == OPEN
+    assert breaker.events[-1].reason == 'error rate 50%'
+
+
+def test_breaker_probes_when_half_open():
+    clock = Clock()
+    breaker = CircuitBreaker(
+        failure_threshold=1, recovery_timeout=10, half_open_probes=2, success_threshold=2,
+        clock=clock,
+    )
+    breaker.release('foo', breaker.acquire('foo'), status=503)
+
+    # after the recovery timeout, only probes are let through
+    clock.now += 10
+    assert breaker.acquire('foo') is True
+    assert breaker.states['foo'] == HALF_OPEN
+    assert breaker.acquire('foo') is True
+    with pytest.raises(CircuitOpen) as raised:
+        breaker.acquire('foo')
+    assert raised.value.retry_in == 0
+
+    # a failing probe opens the circuit again
+    breaker.release('foo', True, status=502)
+    assert breaker.states['foo'] == OPEN
+    breaker.release('foo', True, status=200)  # the other probe is ignored
+    with pytest.raises(CircuitOpen):
+        breaker.acquire('foo')
+
+    # probes stopped without an answer free their slot, successful ones close the circuit
+    clock.now += 10
+    breaker.release('foo', breaker.acquire('foo'), exception=asyncio.CancelledError())
+    for __ in range(2):
+        breaker.release('foo', breaker.acquire('foo'), status=200)
+    assert breaker.states['foo'] == CLOSED
+    assert breaker.acquire('foo') is False
+
+    assert [(event.state, event.reason) for event in breaker.events] == [
+        (OPEN, '1 consecutive failures'),
+        (HALF_OPEN, 'recovery timeout'),
+        (OPEN, 'probe failed'),
+        (HALF_OPEN, 'recovery timeout'),
+        (CLOSED, 'probe succeeded'),
+    ]
+
+
+@pytest.fixture
+def harness():
+    """The behaviour of the server, changed by the tests."""
+    return {'down': False, 'received': 0}
+
+
+@pytest.fixture
+def server(loop, test_server, harness):
+
+    async def handler(request):
+        harness['received'] += 1
+        if harness['down']:
+            # a proxy in front of a server that is down
+            return web.json_response({}, status=502)
+        return web.json_response({})
+
+    app = web.Application()
+    app.router.add_get('/{tail:.*}', handler)
+
+    return loop.run_until_complete(test_server(app))
+
+
+async def test_connection_fails_fast_when_host_is_down(server, harness):
+    breaker = CircuitBreaker(failure_threshold=3, recovery_timeout=0.1)
+    retry = RetryPolicy(max_attempts=5, backoff_factor=0)
+    async with Connection(
+            str(server.make_url('/')), circuit_breaker=breaker, retry=retry) as connection:
+        host = server.make_url('/').raw_authority
+
+        harness['down'] = True
+        # the retries stop when the circuit opens
+        with pytest.raises(CircuitOpen):
+            await connection.issues(1).get()
+        assert harness['received'] == 3
+        assert breaker.states == {host: OPEN}
+
+        results = await connection.gather(
+            [connection.issues(number).get for number in range(50)], return_exceptions=True
+        )
+        assert all(isinstance(result, CircuitOpen) for result in results)
+        assert harness['received'] == 3
+
+        # a failing probe
+        await asyncio.sleep(0.1)
+        with pytest.raises(CircuitOpen):
+            await connection.issues(1).get()
+        assert harness['received'] == 4
+
+        # a successful probe closes the circuit
+        harness['down'] = False
+        await asyncio.sleep(0.1)
+        response = await connection.issues(1).get()
+        assert response.status == 200
+        assert breaker.states == {host: CLOSED}
+
+    assert [event.state for event in breaker.events] == [OPEN, HALF_OPEN, OPEN, HALF_OPEN, CLOSED]
@@ -0,0 +1,141 @@
+import asyncio
+
+from aiohttp import web
+
+import pytest
+
+from isshub_sync.connection.cache import MemoryCache
+from isshub_sync.connection.coalescing import RequestCoalescer, SharedResponse
+from isshub_sync.connection.connection import Connection
+from isshub_sync.connection.decoding import iter_json_array
+
+
+@pytest.fixture
+def calls():
+    return []
+
+
+@pytest.fixture
+def server(loop, test_server, calls):
+
+    async def slow(request):
+        calls.append(('slow', request.query_string, request.headers.get('X-Foo')))
+        await asyncio.sleep(0.05)
+        if request.headers.get('If-None-Match') == '"v1"':
+            return web.Response(status=304, headers={'ETag': '"v1"'})
+        return web.json_response([{'foo': 'bar'}], headers={'ETag': '"v1"'})
+
+    async def failing(request):
+        calls.append(('failing', request.query_string, None))
+        await asyncio.sleep(0.05)
+        return web.Response(status=500)
+
+    app = web.Application()
+    app.router.add_get('/slow/', slow)
+    app.router.add_post('/slow/', slow)
+    app.router.add_get('/failing/', failing)
+
+    return loop.run_until_complete(test_server(app))
+
+
+async def test_coalescer_collapses_identical_requests(server, calls):
+    coalescer = RequestCoalescer()
+    async with Connection(str(server.make_url('/')), coalescer=coalescer) as connection:
+        responses = await asyncio.gather(*(connection.slow.get() for __ in range(5)))
+
+        assert calls == [('slow', '', None)]
+        assert all(isinstance(response, SharedResponse) for response in responses)
+        assert [response.shared for response in responses] == [False] + [True] * 4
+        for response in responses:
+            assert response.status == 200
+            assert await response.json() == [{'foo': 'bar'}]
+            assert [item async for item in iter_json_array(response)] == [{'foo': 'bar'}]
+            response.release()
+
+        assert coalescer.stats == {'requests': 5, 'collapsed': 4, 'in_flight': 0}
+
+        # the request is done: a new call is made
+        await connection.slow.get()
+        assert len(calls) == 2
+        assert coalescer.stats == {'requests': 6, 'collapsed': 4, 'in_flight': 0}
+
+
+async def test_coalescer_keys(server, calls):
+    coalescer = RequestCoalescer()
+    async with Connection(str(server.make_url('/')), coalescer=coalescer) as connection:
+        await asyncio.gather(
+            connection.slow.get(),
+            connection.slow.get(params={'page': 2}),
+            connection.slow.get(params={'page': 2}),
+            connection.slow.get(headers={'X-Foo': 'bar'}),
+            connection.slow.get(headers={'x-foo': 'bar'}),
+            connection.slow.post(),
+            connection.slow.post(),
+        )
+
+    assert sorted(calls, key=str) == sorted([
+        ('slow', '', None),
+        ('slow', 'page=2', None),
+        ('slow', '', 'bar'),
+        ('slow', '', None),
+        ('slow', '', None),
+    ], key=str)
+    assert coalescer.stats == {'requests': 5, 'collapsed': 2, 'in_flight': 0}
+
+
+async def test_coalescer_shares_errors(server, calls):
+    coalescer = RequestCoalescer()
+    async with Connection(str(server.make_url('/')), coalescer=coalescer) as connection:
+        responses = await asyncio.gather(*(connection.failing.get() for __ in range(3)))
+
+    assert len(calls) == 1
+    assert [response.status for response in responses] == [500] * 3
+
+    async def send():
+        raise ValueError('foo')
+
+    results = await asyncio.gather(
+        *(coalescer.run('get', 'http://foo/', {}, send) for __ in range(3)),
+        return_exceptions=True
+    )
+    assert [type(result) for result in results] == [ValueError] * 3
+    assert coalescer.stats['in_flight'] == 0
+
+
+async def test_coalescer_cancellation(loop):
+    coalescer = RequestCoalescer()
+    started = []
+
+    async def send():
+        started.append(True)
+        await asyncio.sleep(10)
+
+    first = asyncio.ensure_future(coalescer.run('get', 'http://foo/', {}, send))
+    second = asyncio.ensure_future(coalescer.run('get', 'http://foo/', {}, send))
+    await asyncio.sleep(0.01)
+    flight = coalescer.flights[('get', 'http://foo/', (), ())]
+
+    # the request continues while someone is waiting for it
+    first.cancel()
+    await asyncio.sleep(0.01)
+    assert not flight.task.done()
+
+    # and is cancelled when nobody is waiting anymore
+    second.cancel()
+    await asyncio.sleep(0.01)
+    assert flight.task.cancelled()
+    assert coalescer.stats['in_flight'] == 0
+    assert started == [True]
+
+
+async def test_coalescer_with_cache(server, calls):
+    coalescer = RequestCoalescer()
+    cache = MemoryCache()
+    async with Connection(
+            str(server.make_url('/')), coalescer=coalescer, cache=cache) as connection:
+        await connection.slow.get()
+        responses = await asyncio.gather(connection.slow.get(), connection.slow.get())
+
+    assert len(calls) == 2
+    assert all(response.from_cache for response in responses)
+    assert await responses[1].json() == [{'foo': 'bar'}]
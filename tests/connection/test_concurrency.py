@@ -0,0 +1,205 @@
+import asyncio
+
+from aiohttp import ClientConnectionError, web
+
+import pytest
+
+from isshub_sync.connection.concurrency import AdaptiveLimiter, percentile
+from isshub_sync.connection.connection import Connection
+
+from .utils import Clock
+
+
+def test_percentile():
+    assert percentile([5], 0.9) == 5
+    assert percentile([0.1] * 9 + [10], 0.9) == 0.1
+    assert percentile([0.1] * 8 + [10] * 2, 0.9) == 10
+
+
+def test_limiter_additive_increase_multiplicative_decrease():
+    clock = Clock()
+    limiter = AdaptiveLimiter(initial_limit=4, min_limit=2, max_limit=6, clock=clock)
+
+    # the limit is increased by one after "limit" successes
+    for __ in range(4 + 5):
+        limiter.release('foo', clock(), 200)
+    assert limiter.limits == {'foo': 6}
+
+    # never above the maximum
+    for __ in range(20):
+        limiter.release('foo', clock(), 200)
+    assert limiter.limits == {'foo': 6}
+
+    # errors: halved, and never below the minimum
+    clock.now += 1
+    limiter.release('foo', clock(), 503)
+    assert limiter.limits == {'foo': 3}
+    # a request started before the decrease was sent with the old limit: ignored
+    limiter.release('foo', clock() - 0.5, 502)
+    assert limiter.limits == {'foo': 3}
+    clock.now += 1
+    limiter.release('foo', clock(), 429)
+    assert limiter.limits == {'foo': 2}
+
+    assert [(limit, reason) for __, limit, reason in limiter.history('foo')] == [
+        (5, 'healthy'), (6, 'healthy'), (3, 'status 503'), (2, 'status 429'),
+    ]
+    assert limiter.history('bar') == []
+
+
+def test_limiter_errors_that_decrease_the_limit():
+    clock = Clock()
+    limiter = AdaptiveLimiter(initial_limit=64, clock=clock)
+
+    limiter.release('foo', clock(), 404)  # not an overload
+    limiter.release('foo', clock(), 403)  # no "Retry-After": not a secondary rate limit
+    limiter.release('foo', clock(), exception=ValueError())
+    assert limiter.limits == {'foo': 64}
+
+    for error in [
+            {'status': 403, 'headers': {'Retry-After': '60'}},
+            {'status': 500},
+            {'exception': ClientConnectionError()},
+            {'exception': asyncio.TimeoutError()},
+    ]:
+        clock.now += 1
+        limiter.release('foo', clock(), **error)
+    assert limiter.limits == {'foo': 4}
+    assert [reason for __, __, reason in limiter.history('foo')] == [
+        'status 403', 'status 500', 'ClientConnectionError', 'TimeoutError',
+    ]
+
+
+def test_limiter_decreases_on_rising_latency():
+    clock = Clock()
+    limiter = AdaptiveLimiter(initial_limit=50, window=10, latency_tolerance=2.0, clock=clock)
+
+    def request(latency):
+        started = clock()
+        clock.now += latency
+        limiter.release('foo', started, 200)
+
+    for __ in range(10):
+        request(0.1)
+    assert limiter.snapshot()['foo']['baseline'] == pytest.approx(0.1)
+
+    for __ in range(10):
+        request(0.15)  # slower, but tolerated
+    assert limiter.limits == {'foo': 50}
+    assert limiter.snapshot()['foo']['baseline'] == pytest.approx(0.105)
+
+    for __ in range(10):
+        request(0.5)
+    assert limiter.limits == {'foo': 25}
+    assert limiter.history('foo')[-1][2] == 'latency'
+    assert limiter.snapshot()['foo']['p90'] is None  # measured again with the new limit
+
+
+async def test_limiter_queues_requests_over_the_limit():
+    limiter = AdaptiveLimiter(initial_limit=2, max_limit=10)
+
+    started = [await limiter.acquire('foo') for __ in range(2)]
+    waiting = [asyncio.ensure_future(limiter.acquire('foo')) for __ in range(3)]
+    await asyncio.sleep(0)
+    assert not any(task.done() for task in waiting)
+    assert limiter.snapshot()['foo']['waiting'] == 3
+
+    # a cancelled waiter doesn't take a slot
+    waiting[0].cancel()
+    limiter.release('foo', started[0], 200)
+    await asyncio.sleep(0)
+    assert waiting[0].cancelled()
+    assert waiting[1].done() and not waiting[2].done()
+
+    # a second success: the limit is increased to 3, so the last waiter gets a slot too
+    limiter.release('foo', started[1], 200)
+    await asyncio.sleep(0)
+    assert waiting[2].done()
+    assert limiter.snapshot()['foo']['in_flight'] == 2
+    assert limiter.limits == {'foo': 3}
+
+
+@pytest.fixture
+def harness():
+    """The behaviour of the server, changed by the tests."""
+    return {
+        'in_flight': 0,
+        'max_in_flight': 0,
+        # answer "503" when more requests than this are in flight
+        'capacity': None,
+        'latency': 0.001,
+        'statuses': [],
+    }
+
+
+@pytest.fixture
+def server(loop, test_server, harness):
+
+    async def handler(request):
+        harness['in_flight'] += 1
+        harness['max_in_flight'] = max(harness['max_in_flight'], harness['in_flight'])
+        try:
+            await asyncio.sleep(harness['latency'])
+            if harness['capacity'] is not None and harness['in_flight'] > harness['capacity']:
+                status = 503
+            else:
+                status = 200
+            harness['statuses'].append(status)
+            return web.json_response({}, status=status)
+        finally:
+            harness['in_flight'] -= 1
+
+    app = web.Application()
+    app.router.add_get('/{tail:.*}', handler)
+
+    return loop.run_until_complete(test_server(app))
+
+
+async def run_requests(connection, count, concurrency):
+    return await connection.gather(
+        [connection.issues(number).get for number in range(count)], concurrency=concurrency
+    )
+
+
+async def test_connection_limit_adapts_to_errors(server, harness):
+    harness['capacity'] = 8
+    # latency is not tested here, and may vary with the load of the machine
+    limiter = AdaptiveLimiter(initial_limit=4, max_limit=50, latency_tolerance=100)
+    async with Connection(str(server.make_url('/')), concurrency_limiter=limiter) as connection:
+        responses = await run_requests(connection, 400, concurrency=50)
+        host = server.make_url('/').raw_authority
+
+        assert [response.status for response in responses].count(503) < 40
+        assert 4 <= limiter.limits[host] <= 16
+        reasons = {reason for __, __, reason in limiter.history(host)}
+        assert reasons == {'healthy', 'status 503'}
+        assert harness['max_in_flight'] <= 16
+        assert limiter.snapshot()[host]['in_flight'] == 0
+
+
+async def test_limiter_adapts_to_latency_rising_with_concurrency():
+    clock = Clock()
+    limiter = AdaptiveLimiter(initial_limit=4, max_limit=50, window=10, clock=clock)
+
+    # the host answers in 2ms up to 6 requests in flight, then slows down with each extra one
+    for __ in range(100):
+        limit = limiter.limits.get('foo', 4)
+        started = [await limiter.acquire('foo') for __ in range(limit)]
+        clock.now += 0.002 * max(1, limit - 6 + 1)
+        for start in started:
+            limiter.release('foo', start, 200)
+
+    assert {reason for __, __, reason in limiter.history('foo')} == {'healthy', 'latency'}
+    assert max(limit for __, limit, __ in limiter.history('foo')) <= 8
+    assert limiter.snapshot()['foo']['in_flight'] == 0
+
+
+async def test_connection_limit_without_errors(server, harness):
+    limiter = AdaptiveLimiter(initial_limit=2, max_limit=20, latency_tolerance=100)
+    async with Connection(str(server.make_url('/')), concurrency_limiter=limiter) as connection:
+        await run_requests(connection, 300, concurrency=50)
+        host = server.make_url('/').raw_authority
+
+    assert limiter.limits[host] == 20
+    assert {reason for __, __, reason in limiter.history(host)} == {'healthy'}
+    assert 2 < harness['max_in_flight'] <= 20
@@ -7,6 +7,7 @@ from isshub_sync.connection.connection import (
     Connection,
     Executable,
     HTTP_METHODS,
+    PathTemplate,
 )
 from isshub_sync.connection.constants import DataModes
 
@@ -71,6 +72,65 @@ def test_callable_is_chainable():
     assert value.path == '/foo/bar/baz/1'
 
 
+def test_callable_shares_parent_path():
+
+    connection = Connection(DUMMY_ROOT)
+    parent = connection.foo('bar')
+    first = parent.baz
+    second = parent(1, 'qux/quux')
+
+    assert parent.path == '/foo/bar'
+    assert first.path == '/foo/bar/baz'
+    assert second.path == '/foo/bar/1/qux/quux'
+    assert second.parts == ['foo', 'bar', '1', 'qux', 'quux']
+
+
+def test_callable_without_parts():
+
+    connection = Connection(DUMMY_ROOT)
+    value = Callable(connection)
+
+    assert value.parts == []
+    assert value.path == '/'
+    assert value('foo').path == '/foo'
+
+
+def test_path_template():
+
+    connection = Connection(DUMMY_ROOT)
+    template = PathTemplate(connection.repos('{owner}', '{name}').issues)
+
+    value = template.format(owner='foo', name='bar')
+    assert isinstance(value, Callable)
+    assert value.path == '/repos/foo/bar/issues'
+    assert value.parts == ['repos', 'foo', 'bar', 'issues']
+    assert value.connection is connection
+
+    value = template.format(owner='baz', name=1)(2).comments
+    assert value.path == '/repos/baz/1/issues/2/comments'
+
+
+def test_callable_path_template():
+
+    connection = Connection(DUMMY_ROOT)
+
+    assert connection.foo.bar.path_template == '/foo/bar'
+    assert connection('foo/bar').baz.path_template == '/foo/bar/baz'
+    assert connection.repos('foo', 'bar').issues(1).path_template == '/repos/{}/{}/issues/{}'
+    assert connection.repos('foo', 'bar').issues(1).path == '/repos/foo/bar/issues/1'
+    assert Callable(connection).path_template == '/'
+    assert connection.users(1).get.path_template == '/users/{}'
+
+    template = PathTemplate(connection.repos('{owner}', '{name}').issues)
+    value = template.format(owner='foo', name='bar')(1).comments
+    assert value.path_template == '/repos/{owner}/{name}/issues/{}/comments'
+
+    value = Callable(connection, 'users/foo', template='/users/{login}')
+    assert value.path == '/users/foo'
+    assert value.path_template == '/users/{login}'
+    assert value.repos.path_template == '/users/{login}/repos'
+
+
 @pytest.mark.parametrize('method', HTTP_METHODS)
 def test_callable_with_attr_method_converts_to_executable(method: str):
 
@@ -130,11 +190,15 @@ def client(loop, test_client):
         value = (await request.json())['foo']
         return web.Response(text='foo was set to %s' % value)
 
+    async def dummy_content_type(request):
+        return web.Response(text=request.headers.get('Content-Type', ''))
+
     app = web.Application()
     app.router.add_get('/', dummy_get)
     app.router.add_get('/dummy_get/', dummy_get)
     app.router.add_post('/dummy_post_form/', dummy_post_form)
     app.router.add_post('/dummy_post_json/', dummy_post_json)
+    app.router.add_post('/dummy_content_type/', dummy_content_type)
     app.router.add_get('/dummy_no_end_slash', dummy_get)
 
     return loop.run_until_complete(test_client(app))
@@ -194,6 +258,24 @@ async def test_connection_should_be_able_to_post_json(client):
     assert text == 'foo was set to bar'
 
 
+async def test_connection_should_set_json_content_type(client):
+
+    connection = Connection(DUMMY_ROOT, client=client)
+    connection.root = ''  # test client refuses absolute urls
+
+    response = await connection.dummy_content_type.post(
+        data={'foo': 'bar'}, data_mode=DataModes.JSON
+    )
+    assert await response.text() == 'application/json'
+
+    response = await connection.dummy_content_type.post(
+        data={'foo': 'bar'},
+        data_mode=DataModes.JSON,
+        headers={'content-type': 'application/vnd.github+json'},
+    )
+    assert await response.text() == 'application/vnd.github+json'
+
+
 async def test_connection_default_client(client):
     connection = Connection(DUMMY_ROOT)
     await connection.get()
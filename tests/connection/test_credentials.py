@@ -0,0 +1,134 @@
+from collections import Counter
+
+from aiohttp import web
+
+import pytest
+
+from isshub_sync.connection.connection import Connection
+from isshub_sync.connection.credentials import CredentialPool
+from isshub_sync.connection.ratelimit import RateLimitExceeded, token_key
+from isshub_sync.connection.retry import RetryPolicy
+
+from .utils import Clock
+
+
+def headers(remaining, reset=2000, limit=5000):
+    return {
+        'X-RateLimit-Limit': str(limit),
+        'X-RateLimit-Remaining': str(remaining),
+        'X-RateLimit-Reset': str(reset),
+    }
+
+
+def test_credential_pool_prefers_unknown_then_biggest_budget():
+    pool = CredentialPool(['foo', 'bar', 'baz'], clock=Clock())
+    foo, bar, baz = (token_key('token %s' % token) for token in ('foo', 'bar', 'baz'))
+    assert list(pool.authorizations) == [foo, bar, baz]
+    assert str(pool) == 'CredentialPool (3 tokens)'
+
+    # nothing known: each token is used once
+    assert sorted(pool.choose()[0] for __ in range(3)) == sorted([foo, bar, baz])
+
+    pool.update(foo, 200, headers(100))
+    pool.update(bar, 200, headers(300))
+    pool.update(baz, 200, headers(200))
+    used = Counter(pool.choose()[0] for __ in range(300))
+    # the budgets are levelled: bar alone down to 200, then bar and baz in turn down to 100
+    assert used == {bar: 200, baz: 100}
+    stats = pool.stats
+    assert [stats[key]['remaining'] for key in (foo, bar, baz)] == [100, 100, 100]
+    assert [stats[key]['requests'] for key in (foo, bar, baz)] == [1, 201, 101]
+
+
+def test_credential_pool_skips_exhausted_tokens_until_reset():
+    clock = Clock()
+    pool = CredentialPool(['Bearer foo', 'Bearer bar'], scheme=None, clock=clock, max_wait=30)
+    foo, bar = pool.authorizations
+    assert pool.authorizations[foo] == 'Bearer foo'
+
+    pool.update(foo, 403, headers(0, reset=1060))
+    pool.update(bar, 200, headers(2, reset=1100))
+    assert pool.stats[foo]['available'] is False
+    assert [pool.choose() for __ in range(2)] == [(bar, 0), (bar, 0)]
+
+    # all exhausted: the token available first is used, after the wait
+    pool.max_wait = None
+    assert pool.choose() == (foo, 60)
+    assert pool.stats[bar]['available'] is False
+
+    pool.max_wait = 30
+    with pytest.raises(RateLimitExceeded):
+        pool.choose()
+
+    # after its reset, the budget of a token is unknown, so it can be used again
+    clock.now = 1061
+    assert pool.choose() == (foo, 0)
+    assert pool.stats[foo]['available'] is True
+    assert pool.stats[foo]['remaining'] is None
+
+
+def test_credential_pool_needs_tokens():
+    with pytest.raises(ValueError):
+        CredentialPool([])
+
+
+@pytest.fixture
+def budgets():
+    return {'token foo': 20, 'token bar': 5, 'token baz': 20, 'token qux': 1}
+
+
+@pytest.fixture
+def server(loop, test_server, budgets):
+
+    async def issue(request):
+        authorization = request.headers.get('Authorization')
+        budgets[authorization] -= 1
+        response_headers = headers(max(budgets[authorization], 0), reset=9999999999, limit=20)
+        if budgets[authorization] < 0:
+            return web.json_response(
+                {'message': 'API rate limit exceeded'}, status=403, headers=response_headers
+            )
+        return web.json_response({'token': authorization}, headers=response_headers)
+
+    app = web.Application()
+    app.router.add_get('/issues/{number}/', issue)
+
+    return loop.run_until_complete(test_server(app))
+
+
+async def test_connection_rotates_tokens(server, budgets):
+    pool = CredentialPool(['foo', 'bar', 'baz'], max_wait=60)
+    async with Connection(str(server.make_url('/')), credentials=pool) as connection:
+        tokens = []
+        for number in range(45):  # the sum of the budgets
+            response = await connection.issues(number).get()
+            assert response.status == 200
+            tokens.append((await response.json())['token'])
+
+        # all tokens are exhausted until their reset, known without any failing request
+        with pytest.raises(RateLimitExceeded):
+            await connection.issues(1).get()
+
+        # a given "Authorization" header is kept
+        response = await connection.issues(1).get(headers={'Authorization': 'token qux'})
+        assert (await response.json())['token'] == 'token qux'
+
+    assert Counter(tokens) == {'token foo': 20, 'token bar': 5, 'token baz': 20}
+    # each token is used once to know its budget, then the biggest budgets are used first
+    assert set(tokens[:3]) == {'token foo', 'token bar', 'token baz'}
+    assert set(tokens[3:33]) == {'token foo', 'token baz'}
+    assert budgets == {'token foo': 0, 'token bar': 0, 'token baz': 0, 'token qux': 0}
+
+    stats = pool.stats
+    assert [stat['available'] for stat in stats.values()] == [False] * 3
+    assert [stat['requests'] for stat in stats.values()] == [20, 5, 20]
+
+
+async def test_connection_retries_with_another_token(server, budgets):
+    budgets['token bar'] = 0  # not known yet by the pool
+    pool = CredentialPool(['bar', 'foo'])
+    retry = RetryPolicy(max_attempts=2, backoff_factor=0, statuses={403})
+    async with Connection(
+            str(server.make_url('/')), credentials=pool, retry=retry) as connection:
+        response = await connection.issues(1).get()
+        assert (await response.json())['token'] == 'token foo'
@@ -0,0 +1,201 @@
+import asyncio
+import hashlib
+from email.utils import formatdate
+
+from aiohttp import ClientResponseError, web
+
+import pytest
+
+from isshub_sync.connection.cache import MemoryCache
+from isshub_sync.connection.connection import Connection
+from isshub_sync.connection.cursors import (
+    MemoryCursorStore,
+    SqliteCursorStore,
+    SyncCursor,
+    format_since,
+)
+
+
+def make_date(timestamp):
+    return format_since(formatdate(timestamp, usegmt=True))
+
+
+@pytest.fixture
+def state():
+    # the server time, and the update time of each issue
+    return {
+        'now': 1000,
+        'issues': {number: 100 + number for number in range(1, 6)},
+        'calls': [],
+        'fail_page': None,
+    }
+
+
+@pytest.fixture
+def server(loop, test_server, state):
+
+    async def issues(request):
+        since = request.query.get('since')
+        page = int(request.query.get('page', 1))
+        per_page = int(request.query.get('per_page', 2))
+        state['calls'].append((since, page, request.headers.get('If-None-Match')))
+        if page == state['fail_page']:
+            return web.json_response({'message': 'oops'}, status=500)
+
+        numbers = sorted(
+            number for number, updated in state['issues'].items()
+            if since is None or make_date(updated) >= since
+        )
+        body = [
+            {'number': number, 'updated_at': make_date(state['issues'][number])}
+            for number in numbers[(page - 1) * per_page:page * per_page]
+        ]
+        etag = '"%s"' % hashlib.md5(repr(body).encode()).hexdigest()
+        headers = {'ETag': etag, 'Date': formatdate(state['now'], usegmt=True)}
+        if page * per_page < len(numbers):
+            headers['Link'] = '</issues/?%spage=%s&per_page=%s>; rel="next"' % (
+                '' if since is None else 'since=%s&' % since, page + 1, per_page
+            )
+        if request.headers.get('If-None-Match') == etag:
+            return web.Response(status=304, headers=headers)
+        return web.json_response(body, headers=headers)
+
+    app = web.Application()
+    app.router.add_get('/issues/', issues)
+
+    return loop.run_until_complete(test_server(app))
+
+
+async def sync(connection, **kwargs):
+    return [issue.number async for issue in connection.issues.get.changes(per_page=2, **kwargs)]
+
+
+async def test_changes_only_fetch_updated_items(server, state):
+    store = MemoryCursorStore()
+    async with Connection(str(server.make_url('/')), cursors=store) as connection:
+        key = store.make_key(connection.issues.get)
+
+        assert await sync(connection) == [1, 2, 3, 4, 5]
+        assert [call[:2] for call in state['calls']] == [(None, 1), (None, 2), (None, 3)]
+        assert store.get(key).since == make_date(1000)
+        assert store.get(key).etag is None
+
+        # nothing changed: no items, and the same request will be made next time
+        del state['calls'][:]
+        assert await sync(connection) == []
+        assert state['calls'] == [(make_date(1000), 1, None)]
+        etag = store.get(key).etag
+        assert etag is not None
+        assert store.get(key).since == make_date(1000)
+
+        # still nothing changed: answered by a "304"
+        state['now'] = 2000
+        assert await sync(connection) == []
+        assert state['calls'][-1] == (make_date(1000), 1, etag)
+
+        # one update: only this issue is fetched
+        state['issues'][3] = 1500
+        assert await sync(connection) == [3]
+        assert state['calls'][-1] == (make_date(1000), 1, etag)
+        assert store.get(key).since == make_date(2000)
+        assert store.get(key).etag is None
+
+
+async def test_changes_resume_after_interruption(server, state):
+    store = MemoryCursorStore()
+    async with Connection(str(server.make_url('/')), cursors=store) as connection:
+        key = store.make_key(connection.issues.get)
+
+        numbers = []
+        changes = connection.issues.get.changes(per_page=2)
+        async for issue in changes:
+            numbers.append(issue.number)
+            if len(numbers) == 3:
+                break
+        await changes.aclose()
+        assert numbers == [1, 2, 3]
+        cursor = store.get(key)
+        assert cursor.next_url.endswith('/issues/?page=2&per_page=2')
+        assert (cursor.since, cursor.next_since) == (None, make_date(1000))
+        assert str(cursor) == 'SyncCursor (since None, interrupted)'
+
+        # the page being read is fetched again, then the next ones
+        state['now'] = 2000
+        assert await sync(connection) == [3, 4, 5]
+        assert store.get(key).since == make_date(1000)
+        assert store.get(key).next_url is None
+
+        # a failing page is the one to resume from
+        state['issues'].update({1: 1500, 2: 1500, 3: 1500})
+        state['fail_page'] = 2
+        with pytest.raises(ClientResponseError):
+            await sync(connection)
+        assert store.get(key).next_url.endswith(
+            '/issues/?since=%s&page=2&per_page=2' % make_date(1000)
+        )
+        state['fail_page'] = None
+        assert await sync(connection) == [3]
+        assert store.get(key).since == make_date(2000)
+
+
+async def test_changes_are_serialized_by_endpoint(server, state):
+    store = MemoryCursorStore()
+    async with Connection(str(server.make_url('/')), cursors=store) as connection:
+        results = await asyncio.gather(sync(connection), sync(connection))
+
+    # the second sync started from the cursor saved by the first one
+    assert sorted(results) == [[], [1, 2, 3, 4, 5]]
+    assert [call[0] for call in state['calls']] == [None, None, None, make_date(1000)]
+
+
+async def test_changes_keys(server, state):
+    store = MemoryCursorStore()
+    async with Connection(str(server.make_url('/'))) as connection:
+        assert await sync(connection, store=store, params={'state': 'all'}) == [1, 2, 3, 4, 5]
+        assert await sync(connection, store=store, key='other') == [1, 2, 3, 4, 5]
+        assert sorted(store.cursors) == [
+            'GET %s' % server.make_url('/issues/?state=all'),
+            'other',
+        ]
+
+        with pytest.raises(ValueError):
+            connection.issues.get.changes()
+
+
+async def test_changes_without_since(server, state):
+    store = MemoryCursorStore()
+    async with Connection(str(server.make_url('/')), cursors=store) as connection:
+        assert await sync(connection, since_param=None) == [1, 2, 3, 4, 5]
+        assert await sync(connection, since_param=None) == []
+        assert state['calls'][-1][1:] == (1, store.get(store.make_key(connection.issues.get)).etag)
+
+        state['issues'][1] = 1500
+        assert await sync(connection, since_param=None) == [1, 2, 3, 4, 5]
+        assert {call[0] for call in state['calls']} == {None}
+
+
+async def test_changes_with_cache(server, state):
+    store = MemoryCursorStore()
+    async with Connection(
+            str(server.make_url('/')), cursors=store, cache=MemoryCache()) as connection:
+        assert await sync(connection) == [1, 2, 3, 4, 5]
+        assert await sync(connection) == []
+        # the "304" replayed from the cache is seen as "nothing changed"
+        assert await sync(connection) == []
+        assert state['calls'][-1][2] is not None
+
+
+async def test_sqlite_cursor_store_survives_restarts(server, state, tmpdir):
+    path = str(tmpdir.join('cursors.db'))
+    store = SqliteCursorStore(path)
+    async with Connection(str(server.make_url('/')), cursors=store) as connection:
+        assert await sync(connection) == [1, 2, 3, 4, 5]
+        key = store.make_key(connection.issues.get)
+    store.close()
+
+    store = SqliteCursorStore(path)
+    assert store.get(key).since == make_date(1000)
+    store.set(key, SyncCursor(since=make_date(104)))
+    async with Connection(str(server.make_url('/')), cursors=store) as connection:
+        assert await sync(connection) == [4, 5]
+    store.close()
@@ -0,0 +1,133 @@
+import json
+
+from aiohttp import web
+
+import pytest
+
+from isshub_sync.connection.cache import MemoryCache
+from isshub_sync.connection.connection import Connection
+from isshub_sync.connection.decoding import iter_json_array, iter_json_decode, read_json
+from isshub_sync.utils import DictObject
+
+
+ITEMS = [
+    {'number': 1, 'title': 'With "quotes", [brackets] and {braces}', 'labels': [{'name': 'é'}]},
+    12345,
+    -1.5e10,
+    'a string, with a comma',
+    None,
+    True,
+    [],
+    {},
+    {'user': {'login': 'fooé€'}},
+]
+
+
+def test_iter_json_decode_stops_on_incomplete_elements():
+    assert list(iter_json_decode('1, 2')) == [(1, 1)]
+    assert list(iter_json_decode('{"a": 1}, {"b"')) == [({'a': 1}, 8)]
+    assert list(iter_json_decode('"foo", tr')) == [('foo', 5)]
+    assert list(iter_json_decode('1 ]')) == [(1, 1)]
+    assert list(iter_json_decode(']')) == []
+    assert list(iter_json_decode(', 2.', first=False)) == []
+    assert list(iter_json_decode(', {"a": 1.5e', first=False)) == []
+
+
+@pytest.mark.parametrize('buffer', ['1 2]', ',,1]', ',1]', '1,]', '1,,2]', 'x]', '{"a" 1}, 2, 3]'])
+def test_iter_json_decode_invalid(buffer):
+    with pytest.raises(ValueError):
+        list(iter_json_decode(buffer))
+
+
+@pytest.fixture
+def server(loop, test_server):
+
+    async def items(request):
+        return web.Response(
+            body=json.dumps(ITEMS, ensure_ascii=False).encode(),
+            content_type='application/json',
+            headers={'ETag': '"v1"'} if 'etag' in request.query else {},
+            status=304 if request.headers.get('If-None-Match') == '"v1"' else 200,
+        )
+
+    async def empty(request):
+        return web.json_response([])
+
+    async def not_an_array(request):
+        return web.json_response({'foo': 'bar'})
+
+    async def truncated(request):
+        return web.Response(body=b'[{"foo": 1}, {"bar"', content_type='application/json')
+
+    async def missing_comma(request):
+        return web.Response(body=b'[1 2' + b', 3' * 100000 + b']', content_type='application/json')
+
+    async def extra_comma(request):
+        return web.Response(body=b'[,,1' + b', 3' * 100000 + b']', content_type='application/json')
+
+    app = web.Application()
+    app.router.add_get('/items/', items)
+    app.router.add_get('/empty/', empty)
+    app.router.add_get('/not_an_array/', not_an_array)
+    app.router.add_get('/truncated/', truncated)
+    app.router.add_get('/missing_comma/', missing_comma)
+    app.router.add_get('/extra_comma/', extra_comma)
+
+    return loop.run_until_complete(test_server(app))
+
+
+async def test_read_json(server):
+    async with Connection(str(server.make_url('/'))) as connection:
+        body = await read_json(await connection.items.get())
+
+    assert body == ITEMS
+    assert isinstance(body[0], DictObject)
+    assert body[0].labels[0].name == 'é'
+    assert body[8].user.login == 'fooé€'
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 7, 64 * 1024])
+async def test_iter_json_array(server, chunk_size):
+    async with Connection(str(server.make_url('/'))) as connection:
+        response = await connection.items.get()
+        items = [item async for item in iter_json_array(response, chunk_size=chunk_size)]
+
+    assert items == ITEMS
+    assert isinstance(items[0], DictObject)
+    assert items[0].labels[0].name == 'é'
+
+
+async def test_iter_json_array_from_cache(server):
+    async with Connection(str(server.make_url('/')), cache=MemoryCache()) as connection:
+        await (await connection.items.get(params={'etag': 1})).read()
+        response = await connection.items.get(params={'etag': 1})
+        assert response.from_cache
+        items = [item async for item in iter_json_array(response)]
+
+    assert items == ITEMS
+
+
+async def test_iter_json_array_empty(server):
+    async with Connection(str(server.make_url('/'))) as connection:
+        response = await connection.empty.get()
+        assert [item async for item in iter_json_array(response)] == []
+
+
+@pytest.mark.parametrize('path', ['not_an_array', 'truncated', 'missing_comma', 'extra_comma'])
+async def test_iter_json_array_invalid(server, path):
+    async with Connection(str(server.make_url('/'))) as connection:
+        response = await connection(path).get()
+        with pytest.raises(ValueError):
+            async for __ in iter_json_array(response, chunk_size=4):
+                pass
+
+
+@pytest.mark.parametrize('path', ['missing_comma', 'extra_comma'])
+async def test_iter_json_array_fails_early(server, path):
+    async with Connection(str(server.make_url('/'))) as connection:
+        response = await connection(path).get(stream=True)
+        with pytest.raises(ValueError):
+            async for __ in iter_json_array(response, chunk_size=16):
+                pass
+        assert not response.content.at_eof()  # the rest of the body is not read
+        response.close()
@@ -0,0 +1,154 @@
+import hashlib
+import io
+import os
+import tracemalloc
+
+from aiohttp import ClientResponseError, web
+
+import pytest
+
+from isshub_sync.connection.cache import MemoryCache
+from isshub_sync.connection.coalescing import RequestCoalescer
+from isshub_sync.connection.connection import Connection
+
+
+BODY = bytes(range(256)) * 4096  # 1MB
+BLOCK = os.urandom(64 * 1024)
+BLOCKS = 128  # 8MB
+
+
+@pytest.fixture
+def calls():
+    return []
+
+
+@pytest.fixture
+def server(loop, test_server, calls):
+
+    async def archive(request):
+        calls.append(request.headers.get('Range'))
+        headers = {'ETag': '"v1"'}
+        http_range = request.http_range
+        if http_range.start is None:
+            return web.Response(body=BODY, headers=headers)
+        if http_range.start >= len(BODY):
+            headers['Content-Range'] = 'bytes */%d' % len(BODY)
+            return web.Response(status=416, headers=headers)
+        headers['Content-Range'] = 'bytes %d-%d/%d' % (http_range.start, len(BODY) - 1, len(BODY))
+        return web.Response(status=206, body=BODY[http_range], headers=headers)
+
+    async def no_range(request):
+        calls.append(request.headers.get('Range'))
+        return web.Response(body=BODY)
+
+    async def big(request):
+        response = web.StreamResponse()
+        response.content_length = len(BLOCK) * BLOCKS
+        await response.prepare(request)
+        for __ in range(BLOCKS):
+            await response.write(BLOCK)
+        return response
+
+    app = web.Application()
+    app.router.add_get('/archive/', archive)
+    app.router.add_get('/no-range/', no_range)
+    app.router.add_get('/big/', big)
+
+    return loop.run_until_complete(test_server(app))
+
+
+async def test_download_to_path(server, tmpdir):
+    destination = str(tmpdir.join('archive'))
+    async with Connection(str(server.make_url('/'))) as connection:
+        result = await connection.archive.get.download(destination, hash_name='sha256')
+
+    assert (result.status, result.size, result.received, result.resumed) == (
+        200, len(BODY), len(BODY), False
+    )
+    assert result.hexdigest == hashlib.sha256(BODY).hexdigest()
+    assert str(result) == 'Download (%d bytes)' % len(BODY)
+    with open(destination, 'rb') as fileobj:
+        assert fileobj.read() == BODY
+
+
+async def test_download_to_file_object(server):
+    fileobj = io.BytesIO()
+    async with Connection(str(server.make_url('/'))) as connection:
+        result = await connection.archive.get.download(fileobj, chunk_size=1000)
+
+        assert result.size == len(BODY)
+        assert result.hexdigest is None
+        assert fileobj.getvalue() == BODY
+
+        with pytest.raises(ValueError):
+            await connection.archive.get.download(fileobj, resume=True)
+
+
+async def test_download_resume(server, tmpdir, calls):
+    destination = str(tmpdir.join('archive'))
+    with open(destination, 'wb') as fileobj:
+        fileobj.write(BODY[:1000])
+
+    async with Connection(str(server.make_url('/'))) as connection:
+        result = await connection.archive.get.download(
+            destination, hash_name='md5', resume=True
+        )
+        assert calls == ['bytes=1000-']
+        assert (result.status, result.size, result.received, result.resumed) == (
+            206, len(BODY), len(BODY) - 1000, True
+        )
+        assert result.hexdigest == hashlib.md5(BODY).hexdigest()
+        with open(destination, 'rb') as fileobj:
+            assert fileobj.read() == BODY
+
+        # already complete
+        result = await connection.archive.get.download(
+            destination, hash_name='md5', resume=True
+        )
+        assert calls[-1] == 'bytes=%d-' % len(BODY)
+        assert (result.status, result.size, result.received) == (416, len(BODY), 0)
+        assert result.hexdigest == hashlib.md5(BODY).hexdigest()
+
+        # ranges not supported: the whole body is downloaded again
+        with open(destination, 'wb') as fileobj:
+            fileobj.write(b'foo')
+        result = await connection('no-range').get.download(destination, resume=True)
+        assert (result.status, result.size, result.resumed) == (200, len(BODY), False)
+        with open(destination, 'rb') as fileobj:
+            assert fileobj.read() == BODY
+
+
+async def test_download_errors(server, tmpdir):
+    async with Connection(str(server.make_url('/'))) as connection:
+        with pytest.raises(ClientResponseError):
+            await connection.missing.get.download(str(tmpdir.join('missing')))
+
+
+async def test_download_does_not_use_cache_nor_coalescer(server, tmpdir, calls):
+    cache = MemoryCache()
+    coalescer = RequestCoalescer()
+    async with Connection(
+            str(server.make_url('/')), cache=cache, coalescer=coalescer) as connection:
+        for __ in range(2):
+            result = await connection.archive.get.download(io.BytesIO())
+            assert result.status == 200
+
+    assert calls == [None, None]
+    assert coalescer.stats['requests'] == 0
+    assert len(cache.entries) == 0
+
+
+async def test_download_memory_is_flat(server):
+    fileobj = io.BytesIO()  # a file object that doesn't keep what it's given
+    fileobj.write = lambda chunk: len(chunk)
+
+    async with Connection(str(server.make_url('/'))) as connection:
+        tracemalloc.start()
+        try:
+            result = await connection.big.get.download(fileobj, chunk_size=64 * 1024)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    assert result.size == len(BLOCK) * BLOCKS
+    assert peak < result.size / 8
@@ -0,0 +1,161 @@
+import asyncio
+import re
+
+from aiohttp import ClientResponseError, web
+
+import pytest
+
+from isshub_sync.connection.connection import Connection
+from isshub_sync.connection.graphql import GraphQLBatcher, GraphQLEnum, GraphQLError
+
+
+LOOKUP_RE = re.compile(r'(q\d+): repository\(owner: "([^"]*)", name: "([^"]*)"\) \{ (.*) \}')
+
+
+@pytest.fixture
+def queries():
+    return []
+
+
+@pytest.fixture
+def server(loop, test_server, queries):
+
+    async def graphql(request):
+        assert request.content_type == 'application/json'
+        query = (await request.json())['query']
+        queries.append(query)
+
+        if 'broken' in query:
+            return web.json_response({'errors': [{'message': 'Parse error'}]})
+        if 'crash' in query:
+            return web.Response(status=502)
+        if 'slow' in query:
+            await asyncio.sleep(0.2)
+
+        data = {}
+        errors = []
+        for alias, owner, name, selection in LOOKUP_RE.findall(query):
+            if name == 'missing':
+                data[alias] = None
+                errors.append({'type': 'NOT_FOUND', 'path': [alias], 'message': 'Not found'})
+            else:
+                data[alias] = {'nameWithOwner': '%s/%s' % (owner, name), 'selection': selection}
+        return web.json_response({'data': data, 'errors': errors} if errors else {'data': data})
+
+    app = web.Application()
+    app.router.add_post('/graphql', graphql)
+
+    return loop.run_until_complete(test_server(app))
+
+
+def repository(batcher, owner, name, **kwargs):
+    return batcher.lookup('repository', {'owner': owner, 'name': name}, 'nameWithOwner', **kwargs)
+
+
+async def test_graphql_batcher_sends_lookups_in_one_query(server, queries):
+    async with Connection(str(server.make_url('/'))) as connection:
+        batcher = GraphQLBatcher(connection)
+        results = await asyncio.gather(*(
+            repository(batcher, 'foo', 'repo%d' % index) for index in range(10)
+        ))
+
+    assert len(queries) == 1
+    assert queries[0].startswith('query {\nq0: repository(owner: "foo", name: "repo0") {')
+    assert [result.nameWithOwner for result in results] == [
+        'foo/repo%d' % index for index in range(10)
+    ]
+    assert batcher.stats == {'batches': 1, 'lookups': 10, 'pending': 0}
+
+
+async def test_graphql_batcher_limits(server, queries):
+    async with Connection(str(server.make_url('/'))) as connection:
+        batcher = GraphQLBatcher(connection, window=10, max_size=4)
+        await asyncio.gather(*(repository(batcher, 'foo', 'repo%d' % index) for index in range(8)))
+        assert [query.count('repository(') for query in queries] == [4, 4]
+
+        del queries[:]
+        batcher = GraphQLBatcher(connection, window=10, max_cost=10)
+        await asyncio.gather(*(
+            repository(batcher, 'foo', 'repo%d' % index, cost=cost)
+            for index, cost in enumerate([3, 3, 4, 1, 9])
+        ))
+        assert [query.count('repository(') for query in queries] == [3, 2]
+
+
+async def test_graphql_batcher_window(server, queries):
+    async with Connection(str(server.make_url('/'))) as connection:
+        async with GraphQLBatcher(connection, window=0.05) as batcher:
+            first = asyncio.ensure_future(repository(batcher, 'foo', 'bar'))
+            await asyncio.sleep(0.01)
+            second = asyncio.ensure_future(repository(batcher, 'foo', 'baz'))
+            await asyncio.sleep(0.1)
+            third = asyncio.ensure_future(repository(batcher, 'foo', 'qux'))
+            await asyncio.sleep(0)  # queued, then sent when leaving the context manager
+
+        assert batcher.stats == {'batches': 2, 'lookups': 3, 'pending': 0}
+        assert (await first).nameWithOwner == 'foo/bar'
+        assert (await second).nameWithOwner == 'foo/baz'
+        assert (await third).nameWithOwner == 'foo/qux'
+
+
+async def test_graphql_batcher_errors(server, queries):
+    async with Connection(str(server.make_url('/'))) as connection:
+        async with GraphQLBatcher(connection) as batcher:
+            results = await asyncio.gather(
+                repository(batcher, 'foo', 'bar'),
+                repository(batcher, 'foo', 'missing'),
+                return_exceptions=True,
+            )
+        assert results[0].nameWithOwner == 'foo/bar'
+        assert isinstance(results[1], GraphQLError)
+        assert str(results[1]) == 'Not found'
+        assert results[1].errors[0]['type'] == 'NOT_FOUND'
+
+        async with GraphQLBatcher(connection) as batcher:
+            results = await asyncio.gather(
+                repository(batcher, 'foo', 'bar'),
+                repository(batcher, 'foo', 'broken'),
+                return_exceptions=True,
+            )
+        assert [type(result) for result in results] == [GraphQLError, GraphQLError]
+        assert str(results[0]) == 'Parse error'
+
+        async with GraphQLBatcher(connection) as batcher:
+            results = await asyncio.gather(
+                repository(batcher, 'foo', 'bar'),
+                repository(batcher, 'foo', 'crash'),
+                return_exceptions=True,
+            )
+        assert [type(result) for result in results] == [ClientResponseError] * 2
+
+
+async def test_graphql_batcher_cancelled_batch(server, queries):
+    async with Connection(str(server.make_url('/'))) as connection:
+        batcher = GraphQLBatcher(connection)
+        lookups = asyncio.gather(
+            repository(batcher, 'foo', 'slow'),
+            repository(batcher, 'foo', 'bar'),
+            return_exceptions=True,
+        )
+        await asyncio.sleep(0.05)  # the batch is sent after the window, and is being answered
+        assert len(batcher._sending) == 1
+        for task in list(batcher._sending):
+            task.cancel()
+
+        results = await asyncio.wait_for(lookups, 1)
+        assert [type(result) for result in results] == [asyncio.CancelledError] * 2
+
+
+async def test_graphql_batcher_arguments(server, queries):
+    async with Connection(str(server.make_url('/'))) as connection:
+        async with GraphQLBatcher(connection) as batcher:
+            result = await batcher.lookup(
+                'search',
+                {'query': 'is:open "foo"', 'type': GraphQLEnum('ISSUE'), 'first': 10},
+                'issueCount',
+            )
+
+    assert result is None
+    assert 'q0: search(query: "is:open \\"foo\\"", type: ISSUE, first: 10) { issueCount }' in (
+        queries[0]
+    )
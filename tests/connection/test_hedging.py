@@ -0,0 +1,189 @@
+import asyncio
+
+from aiohttp import web
+
+import pytest
+
+from isshub_sync.connection.connection import Connection
+from isshub_sync.connection.hedging import HedgingPolicy
+
+
+@pytest.fixture
+def harness():
+    """The behaviour of the server, changed by the tests."""
+    return {
+        # the latencies of the next requests, the following ones being fast
+        'latencies': [],
+        'received': 0,
+        'cancelled': 0,
+        'answered': 0,
+    }
+
+
+@pytest.fixture
+def server(loop, test_server, harness):
+
+    async def handler(request):
+        harness['received'] += 1
+        number = harness['received']
+        latency = harness['latencies'].pop(0) if harness['latencies'] else 0
+        try:
+            await asyncio.sleep(latency)
+        except asyncio.CancelledError:
+            harness['cancelled'] += 1
+            raise
+        harness['answered'] += 1
+        if request.path.startswith('/error/') and number == 1:
+            return web.json_response({}, status=500)
+        return web.json_response({'number': number})
+
+    app = web.Application(handler_args={'handler_cancellation': True})
+    app.router.add_route('*', '/{tail:.*}', handler)
+
+    return loop.run_until_complete(test_server(app))
+
+
+async def test_hedging_with_fixed_delay(server, harness):
+    hedging = HedgingPolicy(delay=0.05, max_extra=1)
+    async with Connection(str(server.make_url('/'))) as connection:
+        harness['latencies'] = [5]  # the first request hangs
+        response = await connection.issues(1).get(hedging=hedging)
+        assert (await response.json())['number'] == 2  # the second request won
+
+        await asyncio.sleep(0.05)
+        assert harness['cancelled'] == 1  # the first one was cancelled
+
+        # fast requests are not hedged
+        response = await connection.issues(1).get(hedging=hedging)
+        assert (await response.json())['number'] == 3
+
+        # other methods are never hedged
+        harness['latencies'] = [0.1]
+        response = await connection.issues(1).post(hedging=hedging)
+        assert (await response.json())['number'] == 4
+
+    assert hedging.stats == {
+        'requests': 2, 'hedged': 1, 'wins': 1, 'skipped': 0, 'extra_ratio': 0.5,
+    }
+
+
+async def test_hedging_with_delay_from_latencies(server, harness):
+    hedging = HedgingPolicy(min_samples=5, max_extra=1)
+    async with Connection(str(server.make_url('/'))) as connection:
+        # not enough latencies known for this path template: not hedged
+        harness['latencies'] = [0] * 4 + [0.3]
+        for number in range(5):
+            response = await connection.issues(number).get(hedging=hedging)
+            response.release()
+        assert hedging.hedged == 0
+        assert len(hedging.latencies['/issues/{}']) == 5
+        assert hedging.get_delay('/issues/{}') >= 0.3
+
+        # the latencies of other path templates are not used
+        harness['latencies'] = [0.5]
+        response = await connection.repos(1).get(hedging=hedging)
+        response.release()
+        assert hedging.hedged == 0
+
+        # once the slow request is out of the 95th percentile, the delay is the minimum one
+        for number in range(20):
+            response = await connection.issues(number).get(hedging=hedging)
+            response.release()
+        assert hedging.get_delay('/issues/{}') == 0.05
+        harness['latencies'] = [2]
+        response = await connection.issues(1).get(hedging=hedging)
+        response.release()
+
+    assert (hedging.hedged, hedging.wins) == (1, 1)
+
+
+async def test_hedging_extra_load_is_capped(server, harness):
+    hedging = HedgingPolicy(delay=0.01, max_extra=0.2)
+    async with Connection(str(server.make_url('/'))) as connection:
+        harness['latencies'] = [0.05] * 100
+        responses = await asyncio.gather(*(
+            connection.issues(number).get(hedging=hedging) for number in range(20)
+        ))
+        for response in responses:
+            response.release()
+
+    assert hedging.stats['requests'] == 20
+    assert hedging.stats['hedged'] + hedging.stats['skipped'] == 20
+    assert hedging.stats['hedged'] <= 4
+    assert hedging.stats['extra_ratio'] <= 0.2
+
+
+async def test_hedging_both_answers(server, harness):
+    hedging = HedgingPolicy(delay=0.01, max_extra=1)
+    async with Connection(str(server.make_url('/'))) as connection:
+        # both answer: the first answer wins, the other is released
+        harness['latencies'] = [0.03, 0.03]
+        response = await connection.issues(1).get(hedging=hedging)
+        assert (await response.json())['number'] in (1, 2)
+
+        # an error response is an answer
+        harness['latencies'] = [0.03, 0.06]
+        response = await connection.error(1).get(hedging=hedging)
+        assert response.status == 200
+        response.release()
+
+    assert hedging.hedged == 2
+    assert harness['received'] == 4
+
+
+class Response:
+
+    def __init__(self, name):
+        self.name = name
+        self.released = False
+
+    def release(self):
+        self.released = True
+
+
+async def test_hedging_failing_requests():
+    hedging = HedgingPolicy(delay=0.01, max_extra=1)
+    responses = []
+
+    def sender(*outcomes):
+        outcomes = list(outcomes)
+
+        async def send():
+            latency, error = outcomes.pop(0)
+            if isinstance(latency, asyncio.Future):
+                await latency
+            else:
+                await asyncio.sleep(latency)
+            if error is asyncio.CancelledError:
+                raise error
+            if error:
+                raise ValueError(error)
+            responses.append(Response(len(responses)))
+            return responses[-1]
+
+        return send
+
+    # a failing request loses
+    send = sender((0.02, 'first'), (0.05, None))
+    assert (await hedging.run(send, 'get', '/foo')).name == 0
+    assert hedging.wins == 1
+
+    # both fail: the exception of the last one is raised
+    send = sender((0.02, 'first'), (0.03, 'second'))
+    with pytest.raises(ValueError, match='second'):
+        await hedging.run(send, 'get', '/foo')
+
+    # both answer at once: the first one wins, the other response is released
+    answered = asyncio.get_event_loop().create_future()
+    asyncio.get_event_loop().call_later(0.03, answered.set_result, None)
+    send = sender((answered, None), (answered, None))
+    assert (await hedging.run(send, 'get', '/foo')).name == 1
+    assert [response.released for response in responses[1:]] == [False, True]
+
+    # a cancelled request loses
+    send = sender((0.02, asyncio.CancelledError), (0.03, None))
+    assert (await hedging.run(send, 'get', '/foo')).name == 3
+
+    assert hedging.stats == {
+        'requests': 4, 'hedged': 4, 'wins': 2, 'skipped': 0, 'extra_ratio': 1.0,
+    }
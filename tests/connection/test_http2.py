@@ -0,0 +1,165 @@
+import asyncio
+import json
+import socket
+
+from aiohttp import ClientConnectionError, ClientResponseError, web
+
+import pytest
+
+from isshub_sync.connection.connection import Connection
+from isshub_sync.connection.constants import DataModes
+from isshub_sync.connection.decoding import iter_json_array, read_json
+from isshub_sync.connection.http2 import HttpxClient, HttpxResponse
+from isshub_sync.connection.retry import RetryPolicy
+
+pytest.importorskip('httpx')
+
+
+@pytest.fixture
+def server(loop, test_server):
+
+    async def echo(request):
+        return web.json_response({
+            'method': request.method,
+            'query': dict(request.query),
+            'foo': request.headers.get('X-Foo'),
+            'content_type': request.content_type,
+            'body': (await request.read()).decode(),
+        })
+
+    async def items(request):
+        return web.json_response([{'number': number} for number in range(100)])
+
+    async def missing(request):
+        return web.Response(status=404, reason='Nope')
+
+    app = web.Application()
+    app.router.add_route('*', '/echo/', echo)
+    app.router.add_get('/items/', items)
+    app.router.add_get('/missing/', missing)
+
+    return loop.run_until_complete(test_server(app))
+
+
+async def test_httpx_client_requests(server):
+    async with HttpxClient() as client:
+        connection = Connection(str(server.make_url('/')), client=client)
+
+        response = await connection.echo.get(params={'page': 2}, headers={'X-Foo': 'bar'})
+        assert isinstance(response, HttpxResponse)
+        assert response.status == 200
+        assert response.ok
+        assert response.version == 'HTTP/1.1'  # no HTTP/2 negotiation without TLS
+        assert response.headers['content-type'] == 'application/json; charset=utf-8'
+        assert str(response.url) == str(server.make_url('/echo/?page=2'))
+        body = await read_json(response)
+        assert (body.method, body.query.page, body.foo) == ('GET', '2', 'bar')
+        assert (await response.json())['foo'] == 'bar'  # the body can be read again
+
+        response = await connection.echo.post(data={'foo': 'bar'})
+        body = await response.json()
+        assert (body['content_type'], body['body']) == (
+            'application/x-www-form-urlencoded', 'foo=bar'
+        )
+
+        response = await connection.echo.put(data={'foo': 'bar'}, data_mode=DataModes.JSON)
+        body = await response.json()
+        assert (body['method'], body['content_type'], json.loads(body['body'])) == (
+            'PUT', 'application/json', {'foo': 'bar'}
+        )
+
+        assert client.started
+    assert not client.started
+
+
+async def test_httpx_client_streams_body(server):
+    async with HttpxClient() as client:
+        connection = Connection(str(server.make_url('/')), client=client)
+        response = await connection.items.get()
+        assert [item.number async for item in iter_json_array(response, chunk_size=10)] == (
+            list(range(100))
+        )
+        response.release()
+
+
+async def test_httpx_client_errors(server):
+    async with HttpxClient() as client:
+        connection = Connection(str(server.make_url('/')), client=client)
+
+        response = await connection.missing.get()
+        assert response.status == 404
+        with pytest.raises(ClientResponseError) as raised:
+            response.raise_for_status()
+        assert raised.value.status == 404
+        assert raised.value.message == 'Nope'
+        assert raised.value.request_info.method == 'GET'
+
+        # transport errors are the ones of aiohttp, so they are retried
+        attempts = []
+        connection = Connection(
+            'http://127.0.0.1:1', client=client,
+            retry=RetryPolicy(max_attempts=2, backoff_factor=0, on_retry=attempts.append),
+        )
+        with pytest.raises(ClientConnectionError):
+            await connection.foo.get()
+        assert len(attempts) == 1
+
+
+async def test_connection_creates_and_closes_its_httpx_client(server):
+
+    class Http2Connection(Connection):
+        DEFAULT_CLIENT_CLASS = HttpxClient
+
+    async with Http2Connection(str(server.make_url('/'))) as connection:
+        response = await connection.echo.get()
+        assert response.status == 200
+        client = connection.client
+        assert isinstance(client, HttpxClient)
+    assert not client.started
+
+
+@pytest.fixture
+def http2_server(loop):
+    hypercorn_asyncio = pytest.importorskip('hypercorn.asyncio')
+    from hypercorn.config import Config
+
+    clients = set()
+
+    async def app(scope, receive, send):
+        if scope['type'] != 'http':
+            return
+        clients.add(tuple(scope['client']))
+        await send({'type': 'http.response.start', 'status': 200, 'headers': [
+            (b'content-type', b'application/json'),
+        ]})
+        await send({'type': 'http.response.body', 'body': b'{"version": "%s"}' % (
+            scope['http_version'].encode()
+        )})
+
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+
+    config = Config()
+    config.bind = ['127.0.0.1:%d' % port]
+    config.accesslog = config.errorlog = None
+    shutdown = asyncio.Event()
+    task = loop.create_task(hypercorn_asyncio.serve(app, config, shutdown_trigger=shutdown.wait))
+    loop.run_until_complete(asyncio.sleep(0.2))
+
+    yield 'http://127.0.0.1:%d' % port, clients
+
+    shutdown.set()
+    loop.run_until_complete(task)
+
+
+async def test_httpx_client_multiplexes_requests(http2_server):
+    root, clients = http2_server
+    async with HttpxClient(http1=False) as client:
+        connection = Connection(root, client=client)
+        responses = await asyncio.gather(*(connection.foo(index).get() for index in range(50)))
+        bodies = [await response.json() for response in responses]
+
+    assert bodies == [{'version': '2'}] * 50
+    assert responses[0].version == 'HTTP/2'
+    assert len(clients) == 1  # a single connection for all the requests
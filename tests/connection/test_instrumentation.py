@@ -0,0 +1,177 @@
+import asyncio
+
+from aiohttp import ClientConnectionError, ClientSession, web
+
+import pytest
+
+from isshub_sync.connection.connection import Connection, PathTemplate
+from isshub_sync.connection.instrumentation import Instrumentation, RequestEvent
+from isshub_sync.connection.pool import ClientPool
+
+
+@pytest.fixture
+def server(loop, test_server):
+
+    async def issue(request):
+        await asyncio.sleep(0.02)
+        return web.json_response({'number': int(request.match_info['number'])})
+
+    async def create(request):
+        await request.read()
+        return web.json_response({'created': True}, status=201)
+
+    async def missing(request):
+        return web.Response(status=404, text='Not found')
+
+    app = web.Application()
+    app.router.add_get('/repos/{owner}/{name}/issues/{number}/', issue)
+    app.router.add_post('/repos/{owner}/{name}/issues/', create)
+    app.router.add_get('/users/{id}/', missing)
+
+    return loop.run_until_complete(test_server(app))
+
+
+async def test_instrumentation_groups_requests_by_path_template(server):
+    instrumentation = Instrumentation(buckets=(0.001, 10))
+    async with Connection(
+            str(server.make_url('/')), instrumentation=instrumentation) as connection:
+        for number in range(3):
+            response = await connection.repos('foo', 'bar').issues(number).get()
+            await response.read()
+        await connection.repos('baz', 'qux').issues.post(data={'title': 'foo'})
+        await connection.get('users/123')
+        await connection.users(456).get()
+
+    snapshot = instrumentation.snapshot()
+    assert sorted(snapshot) == [
+        ('GET', '/repos/{}/{}/issues/{}'),
+        ('GET', '/users/{}'),
+        ('GET', '/users/{}/'),
+        ('POST', '/repos/{}/{}/issues'),
+    ]
+
+    issues = snapshot[('GET', '/repos/{}/{}/issues/{}')]
+    assert issues['statuses'] == {'200': 3}
+    assert issues['durations']['count'] == 3
+    assert issues['durations']['buckets'] == [(0.001, 0), (10, 3), (float('inf'), 3)]
+    assert issues['durations']['sum'] >= 0.06
+    assert issues['bytes_received'] == sum(len('{"number": %d}' % number) for number in range(3))
+    assert issues['wire'] > 0
+
+    created = snapshot[('POST', '/repos/{}/{}/issues')]
+    assert created['statuses'] == {'201': 1}
+    assert created['bytes_sent'] == len('title=foo')
+
+    assert snapshot[('GET', '/users/{}/')]['statuses'] == {'404': 1}
+
+
+async def test_instrumentation_measures_pool_wait(server):
+    instrumentation = Instrumentation()
+    async with ClientPool(limit=1, trace_configs=[instrumentation.trace_config]) as pool:
+        async with Connection(
+                str(server.make_url('/')), pool=pool, instrumentation=instrumentation
+        ) as connection:
+            responses = await asyncio.gather(*(
+                connection.repos('foo', 'bar').issues(number).get() for number in range(3)
+            ))
+            for response in responses:
+                await response.read()
+                response.release()
+
+    metrics = instrumentation.snapshot()[('GET', '/repos/{}/{}/issues/{}')]
+    # with only one connection, the requests wait for each other
+    assert metrics['pool_wait'] >= 0.02
+    assert metrics['connect'] > 0
+    assert metrics['statuses'] == {'200': 3}
+
+
+async def test_instrumentation_hooks(server):
+    events = []
+    instrumentation = Instrumentation(
+        before_request=[lambda event: events.append(('before', event.status))],
+        after_request=[lambda event: events.append(('after', event.status))],
+    )
+    async with Connection(
+            str(server.make_url('/')), instrumentation=instrumentation) as connection:
+        await connection.users(1).get()
+
+    assert events == [('before', None), ('after', 404)]
+
+
+async def test_instrumentation_records_errors(loop):
+    instrumentation = Instrumentation()
+    events = []
+    instrumentation.after_request.append(events.append)
+    async with Connection(
+            'http://127.0.0.1:1', instrumentation=instrumentation) as connection:
+        with pytest.raises(ClientConnectionError):
+            await connection.foo(1).get()
+
+    statuses = instrumentation.snapshot()[('GET', '/foo/{}')]['statuses']
+    assert list(statuses.values()) == [1]
+    assert isinstance(events[0].exception, ClientConnectionError)
+    assert events[0].status is None
+
+
+async def test_instrumentation_records_cancelled_requests(server):
+    instrumentation = Instrumentation()
+    events = []
+    instrumentation.after_request.append(events.append)
+    async with Connection(
+            str(server.make_url('/')), instrumentation=instrumentation) as connection:
+        request = asyncio.ensure_future(connection.repos('foo', 'bar').issues(1).get())
+        await asyncio.sleep(0.01)
+        request.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await request
+
+    statuses = instrumentation.snapshot()[('GET', '/repos/{}/{}/issues/{}')]['statuses']
+    assert statuses == {'CancelledError': 1}
+    assert isinstance(events[0].exception, asyncio.CancelledError)
+
+
+async def test_instrumentation_path_templates(server):
+    instrumentation = Instrumentation()
+    async with Connection(
+            str(server.make_url('/')), instrumentation=instrumentation) as connection:
+        issue = PathTemplate(connection.repos('{owner}', '{name}').issues('{number}'))
+        await issue.format(owner='foo', name='bar', number=1).get()
+        await connection.repos('foo', 'bar').issues(2).get(path_template='/issue')
+
+    assert sorted(instrumentation.snapshot()) == [
+        ('GET', '/issue'),
+        ('GET', '/repos/{owner}/{name}/issues/{number}'),
+    ]
+
+
+def test_instrumentation_to_prometheus():
+    instrumentation = Instrumentation(buckets=(0.5, ), prefix='sync')
+    event = RequestEvent('GET', 'http://foo/bar/1/', '/bar/"{}"', {})
+    instrumentation.start(event)
+    event.start -= 0.25
+    event.status = 200
+    event.bytes_received = 12
+    instrumentation.finish(event)
+
+    text = instrumentation.to_prometheus()
+    labels = 'method="GET",path="/bar/\\"{}\\""'
+    assert '# TYPE sync_request_duration_seconds histogram' in text
+    assert 'sync_request_duration_seconds_bucket{%s,le="0.5"} 1' % labels in text
+    assert 'sync_request_duration_seconds_bucket{%s,le="+Inf"} 1' % labels in text
+    assert 'sync_request_duration_seconds_count{%s} 1' % labels in text
+    assert 'sync_requests_total{%s,status="200"} 1' % labels in text
+    assert 'sync_bytes_received_total{%s} 12' % labels in text
+    assert '# TYPE sync_pool_wait_seconds_total counter' in text
+    assert text.endswith('\n')
+
+    instrumentation.reset()
+    assert instrumentation.snapshot() == {}
+
+
+async def test_instrumentation_default_client_uses_trace_config(loop):
+    instrumentation = Instrumentation()
+    connection = Connection('http://foo.com', instrumentation=instrumentation)
+    client = connection._get_client()
+    assert isinstance(client, ClientSession)
+    assert instrumentation.trace_config in client.trace_configs
+    await connection.close()
@@ -0,0 +1,123 @@
+from aiohttp import ClientResponseError, web
+
+import pytest
+
+from isshub_sync.connection.connection import Connection
+from isshub_sync.connection.pagination import get_next_link, parse_link_header
+from isshub_sync.utils import DictObject
+
+
+NB_PAGES = 3
+
+
+def test_parse_link_header():
+    links = parse_link_header(
+        '<https://foo.com/bar?page=2&per_page=10>; rel="next", '
+        '</bar?page=1>; rel="first prev", '
+        '<https://foo.com/bar?page=5>; rel=last'
+    )
+    assert links == {
+        'next': 'https://foo.com/bar?page=2&per_page=10',
+        'first': '/bar?page=1',
+        'prev': '/bar?page=1',
+        'last': 'https://foo.com/bar?page=5',
+    }
+
+
+@pytest.fixture
+def calls():
+    return []
+
+
+@pytest.fixture
+def server(loop, test_server, calls):
+
+    async def issues(request):
+        page = int(request.query.get('page', 1))
+        per_page = int(request.query.get('per_page', 2))
+        calls.append((page, per_page))
+        headers = {}
+        if page < NB_PAGES:
+            headers['Link'] = '</issues/?page=%s&per_page=%s>; rel="next"' % (page + 1, per_page)
+        return web.json_response([
+            {'number': (page - 1) * per_page + index, 'user': {'login': 'foo'}}
+            for index in range(per_page)
+        ], headers=headers)
+
+    async def search(request):
+        return web.json_response({'total_count': 2, 'items': [{'number': 1}, {'number': 2}]})
+
+    async def error(request):
+        return web.json_response({'message': 'not found'}, status=404)
+
+    app = web.Application()
+    app.router.add_get('/issues/', issues)
+    app.router.add_get('/search/', search)
+    app.router.add_get('/error/', error)
+
+    return loop.run_until_complete(test_server(app))
+
+
+async def test_paginate_follows_link_header(server, calls):
+    async with Connection(str(server.make_url('/'))) as connection:
+        issues = [issue async for issue in connection.issues.get.paginate(per_page=3)]
+
+    assert [issue.number for issue in issues] == list(range(9))
+    assert isinstance(issues[0], DictObject)
+    assert issues[0].user.login == 'foo'
+    assert calls == [(1, 3), (2, 3), (3, 3)]
+
+
+@pytest.mark.parametrize('prefetch', [True, False])
+async def test_paginate_stops_when_consumer_breaks(server, calls, prefetch):
+    async with Connection(str(server.make_url('/'))) as connection:
+        pages = connection.issues.get.paginate(prefetch=prefetch).pages()
+        async for items in pages:
+            assert [issue.number for issue in items] == [0, 1]
+            break
+        await pages.aclose()
+
+    assert calls[0] == (1, 2)
+    assert len(calls) <= 2
+    if not prefetch:
+        assert len(calls) == 1
+
+
+async def test_paginate_with_items_key(server):
+    async with Connection(str(server.make_url('/'))) as connection:
+        items = [item async for item in connection.search.get.paginate(items_key='items')]
+
+    assert [item.number for item in items] == [1, 2]
+
+
+async def test_paginate_with_custom_next_getter(server, calls):
+
+    def get_next(response, body):
+        if body[-1].number < 3:
+            return get_next_link(response, body)
+        return None
+
+    async with Connection(str(server.make_url('/'))) as connection:
+        issues = [issue async for issue in connection.issues.get.paginate(get_next=get_next)]
+
+    assert [issue.number for issue in issues] == [0, 1, 2, 3]
+    assert calls == [(1, 2), (2, 2)]
+
+
+async def test_paginate_raises_on_http_error(server):
+    async with Connection(str(server.make_url('/'))) as connection:
+        with pytest.raises(ClientResponseError) as raised:
+            async for __ in connection.error.get.paginate():
+                pass
+
+    assert raised.value.status == 404
+
+
+def test_connection_refuses_full_url_of_other_root():
+    connection = Connection('https://foo.com/api')
+
+    assert connection._finalize_url('https://foo.com/api/bar?page=2') == \
+        'https://foo.com/api/bar?page=2'
+
+    with pytest.raises(ValueError):
+        connection._finalize_url('https://bar.com/api/bar?page=2')
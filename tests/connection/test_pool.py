@@ -0,0 +1,99 @@
+from aiohttp import web, ClientSession, TCPConnector
+
+import pytest
+
+from isshub_sync.connection.connection import Connection
+from isshub_sync.connection.pool import ClientPool
+
+
+@pytest.fixture
+def server(loop, test_server):
+
+    async def dummy_get(request):
+        return web.Response(text='dummy')
+
+    app = web.Application()
+    app.router.add_get('/dummy_get/', dummy_get)
+
+    return loop.run_until_complete(test_server(app))
+
+
+async def test_pool_creates_client_lazily(loop):
+    pool = ClientPool(limit=50, limit_per_host=5, keepalive_timeout=10, ttl_dns_cache=60)
+    assert not pool.started
+
+    client = pool.client
+    assert pool.started
+    assert isinstance(client, ClientSession)
+    assert isinstance(client.connector, TCPConnector)
+    assert client.connector.limit == 50
+    assert client.connector.limit_per_host == 5
+    assert pool.client is client
+
+    await pool.close()
+    assert not pool.started
+    assert client.closed
+
+
+async def test_pool_is_shared_between_connections(server):
+    async with ClientPool() as pool:
+        connection1 = Connection(str(server.make_url('/')), pool=pool)
+        connection2 = Connection(str(server.make_url('/')), pool=pool)
+
+        response = await connection1.dummy_get.get()
+        assert response.status == 200
+        assert await response.text() == 'dummy'
+        response = await connection2.dummy_get.get()
+        assert response.status == 200
+
+        assert connection1.client is pool.client
+        assert connection2.client is pool.client
+
+        client = pool.client
+
+    assert client.closed
+
+
+async def test_connection_uses_new_pool_client_after_close(server):
+    pool = ClientPool()
+    connection = Connection(str(server.make_url('/')), pool=pool)
+    await connection.dummy_get.get()
+    first_client = pool.client
+
+    await pool.close()
+    assert first_client.closed
+
+    response = await connection.dummy_get.get()
+    assert await response.text() == 'dummy'
+    assert connection.client is pool.client
+    assert connection.client is not first_client
+    await pool.close()
+
+
+async def test_connection_context_manager_keeps_pool_client_open(server):
+    async with ClientPool() as pool:
+        async with Connection(str(server.make_url('/')), pool=pool) as connection:
+            await connection.dummy_get.get()
+            client = connection.client
+
+        assert connection.client is None
+        assert not client.closed
+
+
+async def test_connection_context_manager_closes_own_client(server):
+    async with Connection(str(server.make_url('/'))) as connection:
+        await connection.dummy_get.get()
+        client = connection.client
+
+    assert connection.client is None
+    assert client.closed
+
+
+async def test_connection_context_manager_keeps_given_client_open(server):
+    client = ClientSession()
+    async with Connection(str(server.make_url('/')), client=client) as connection:
+        await connection.dummy_get.get()
+
+    assert connection.client is client
+    assert not client.closed
+    await client.close()
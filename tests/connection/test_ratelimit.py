@@ -0,0 +1,112 @@
+import time
+
+from aiohttp import web
+
+import pytest
+
+from isshub_sync.connection.connection import Connection
+from isshub_sync.connection.ratelimit import ANONYMOUS, RateLimiter, RateLimitExceeded, token_key
+
+from .utils import Clock
+
+
+def test_rate_limiter_does_not_delay_with_enough_budget():
+    limiter = RateLimiter(clock=Clock())
+    limiter.update('foo', 200, {
+        'X-RateLimit-Limit': '5000', 'X-RateLimit-Remaining': '4000', 'X-RateLimit-Reset': '2000'
+    })
+
+    assert [limiter.get_delay('foo') for __ in range(10)] == [0] * 10
+    assert limiter.budget()['foo']['remaining'] == 3990
+    assert limiter.budget()['foo']['requests'] == 10
+
+
+def test_rate_limiter_spreads_requests_when_budget_is_low():
+    clock = Clock()
+    limiter = RateLimiter(smooth_below=0.2, clock=clock)
+    limiter.update('foo', 200, {
+        'X-RateLimit-Limit': '5000', 'X-RateLimit-Remaining': '100', 'X-RateLimit-Reset': '1100'
+    })
+
+    assert [limiter.get_delay('foo') for __ in range(3)] == [0, 1, 2]
+
+    # the reserved slots are in the past: no delay, and the next slot is reserved from now
+    clock.now = 1010
+    assert limiter.get_delay('foo') == 0
+    assert limiter.get_delay('foo') == pytest.approx(90 / 97)
+
+
+def test_rate_limiter_waits_for_reset_when_budget_is_exhausted():
+    clock = Clock()
+    limiter = RateLimiter(clock=clock)
+    limiter.update('foo', 403, {
+        'X-RateLimit-Limit': '5000', 'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset': '1060'
+    })
+
+    assert limiter.get_delay('foo') == 60
+
+    # after the reset, the budget is unknown, so no delay
+    clock.now = 1061
+    assert limiter.get_delay('foo') == 0
+    assert limiter.budget()['foo']['remaining'] is None
+
+
+def test_rate_limiter_respects_retry_after():
+    limiter = RateLimiter(clock=Clock())
+    limiter.update('foo', 429, {'Retry-After': '30'})
+
+    assert limiter.get_delay('foo') == 30
+    assert limiter.get_delay('bar') == 0
+
+
+def test_rate_limiter_can_raise_instead_of_waiting_too_long():
+    limiter = RateLimiter(max_wait=10, clock=Clock())
+    limiter.update('foo', 429, {'Retry-After': '30'})
+
+    with pytest.raises(RateLimitExceeded) as raised:
+        limiter.get_delay('foo')
+
+    assert raised.value.key == 'foo'
+    assert raised.value.wait == 30
+
+
+def test_rate_limiter_key_depends_on_authorization():
+    assert RateLimiter.get_key(None) == ANONYMOUS
+    assert RateLimiter.get_key({'authorization': 'token foo'}) == token_key('token foo')
+    assert 'foo' not in token_key('token foo')
+
+
+@pytest.fixture
+def server(loop, test_server):
+
+    async def dummy_get(request):
+        remaining = 1 if request.headers.get('Authorization') == 'token low' else 4000
+        return web.Response(text='dummy', headers={
+            'X-RateLimit-Limit': '5000',
+            'X-RateLimit-Remaining': str(remaining),
+            'X-RateLimit-Reset': str(int(time.time()) + 3600),
+        })
+
+    app = web.Application()
+    app.router.add_get('/dummy_get/', dummy_get)
+
+    return loop.run_until_complete(test_server(app))
+
+
+async def test_connection_updates_rate_limiter(server):
+    limiter = RateLimiter(max_wait=60)
+
+    async with Connection(str(server.make_url('/')), rate_limiter=limiter) as connection:
+        await connection.dummy_get.get(headers={'Authorization': 'token high'})
+        await connection.dummy_get.get(headers={'Authorization': 'token high'})
+        await connection.dummy_get.get(headers={'Authorization': 'token low'})
+
+        budget = limiter.budget()
+        assert budget[token_key('token high')]['remaining'] == 4000
+        assert budget[token_key('token high')]['requests'] == 2
+        assert budget[token_key('token low')]['remaining'] == 1
+
+        await connection.dummy_get.get(headers={'Authorization': 'token low'})
+        # one request left for one hour: the next one would have to wait too long
+        with pytest.raises(RateLimitExceeded):
+            await connection.dummy_get.get(headers={'Authorization': 'token low'})
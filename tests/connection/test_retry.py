@@ -0,0 +1,186 @@
+import asyncio
+
+from aiohttp import web, ClientConnectionError
+
+import pytest
+
+from isshub_sync.connection.connection import Connection
+from isshub_sync.connection.retry import RetryPolicy
+
+
+def test_retry_policy_backoff_with_jitter():
+    policy = RetryPolicy(backoff_factor=1, max_backoff=10)
+
+    for attempt in range(1, 10):
+        assert 0 <= policy.get_backoff(attempt) <= min(10, 2 ** (attempt - 1))
+
+
+class Sender:
+    """Return the given responses or raise the given exceptions, in order."""
+
+    def __init__(self, *results):
+        self.results = list(results)
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        result = self.results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+class DummyResponse:
+
+    def __init__(self, status, headers=None):
+        self.status = status
+        self.headers = headers or {}
+        self.released = False
+
+    def release(self):
+        self.released = True
+
+
+async def test_retry_policy_retries_on_status(loop):
+    events = []
+    policy = RetryPolicy(max_attempts=3, backoff_factor=0.001, on_retry=events.append)
+    failing = DummyResponse(503)
+    sender = Sender(failing, DummyResponse(502), DummyResponse(200))
+
+    response = await policy.run(sender, 'get', 'http://foo.com/')
+
+    assert response.status == 200
+    assert sender.calls == 3
+    assert failing.released
+    assert [(event.attempt, event.status) for event in events] == [(1, 503), (2, 502)]
+
+
+async def test_retry_policy_returns_last_response_after_max_attempts(loop):
+    policy = RetryPolicy(max_attempts=2, backoff_factor=0.001)
+    sender = Sender(DummyResponse(503), DummyResponse(503), DummyResponse(200))
+
+    response = await policy.run(sender, 'get', 'http://foo.com/')
+
+    assert response.status == 503
+    assert sender.calls == 2
+
+
+async def test_retry_policy_retries_on_exceptions(loop):
+    events = []
+    policy = RetryPolicy(max_attempts=3, backoff_factor=0.001, on_retry=events.append)
+
+    sender = Sender(ClientConnectionError(), asyncio.TimeoutError(), DummyResponse(200))
+    response = await policy.run(sender, 'get', 'http://foo.com/')
+    assert response.status == 200
+    assert [type(event.exception) for event in events] == [
+        ClientConnectionError, asyncio.TimeoutError
+    ]
+
+    sender = Sender(ClientConnectionError(), ClientConnectionError(), ClientConnectionError())
+    with pytest.raises(ClientConnectionError):
+        await policy.run(sender, 'get', 'http://foo.com/')
+    assert sender.calls == 3
+
+    sender = Sender(ValueError(), DummyResponse(200))
+    with pytest.raises(ValueError):
+        await policy.run(sender, 'get', 'http://foo.com/')
+    assert sender.calls == 1
+
+
+async def test_retry_policy_respects_deadline(loop):
+    policy = RetryPolicy(max_attempts=5, backoff_factor=1, jitter=False, deadline=0.5)
+    sender = Sender(DummyResponse(503), DummyResponse(200))
+
+    response = await policy.run(sender, 'get', 'http://foo.com/')
+
+    assert response.status == 503
+    assert sender.calls == 1
+
+
+async def test_retry_policy_respects_retry_after(loop):
+    events = []
+    policy = RetryPolicy(backoff_factor=0.001, jitter=False, on_retry=events.append)
+    sender = Sender(DummyResponse(429, {'Retry-After': '0.05'}), DummyResponse(200))
+
+    await policy.run(sender, 'get', 'http://foo.com/')
+
+    assert events[0].delay == pytest.approx(0.05, abs=0.01)
+
+
+async def test_retry_policy_does_not_wait_for_long_retry_after(loop):
+    # longer than ``max_backoff``, without deadline: the response is returned
+    policy = RetryPolicy(backoff_factor=0.001, max_backoff=0.01)
+    sender = Sender(DummyResponse(429, {'Retry-After': '3600'}), DummyResponse(200))
+    response = await asyncio.wait_for(policy.run(sender, 'get', 'http://foo.com/'), 1)
+    assert response.status == 429
+    assert sender.calls == 1
+
+    # within the deadline of the policy, it is waited for
+    events = []
+    policy = RetryPolicy(
+        backoff_factor=0.001, max_backoff=0.01, deadline=1, on_retry=events.append
+    )
+    sender = Sender(DummyResponse(429, {'Retry-After': '0.05'}), DummyResponse(200))
+    response = await policy.run(sender, 'get', 'http://foo.com/')
+    assert response.status == 200
+    assert events[0].delay == pytest.approx(0.05, abs=0.01)
+
+
+@pytest.fixture
+def calls():
+    return []
+
+
+@pytest.fixture
+def client(loop, test_client, calls):
+
+    async def flaky(request):
+        calls.append(request.method)
+        if len(calls) % 2:
+            return web.Response(status=503)
+        return web.Response(text='ok')
+
+    app = web.Application()
+    app.router.add_route('*', '/flaky/', flaky)
+
+    return loop.run_until_complete(test_client(app))
+
+
+async def test_connection_retries_idempotent_requests(client, calls):
+    connection = Connection('https://httpbin.org/', client=client, retry=RetryPolicy(
+        backoff_factor=0.001
+    ))
+    connection.root = ''  # test client refuses absolute urls
+
+    response = await connection.flaky.get()
+    assert response.status == 200
+    assert calls == ['GET', 'GET']
+
+
+async def test_connection_does_not_retry_post_by_default(client, calls):
+    connection = Connection('https://httpbin.org/', client=client, retry=RetryPolicy(
+        backoff_factor=0.001
+    ))
+    connection.root = ''  # test client refuses absolute urls
+
+    response = await connection.flaky.post()
+    assert response.status == 503
+    assert calls == ['POST']
+
+
+async def test_connection_retry_can_be_overridden_per_request(client, calls):
+    connection = Connection('https://httpbin.org/', client=client, retry=RetryPolicy(
+        backoff_factor=0.001
+    ))
+    connection.root = ''  # test client refuses absolute urls
+
+    response = await connection.flaky.get(retry=None)
+    assert response.status == 503
+    assert calls == ['GET']
+
+    del calls[:]
+    response = await connection.flaky.post(retry=RetryPolicy(
+        backoff_factor=0.001, methods={'post'}
+    ))
+    assert response.status == 200
+    assert calls == ['POST', 'POST']
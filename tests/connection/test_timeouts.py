@@ -0,0 +1,227 @@
+import asyncio
+import sys
+import time
+from functools import partial
+
+from aiohttp import web
+
+import pytest
+
+from isshub_sync.connection.concurrency import AdaptiveLimiter
+from isshub_sync.connection.connection import Connection
+from isshub_sync.connection.credentials import CredentialPool
+from isshub_sync.connection.ratelimit import RateLimiter
+from isshub_sync.connection.retry import RetryPolicy
+from isshub_sync.connection.timeouts import (
+    Deadline,
+    DeadlineExceeded,
+    TimeoutPolicy,
+    Timeouts,
+    _TaskLocal,
+    current_deadline,
+)
+
+from .utils import Clock
+
+
+def test_timeout_policy_prefixes():
+    policy = TimeoutPolicy(Timeouts(total=30, connect=5), {
+        'search': Timeouts(total=60),
+        '/search/issues/': Timeouts(read=20),
+    })
+    assert [prefix for prefix, __ in policy.prefixes] == ['/search', '/search/issues']
+
+    assert policy.get('/search').total == 60
+    assert str(policy.get('/search/issues/?q=foo')) == 'Timeouts (total=60, connect=5, read=20)'
+    assert str(policy.get('/searches/')) == 'Timeouts (total=30, connect=5, read=None)'
+    assert str(TimeoutPolicy().get('/foo/')) == 'Timeouts (total=None, connect=None, read=None)'
+
+
+def test_timeouts_use_client_values_when_not_set():
+    base = Timeouts(total=300, connect=10).to_client_timeout()
+    timeout = Timeouts(read=5).to_client_timeout(base)
+    assert (timeout.total, timeout.sock_connect, timeout.sock_read) == (300, 10, 5)
+
+    # never longer than the deadline
+    assert Timeouts().to_client_timeout(base, remaining=2).total == 2
+    assert Timeouts(total=1).to_client_timeout(base, remaining=2).total == 1
+
+
+def test_deadline():
+    clock = Clock()
+    deadline = Deadline(10, clock=clock)
+    assert deadline.remaining == 10  # not started
+    assert current_deadline() is None
+
+    with deadline:
+        clock.now += 4
+        assert current_deadline() is deadline
+        assert deadline.remaining == 6
+
+        # not enough time left to wait
+        deadline.check(5)
+        with pytest.raises(DeadlineExceeded):
+            deadline.check(6)
+
+        # a nested deadline never ends after the outer one
+        with Deadline(60, clock=clock) as nested:
+            assert nested.remaining == 6
+            clock.now += 6
+            assert nested.expired
+            with pytest.raises(DeadlineExceeded, match='Deadline of 60.0 seconds exceeded'):
+                nested.check()
+        assert current_deadline() is deadline
+
+    assert current_deadline() is None
+
+
+async def test_task_local():
+    local = _TaskLocal()
+
+    async def task(value):
+        assert local.get() is None
+        token = local.set(value)
+        await asyncio.sleep(0)
+        assert local.get() == value
+        local.reset(token)
+        return local.get()
+
+    assert await asyncio.gather(task(1), task(2)) == [None, None]
+    assert local.get('default') == 'default'
+
+
+@pytest.fixture
+def calls():
+    return []
+
+
+@pytest.fixture
+def server(loop, test_server, calls):
+
+    async def handler(request):
+        calls.append(request.path)
+        await asyncio.sleep(float(request.query.get('latency', 0)))
+        return web.json_response({})
+
+    async def issues(request):
+        calls.append(request.path)
+        page = int(request.query.get('page', 1))
+        await asyncio.sleep(0.1)
+        return web.json_response(
+            [page], headers={'Link': '<%s>; rel="next"' % request.url.with_query(page=page + 1)}
+        )
+
+    app = web.Application()
+    app.router.add_get('/issues/', issues)
+    app.router.add_get('/{tail:.*}', handler)
+
+    return loop.run_until_complete(test_server(app))
+
+
+async def test_connection_timeouts(server, calls):
+    policy = TimeoutPolicy(Timeouts(total=0.1), {'/slow': Timeouts(total=1)})
+    async with Connection(str(server.make_url('/')), timeouts=policy) as connection:
+        with pytest.raises(asyncio.TimeoutError):
+            await connection.foo.get(params={'latency': 0.3})
+
+        # longer timeout for a prefix
+        response = await connection.slow.foo.get(params={'latency': 0.3})
+        assert response.status == 200
+
+        # and for a call
+        with pytest.raises(asyncio.TimeoutError):
+            await connection.slow.get(params={'latency': 0.3}, timeouts=Timeouts(read=0.1))
+        response = await connection.foo.get(params={'latency': 0.3}, timeouts=Timeouts(total=1))
+        assert response.status == 200
+
+    assert len(calls) == 4
+
+
+async def test_deadline_stops_retries(server, calls):
+    retry = RetryPolicy(max_attempts=10, backoff_factor=0, statuses=set())
+    async with Connection(str(server.make_url('/')), retry=retry) as connection:
+        loop = asyncio.get_event_loop()
+        start = loop.time()
+        with Deadline(0.5):
+            # each attempt times out: the last one only has what is left of the deadline
+            with pytest.raises(DeadlineExceeded):
+                await connection.foo.get(
+                    params={'latency': 1}, timeouts=Timeouts(total=0.2)
+                )
+        assert loop.time() - start < 0.7
+        assert len(calls) == 3
+
+        # no time left: the request is not sent
+        with Deadline(0):
+            with pytest.raises(DeadlineExceeded):
+                await connection.foo.get()
+        assert len(calls) <= 3
+
+
+async def test_deadline_stops_pagination(server, calls):
+    async with Connection(str(server.make_url('/'))) as connection:
+        pages = []
+        with Deadline(0.45):
+            with pytest.raises(DeadlineExceeded):
+                async for page in connection.issues.get.paginate():
+                    pages.append(page)
+
+    # each page takes 0.1 second
+    assert 3 <= len(pages) <= 4
+    assert pages == list(range(1, len(pages) + 1))
+    assert len(calls) - len(pages) in (0, 1)
+
+
+@pytest.mark.skipif(sys.version_info < (3, 7), reason='asyncio has no context variables')
+async def test_deadline_is_seen_by_jobs(server, calls):
+    async with Connection(str(server.make_url('/'))) as connection:
+        slow = partial(connection.foo.get, params={'latency': 1})
+        with Deadline(0.2):
+            results = await connection.gather(
+                [connection.foo.get] * 3 + [slow] * 3, return_exceptions=True
+            )
+
+    assert [result.status for result in results[:3]] == [200] * 3
+    assert [result.__class__ for result in results[3:]] == [DeadlineExceeded] * 3
+
+
+EXHAUSTED = {'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset': str(time.time() + 3600)}
+
+
+async def test_deadline_bounds_rate_limit_waits(server, calls):
+    rate_limiter = RateLimiter()
+    rate_limiter.update(rate_limiter.get_key(None), 200, EXHAUSTED)
+    credentials = CredentialPool(['foo'])
+    credentials.update(credentials.choose()[0], 200, EXHAUSTED)
+
+    loop = asyncio.get_event_loop()
+    start = loop.time()
+    for limiter in ({'rate_limiter': rate_limiter}, {'credentials': credentials}):
+        async with Connection(str(server.make_url('/')), **limiter) as connection:
+            # the reset is in an hour: it fails at once instead of waiting for it
+            with Deadline(1):
+                with pytest.raises(DeadlineExceeded):
+                    await connection.foo.get()
+
+    assert loop.time() - start < 0.5
+    assert calls == []
+
+
+async def test_deadline_bounds_concurrency_waits(server, calls):
+    limiter = AdaptiveLimiter(initial_limit=1, min_limit=1)
+    async with Connection(str(server.make_url('/')), concurrency_limiter=limiter) as connection:
+        slow = asyncio.ensure_future(connection.foo.get(params={'latency': 1}))
+        await asyncio.sleep(0.1)
+
+        loop = asyncio.get_event_loop()
+        start = loop.time()
+        with Deadline(0.2):
+            with pytest.raises(DeadlineExceeded):
+                await connection.foo.get()
+        assert 0.15 < loop.time() - start < 0.5
+
+        assert (await slow).status == 200
+        # the slot not obtained is not lost
+        assert (await connection.foo.get()).status == 200
+
+    assert len(calls) == 2
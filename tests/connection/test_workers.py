@@ -0,0 +1,162 @@
+import pickle
+import threading
+from functools import partial
+
+from aiohttp import web
+
+import pytest
+
+from isshub_sync.connection.connection import Connection
+from isshub_sync.connection.workers import (
+    JobFailed,
+    RequestJob,
+    SharedCache,
+    SharedRateLimiter,
+    WorkerPool,
+    make_job,
+)
+from isshub_sync.utils import DictObject
+
+
+@pytest.fixture
+def calls():
+    return []
+
+
+@pytest.fixture
+def server(loop, test_server, calls):
+
+    async def issue(request):
+        calls.append(request.headers.get('If-None-Match'))
+        number = int(request.match_info['number'])
+        headers = {
+            'ETag': '"%s"' % number,
+            'X-RateLimit-Limit': '5000',
+            'X-RateLimit-Remaining': str(5000 - len(calls)),
+            'X-RateLimit-Reset': '9999999999',
+        }
+        if request.headers.get('If-None-Match') == headers['ETag']:
+            return web.Response(status=304, headers=headers)
+        if number == 0:
+            return web.json_response({'message': 'Not Found'}, status=404, headers=headers)
+        return web.json_response(
+            {'number': number, 'title': 'Issue %s' % number, 'labels': [{'name': 'bug'}]},
+            headers=headers,
+        )
+
+    app = web.Application()
+    app.router.add_get('/repos/foo/bar/issues/{number}/', issue)
+
+    return loop.run_until_complete(test_server(app))
+
+
+async def get_title(connection, number):
+    """A job defined at the module level, so it is picklable."""
+    response = await connection.repos('foo', 'bar').issues(number).get()
+    try:
+        return (await response.json())['title']
+    finally:
+        response.release()
+
+
+def test_make_job():
+    connection = Connection('https://api.github.com/')
+    executable = connection.repos('foo', 'bar').issues(1).get
+
+    job = make_job(partial(executable, headers={'Authorization': 'token foo'}))
+    assert isinstance(job, RequestJob)
+    job = pickle.loads(pickle.dumps(job))
+    assert (job.method, job.path, job.kwargs) == ('GET', '/repos/foo/bar/issues/1', {
+        'headers': {'Authorization': 'token foo'},
+        'path_template': '/repos/{}/{}/issues/{}',
+    })
+
+    assert make_job(get_title) is get_title
+
+    error = pickle.loads(pickle.dumps(JobFailed('ClientResponseError', '404, Not Found')))
+    assert str(error) == 'ClientResponseError: 404, Not Found'
+
+
+async def test_worker_pool_runs_jobs_in_order(server, calls):
+    connection = Connection(str(server.make_url('/')))
+    jobs = [connection.repos('foo', 'bar').issues(number).get for number in range(1, 31)]
+
+    with WorkerPool(str(server.make_url('/')), processes=2, chunk_size=4) as workers:
+        assert str(workers) == 'WorkerPool (%s, 2 processes)' % server.make_url('/')
+        issues = await workers.gather(jobs)
+        titles = await workers.gather(partial(get_title, number=number) for number in (3, 1))
+
+        # the budget of all the workers is known by the coordinator
+        budget = workers.budget()['anonymous']
+        assert budget['requests'] == 32
+        assert budget['limit'] == 5000
+
+    assert [issue.number for issue in issues] == list(range(1, 31))
+    assert all(isinstance(issue, DictObject) for issue in issues)
+    assert issues[0].labels[0].name == 'bug'
+    assert titles == ['Issue 3', 'Issue 1']
+
+
+async def test_worker_pool_shares_the_cache(server, calls):
+    connection = Connection(str(server.make_url('/')))
+    jobs = [connection.repos('foo', 'bar').issues(number).get for number in range(1, 11)]
+
+    with WorkerPool(str(server.make_url('/')), processes=2, chunk_size=1) as workers:
+        first = await workers.gather(jobs)
+        second = await workers.gather(reversed(jobs))  # other workers for the same requests
+
+    assert [issue.number for issue in second] == list(range(10, 0, -1))
+    assert [issue.number for issue in first] == list(range(1, 11))
+    assert calls[:10] == [None] * 10
+    assert sorted(calls[10:]) == sorted('"%s"' % number for number in range(1, 11))
+
+
+async def test_worker_pool_errors(server):
+    connection = Connection(str(server.make_url('/')))
+    jobs = [connection.repos('foo', 'bar').issues(number).get for number in (1, 0, 2)]
+
+    with WorkerPool(
+            str(server.make_url('/')), processes=1, rate_limit=False, cache=False) as workers:
+        with pytest.raises(JobFailed) as raised:
+            await workers.gather(jobs)
+        assert raised.value.error_class == 'ClientResponseError'
+
+        results = list(workers.map([], return_exceptions=True))
+        assert results == []
+
+        results = await workers.gather(jobs, return_exceptions=True)
+        assert results[0].number == 1
+        assert isinstance(results[1], JobFailed)
+        assert results[2].number == 2
+
+        assert workers.budget() == {}
+
+
+class ThreadProxy:
+    """A proxy recording the thread of each call, like a ``BaseProxy`` would block it."""
+
+    def __init__(self):
+        self.threads = []
+
+    def __getattr__(self, name):
+        def call(*args):
+            self.threads.append(threading.get_ident())
+            return 0.0 if name == 'get_delay' else None
+        return call
+
+
+async def test_shared_objects_do_not_block_the_loop(loop):
+    proxy = ThreadProxy()
+    rate_limiter = SharedRateLimiter(proxy)
+    await rate_limiter.acquire('anonymous')
+    rate_limiter.update('anonymous', 200, {'X-RateLimit-Remaining': '10'})
+    await rate_limiter.flush()
+    assert not rate_limiter.pending
+
+    cache = SharedCache(proxy)
+    assert await cache.prepare('get', 'http://foo/', {}) == (
+        cache.make_key('get', 'http://foo/', {}), None
+    )
+
+    assert len(proxy.threads) == 3
+    assert threading.get_ident() not in proxy.threads
@@ -0,0 +1,13 @@
+"""Helpers shared by the tests of ``isshub_sync.connection``."""
+
+
+class Clock:  # pylint: disable=too-few-public-methods
+    """A fake clock, for the ``clock`` argument of the limiters, set by changing ``now``."""
+
+    def __init__(self, now: float = 1000.0) -> None:
+        """Start the clock at `now`."""
+        self.now = now
+
+    def __call__(self) -> float:
+        """Return the current time."""
+        return self.now
@@ -1,24 +1,52 @@
 import configparser
-from pkg_resources import get_distribution, DistributionNotFound
+import subprocess
+import sys
 from pathlib import PurePath
 
+import pytest
+
+import isshub_sync
 from isshub_sync import _extract_version
 
 
 def test_extract_version_from_distribution(mocker):
-    pytest_distrib = get_distribution('pytest')
-    mocker.patch('isshub_sync.get_distribution', return_value=pytest_distrib)
-    assert _extract_version() == pytest_distrib.version
+    mocker.patch('isshub_sync._metadata_version', return_value='1.2.3')
+    assert _extract_version() == '1.2.3'
 
 
 def test_extract_version_from_setupcfg(mocker):
     config = configparser.ConfigParser()
-    config.read(PurePath(__file__).parent.parent / 'setup.cfg')
+    config.read(str(PurePath(__file__).parent.parent / 'setup.cfg'), encoding='utf-8')
     assert config['metadata']['version']
 
-    def get_distribution(dist):
+    def metadata_version(name):
         """Emulate a call to get a distribution that does not exist"""
-        raise DistributionNotFound
+        raise ImportError('No package metadata was found for %s' % name)
 
-    mocker.patch('isshub_sync.get_distribution', side_effect=get_distribution)
+    mocker.patch('isshub_sync._metadata_version', side_effect=metadata_version)
     assert _extract_version() == config['metadata']['version']
+
+
+def test_version_is_computed_on_first_access(mocker, monkeypatch):
+    # the value set by the test is removed, or the original one restored, at the end
+    monkeypatch.setitem(vars(isshub_sync), '__version__', None)
+    monkeypatch.delitem(vars(isshub_sync), '__version__')
+
+    extract_version = mocker.patch('isshub_sync._extract_version', return_value='1.2.3')
+    assert isshub_sync.__version__ == '1.2.3'
+    assert isshub_sync.__version__ == '1.2.3'
+    assert vars(isshub_sync)['__version__'] == '1.2.3'
+    assert extract_version.call_count == 1
+
+    with pytest.raises(AttributeError):
+        isshub_sync.foo  # pylint: disable=pointless-statement
+
+
+def test_import_is_cheap():
+    code = 'import sys, isshub_sync; print(sorted(set(sys.argv[1:]) & set(sys.modules)))'
+    heavy_modules = ['aiohttp', 'pkg_resources', 'setuptools']
+    output = subprocess.check_output(
+        [sys.executable, '-c', code] + heavy_modules,
+        cwd=str(PurePath(__file__).parent.parent),
+    )
+    assert output.decode().strip() == '[]'
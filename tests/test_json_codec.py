@@ -0,0 +1,106 @@
+import json
+
+import pytest
+
+from isshub_sync import json_codec
+from isshub_sync.json_codec import (
+    CODEC_CLASSES,
+    JsonCodec,
+    OrjsonCodec,
+    UjsonCodec,
+    get_codec,
+    set_codec,
+)
+from isshub_sync.records import Record
+from isshub_sync.utils import DictObject
+
+
+@pytest.fixture(params=CODEC_CLASSES, ids=lambda codec_class: codec_class.NAME)
+def codec(request):
+    if not request.param.is_available():
+        pytest.skip('%s is not installed' % request.param.MODULE)
+    return request.param()
+
+
+@pytest.fixture
+def restore_codec():
+    yield
+    set_codec(None)
+
+
+class User(Record):
+    __slots__ = ('login', )
+
+
+def test_codec_dumps_bytes(codec):
+
+    data = {'a': [1, 2.5, None, True], 'b': 'é', 'c': DictObject(d=User(login='foo'))}
+    dumped = codec.dumps(data)
+
+    assert isinstance(dumped, bytes)
+    assert json.loads(dumped.decode()) == {
+        'a': [1, 2.5, None, True], 'b': 'é', 'c': {'d': {'login': 'foo'}},
+    }
+
+    with pytest.raises(TypeError):
+        codec.dumps({'a': object()})
+
+
+def test_codec_loads_str_and_bytes(codec):
+
+    assert codec.loads('{"a": [1, {"b": "é"}]}') == {'a': [1, {'b': 'é'}]}
+    assert codec.loads('{"a": [1, {"b": "é"}]}'.encode()) == {'a': [1, {'b': 'é'}]}
+
+
+def test_codec_loads_objects(codec):
+
+    obj = codec.loads_objects(b'{"a": {"b": [{"c": 1}, [{"d": 2}]]}, "e": []}', DictObject)
+
+    assert obj == {'a': {'b': [{'c': 1}, [{'d': 2}]]}, 'e': []}
+    assert type(obj) is DictObject
+    assert obj.a.b[0].c == 1
+    assert obj.a.b[1][0].d == 2
+
+    assert codec.loads_objects(b'[{"a": 1}, 2]', DictObject)[0].a == 1
+
+
+def test_get_codec_prefers_fast_codecs(restore_codec, monkeypatch):
+
+    set_codec(None)
+    available = [codec_class for codec_class in CODEC_CLASSES if codec_class.is_available()]
+    assert type(get_codec()) is available[0]
+
+    monkeypatch.setattr(OrjsonCodec, 'MODULE', 'not_installed_module')
+    monkeypatch.setattr(json_codec, 'CODEC_CLASSES', (OrjsonCodec, JsonCodec))
+    set_codec(None)
+    assert type(get_codec()) is JsonCodec
+
+
+def test_old_ujson_is_not_used(monkeypatch):
+
+    class OldUjson:
+        __version__ = '4.3.0'
+
+    monkeypatch.setattr(json_codec.importlib, 'import_module', lambda name: OldUjson)
+    assert not UjsonCodec.is_available()
+    OldUjson.__version__ = '5.1.0'
+    assert UjsonCodec.is_available()
+
+
+def test_set_codec(restore_codec):
+
+    codec = JsonCodec()
+    assert set_codec(codec) is codec
+    assert get_codec() is codec
+
+    assert type(set_codec('json')) is JsonCodec
+
+    with pytest.raises(ValueError):
+        set_codec('foo')
+
+
+def test_dict_object_uses_codec(restore_codec, codec):
+
+    set_codec(codec)
+    obj = DictObject.from_json(b'{"a": {"b": [{"c": 1}]}}')
+    assert obj.a.b[0].c == 1
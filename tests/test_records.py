@@ -0,0 +1,152 @@
+import json
+import sys
+from pickle import dumps, loads
+
+import pytest
+
+from isshub_sync.records import Record, infer_record_type, record_type
+from isshub_sync.utils import DictObject
+
+
+class User(Record):
+    __slots__ = ('id', 'login')
+
+
+class Issue(Record):
+    __slots__ = ('number', 'title', 'user', 'assignees')
+    NESTED = {'user': User, 'assignees': User}
+
+
+class PullRequest(Issue):
+    __slots__ = ('merged', )
+
+
+payload = {
+    'number': 1,
+    'title': 'Foo',
+    'user': {'id': 1, 'login': 'foo', 'type': 'User'},
+    'assignees': [{'id': 2, 'login': 'bar'}],
+    'labels': [{'name': 'bug'}],
+    'milestone': {'title': 'v1'},
+}
+
+
+def test_record_attribute_and_key_access():
+
+    issue = Issue.from_dict(payload)
+
+    assert issue.number == issue['number'] == 1
+    assert issue.user.login == 'foo'
+    assert isinstance(issue.user, User)
+    assert isinstance(issue.assignees[0], User)
+    assert issue == payload
+    assert dict(issue.user) == payload['user']
+
+    issue.title = 'Bar'
+    assert issue['title'] == 'Bar'
+    issue['number'] = 2
+    assert issue.number == 2
+
+
+def test_record_unknown_keys_fall_back_to_dict_object():
+
+    issue = Issue.from_dict(payload)
+
+    assert list(issue) == ['number', 'title', 'user', 'assignees', 'labels', 'milestone']
+    assert isinstance(issue.milestone, DictObject)
+    assert issue.milestone.title == 'v1'
+    assert isinstance(issue.labels[0], DictObject)
+    assert issue.user.type == 'User'
+
+    issue.state = 'open'
+    assert issue['state'] == 'open'
+    assert issue.get('state') == 'open'
+    assert issue.get('foo') is None
+
+
+def test_record_missing_keys():
+
+    user = User.from_dict({'login': 'foo'})
+
+    assert list(user) == ['login']
+    assert len(user) == 1
+    assert 'id' not in user
+
+    with pytest.raises(KeyError):
+        user.id
+    with pytest.raises(KeyError):
+        user['foo']
+
+
+def test_record_fields():
+
+    assert Issue.FIELDS == ('number', 'title', 'user', 'assignees')
+    assert PullRequest.FIELDS == ('number', 'title', 'user', 'assignees', 'merged')
+    assert PullRequest.NESTED is Issue.NESTED
+
+    with pytest.raises(ValueError):
+        type('Foo', (Record, ), {'__slots__': ('keys', )})
+    with pytest.raises(ValueError):
+        type('Foo', (Record, ), {'__slots__': ('_foo', )})
+
+
+def test_record_from_json_in_bulk():
+
+    issues = Issue.from_json(json.dumps([payload, payload]))
+
+    assert len(issues) == 2
+    assert all(isinstance(issue, Issue) for issue in issues)
+    assert issues[1].user.login == 'foo'
+
+    assert Issue.from_json(json.dumps(payload).encode()) == payload
+
+
+def test_record_can_be_pickled():
+
+    issue = loads(dumps(PullRequest.from_dict(dict(payload, merged=True))))
+
+    assert isinstance(issue, PullRequest)
+    assert issue == dict(payload, merged=True)
+    assert issue.user.login == 'foo'
+    assert issue.milestone.title == 'v1'
+
+    user = loads(dumps(User(login='foo')))
+    assert list(user) == ['login']
+
+
+def test_record_uses_less_memory_than_dict_object():
+
+    assert sys.getsizeof(Issue.from_dict(payload)) < sys.getsizeof(DictObject(payload))
+    assert not hasattr(Issue.from_dict(payload), '__dict__')
+
+
+Commit = record_type('Commit', ['sha', 'message', 'author', '_links', 'class'])
+
+
+def test_record_type():
+
+    assert Commit.FIELDS == ('sha', 'message', 'author')
+    assert Commit.__module__ == __name__
+
+    commit = Commit.from_dict({'sha': 'abc', '_links': {}, 'class': 'foo'})
+    assert commit.sha == 'abc'
+    assert commit['class'] == 'foo'
+    assert loads(dumps(commit)) == commit
+
+
+def test_infer_record_type():
+
+    Inferred = infer_record_type('Inferred', [payload, {'number': 2, 'body': 'foo'}])
+
+    assert Inferred.FIELDS == (
+        'number', 'title', 'user', 'assignees', 'labels', 'milestone', 'body'
+    )
+    assert Inferred.NESTED['user'].FIELDS == ('id', 'login', 'type')
+    assert Inferred.NESTED['assignees'].FIELDS == ('id', 'login')
+    assert Inferred.NESTED['labels'].__name__ == 'InferredLabels'
+    assert Inferred.__module__ == Inferred.NESTED['user'].__module__ == __name__
+
+    issue = Inferred.from_dict(payload)
+    assert issue == payload
+    assert issue.labels[0].name == 'bug'
+    assert isinstance(issue.milestone, Record)
@@ -2,7 +2,9 @@ import json
 from pickle import dumps, loads
 
 from isshub_sync.utils import (
-    DictObject
+    DictObject,
+    LazyDictObject,
+    LazyList,
 )
 
 
@@ -57,3 +59,60 @@ def test_dict_object_can_be_pickled():
     obj = loads(dumps(DictObject.from_dict(test_data)))
     assert obj.a_dict.dict2.bar == 4
     assert obj.a_dict.dict2 is obj['a_dict']['dict2']
+
+
+def test_lazy_dict_object_wraps_on_access():
+
+    raw = {
+        'var': 1,
+        'a_dict': {'dict2': {'bar': 4}},
+        'a_list': [{'foo': 1}, [{'baz': 2}], 3],
+    }
+    obj = DictObject.lazy(raw)
+
+    assert isinstance(obj, LazyDictObject)
+    assert obj == raw
+    assert type(dict.__getitem__(obj, 'a_dict')) is dict
+
+    assert obj.a_dict.dict2.bar == 4
+    assert isinstance(obj.a_dict, LazyDictObject)
+    assert obj.a_dict is obj['a_dict']
+    assert obj.a_dict.dict2 is obj.get('a_dict').dict2
+
+    assert isinstance(obj.a_list, LazyList)
+    assert obj.a_list[0].foo == 1
+    assert obj.a_list[1][0].baz == 2
+    assert obj.a_list[0] is obj.a_list[0]
+    assert [type(item) for item in obj.a_list] == [LazyDictObject, LazyList, int]
+
+    # the original dict is not modified
+    assert type(raw['a_dict']) is dict
+    assert type(raw['a_list'][0]) is dict
+
+
+def test_lazy_dict_object_dict_methods():
+
+    obj = DictObject.lazy({'a': {'b': 1}, 'c': 2})
+
+    assert obj.get('d') is None
+    assert obj.get('a').b == 1
+    assert [type(value) for value in DictObject.lazy({'a': {}}).values()] == [LazyDictObject]
+    assert [(key, type(value)) for key, value in DictObject.lazy({'a': {}}).items()] == [
+        ('a', LazyDictObject)
+    ]
+
+
+def test_lazy_dict_object_can_be_pickled():
+
+    obj = DictObject.lazy(test_data)
+    assert obj.a_dict.var2 == 2  # a_dict is converted, not dict2
+
+    obj = loads(dumps(obj))
+    assert isinstance(obj, LazyDictObject)
+    assert obj == test_data
+    assert obj.a_dict.dict2.bar == 4
+    assert obj.a_dict.dict2 is obj['a_dict']['dict2']
+
+    lst = loads(dumps(LazyList([{'foo': 1}])))
+    assert isinstance(lst, LazyList)
+    assert lst[0].foo == 1